@@ -0,0 +1,163 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "backend" / "src"
+sys.path.insert(0, str(SRC))
+
+import argparse
+import asyncio
+import os
+import random
+import subprocess
+import time
+import urllib.error
+import urllib.request
+
+from app.api.db import DB_ASYNC, DB_SYNC
+
+TERMOS = ["", "", "unimed", "saude", "odonto", "12", "coop"]
+
+
+def subirApi(modo: str, porta: int) -> subprocess.Popen:
+    # índice em memória desligado: toda listagem vai ao banco
+    env = {
+        **os.environ,
+        "API_DB_MODO": modo,
+        "OPERADORAS_INDICE": "0",
+        "PYTHONPATH": str(SRC),
+    }
+    processo = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            "app.api.main:app",
+            "--port",
+            str(porta),
+            "--log-level",
+            "warning",
+        ],
+        env=env,
+    )
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        try:
+            urllib.request.urlopen(f"http://127.0.0.1:{porta}/api/estatisticas")
+            return processo
+        except urllib.error.HTTPError:
+            return processo  # respondeu (o erro aparece na carga)
+        except OSError:
+            time.sleep(0.2)
+    processo.terminate()
+    raise RuntimeError(f"API ({modo}) não respondeu na porta {porta}")
+
+
+def caminhoAleatorio(rnd: random.Random) -> str:
+    termo = rnd.choice(TERMOS)
+    pagina = rnd.randint(1, 20)
+    filtro = f"&q={termo}" if termo else ""
+    return f"/api/operadoras?page={pagina}&limit=10{filtro}"
+
+
+async def requisitar(leitor, escritor, porta: int, caminho: str) -> int:
+    escritor.write(
+        f"GET {caminho} HTTP/1.1\r\nHost: 127.0.0.1:{porta}\r\n\r\n".encode("ascii")
+    )
+    await escritor.drain()
+    status = int((await leitor.readline()).split()[1])
+    tamanho = 0
+    while (linha := await leitor.readline()) not in (b"\r\n", b""):
+        nome, _, valor = linha.decode("latin-1").partition(":")
+        if nome.lower() == "content-length":
+            tamanho = int(valor)
+    await leitor.readexactly(tamanho)
+    return status
+
+
+async def cliente(porta: int, fim: float, latencias: list, erros: list, seed: int):
+    """Um cliente HTTP/1.1 keep-alive; requests em sequência até o fim."""
+    rnd = random.Random(seed)
+    conexao = None
+    while time.monotonic() < fim:
+        if conexao is None:
+            conexao = await asyncio.open_connection("127.0.0.1", porta)
+        inicio = time.perf_counter()
+        try:
+            status = await requisitar(*conexao, porta, caminhoAleatorio(rnd))
+        except (ConnectionError, asyncio.IncompleteReadError, IndexError):
+            # o uvicorn fecha a conexão depois de um 500 não tratado
+            conexao[1].close()
+            conexao = None
+            erros.append("conexão")
+            continue
+        latencias.append((time.perf_counter() - inicio) * 1000)
+        if status != 200:
+            erros.append(status)
+    if conexao is not None:
+        conexao[1].close()
+
+
+async def carga(porta: int, clientes: int, segundos: float):
+    latencias, erros = [], []
+    fim = time.monotonic() + segundos
+    await asyncio.gather(
+        *(cliente(porta, fim, latencias, erros, i) for i in range(clientes))
+    )
+    return latencias, erros
+
+
+def percentil(valores: list, p: float) -> float:
+    ordenados = sorted(valores) or [float("nan")]
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+def main(niveis: list[int], segundos: float, porta: int):
+    resultados = {}
+    for modo in (DB_SYNC, DB_ASYNC):
+        processo = subirApi(modo, porta)
+        try:
+            asyncio.run(carga(porta, 4, 2))  # aquece pool e planos
+            for clientes in niveis:
+                latencias, erros = asyncio.run(carga(porta, clientes, segundos))
+                resultados[(modo, clientes)] = (
+                    len(latencias) / segundos,
+                    percentil(latencias, 0.50),
+                    percentil(latencias, 0.99),
+                    len(erros),
+                )
+        finally:
+            processo.terminate()
+            processo.wait()
+
+    print(
+        f"{'clientes':>8} {'modo':>6} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9}"
+        f" {'erros':>6}"
+    )
+    for clientes in niveis:
+        for modo in (DB_SYNC, DB_ASYNC):
+            rps, p50, p99, erros = resultados[(modo, clientes)]
+            print(
+                f"{clientes:>8} {modo:>6} {rps:9.0f} {p50:9.1f} {p99:9.1f} {erros:>6}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Carga concorrente em GET /api/operadoras com a API em "
+            "API_DB_MODO=sync e async (1 worker uvicorn cada; usa DATABASE_URL)"
+        )
+    )
+    parser.add_argument(
+        "--clientes",
+        type=int,
+        nargs="+",
+        default=[10, 50, 200],
+        help="Níveis de concorrência (clientes keep-alive simultâneos)",
+    )
+    parser.add_argument("--segundos", type=float, default=15)
+    parser.add_argument("--porta", type=int, default=8765)
+    args = parser.parse_args()
+
+    main(niveis=args.clientes, segundos=args.segundos, porta=args.porta)
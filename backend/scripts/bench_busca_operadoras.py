@@ -0,0 +1,201 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "backend" / "src"
+sys.path.insert(0, str(SRC))
+
+import argparse
+import re
+import statistics
+import time
+
+from app.api.db import SessionLocal
+from app.api.utils import only_digits
+from app.repositories.operadora_repo import (
+    COLUNAS_OPERADORA,
+    FILTRO_Q,
+    FILTRO_TRIGRAM,
+    RANK_TRIGRAM,
+    _params_q,
+)
+from app.services.operadora_indice import IndiceOperadoras
+from sqlalchemy import text
+
+DB_DIR = ROOT / "db"
+SCHEMA = "bench_busca"
+
+# ~1.100 operadoras ativas no CADOP
+LINHAS_CADOP = 1_100
+
+TERMOS = [
+    "unimed",
+    "saude",
+    "SAÚDE",
+    "odonto",
+    "assistencia medica",
+    "unimde",  # erro de digitação
+    "12345",  # prefixo de CNPJ
+    "zzzzzz",  # sem resultado
+]
+
+PALAVRAS = [
+    "UNIMED",
+    "SAÚDE",
+    "ASSISTÊNCIA",
+    "MÉDICA",
+    "ODONTOLÓGICA",
+    "COOPERATIVA",
+    "PLANOS",
+    "HOSPITALAR",
+    "SÃO PAULO",
+    "PARANÁ",
+    "GOIÂNIA",
+    "BELÉM",
+    "CLÍNICA",
+    "SERVIÇOS",
+    "ADMINISTRADORA",
+    "BENEFÍCIOS",
+]
+
+
+def criarTabela(db, linhas: int):
+    db.execute(text(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE"))
+    db.execute(text(f"CREATE SCHEMA {SCHEMA}"))
+    db.execute(
+        text(
+            f"CREATE TABLE {SCHEMA}.operadora "
+            "(LIKE healthtech.operadora INCLUDING DEFAULTS)"
+        )
+    )
+    db.execute(text("SELECT setseed(0.22)"))
+    # nomes com 2-4 palavras acentuadas + sufixo numérico; CNPJ aleatório
+    db.execute(
+        text(f"""
+            INSERT INTO {SCHEMA}.operadora (registro_ans, cnpj, razao_social, nome_fantasia, uf)
+            SELECT
+              r,
+              lpad((floor(random() * 1e14))::bigint::text, 14, '0'),
+              (
+                SELECT string_agg(p[1 + floor(random() * array_length(p, 1))::int], ' ')
+                FROM generate_series(1, 2 + (r % 3))
+              ) || ' ' || r,
+              CASE WHEN r % 4 = 0 THEN NULL ELSE p[1 + (r % array_length(p, 1))] END,
+              'SP'
+            FROM generate_series(1, :linhas) r, (SELECT CAST(:palavras AS text[]) AS p) w
+            """),
+        {"linhas": linhas, "palavras": PALAVRAS},
+    )
+
+    # mesmos índices do 005_busca_operadora.sql, no schema do benchmark
+    ddl = (DB_DIR / "005_busca_operadora.sql").read_text(encoding="utf-8")
+    for comando in re.findall(r"CREATE INDEX IF NOT EXISTS.*?;", ddl, re.S):
+        db.execute(text(comando.replace("healthtech.operadora", f"{SCHEMA}.operadora")))
+    db.execute(text(f"CREATE INDEX ON {SCHEMA}.operadora (razao_social, registro_ans)"))
+    db.execute(text(f"ANALYZE {SCHEMA}.operadora"))
+    db.commit()
+
+
+def consultas(filtro: str, rank: bool):
+    ordem = "razao_social NULLS LAST, registro_ans"
+    if rank:
+        ordem = f"({RANK_TRIGRAM}) DESC, {ordem}"
+    # o que o endpoint faz na página 1: COUNT + página
+    return (
+        text(f"SELECT COUNT(*) FROM {SCHEMA}.operadora WHERE {filtro}"),
+        text(
+            f"SELECT registro_ans, razao_social FROM {SCHEMA}.operadora "
+            f"WHERE {filtro} ORDER BY {ordem} LIMIT 10"
+        ),
+    )
+
+
+def medir(db, filtro: str, rank: bool, termo: str, repeticoes: int):
+    contagem, pagina = consultas(filtro, rank)
+    params = _params_q(termo, only_digits(termo))
+    tempos = []
+    for _ in range(repeticoes + 1):  # a primeira só aquece
+        inicio = time.perf_counter()
+        total = db.execute(contagem, params).scalar_one()
+        linhas = db.execute(pagina, params).all()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos = sorted(tempos[1:])
+    p95 = tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))]
+    primeiro = linhas[0][1] if linhas else "-"
+    return statistics.median(tempos), p95, total, primeiro
+
+
+def medirIndice(indice: IndiceOperadoras, termo: str, repeticoes: int):
+    # OPERADORAS_INDICE=1: mesma resposta, sem ida ao banco (LRU limpo a cada volta)
+    tempos = []
+    achadas = 0
+    for _ in range(repeticoes + 1):
+        indice.buscar.cache_clear()
+        inicio = time.perf_counter()
+        posicoes = indice.buscar(termo, only_digits(termo))
+        # os TERMOS são todos cobertos pelo índice (None iria ao SQL)
+        assert posicoes is not None, f"índice não cobre {termo!r}"
+        indice.pagina(posicoes, 0, 10)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        achadas = len(posicoes)
+    tempos = sorted(tempos[1:])
+    p95 = tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))]
+    return statistics.median(tempos), p95, achadas
+
+
+def main(fator: int, repeticoes: int, manter: bool):
+    linhas = LINHAS_CADOP * fator
+    with SessionLocal() as db:
+        inicio = time.perf_counter()
+        criarTabela(db, linhas)
+        print(f"{linhas} operadoras sintéticas em {time.perf_counter() - inicio:.1f}s")
+
+        inicio = time.perf_counter()
+        indice = IndiceOperadoras(
+            db.execute(
+                text(
+                    f"SELECT {COLUNAS_OPERADORA} FROM {SCHEMA}.operadora "
+                    "ORDER BY razao_social NULLS LAST, registro_ans"
+                )
+            )
+            .mappings()
+            .all()
+        )
+        print(f"índice em memória em {time.perf_counter() - inicio:.1f}s\n")
+
+        print(
+            f"{'termo':<20} {'ilike p50/p95 ms':>18} {'índice p50/p95 ms':>19}"
+            f" {'trigram p50/p95 ms':>20} {'total':>14}  1º resultado (trigram)"
+        )
+        for termo in TERMOS:
+            ilike = medir(db, FILTRO_Q, False, termo, repeticoes)
+            memoria = medirIndice(indice, termo, repeticoes)
+            assert memoria[2] == ilike[2], f"índice diverge do ILIKE em {termo!r}"
+            trigram = medir(db, FILTRO_TRIGRAM, True, termo, repeticoes)
+            print(
+                f"{termo:<20} {ilike[0]:8.1f}/{ilike[1]:<9.1f}"
+                f" {memoria[0]:9.3f}/{memoria[1]:<9.3f}"
+                f" {trigram[0]:10.1f}/{trigram[1]:<9.1f}"
+                f" {ilike[2]:>6}/{trigram[2]:<7}  {trigram[3]}"
+            )
+
+        if not manter:
+            db.execute(text(f"DROP SCHEMA {SCHEMA} CASCADE"))
+            db.commit()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Latência do filtro q de /api/operadoras: ILIKE x índice em memória x trigramas "
+            "(tabela sintética N x CADOP; usa DATABASE_URL com o 001_ddl.sql aplicado)"
+        )
+    )
+    parser.add_argument("--fator", type=int, default=100)
+    parser.add_argument("--repeticoes", type=int, default=20)
+    parser.add_argument(
+        "--manter", action="store_true", help="Não apaga o schema de benchmark"
+    )
+    args = parser.parse_args()
+
+    main(fator=args.fator, repeticoes=args.repeticoes, manter=args.manter)
@@ -0,0 +1,64 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "backend" / "src"
+sys.path.insert(0, str(SRC))
+
+import argparse
+import random
+import time
+
+from app.domain import validators
+from app.domain.validators import motivo_cnpj_invalido, validar_cnpj, validar_cnpjs
+
+
+def gerarCnpjs(n: int, distintos: int) -> list[str]:
+    rnd = random.Random(42)
+    base = []
+    for _ in range(distintos):
+        raiz = "".join(rnd.choice("0123456789") for _ in range(12))
+        dv1 = validators._calc_dv(raiz, validators.PESOS_DV1)
+        cnpj = raiz + dv1 + validators._calc_dv(raiz + dv1, validators.PESOS_DV2)
+        # ~5% inválidos, como no CADOP real
+        base.append(cnpj if rnd.random() > 0.05 else cnpj[:13] + "9")
+    # strings novas por linha, como o csv.reader produz
+    return ["".join(rnd.choice(base)) for _ in range(n)]
+
+
+def medir(nome: str, fn, cnpjs) -> float:
+    inicio = time.perf_counter()
+    validos = sum(1 for c in cnpjs if fn(c))
+    dt = time.perf_counter() - inicio
+    print(
+        f"{nome:<22} {dt:8.3f}s  {dt / len(cnpjs) * 1e9:8.1f} ns/linha  validos={validos}"
+    )
+    return dt
+
+
+def main(n: int, distintos: int):
+    cnpjs = gerarCnpjs(n, distintos)
+    semCache = motivo_cnpj_invalido.__wrapped__
+
+    print(f"{n} linhas, {distintos} CNPJs distintos")
+    base = medir("escalar (sem cache)", lambda c: semCache(c) is None, cnpjs)
+    motivo_cnpj_invalido.cache_clear()
+    cache = medir("escalar (memo)", validar_cnpj, cnpjs)
+
+    inicio = time.perf_counter()
+    validos = int(sum(validar_cnpjs(cnpjs)))
+    lote = time.perf_counter() - inicio
+    print(
+        f"{'lote (numpy)':<22} {lote:8.3f}s  {lote / n * 1e9:8.1f} ns/linha  validos={validos}"
+    )
+
+    print(f"speedup memo: {base / cache:.1f}x | lote: {base / lote:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-benchmark da validação de CNPJ")
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--distintos", type=int, default=1_500)
+    args = parser.parse_args()
+
+    main(n=args.linhas, distintos=args.distintos)
@@ -0,0 +1,112 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "backend" / "src"
+sys.path.insert(0, str(SRC))
+
+import argparse
+import csv
+import random
+import tempfile
+import time
+
+from app.core import columnar
+from app.usecases.ans_consolidate import (
+    acumularDecimal,
+    acumularVetorizado,
+    escreverConsolidado,
+)
+from app.usecases.ans_normalization import CANON_HEADER
+
+
+def gerarStaging(caminho: Path, linhas: int, operadoras: int) -> None:
+    rnd = random.Random(42)
+    registros = [f"{rnd.randint(300, 420_000):06d}" for _ in range(operadoras)]
+    escritorColunar = (
+        columnar.EscritorColunar(
+            caminho.with_suffix(".parquet"), columnar.STAGING_LAYOUT
+        )
+        if columnar.pa is not None
+        else None
+    )
+
+    with open(caminho, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(CANON_HEADER)
+        for _ in range(linhas):
+            ano, t = rnd.choice([(2024, 3), (2024, 4), (2025, 1), (2025, 2)])
+            valor = f"{rnd.randint(-10_000, 50_000_000)}.{rnd.randint(0, 99):02d}"
+            row = [
+                f"{ano}-{t * 3:02d}-01",
+                rnd.choice(registros),
+                "411",
+                "EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS",
+                "",
+                valor,
+                str(ano),
+                str(t),
+                f"{t}T{ano}.csv",
+            ]
+            writer.writerow(row)
+            if escritorColunar is not None:
+                escritorColunar.writerow(row)
+
+    if escritorColunar is not None:
+        escritorColunar.close()
+
+
+def medir(nome: str, fn, saida: Path) -> float:
+    inicio = time.perf_counter()
+    escreverConsolidado(fn(), saida)
+    dt = time.perf_counter() - inicio
+    print(f"{nome:<24} {dt:8.2f}s")
+    return dt
+
+
+def main(linhas: int, operadoras: int):
+    with tempfile.TemporaryDirectory() as tmp:
+        tmpDir = Path(tmp)
+        staging = tmpDir / "staging.csv"
+
+        inicio = time.perf_counter()
+        gerarStaging(staging, linhas, operadoras)
+        print(
+            f"staging sintético: {linhas} linhas ({time.perf_counter() - inicio:.1f}s)"
+        )
+
+        base = medir(
+            "decimal (csv)",
+            lambda: acumularDecimal(staging, "csv"),
+            tmpDir / "decimal.csv",
+        )
+        vetorCsv = medir(
+            "vetorizado (csv)",
+            lambda: acumularVetorizado(staging, "csv"),
+            tmpDir / "vetorizado_csv.csv",
+        )
+        vetorParquet = medir(
+            "vetorizado (parquet)",
+            lambda: acumularVetorizado(staging.with_suffix(".parquet"), "parquet"),
+            tmpDir / "vetorizado_parquet.csv",
+        )
+
+        esperado = (tmpDir / "decimal.csv").read_bytes()
+        for nome in ("vetorizado_csv.csv", "vetorizado_parquet.csv"):
+            assert (tmpDir / nome).read_bytes() == esperado, f"{nome} divergente"
+
+        print("saídas byte a byte idênticas")
+        print(
+            f"speedup csv: {base / vetorCsv:.1f}x | parquet: {base / vetorParquet:.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark dos motores de consolidação (decimal x vetorizado)"
+    )
+    parser.add_argument("--linhas", type=int, default=3_000_000)
+    parser.add_argument("--operadoras", type=int, default=1_000)
+    args = parser.parse_args()
+
+    main(linhas=args.linhas, operadoras=args.operadoras)
@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "backend" / "src"
+sys.path.insert(0, str(SRC))
+
+import argparse
+import statistics
+import time
+
+from app.api.db import SessionLocal
+from app.repositories.estatisticas_repo import EstatisticasRepository
+from app.services.cache import CacheMemoria
+from app.services.estatisticas_service import (
+    CONSULTA_SEPARADAS,
+    CONSULTA_UNICA,
+    EstatisticasService,
+)
+
+
+class SemResumo(EstatisticasRepository):
+    # mede as consultas mesmo em banco que já tem o resumo materializado
+    def resumo(self, db):
+        return None
+
+
+def medir(db, modo: str, repeticoes: int):
+    svc = EstatisticasService(SemResumo(), consulta=modo, cache=CacheMemoria())
+    tempos = []
+    payload = None
+    for _ in range(repeticoes + 1):  # a primeira só aquece
+        inicio = time.perf_counter()
+        payload = svc._calcular(db)  # direto no banco, sem cache
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    return statistics.median(tempos[1:]), payload
+
+
+def main(repeticoes: int):
+    with SessionLocal() as db:
+        separadas, esperado = medir(db, CONSULTA_SEPARADAS, repeticoes)
+        unica, payload = medir(db, CONSULTA_UNICA, repeticoes)
+
+    print(f"{'4 consultas':<14} {separadas:9.1f} ms (mediana de {repeticoes})")
+    print(f"{'consulta única':<14} {unica:9.1f} ms")
+    print(f"speedup: {separadas / unica:.2f}x | mesmo payload: {payload == esperado}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compara /api/estatisticas com 4 consultas x consulta única (usa DATABASE_URL)"
+    )
+    parser.add_argument("--repeticoes", type=int, default=20)
+    args = parser.parse_args()
+
+    main(repeticoes=args.repeticoes)
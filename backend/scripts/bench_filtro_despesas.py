@@ -0,0 +1,77 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "backend" / "src"
+sys.path.insert(0, str(SRC))
+
+import argparse
+import random
+import time
+
+from app.usecases.ans_normalization import (
+    isContaEventosSinistros,
+    isDespesasEventosSinistros,
+)
+
+DESCRICOES = [
+    ("EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS  DE ASSISTÊNCIA A SAÚDE", "411"),
+    ("Despesas com Eventos / Sinistros", "41"),
+    ("DESPESAS COM SINISTROS - JUDICIAL", "4111"),
+    ("Contraprestações Efetivas de Operações de Planos", "311"),
+    ("Despesas de Comercialização", "43"),
+    ("Despesas Administrativas", "46"),
+    ("Receitas Financeiras", "35"),
+    ("Provisão de Eventos Ocorridos e Não Avisados", "2111"),
+]
+
+
+def gerarLinhas(n: int, distintas: int) -> list[tuple[str, str]]:
+    rnd = random.Random(42)
+    base = [
+        (f"{d} {i // len(DESCRICOES)}".strip(), c)
+        for i, (d, c) in enumerate(DESCRICOES * (distintas // len(DESCRICOES) + 1))
+    ][:distintas]
+    # strings novas por linha, como o csv.reader produz
+    return [("".join(d), c) for d, c in (rnd.choice(base) for _ in range(n))]
+
+
+def medir(nome: str, fn, linhas) -> float:
+    inicio = time.perf_counter()
+    match = 0
+    for descricao, conta in linhas:
+        if fn(descricao, conta):
+            match += 1
+    dt = time.perf_counter() - inicio
+    print(
+        f"{nome:<22} {dt:8.3f}s  {dt / len(linhas) * 1e9:8.1f} ns/linha  match={match}"
+    )
+    return dt
+
+
+def main(n: int, distintas: int):
+    linhas = gerarLinhas(n, distintas)
+    semCache = isDespesasEventosSinistros.__wrapped__
+
+    print(f"{n} linhas, {distintas} descrições distintas")
+    base = medir("descricao (sem cache)", lambda d, c: semCache(d), linhas)
+    isDespesasEventosSinistros.cache_clear()
+    cache = medir(
+        "descricao (memo)", lambda d, c: isDespesasEventosSinistros(d), linhas
+    )
+    prefixo = medir(
+        "prefixo CD_CONTA", lambda d, c: isContaEventosSinistros(c, ("41",)), linhas
+    )
+
+    print(f"speedup memo: {base / cache:.1f}x | prefixo: {base / prefixo:.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Micro-benchmark do filtro de Despesas com Eventos/Sinistros"
+    )
+    parser.add_argument("--linhas", type=int, default=1_000_000)
+    parser.add_argument("--distintas", type=int, default=300)
+    args = parser.parse_args()
+
+    main(n=args.linhas, distintas=args.distintas)
@@ -0,0 +1,253 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "backend" / "src"
+sys.path.insert(0, str(SRC))
+
+import argparse
+import json
+import re
+import statistics
+import time
+
+from app.usecases.db_import import exigirPsycopg, getDatabaseUrl
+
+DB_DIR = ROOT / "db"
+
+SCHEMA_HEAP = "bench_heap"
+SCHEMA_PARTICIONADO = "bench_particionado"
+
+DDL_OPERADORA = """
+CREATE TABLE operadora (
+  registro_ans  INTEGER PRIMARY KEY,
+  razao_social  TEXT,
+  uf            CHAR(2)
+)
+"""
+
+COLUNAS_FATO = """
+  registro_ans        INTEGER NOT NULL REFERENCES operadora(registro_ans),
+  ano                 SMALLINT NOT NULL,
+  trimestre           SMALLINT NOT NULL CHECK (trimestre BETWEEN 1 AND 4),
+  valor_despesas      NUMERIC(18,2) NOT NULL,
+  cnpj_valido             BOOLEAN,
+  valor_positivo          BOOLEAN,
+  razao_social_nao_vazia  BOOLEAN,
+  erros                   TEXT,
+  PRIMARY KEY (registro_ans, ano, trimestre)
+"""
+
+# layout anterior do 001_ddl.sql
+DDL_HEAP = [
+    f"CREATE TABLE despesa_trimestral ({COLUNAS_FATO})",
+    "CREATE INDEX idx_despesa_periodo ON despesa_trimestral (ano, trimestre)",
+    "CREATE INDEX idx_despesa_registro_periodo "
+    "ON despesa_trimestral (registro_ans, ano, trimestre)",
+]
+
+DDL_PARTICIONADO = [
+    f"CREATE TABLE despesa_trimestral ({COLUNAS_FATO}) PARTITION BY RANGE (ano, trimestre)",
+    "CREATE TABLE despesa_trimestral_default PARTITION OF despesa_trimestral DEFAULT",
+]
+
+UFS = ["SP", "RJ", "MG", "RS", "PR", "BA", "SC", "PE", "GO", "DF", "CE", "ES"]
+
+
+def lerQueries() -> list[str]:
+    """As três queries do 003_queries.sql, sem os SETs (cada cenário liga os seus)."""
+    texto = (DB_DIR / "003_queries.sql").read_text(encoding="utf-8")
+    texto = re.sub(r"--[^\n]*", "", texto)
+    comandos = [c.strip() for c in texto.split(";")]
+    return [c for c in comandos if c and not c.upper().startswith("SET ")]
+
+
+def criarSchema(cur, schema: str, ddl: list[str]):
+    cur.execute(f"DROP SCHEMA IF EXISTS {schema} CASCADE")
+    cur.execute(f"CREATE SCHEMA {schema}")
+    cur.execute(f"SET search_path TO {schema}")
+    cur.execute(DDL_OPERADORA)
+    for comando in ddl:
+        cur.execute(comando)
+
+
+def popular(cur, operadoras: int, anoInicial: int, anos: int, falta: float):
+    cur.execute("SELECT setseed(0.42)")
+    cur.execute(
+        "INSERT INTO operadora (registro_ans, razao_social, uf) "
+        "SELECT r, 'OPERADORA ' || r, (%s::text[])[1 + r %% %s] "
+        "FROM generate_series(1, %s) r",
+        (UFS, len(UFS), operadoras),
+    )
+    # trimestres faltando (falta) e valores com cauda longa, como nos dados da ANS
+    cur.execute(
+        "INSERT INTO despesa_trimestral "
+        "(registro_ans, ano, trimestre, valor_despesas, cnpj_valido, valor_positivo, "
+        " razao_social_nao_vazia, erros) "
+        "SELECT r, a, t, round((exp(random() * 14))::numeric, 2), true, true, true, NULL "
+        "FROM generate_series(1, %s) r, generate_series(%s, %s) a, generate_series(1, 4) t "
+        "WHERE random() >= %s",
+        (operadoras, anoInicial, anoInicial + anos - 1, falta),
+    )
+
+
+def executionTime(cur, sql: str) -> float:
+    cur.execute(f"EXPLAIN (ANALYZE, FORMAT JSON) {sql}")
+    plano = cur.fetchone()[0]
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return plano[0]["Execution Time"]
+
+
+def medirQueries(cur, schema: str, partitionwise: bool, queries, repeticoes: int):
+    cur.execute(f"SET search_path TO {schema}")
+    valor = "on" if partitionwise else "off"
+    cur.execute(f"SET enable_partitionwise_aggregate = {valor}")
+    cur.execute(f"SET enable_partitionwise_join = {valor}")
+    tempos = []
+    for sql in queries:
+        executionTime(cur, sql)  # aquece o cache
+        tempos.append(
+            statistics.median(executionTime(cur, sql) for _ in range(repeticoes))
+        )
+    return tempos
+
+
+def medirRemocao(conn, schema: str, ano: int, particionado: bool) -> float:
+    # dentro de uma transação desfeita: os dois cenários partem da mesma base
+    with conn.transaction(force_rollback=True):
+        with conn.cursor() as cur:
+            cur.execute(f"SET LOCAL search_path TO {schema}")
+            inicio = time.perf_counter()
+            if particionado:
+                cur.execute("SELECT remover_particao_despesa(%s, 1)", (ano,))
+            else:
+                cur.execute(
+                    "DELETE FROM despesa_trimestral WHERE ano = %s AND trimestre = 1",
+                    (ano,),
+                )
+            return (time.perf_counter() - inicio) * 1000
+
+
+def imprimirPlanos(cur, queries):
+    cur.execute(f"SET search_path TO {SCHEMA_PARTICIONADO}")
+    cur.execute("SET enable_partitionwise_aggregate = on")
+    cur.execute("SET enable_partitionwise_join = on")
+    for i, sql in enumerate(queries, start=1):
+        cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) {sql}")
+        print(f"\n--- Query {i} (particionada, partitionwise on) ---")
+        print("\n".join(linha[0] for linha in cur.fetchall()))
+
+
+def main(
+    operadoras: int,
+    anoInicial: int,
+    anos: int,
+    falta: float,
+    repeticoes: int,
+    explain: bool,
+    manter: bool,
+):
+    exigirPsycopg()
+    import psycopg
+    queries = lerQueries()
+    # bytes: o psycopg executa o script como veio (sem parâmetros)
+    funcoes = (DB_DIR / "funcoes_particao.sql").read_bytes()
+
+    with psycopg.connect(getDatabaseUrl(), autocommit=True) as conn:
+        with conn.cursor() as cur:
+            criarSchema(cur, SCHEMA_HEAP, DDL_HEAP)
+            inicio = time.perf_counter()
+            popular(cur, operadoras, anoInicial, anos, falta)
+            cur.execute("SELECT COUNT(*) FROM despesa_trimestral")
+            (linhas,) = cur.fetchone() or (0,)
+            print(
+                f"{linhas} linhas sintéticas ({operadoras} operadoras x {anos} anos) "
+                f"em {time.perf_counter() - inicio:.1f}s"
+            )
+
+            criarSchema(cur, SCHEMA_PARTICIONADO, DDL_PARTICIONADO)
+            cur.execute(funcoes)
+            cur.execute(
+                "SELECT criar_particao_despesa(a, t) "
+                "FROM generate_series(%s, %s) a, generate_series(1, 4) t",
+                (anoInicial, anoInicial + anos - 1),
+            )
+            cur.execute(f"INSERT INTO operadora SELECT * FROM {SCHEMA_HEAP}.operadora")
+            cur.execute(
+                "INSERT INTO despesa_trimestral "
+                f"SELECT * FROM {SCHEMA_HEAP}.despesa_trimestral"
+            )
+            cur.execute(f"ANALYZE {SCHEMA_HEAP}.despesa_trimestral")
+            cur.execute(f"ANALYZE {SCHEMA_HEAP}.operadora")
+            cur.execute(f"ANALYZE {SCHEMA_PARTICIONADO}.despesa_trimestral")
+            cur.execute(f"ANALYZE {SCHEMA_PARTICIONADO}.operadora")
+
+            cenarios = [
+                ("heap", medirQueries(cur, SCHEMA_HEAP, False, queries, repeticoes)),
+                (
+                    "particionada",
+                    medirQueries(cur, SCHEMA_PARTICIONADO, False, queries, repeticoes),
+                ),
+                (
+                    "particionada + partitionwise",
+                    medirQueries(cur, SCHEMA_PARTICIONADO, True, queries, repeticoes),
+                ),
+            ]
+
+        print(
+            f"\n{'cenário (mediana ms)':<30}"
+            + "".join(f"{f'Q{i}':>10}" for i in (1, 2, 3))
+        )
+        for nome, tempos in cenarios:
+            print(f"{nome:<30}" + "".join(f"{t:10.1f}" for t in tempos))
+
+        removerHeap = medirRemocao(conn, SCHEMA_HEAP, anoInicial, False)
+        removerParticao = medirRemocao(conn, SCHEMA_PARTICIONADO, anoInicial, True)
+        print(
+            f"\nremover {anoInicial}T1: DELETE {removerHeap:.1f} ms | "
+            f"DETACH + DROP {removerParticao:.1f} ms"
+        )
+
+        with conn.cursor() as cur:
+            if explain:
+                imprimirPlanos(cur, queries)
+            if not manter:
+                cur.execute(f"DROP SCHEMA {SCHEMA_HEAP} CASCADE")
+                cur.execute(f"DROP SCHEMA {SCHEMA_PARTICIONADO} CASCADE")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Compara despesa_trimestral heap x particionada por trimestre "
+            "(queries do 003_queries.sql em dados sintéticos)"
+        )
+    )
+    parser.add_argument("--operadoras", type=int, default=20_000)
+    parser.add_argument("--ano-inicial", type=int, default=2016)
+    parser.add_argument("--anos", type=int, default=10)
+    parser.add_argument(
+        "--falta",
+        type=float,
+        default=0.1,
+        help="Fração de trimestres ausentes por operadora",
+    )
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument(
+        "--explain", action="store_true", help="Imprime os planos da particionada"
+    )
+    parser.add_argument(
+        "--manter", action="store_true", help="Não apaga os schemas de benchmark"
+    )
+    args = parser.parse_args()
+
+    main(
+        operadoras=args.operadoras,
+        anoInicial=args.ano_inicial,
+        anos=args.anos,
+        falta=args.falta,
+        repeticoes=args.repeticoes,
+        explain=args.explain,
+        manter=args.manter,
+    )
@@ -0,0 +1,99 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "backend" / "src"
+sys.path.insert(0, str(SRC))
+
+import argparse
+import statistics
+import time
+
+from app.api.db import DATABASE_URL
+from app.api.utils import only_digits
+from app.repositories.operadora_repo import OperadoraRepository
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+TERMOS = ["", "unimed", "saude", "12"]
+
+# consultas quentes da listagem/detalhe
+CONSULTAS = {
+    "count": lambda repo, db, q, i: repo.count_operadoras(db, q, only_digits(q)),
+    "página": lambda repo, db, q, i: repo.list_operadoras(
+        db, 1 + i % 5, 10, q, only_digits(q)
+    ),
+    "keyset": lambda repo, db, q, i: repo.list_operadoras_keyset(
+        db, 11, q, only_digits(q), ("M", 1)
+    ),
+    "por cnpj": lambda repo, db, q, i: repo.get_registro_ans_by_cnpj(
+        db, "00000000000000"
+    ),
+}
+
+
+def medir(threshold, repeticoes: int):
+    """Mediana (ms) por consulta numa conexão só, com o threshold do psycopg."""
+    engine = create_engine(
+        DATABASE_URL,
+        pool_size=1,
+        connect_args={
+            "options": "-csearch_path=healthtech",
+            "prepare_threshold": threshold,
+        },
+    )
+    repo = OperadoraRepository()
+    tempos = {nome: [] for nome in CONSULTAS}
+    with Session(engine) as db:
+        for i in range(repeticoes):
+            q = TERMOS[i % len(TERMOS)]
+            for nome, consulta in CONSULTAS.items():
+                inicio = time.perf_counter()
+                consulta(repo, db, q, i)
+                tempos[nome].append((time.perf_counter() - inicio) * 1000)
+        preparadas = db.execute(
+            text("SELECT COUNT(*) FROM pg_prepared_statements")
+        ).scalar_one()
+    engine.dispose()
+    # descarta o aquecimento (antes do threshold nada está preparado)
+    return {n: statistics.median(t[20:]) for n, t in tempos.items()}, preparadas
+
+
+def main(repeticoes: int, rodadas: int):
+    cenarios = [("nunca", None), ("5 (padrão)", 5), ("0 (sempre)", 0)]
+    resultados = {nome: {c: [] for c in CONSULTAS} for nome, _ in cenarios}
+    preparadas = {}
+    # rodadas alternadas: ruído da máquina afeta os cenários por igual
+    for _ in range(rodadas):
+        for nome, threshold in cenarios:
+            medianas, preparadas[nome] = medir(threshold, repeticoes)
+            for consulta, valor in medianas.items():
+                resultados[nome][consulta].append(valor)
+
+    print(
+        f"{'prepare_threshold':<18}"
+        + "".join(f"{c:>11}" for c in CONSULTAS)
+        + f"{'preparadas':>12}"
+    )
+    for nome, _ in cenarios:
+        print(
+            f"{nome:<18}"
+            + "".join(
+                f"{statistics.median(resultados[nome][c]):11.3f}" for c in CONSULTAS
+            )
+            + f"{preparadas[nome]:>12}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description=(
+            "Latência (ms) das consultas quentes de operadoras com e sem "
+            "statements preparados no servidor (API_DB_PREPARE_THRESHOLD)"
+        )
+    )
+    parser.add_argument("--repeticoes", type=int, default=400)
+    parser.add_argument("--rodadas", type=int, default=3)
+    args = parser.parse_args()
+
+    main(repeticoes=args.repeticoes, rodadas=args.rodadas)
@@ -0,0 +1,37 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "backend" / "src"
+sys.path.insert(0, str(SRC))
+
+import argparse
+
+from app.usecases.db_import import executarImportacaoDb
+
+
+def main(lote: int | None, incremental: bool):
+    resultados = executarImportacaoDb(tamanhoLote=lote, incremental=incremental or None)
+    total = sum(r.linhas for r in resultados)
+    duracao = sum(r.duracao_s for r in resultados)
+    print(f"Carga finalizada: {total} linhas em {duracao:.2f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Carrega os CSVs do pipeline no PostgreSQL via COPY (Teste 3)"
+    )
+    parser.add_argument(
+        "--lote",
+        type=int,
+        default=None,
+        help="Linhas por lote de COPY (padrão: ANS_DB_LOTE ou 50000)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Carrega só as partições (trimestres, agregados) alteradas desde a última carga",
+    )
+    args = parser.parse_args()
+
+    main(lote=args.lote, incremental=args.incremental)
@@ -0,0 +1,115 @@
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "backend" / "src"
+sys.path.insert(0, str(SRC))
+
+import argparse
+
+from app.core.pipeline import executarPipeline, getArquivoRelatorio
+from app.usecases.ans_pipeline import (
+    montarEtapaImportacaoDb,
+    montarEtapasTeste1,
+    montarEtapasTeste2,
+)
+
+
+def main(
+    nome: str,
+    formato: str | None,
+    workers: int,
+    paralelismo: int,
+    incremental: bool,
+    fundido: bool,
+    importarDb: bool,
+    loteDb: int | None,
+    relatorio: Path | None,
+):
+    # Teste 1 + Teste 2 num único DAG: download do CADOP roda junto com o Teste 1
+    etapas = montarEtapasTeste1(
+        formato=formato, workers=workers or None, incremental=incremental or None
+    ) + montarEtapasTeste2(
+        nome,
+        formato=formato,
+        incremental=incremental or None,
+        dependenciasConsolidado=("consolidacao",),
+        fundido=fundido or None,
+    )
+    if importarDb:
+        etapas.append(
+            montarEtapaImportacaoDb(tamanhoLote=loteDb, incremental=incremental or None)
+        )
+
+    relatorioPath = relatorio or getArquivoRelatorio("pipeline")
+    resultado = executarPipeline(
+        etapas, workers=paralelismo, relatorioPath=relatorioPath
+    )
+
+    print(f"Pipeline finalizado em {resultado.duracao_s}s")
+    print(f"Relatório de execução: {relatorioPath}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Executa Teste 1 e Teste 2 como um grafo de etapas instrumentado"
+    )
+    parser.add_argument("--nome", default="Gabriel_Martins")
+    parser.add_argument(
+        "--formato",
+        choices=["csv", "parquet"],
+        default=None,
+        help="Formato dos intermediários (padrão: ANS_FORMATO_INTERMEDIARIO ou csv)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Processos para normalização paralela (>1 ativa o modo paralelo)",
+    )
+    parser.add_argument(
+        "--paralelismo",
+        type=int,
+        default=2,
+        help="Etapas independentes executadas ao mesmo tempo",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reprocessa só o que mudou (manifestos em data/staging e data/output/teste2)",
+    )
+    parser.add_argument(
+        "--fundido",
+        action="store_true",
+        help="Enriquecimento, validação e agregação numa única passagem",
+    )
+    parser.add_argument(
+        "--importar-db",
+        action="store_true",
+        help="Carrega CADOP, consolidado final e agregadas no PostgreSQL (DATABASE_URL)",
+    )
+    parser.add_argument(
+        "--lote-db",
+        type=int,
+        default=None,
+        help="Linhas por lote de COPY na carga (padrão: ANS_DB_LOTE ou 50000)",
+    )
+    parser.add_argument(
+        "--relatorio",
+        type=Path,
+        default=None,
+        help="JSON com tempo/linhas/bytes/pico de RSS por etapa (padrão: data/output/relatorios)",
+    )
+    args = parser.parse_args()
+
+    main(
+        nome=args.nome,
+        formato=args.formato,
+        workers=args.workers,
+        paralelismo=args.paralelismo,
+        incremental=args.incremental,
+        fundido=args.fundido,
+        importarDb=args.importar_db,
+        loteDb=args.lote_db,
+        relatorio=args.relatorio,
+    )
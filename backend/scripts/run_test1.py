@@ -9,9 +9,9 @@ import argparse
 import shutil
 
 from app.core.paths import EXTRACTED_DIR, OUTPUT_TESTE1_DIR, RAW_DIR, STAGING_DIR
-from app.usecases.ans_consolidate import consolidarDespesas
-from app.usecases.ans_download import executarDownloadAns
-from app.usecases.ans_normalization import executarProcessamentoAns
+from app.core.pipeline import executarPipeline, getArquivoRelatorio
+from app.usecases.ans_consolidate import getArquivoZipFinal
+from app.usecases.ans_pipeline import montarEtapasTeste1
 
 
 def limparDiretorios():
@@ -28,21 +28,29 @@ def limparDiretorios():
             print(f"Removido: {pasta}")
 
 
-def main(clean: bool):
+def main(
+    clean: bool,
+    streaming: bool,
+    workers: int,
+    formato: str | None,
+    incremental: bool,
+    relatorio: Path | None,
+):
     if clean:
         print("Executando limpeza completa do Teste 1 (--clean)")
         limparDiretorios()
 
-    print("=== TESTE 1.1 — Download ===")
-    executarDownloadAns()
-
-    print("=== TESTE 1.2 — Normalização ===")
-    executarProcessamentoAns()
-
-    print("=== TESTE 1.3 — Consolidação ===")
-    zipFinal = consolidarDespesas()
+    etapas = montarEtapasTeste1(
+        formato=formato,
+        streaming=streaming or None,
+        workers=workers or None,
+        incremental=incremental or None,
+    )
+    relatorioPath = relatorio or getArquivoRelatorio("teste1")
+    executarPipeline(etapas, relatorioPath=relatorioPath)
 
-    print(f"Pipeline finalizado. Arquivo gerado: {zipFinal}")
+    print(f"Pipeline finalizado. Arquivo gerado: {getArquivoZipFinal()}")
+    print(f"Relatório de execução: {relatorioPath}")
 
 
 if __name__ == "__main__":
@@ -54,6 +62,41 @@ if __name__ == "__main__":
         action="store_true",
         help="Remove dados anteriores antes de executar o pipeline",
     )
+    parser.add_argument(
+        "--streaming",
+        action="store_true",
+        help="Normaliza direto do stream dos ZIPs, sem extrair para data/extracted",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="Processos para normalização paralela (>1 ativa o modo paralelo)",
+    )
+    parser.add_argument(
+        "--formato",
+        choices=["csv", "parquet"],
+        default=None,
+        help="Formato dos intermediários (padrão: ANS_FORMATO_INTERMEDIARIO ou csv)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Reprocessa só os trimestres novos/alterados (manifesto em data/staging)",
+    )
+    parser.add_argument(
+        "--relatorio",
+        type=Path,
+        default=None,
+        help="JSON com tempo/linhas/bytes/pico de RSS por etapa (padrão: data/output/relatorios)",
+    )
     args = parser.parse_args()
 
-    main(clean=args.clean)
+    main(
+        clean=args.clean,
+        streaming=args.streaming,
+        workers=args.workers,
+        formato=args.formato,
+        incremental=args.incremental,
+        relatorio=args.relatorio,
+    )
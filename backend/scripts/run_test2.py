@@ -9,8 +9,8 @@ import argparse
 import shutil
 
 from app.core.paths import DELIVERY_DIR, OUTPUT_TESTE2_DIR
-from app.usecases.ans_agregate import executarAgregacaoAns
-from app.usecases.ans_enrich_validate import executarEnriquecimentoEValidacao
+from app.core.pipeline import executarPipeline, getArquivoRelatorio
+from app.usecases.ans_pipeline import montarEtapasTeste2
 
 
 def limparTeste2(nome: str):
@@ -26,28 +26,31 @@ def limparTeste2(nome: str):
         print(f"Removido: {entrega}")
 
 
-def main(clean: bool, nome: str):
+def main(
+    clean: bool,
+    nome: str,
+    formato: str | None,
+    incremental: bool,
+    fundido: bool,
+    relatorio: Path | None,
+):
     if clean:
         print(
             "Executando limpeza do Teste 2 (--clean): apenas output/teste2 (delivery preservada)"
         )
         limparTeste2(nome)
 
-    print("=== TESTE 2.2 + 2.1 — Enriquecimento + Validação ===")
-    csvFinal = executarEnriquecimentoEValidacao()
-    print(f"Gerado: {csvFinal}")
-
-    print("=== TESTE 2.3 — Agregação ===")
-    csvAgregado, zipAgregado = executarAgregacaoAns(nome_zip=nome)
-    print(f"Gerado CSV: {csvAgregado}")
-    print(f"Gerado ZIP (output): {zipAgregado}")
-
-    # entrega: runner é o único responsável por delivery/
-    DELIVERY_DIR.mkdir(parents=True, exist_ok=True)
-    zipEntrega = DELIVERY_DIR / f"Teste_Agregacao_{nome}.zip"
-    shutil.copyfile(zipAgregado, zipEntrega)
+    etapas = montarEtapasTeste2(
+        nome,
+        formato=formato,
+        incremental=incremental or None,
+        fundido=fundido or None,
+    )
+    relatorioPath = relatorio or getArquivoRelatorio("teste2")
+    executarPipeline(etapas, relatorioPath=relatorioPath)
 
-    print(f"Entrega gerada: {zipEntrega}")
+    print(f"Entrega gerada: {DELIVERY_DIR / f'Teste_Agregacao_{nome}.zip'}")
+    print(f"Relatório de execução: {relatorioPath}")
 
 
 if __name__ == "__main__":
@@ -64,6 +67,35 @@ if __name__ == "__main__":
         default="Gabriel_Martins",
         help="Nome usado no arquivo final (ex: Gabriel_Martins)",
     )
+    parser.add_argument(
+        "--formato",
+        choices=["csv", "parquet"],
+        default=None,
+        help="Formato dos intermediários (padrão: ANS_FORMATO_INTERMEDIARIO ou csv)",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Pula etapas cujas entradas não mudaram (manifesto em data/output/teste2)",
+    )
+    parser.add_argument(
+        "--fundido",
+        action="store_true",
+        help="Enriquecimento, validação e agregação numa única passagem",
+    )
+    parser.add_argument(
+        "--relatorio",
+        type=Path,
+        default=None,
+        help="JSON com tempo/linhas/bytes/pico de RSS por etapa (padrão: data/output/relatorios)",
+    )
     args = parser.parse_args()
 
-    main(clean=args.clean, nome=args.nome)
+    main(
+        clean=args.clean,
+        nome=args.nome,
+        formato=args.formato,
+        incremental=args.incremental,
+        fundido=args.fundido,
+        relatorio=args.relatorio,
+    )
@@ -2,25 +2,111 @@ import os
 
 from dotenv import load_dotenv
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import sessionmaker
 
+from .pool import (
+    METRICAS_ASYNC,
+    METRICAS_SYNC,
+    AsyncPoolMedido,
+    PoolMedido,
+    config_pool,
+    get_prepare_threshold,
+    medir_pool,
+)
+
 # Carrega .env sem sobrescrever o que já existe no terminal
 load_dotenv(override=False)
 
-DATABASE_URL = os.getenv("DATABASE_URL")
+# str para quem importa (scripts): vazio cai no erro abaixo
+DATABASE_URL = os.getenv("DATABASE_URL") or ""
 if not DATABASE_URL:
     raise RuntimeError(
         "DATABASE_URL não configurada. Defina no terminal ou no arquivo .env na raiz do projeto."
     )
 
+# API: sessões síncronas no threadpool (padrão) ou assíncronas no event loop.
+# Scripts usam sempre o SessionLocal.
+DB_SYNC = "sync"
+DB_ASYNC = "async"
+
+
+def get_modo_db(modo: str | None = None) -> str:
+    modo = (modo or os.getenv("API_DB_MODO") or DB_SYNC).lower()
+    if modo not in (DB_SYNC, DB_ASYNC):
+        raise ValueError(f"Modo de banco da API inválido: {modo}")
+    return modo
+
+
+def connect_args(url: str) -> dict:
+    # asyncpg não aceita `options`: o search_path vai em server_settings
+    # (e tem o próprio cache de statements preparados)
+    if "+asyncpg" in url:
+        return {"server_settings": {"search_path": "healthtech"}}
+    # psycopg prepara no servidor a consulta repetida na mesma conexão
+    return {
+        "options": "-csearch_path=healthtech",
+        "prepare_threshold": get_prepare_threshold(),
+    }
+
+
+# sem pre-ping por padrão (um round-trip a cada checkout): conexão que cair
+# é invalidada no erro, junto com as mais antigas do pool, e o request é
+# repetido uma vez (api/utils.py::executar)
 engine = create_engine(
     DATABASE_URL,
-    pool_pre_ping=True,
-    connect_args={"options": "-csearch_path=healthtech"},
+    poolclass=PoolMedido,
+    connect_args=connect_args(DATABASE_URL),
+    **config_pool(),
 )
+medir_pool(engine, METRICAS_SYNC)
 
 SessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine,
 )
+
+# postgresql+psycopg já é assíncrono no create_async_engine (psycopg 3);
+# DATABASE_URL_ASYNC permite outro driver, ex. postgresql+asyncpg://
+ASYNC_DATABASE_URL = os.getenv("DATABASE_URL_ASYNC") or DATABASE_URL
+
+# criados no primeiro uso (API_DB_MODO=async): no modo sync não há pool
+# async, nem conexões nem métricas dele
+_async_engine: AsyncEngine | None = None
+_async_sessionmaker: async_sessionmaker[AsyncSession] | None = None
+
+
+def get_async_engine() -> AsyncEngine:
+    global _async_engine
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            ASYNC_DATABASE_URL,
+            poolclass=AsyncPoolMedido,
+            connect_args=connect_args(ASYNC_DATABASE_URL),
+            **config_pool(),
+        )
+        medir_pool(_async_engine.sync_engine, METRICAS_ASYNC)
+    return _async_engine
+
+
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    global _async_sessionmaker
+    if _async_sessionmaker is None:
+        _async_sessionmaker = async_sessionmaker(
+            autoflush=False,
+            bind=get_async_engine(),
+            expire_on_commit=False,
+        )
+    return _async_sessionmaker
+
+
+async def dispose_async_engine() -> None:
+    # no shutdown: só se o modo async chegou a criá-lo
+    if _async_engine is not None:
+        await _async_engine.dispose()
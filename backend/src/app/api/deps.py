@@ -1,8 +1,9 @@
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .db import SessionLocal
+from .db import DB_ASYNC, SessionLocal, get_async_sessionmaker, get_modo_db
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -11,3 +12,15 @@ def get_db() -> Generator[Session, None, None]:
         yield db
     finally:
         db.close()
+
+
+async def get_async_db() -> AsyncGenerator[AsyncSession, None]:
+    fabrica = get_async_sessionmaker()
+    async with fabrica() as db:
+        yield db
+
+
+# dependência dos routers no modo de API_DB_MODO (sync é o padrão). No sync
+# fica o gerador `def`: o FastAPI fecha a sessão fora do threadpool dos
+# requests, senão threads esperando conexão travam quem iria devolvê-la.
+get_db_api = get_async_db if get_modo_db() == DB_ASYNC else get_db
@@ -1,16 +1,54 @@
 import logging
+from contextlib import asynccontextmanager
 
-from app.api.routers import estatisticas, operadoras
+from app.api.db import (
+    SessionLocal,
+    dispose_async_engine,
+    engine,
+    get_async_sessionmaker,
+)
+from app.api.routers import estatisticas, metricas, operadoras
+from app.services.operadora_service import AsyncOperadoraService
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 
 logger = logging.getLogger("healthtech")
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # índice de operadoras (OPERADORAS_INDICE=1): carrega antes do 1º request;
+    # sem banco no startup, o primeiro request tenta de novo
+    svc = operadoras.svc
+    if svc.usar_indice:
+        try:
+            if isinstance(svc, AsyncOperadoraService):
+                fabrica = get_async_sessionmaker()
+                async with fabrica() as db:
+                    await svc.carregar_indice(db)
+            else:
+                with SessionLocal() as db:
+                    svc.carregar_indice(db)
+            indice = svc.indice
+            logger.info(
+                "Índice de operadoras carregado: %d linhas",
+                len(indice) if indice is not None else 0,
+            )
+        except Exception:
+            logger.warning(
+                "Índice de operadoras não carregado no startup", exc_info=True
+            )
+    yield
+    await dispose_async_engine()
+    engine.dispose()
+
+
 app = FastAPI(
     title="HealthTech API",
     version="1.0.0",
     description="Teste Técnico — Intuitive Care",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -27,6 +65,7 @@ app.add_middleware(
 # Routers
 app.include_router(operadoras.router, prefix="/api/operadoras", tags=["Operadoras"])
 app.include_router(estatisticas.router, prefix="/api", tags=["Estatísticas"])
+app.include_router(metricas.router, prefix="/api", tags=["Métricas"])
 
 
 # Erro inesperado: não vazar detalhes ao cliente
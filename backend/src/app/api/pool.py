@@ -0,0 +1,149 @@
+"""
+Pool de conexões da API: configuração por ambiente e métricas de checkout.
+
+As métricas são por processo (cada worker do uvicorn tem o seu pool) e
+servem para dimensionar API_DB_POOL_SIZE/API_DB_MAX_OVERFLOW: se
+`esperas` e `espera_max_ms` crescem com a carga, faltam conexões; se
+`em_uso` nunca passa de poucas, sobram.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# checkout acima disso conta como espera (fila no pool ou conexão nova)
+ESPERA_MINIMA = 0.001
+
+
+def get_max_overflow() -> int:
+    return int(os.getenv("API_DB_MAX_OVERFLOW", "10"))
+
+
+def config_pool() -> dict:
+    """Argumentos de pool do create_engine (sync e async)."""
+    return {
+        "pool_size": int(os.getenv("API_DB_POOL_SIZE", "5")),
+        "max_overflow": get_max_overflow(),
+        "pool_timeout": float(os.getenv("API_DB_POOL_TIMEOUT", "30")),
+        # sem pre-ping, a reciclagem evita conexões mortas por timeout de ociosidade
+        "pool_recycle": int(os.getenv("API_DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("API_DB_PRE_PING", "0") == "1",
+    }
+
+
+def get_prepare_threshold() -> int | None:
+    """
+    Execuções da mesma consulta, por conexão, até o psycopg prepará-la no
+    servidor (0 = já na primeira; none = nunca, ex. atrás de pgbouncer em
+    modo transação). Padrão do psycopg: 5.
+    """
+    valor = (os.getenv("API_DB_PREPARE_THRESHOLD") or "5").lower()
+    if valor in ("none", "off"):
+        return None
+    return int(valor)
+
+
+class MetricasPool:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.esperas = 0
+        self.espera_total = 0.0
+        self.espera_max = 0.0
+        self.timeouts = 0
+        self.conexoes_abertas = 0
+        self.invalidacoes = 0
+        self.repeticoes = 0
+
+    def registrar_checkout(self, segundos: float, timeout: bool = False) -> None:
+        with self._lock:
+            if timeout:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.espera_total += segundos
+            self.espera_max = max(self.espera_max, segundos)
+            if segundos >= ESPERA_MINIMA:
+                self.esperas += 1
+
+    def contar(self, campo: str) -> None:
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def como_dict(self, pool) -> dict:
+        with self._lock:
+            pedidos = self.checkouts + self.timeouts
+            return {
+                "tamanho": pool.size(),
+                # o QueuePool não expõe o limite: vale o configurado
+                "max_overflow": get_max_overflow(),
+                "em_uso": pool.checkedout(),
+                "overflow": max(pool.overflow(), 0),
+                "checkouts": self.checkouts,
+                "esperas": self.esperas,
+                "espera_media_ms": (
+                    self.espera_total / pedidos * 1000 if pedidos else 0.0
+                ),
+                "espera_max_ms": self.espera_max * 1000,
+                "timeouts": self.timeouts,
+                "conexoes_abertas": self.conexoes_abertas,
+                "invalidacoes": self.invalidacoes,
+                "repeticoes": self.repeticoes,
+            }
+
+
+METRICAS_SYNC = MetricasPool()
+METRICAS_ASYNC = MetricasPool()
+
+
+class _CheckoutMedido(QueuePool):
+    """
+    Mede o tempo de `connect()`: fila do pool + abertura de conexão nova.
+    Subclasse e não evento: o pool não tem evento antes do checkout.
+    """
+
+    metricas: MetricasPool | None = None
+
+    def connect(self):
+        if self.metricas is None:
+            return super().connect()
+        inicio = time.perf_counter()
+        try:
+            conexao = super().connect()
+        except exc.TimeoutError:
+            self.metricas.registrar_checkout(time.perf_counter() - inicio, True)
+            raise
+        self.metricas.registrar_checkout(time.perf_counter() - inicio)
+        return conexao
+
+    def recreate(self) -> QueuePool:
+        # engine.dispose() troca o pool: as métricas continuam
+        novo = super().recreate()
+        if isinstance(novo, _CheckoutMedido):
+            novo.metricas = self.metricas
+        return novo
+
+
+class PoolMedido(_CheckoutMedido):
+    pass
+
+
+class AsyncPoolMedido(_CheckoutMedido, AsyncAdaptedQueuePool):
+    pass
+
+
+def medir_pool(engine, metricas: MetricasPool) -> None:
+    engine.pool.metricas = metricas
+
+    @event.listens_for(engine, "connect")
+    def _conectou(dbapi_connection, connection_record):
+        metricas.contar("conexoes_abertas")
+
+    @event.listens_for(engine, "invalidate")
+    def _invalidou(dbapi_connection, connection_record, exception):
+        metricas.contar("invalidacoes")
@@ -1,15 +1,26 @@
-from app.api.deps import get_db
+from app.api.db import DB_ASYNC, get_modo_db
+from app.api.deps import get_db_api
 from app.api.schemas.estatisticas import EstatisticasResponse
-from app.repositories.estatisticas_repo import EstatisticasRepository
-from app.services.estatisticas_service import EstatisticasService
+from app.api.utils import executar
+from app.repositories.estatisticas_repo import (
+    AsyncEstatisticasRepository,
+    EstatisticasRepository,
+)
+from app.services.estatisticas_service import (
+    AsyncEstatisticasService,
+    EstatisticasService,
+)
 from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
 
 router = APIRouter()
-svc = EstatisticasService(EstatisticasRepository())
+svc: EstatisticasService | AsyncEstatisticasService
+if get_modo_db() == DB_ASYNC:
+    svc = AsyncEstatisticasService(AsyncEstatisticasRepository())
+else:
+    svc = EstatisticasService(EstatisticasRepository())
 
 
 @router.get("/estatisticas", response_model=EstatisticasResponse)
-def estatisticas(db: Session = Depends(get_db)):
-    payload = svc.get(db)
+async def estatisticas(db=Depends(get_db_api)):
+    payload = await executar(svc.get, db)
     return EstatisticasResponse(**payload)
@@ -0,0 +1,17 @@
+from app.api.db import DB_ASYNC, engine, get_async_engine, get_modo_db
+from app.api.pool import METRICAS_ASYNC, METRICAS_SYNC
+from app.api.schemas.metricas import PoolMetricasResponse
+from fastapi import APIRouter
+
+router = APIRouter()
+
+
+@router.get("/metricas/pool", response_model=PoolMetricasResponse)
+def metricas_pool():
+    # do pool do worker que atendeu (um por processo do uvicorn)
+    modo = get_modo_db()
+    if modo == DB_ASYNC:
+        dados = METRICAS_ASYNC.como_dict(get_async_engine().sync_engine.pool)
+    else:
+        dados = METRICAS_SYNC.como_dict(engine.pool)
+    return PoolMetricasResponse(modo=modo, **dados)
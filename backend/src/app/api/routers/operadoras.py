@@ -1,45 +1,86 @@
-from app.api.deps import get_db
+from typing import Literal
+
+from app.api.db import DB_ASYNC, get_modo_db
+from app.api.deps import get_db_api
 from app.api.schemas.operadora import (
     DespesasResponse,
     OperadoraListResponse,
     OperadoraOut,
 )
-from app.repositories.operadora_repo import OperadoraRepository
-from app.services.operadora_service import OperadoraService
+from app.api.utils import executar
+from app.repositories.operadora_repo import (
+    AsyncOperadoraRepository,
+    OperadoraRepository,
+)
+from app.services.operadora_service import (
+    CONTAGEM_EXATA,
+    CONTAGEM_NENHUMA,
+    AsyncOperadoraService,
+    OperadoraService,
+)
 from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
 
 router = APIRouter()
-svc = OperadoraService(OperadoraRepository())
+svc: OperadoraService | AsyncOperadoraService
+if get_modo_db() == DB_ASYNC:
+    svc = AsyncOperadoraService(AsyncOperadoraRepository())
+else:
+    svc = OperadoraService(OperadoraRepository())
 
 
 @router.get("", response_model=OperadoraListResponse)
-def listar_operadoras(
+async def listar_operadoras(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1, le=100),
     q: str | None = Query(
         None, description="Filtro por razão social ou CNPJ (parcial)"
     ),
-    db: Session = Depends(get_db),
+    paginacao: Literal["offset", "cursor"] = Query(
+        "offset", description="cursor: usa `cursor`/`next_cursor` em vez de `page`"
+    ),
+    cursor: str | None = Query(
+        None, description="`next_cursor` da página anterior (ativa paginacao=cursor)"
+    ),
+    contagem: Literal["exata", "estimada", "nenhuma"] | None = Query(
+        None,
+        description="Total: exata (padrão no offset) ou nenhuma (padrão no cursor)",
+    ),
+    db=Depends(get_db_api),
 ):
-    total, rows = svc.listar(db, page, limit, q)
+    if paginacao == "cursor" or cursor:
+        contagem = contagem or CONTAGEM_NENHUMA
+        total, estimado, rows, next_cursor = await executar(
+            svc.listar_cursor, db, limit, q, cursor, contagem
+        )
+        return OperadoraListResponse(
+            data=[OperadoraOut(**r) for r in rows],
+            total=total,
+            page=None,
+            limit=limit,
+            next_cursor=next_cursor,
+            total_estimado=estimado,
+        )
+
+    contagem = contagem or CONTAGEM_EXATA
+    total, estimado, rows = await executar(svc.listar, db, page, limit, q, contagem)
     return OperadoraListResponse(
         data=[OperadoraOut(**r) for r in rows],
         total=total,
         page=page,
         limit=limit,
+        total_estimado=estimado,
     )
 
 
 @router.get("/{cnpj}", response_model=OperadoraOut)
-def obter_operadora(cnpj: str, db: Session = Depends(get_db)):
-    row = svc.detalhe(db, cnpj)
+async def obter_operadora(cnpj: str, db=Depends(get_db_api)):
+    row = await executar(svc.detalhe, db, cnpj)
     return OperadoraOut(**row)
 
 
 @router.get("/{cnpj}/despesas", response_model=DespesasResponse)
-def despesas_operadora(cnpj: str, db: Session = Depends(get_db)):
-    cnpj_norm, rows = svc.despesas(db, cnpj)
+async def despesas_operadora(cnpj: str, db=Depends(get_db_api)):
+    cnpj_norm, rows = await executar(svc.despesas, db, cnpj)
     items = [
         {"ano": int(a), "trimestre": int(t), "valor": float(v)} for a, t, v in rows
     ]
@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+
+
+class PoolMetricasResponse(BaseModel):
+    modo: str
+    tamanho: int
+    max_overflow: int
+    em_uso: int
+    overflow: int
+    checkouts: int
+    esperas: int
+    espera_media_ms: float
+    espera_max_ms: float
+    timeouts: int
+    conexoes_abertas: int
+    invalidacoes: int
+    repeticoes: int
@@ -29,9 +29,13 @@ class OperadoraOut(BaseModel):
 
 class OperadoraListResponse(BaseModel):
     data: List[OperadoraOut]
-    total: int
-    page: int
+    # None com contagem=nenhuma; estimativa do planner com contagem=estimada
+    total: Optional[int]
+    # None na paginação por cursor
+    page: Optional[int]
     limit: int
+    next_cursor: Optional[str] = None
+    total_estimado: bool = False
 
 
 class DespesaItem(BaseModel):
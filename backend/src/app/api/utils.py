@@ -1,7 +1,38 @@
+import inspect
 import re
 
+from sqlalchemy.exc import DBAPIError
+from starlette.concurrency import run_in_threadpool
+
+from .pool import METRICAS_ASYNC, METRICAS_SYNC
+
 _digits = re.compile(r"\D+")
 
 
 def only_digits(value: str | None) -> str:
     return _digits.sub("", value or "")
+
+
+async def executar(fn, db, *args):
+    """
+    Chama o serviço do modo atual: corrotina no event loop; função síncrona
+    no threadpool, como o FastAPI faria com um handler `def`.
+
+    Se a conexão caiu (o SQLAlchemy já a invalidou, e as mais antigas do
+    pool com ela), repete uma vez numa conexão nova: os serviços da API só
+    leem.
+    """
+    assincrono = inspect.iscoroutinefunction(fn)
+    try:
+        if assincrono:
+            return await fn(db, *args)
+        return await run_in_threadpool(fn, db, *args)
+    except DBAPIError as erro:
+        if not erro.connection_invalidated:
+            raise
+    (METRICAS_ASYNC if assincrono else METRICAS_SYNC).contar("repeticoes")
+    if assincrono:
+        await db.rollback()
+        return await fn(db, *args)
+    await run_in_threadpool(db.rollback)
+    return await run_in_threadpool(fn, db, *args)
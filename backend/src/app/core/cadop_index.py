@@ -0,0 +1,190 @@
+"""
+Índice compilado do CADOP (Relatorio_cadop.csv) por RegistroANS.
+
+Arquivo binário lido via mmap: abrir é O(1) (só o header) e cada consulta é
+uma busca binária nas chaves ordenadas, sem carregar o cadastro em memória.
+O header guarda o SHA-256 (e tamanho/mtime) do CSV de origem; o índice só é
+recompilado quando o CSV muda.
+
+Layout (little-endian):
+- header: magic, versão, sha256 da origem, tamanho e mtime_ns da origem,
+  quantidade de registros, largura da chave;
+- chaves: `n * largura` bytes, UTF-8 completado com NUL, ordenadas;
+- offsets: `n + 1` uint32 no blob;
+- blob: por registro, "cnpj\\x1frazao\\x1fmodalidade\\x1fuf" em UTF-8.
+"""
+
+import hashlib
+import mmap
+import struct
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+
+from app.domain.models import CadopRegistro
+
+MAGIC = b"CADOPIDX"
+VERSAO = 1
+HEADER = struct.Struct("<8sH32sQqII")
+OFFSET = struct.Struct("<I")
+SEPARADOR = "\x1f"
+
+
+def getArquivoIndice(cadopPath: Path) -> Path:
+    return cadopPath.with_name(cadopPath.name + ".idx")
+
+
+def hashOrigem(caminho: Path) -> bytes:
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            h.update(chunk)
+    return h.digest()
+
+
+def compilarIndice(
+    registros: Dict[str, CadopRegistro], origem: Path, destino: Path
+) -> Path:
+    st = origem.stat()
+    chaves = sorted(registros)
+    largura = max((len(c.encode("utf-8")) for c in chaves), default=0)
+
+    blob = bytearray()
+    offsets = [0]
+    for chave in chaves:
+        r = registros[chave]
+        campos = [r.cnpj, r.razaoSocial, r.modalidade, r.uf]
+        blob += SEPARADOR.join(c.replace(SEPARADOR, " ") for c in campos).encode(
+            "utf-8"
+        )
+        offsets.append(len(blob))
+
+    destino.parent.mkdir(parents=True, exist_ok=True)
+    temp = destino.with_suffix(destino.suffix + ".tmp")
+    with open(temp, "wb") as f:
+        f.write(
+            HEADER.pack(
+                MAGIC,
+                VERSAO,
+                hashOrigem(origem),
+                st.st_size,
+                st.st_mtime_ns,
+                len(chaves),
+                largura,
+            )
+        )
+        for chave in chaves:
+            f.write(chave.encode("utf-8").ljust(largura, b"\0"))
+        for off in offsets:
+            f.write(OFFSET.pack(off))
+        f.write(blob)
+    temp.replace(destino)
+    return destino
+
+
+class IndiceCadop:
+    """Consulta somente-leitura; mesma interface de `dict.get` usada no enriquecimento."""
+
+    def __init__(self, caminho: Path):
+        self.caminho = caminho
+        with open(caminho, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            (
+                magic,
+                versao,
+                self.sha256Origem,
+                self.tamanhoOrigem,
+                self.mtimeNsOrigem,
+                self.n,
+                self.largura,
+            ) = HEADER.unpack_from(self._mm, 0)
+        except struct.error:
+            self.close()
+            raise ValueError(f"Índice CADOP inválido: {caminho}")
+        if magic != MAGIC or versao != VERSAO:
+            self.close()
+            raise ValueError(f"Índice CADOP inválido: {caminho}")
+
+        self._inicioChaves = HEADER.size
+        self._inicioOffsets = self._inicioChaves + self.n * self.largura
+        self._inicioBlob = self._inicioOffsets + (self.n + 1) * OFFSET.size
+
+    def _chave(self, i: int) -> bytes:
+        inicio = self._inicioChaves + i * self.largura
+        return self._mm[inicio : inicio + self.largura]
+
+    def _registro(self, i: int) -> CadopRegistro:
+        ini, fim = struct.unpack_from("<II", self._mm, self._inicioOffsets + i * 4)
+        campos = self._mm[self._inicioBlob + ini : self._inicioBlob + fim]
+        cnpj, razao, modalidade, uf = campos.decode("utf-8").split(SEPARADOR)
+        return CadopRegistro(
+            registroAns=self._chave(i).rstrip(b"\0").decode("utf-8"),
+            cnpj=cnpj,
+            razaoSocial=razao,
+            modalidade=modalidade,
+            uf=uf,
+        )
+
+    def _buscar(self, registroAns: str) -> int:
+        alvo = registroAns.encode("utf-8")
+        if len(alvo) > self.largura:
+            return -1
+        alvo = alvo.ljust(self.largura, b"\0")
+
+        lo, hi = 0, self.n
+        while lo < hi:
+            meio = (lo + hi) // 2
+            if self._chave(meio) < alvo:
+                lo = meio + 1
+            else:
+                hi = meio
+        return lo if lo < self.n and self._chave(lo) == alvo else -1
+
+    def get(
+        self, registroAns: str, default: Optional[CadopRegistro] = None
+    ) -> Optional[CadopRegistro]:
+        i = self._buscar(registroAns)
+        return self._registro(i) if i >= 0 else default
+
+    def __contains__(self, registroAns: str) -> bool:
+        return self._buscar(registroAns) >= 0
+
+    def __len__(self) -> int:
+        return self.n
+
+    def __iter__(self) -> Iterator[CadopRegistro]:
+        for i in range(self.n):
+            yield self._registro(i)
+
+    def isAtualizado(self, origem: Path) -> bool:
+        st = origem.stat()
+        if st.st_size != self.tamanhoOrigem:
+            return False
+        if st.st_mtime_ns == self.mtimeNsOrigem:
+            return True
+        # mtime mudou (cópia/touch): decide pelo conteúdo
+        return hashOrigem(origem) == self.sha256Origem
+
+    def close(self) -> None:
+        self._mm.close()
+
+    def __enter__(self) -> "IndiceCadop":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def abrirIndiceAtualizado(origem: Path) -> Optional[IndiceCadop]:
+    caminho = getArquivoIndice(origem)
+    if not caminho.exists():
+        return None
+    try:
+        indice = IndiceCadop(caminho)
+    except (OSError, ValueError):
+        return None
+    if indice.isAtualizado(origem):
+        return indice
+    indice.close()
+    return None
@@ -0,0 +1,342 @@
+"""
+Formato intermediário colunar (Parquet) opcional para o pipeline.
+
+Os entregáveis continuam em CSV/ZIP; o Parquet só troca os intermediários
+(staging, consolidado, consolidado final) para evitar re-parse de texto e
+`Decimal` a cada etapa.
+
+Tipos:
+- texto: string (Parquet já dicionariza colunas repetitivas em disco);
+  RegistroANS fica como texto porque os zeros à esquerda (ex.: 005711)
+  fazem parte do entregável.
+- smallint: int16 (ano, trimestre).
+- bool: flags "1"/"0".
+- decimal: inteiro não escalado (int64) + expoente (int8) na coluna
+  `<nome>__exp`. Com expoente -2 o inteiro é o valor em centavos; guardar o
+  expoente mantém a representação textual exata (ex.: "0", "99.9").
+"""
+
+import os
+import shutil
+from dataclasses import dataclass
+from decimal import Decimal
+from pathlib import Path
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from app.domain import decimais
+
+if TYPE_CHECKING:
+    # para o checador de tipos os módulos existem; em runtime quem usa
+    # chama exigirPyarrow()/exigirNumpy() antes
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+else:
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+        import pyarrow.csv as pacsv
+        import pyarrow.parquet as pq
+    except ImportError:  # dependência opcional
+        pa = None
+        pc = None
+        pacsv = None
+        pq = None
+
+    try:
+        import numpy as np
+    except ImportError:  # dependência opcional (kernels vetorizados)
+        np = None
+
+FORMATO_CSV = "csv"
+FORMATO_PARQUET = "parquet"
+
+TAMANHO_LOTE = 65_536
+SUFIXO_EXPOENTE = "__exp"
+
+
+@dataclass(frozen=True)
+class Coluna:
+    nome: str
+    tipo: str  # "texto" | "smallint" | "bool" | "decimal"
+
+
+STAGING_LAYOUT = [
+    Coluna("data", "texto"),
+    Coluna("reg_ans", "texto"),
+    Coluna("cd_conta_contabil", "texto"),
+    Coluna("descricao", "texto"),
+    Coluna("vl_saldo_inicial", "decimal"),
+    Coluna("vl_saldo_final", "decimal"),
+    Coluna("ano", "smallint"),
+    Coluna("trimestre", "smallint"),
+    Coluna("fonte_arquivo", "texto"),
+]
+
+CONSOLIDADO_LAYOUT = [
+    Coluna("RegistroANS", "texto"),
+    Coluna("RazaoSocial", "texto"),
+    Coluna("Trimestre", "smallint"),
+    Coluna("Ano", "smallint"),
+    Coluna("ValorDespesas", "decimal"),
+]
+
+CONSOLIDADO_FINAL_LAYOUT = [
+    Coluna("RegistroANS", "texto"),
+    Coluna("CNPJ", "texto"),
+    Coluna("RazaoSocial", "texto"),
+    Coluna("Modalidade", "texto"),
+    Coluna("UF", "texto"),
+    Coluna("Trimestre", "smallint"),
+    Coluna("Ano", "smallint"),
+    Coluna("ValorDespesas", "decimal"),
+    Coluna("cnpj_valido", "bool"),
+    Coluna("valor_positivo", "bool"),
+    Coluna("razao_social_nao_vazia", "bool"),
+    Coluna("erros", "texto"),
+]
+
+
+def getFormatoIntermediario(formato: Optional[str] = None) -> str:
+    formato = (formato or os.getenv("ANS_FORMATO_INTERMEDIARIO") or FORMATO_CSV).lower()
+    if formato not in (FORMATO_CSV, FORMATO_PARQUET):
+        raise ValueError(f"Formato intermediário inválido: {formato}")
+    if formato == FORMATO_PARQUET:
+        exigirPyarrow()
+    return formato
+
+
+def exigirPyarrow() -> None:
+    if pa is None:
+        raise RuntimeError(
+            "Formato parquet requer pyarrow. Instale com: pip install pyarrow"
+        )
+
+
+def exigirNumpy() -> None:
+    exigirPyarrow()
+    if np is None:
+        raise RuntimeError(
+            "Motor vetorizado requer numpy. Instale com: pip install numpy"
+        )
+
+
+def isCaminhoColunar(caminho: Path) -> bool:
+    return caminho.suffix == ".parquet"
+
+
+def decimalParaInteiro(valor: str) -> Tuple[Optional[int], Optional[int]]:
+    # vazio/inválido vira nulo no Parquet
+    try:
+        inteiro, casas = decimais.decompor(valor, decimais.FORMATO_PONTO)
+    except decimais.ErroDecimal:
+        return None, None
+    return inteiro, -casas
+
+
+def inteiroParaDecimal(inteiro: Optional[int], expoente: Optional[int]):
+    if inteiro is None or expoente is None:
+        return None
+    return Decimal(inteiro).scaleb(expoente)
+
+
+def getSchema(layout: Sequence[Coluna]):
+    exigirPyarrow()
+    campos = []
+    for c in layout:
+        if c.tipo == "texto":
+            campos.append(pa.field(c.nome, pa.string()))
+        elif c.tipo == "smallint":
+            campos.append(pa.field(c.nome, pa.int16()))
+        elif c.tipo == "bool":
+            campos.append(pa.field(c.nome, pa.bool_()))
+        elif c.tipo == "decimal":
+            campos.append(pa.field(c.nome, pa.int64()))
+            campos.append(pa.field(c.nome + SUFIXO_EXPOENTE, pa.int8()))
+        else:
+            raise ValueError(f"Tipo de coluna desconhecido: {c.tipo}")
+    return pa.schema(campos)
+
+
+def listarPartes(caminho: Path) -> List[Path]:
+    # dataset = diretório com part-NNNNN.parquet (permite append por parte)
+    if caminho.is_dir():
+        return sorted(caminho.glob("part-*.parquet"))
+    if caminho.exists():
+        return [caminho]
+    return []
+
+
+def proximaParte(caminho: Path) -> Path:
+    caminho.mkdir(parents=True, exist_ok=True)
+    return caminho / f"part-{len(listarPartes(caminho)):05d}.parquet"
+
+
+def anexarPartes(origem: Path, destino: Path, copiar: bool = False) -> None:
+    for parte in listarPartes(origem):
+        if copiar:
+            shutil.copyfile(parte, proximaParte(destino))
+        else:
+            shutil.move(str(parte), str(proximaParte(destino)))
+
+
+class EscritorColunar:
+    """
+    Recebe linhas no mesmo layout do CSV (lista de str, via `writerow`) e
+    grava em lotes tipados num arquivo Parquet.
+    """
+
+    def __init__(
+        self, caminho: Path, layout: Sequence[Coluna], tamanhoLote: int = TAMANHO_LOTE
+    ):
+        self.caminho = caminho
+        self.layout = list(layout)
+        self.schema = getSchema(self.layout)
+        self.tamanhoLote = tamanhoLote
+        self._buffer: Dict[str, list] = {f.name: [] for f in self.schema}
+        self._pendentes = 0
+        self._writer = None
+
+    def writerow(self, row: Sequence[str]) -> None:
+        for c, valor in zip(self.layout, row):
+            if c.tipo == "texto":
+                self._buffer[c.nome].append(valor)
+            elif c.tipo == "smallint":
+                v = (valor or "").strip()
+                self._buffer[c.nome].append(int(v) if v.lstrip("-").isdigit() else None)
+            elif c.tipo == "bool":
+                v = (valor or "").strip()
+                self._buffer[c.nome].append(v == "1" if v in ("0", "1") else None)
+            else:
+                inteiro, expoente = decimalParaInteiro(valor)
+                self._buffer[c.nome].append(inteiro)
+                self._buffer[c.nome + SUFIXO_EXPOENTE].append(expoente)
+
+        self._pendentes += 1
+        if self._pendentes >= self.tamanhoLote:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._pendentes:
+            return
+        if self._writer is None:
+            self.caminho.parent.mkdir(parents=True, exist_ok=True)
+            self._writer = pq.ParquetWriter(self.caminho, self.schema)
+        self._writer.write_table(pa.table(self._buffer, schema=self.schema))
+        self._buffer = {f.name: [] for f in self.schema}
+        self._pendentes = 0
+
+    def close(self) -> None:
+        self.flush()
+        if self._writer is not None:
+            self._writer.close()
+
+    def __enter__(self) -> "EscritorColunar":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def lerLotesArrow(
+    caminho: Path,
+    colunas: Optional[Sequence[str]] = None,
+    tamanhoLote: int = TAMANHO_LOTE,
+):
+    exigirPyarrow()
+    for parte in listarPartes(caminho):
+        yield from pq.ParquetFile(parte).iter_batches(
+            batch_size=tamanhoLote, columns=list(colunas) if colunas else None
+        )
+
+
+def lerLotes(
+    caminho: Path,
+    layout: Sequence[Coluna],
+    colunas: Optional[Sequence[str]] = None,
+    tamanhoLote: int = TAMANHO_LOTE,
+) -> Iterator[Dict[str, list]]:
+    """Lotes de colunas já tipadas (decimais como `Decimal`, sem re-parse de texto)."""
+    selecionadas = [c for c in layout if colunas is None or c.nome in colunas]
+    fisicas: List[str] = []
+    for c in selecionadas:
+        fisicas.append(c.nome)
+        if c.tipo == "decimal":
+            fisicas.append(c.nome + SUFIXO_EXPOENTE)
+
+    for batch in lerLotesArrow(caminho, fisicas, tamanhoLote):
+        lote: Dict[str, list] = {}
+        for c in selecionadas:
+            valores = batch.column(c.nome).to_pylist()
+            if c.tipo == "decimal":
+                expoentes = batch.column(c.nome + SUFIXO_EXPOENTE).to_pylist()
+                valores = [inteiroParaDecimal(i, e) for i, e in zip(valores, expoentes)]
+            lote[c.nome] = valores
+        yield lote
+
+
+def lerLinhas(
+    caminho: Path, layout: Sequence[Coluna], colunas: Optional[Sequence[str]] = None
+) -> Iterator[Dict[str, object]]:
+    for lote in lerLotes(caminho, layout, colunas):
+        nomes = list(lote)
+        for valores in zip(*(lote[n] for n in nomes)):
+            yield dict(zip(nomes, valores))
+
+
+def lerLotesCsvArrow(
+    caminho: Path,
+    colunas: Sequence[str],
+    delimitador: str = ",",
+    encoding: str = "utf-8",
+    tamanhoBloco: int = 8 << 20,
+):
+    """CSV em lotes Arrow (todas as colunas como texto, sem inferência de tipo)."""
+    exigirPyarrow()
+    leitor = pacsv.open_csv(
+        caminho,
+        read_options=pacsv.ReadOptions(block_size=tamanhoBloco, encoding=encoding),
+        parse_options=pacsv.ParseOptions(
+            delimiter=delimitador, newlines_in_values=True
+        ),
+        convert_options=pacsv.ConvertOptions(
+            include_columns=list(colunas),
+            column_types={c: pa.string() for c in colunas},
+            strings_can_be_null=False,
+        ),
+    )
+    yield from leitor
+
+
+def textoParaInteiros(
+    arr,
+) -> Tuple["np.ndarray", "np.ndarray", Dict[int, str]]:
+    """
+    Versão vetorizada de `decimalParaInteiro` para uma coluna de texto, sobre
+    o kernel em lote de `domain.decimais`. O que ele não cobre (vazio,
+    expoente, lixo, mais de 18 dígitos) cai no kernel escalar; as linhas que
+    ele também recusa saem em {posição: motivo}, com (0, 0) nos arrays.
+    """
+    exigirNumpy()
+    texto = pc.call_function("utf8_trim_whitespace", [pc.fill_null(arr, "")])
+    inteiros, casas, validos = decimais.decompor_lote(texto, decimais.FORMATO_PONTO)
+    inteiros = inteiros.copy()
+    expoentes = -casas
+    recusadas: Dict[int, str] = {}
+
+    for i in np.flatnonzero(~validos).tolist():
+        try:
+            inteiro, casasLinha = decimais.decompor(
+                texto[i].as_py(), decimais.FORMATO_PONTO
+            )
+        except decimais.ErroDecimal as e:
+            recusadas[i] = e.motivo
+            continue
+        if not -(2**63) <= inteiro < 2**63 and inteiros.dtype != object:
+            inteiros = inteiros.astype(object)
+        inteiros[i] = inteiro
+        expoentes[i] = -casasLinha
+
+    return inteiros, expoentes, recusadas
@@ -0,0 +1,81 @@
+"""
+Detecção de encoding e delimitador de CSV, compartilhada pelos usecases.
+
+Lê só uma amostra limitada do início do arquivo (nunca o arquivo inteiro) e
+faz encoding + delimitador na mesma leitura. O resultado fica em cache por
+(caminho, mtime, tamanho): etapas diferentes que abrem o mesmo arquivo não
+repetem a amostragem, e um arquivo reescrito é detectado de novo.
+"""
+
+import codecs
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+
+AMOSTRA_ENCODING = 200_000
+AMOSTRA_DELIMITADOR = 50_000
+ENCODINGS = ("utf-8-sig", "utf-8", "latin-1")
+
+
+@dataclass(frozen=True)
+class FormatoCsv:
+    encoding: str
+    delimiter: str
+
+
+def detectarEncodingAmostra(amostra: bytes) -> str:
+    # decoder incremental: amostra truncada no meio de um caractere multibyte não falha
+    for enc in ENCODINGS:
+        try:
+            codecs.getincrementaldecoder(enc)().decode(amostra, final=False)
+            return enc
+        except UnicodeDecodeError:
+            continue
+    return "latin-1"
+
+
+def detectarDelimiterAmostra(texto: str, empate: str = ";") -> str:
+    # ";" é o padrão da ANS e dos artefatos do pipeline; "," só se predominar.
+    # No empate cada etapa manteve a regra que já tinha (`empate`)
+    pontoEVirgula, virgula = texto.count(";"), texto.count(",")
+    if pontoEVirgula == virgula:
+        return empate
+    return ";" if pontoEVirgula > virgula else ","
+
+
+def lerAmostra(caminho: Path, limite: int = AMOSTRA_ENCODING) -> bytes:
+    with open(caminho, "rb") as f:
+        return f.read(limite)
+
+
+@lru_cache(maxsize=256)
+def _detectarFormatoCacheado(
+    caminho: str, mtimeNs: int, tamanho: int, empate: str
+) -> FormatoCsv:
+    amostra = lerAmostra(Path(caminho))
+    encoding = detectarEncodingAmostra(amostra)
+    texto = codecs.getincrementaldecoder(encoding)(errors="ignore").decode(
+        amostra[:AMOSTRA_DELIMITADOR], final=False
+    )
+    return FormatoCsv(
+        encoding=encoding, delimiter=detectarDelimiterAmostra(texto, empate)
+    )
+
+
+def detectarFormato(caminho: Path, empate: str = ";") -> FormatoCsv:
+    st = caminho.stat()
+    return _detectarFormatoCacheado(
+        str(caminho.resolve()), st.st_mtime_ns, st.st_size, empate
+    )
+
+
+def detectarEncoding(caminho: Path) -> str:
+    return detectarFormato(caminho).encoding
+
+
+def detectarDelimiter(caminho: Path, empate: str = ";") -> str:
+    return detectarFormato(caminho, empate).delimiter
+
+
+def limparCache() -> None:
+    _detectarFormatoCacheado.cache_clear()
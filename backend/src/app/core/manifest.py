@@ -0,0 +1,154 @@
+"""
+Manifesto de execução incremental do pipeline (JSON ao lado dos artefatos).
+
+- zips: por ZIP bruto, hash do conteúdo + artefatos derivados dele (staging e
+  consolidado parciais), cada um com hash e contagem de linhas.
+- derivados: artefatos globais (staging unificado, consolidado, final,
+  agregado) com o hash de saída e os hashes das origens usadas para gerá-los.
+
+Um artefato só é refeito quando alguma origem mudou (ou a saída sumiu/foi
+alterada fora do pipeline).
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Optional
+
+VERSAO = 1
+ARQUIVO_MANIFESTO = "manifest.json"
+CHUNK_HASH = 1024 * 1024
+
+
+def isModoIncremental() -> bool:
+    return os.getenv("ANS_PIPELINE_INCREMENTAL", "0") == "1"
+
+
+def hashArquivo(caminho: Path) -> Optional[str]:
+    # dataset colunar (diretório de partes) entra com nome + conteúdo de cada parte
+    if caminho.is_dir():
+        partes = sorted(p for p in caminho.iterdir() if p.is_file())
+    elif caminho.exists():
+        partes = [caminho]
+    else:
+        return None
+
+    h = hashlib.sha256()
+    for parte in partes:
+        if caminho.is_dir():
+            h.update(parte.name.encode("utf-8") + b"\0")
+        with open(parte, "rb") as f:
+            while chunk := f.read(CHUNK_HASH):
+                h.update(chunk)
+    return h.hexdigest()
+
+
+def removerArtefato(caminho: Path) -> None:
+    if caminho.is_dir():
+        for parte in caminho.iterdir():
+            parte.unlink()
+        caminho.rmdir()
+    elif caminho.exists():
+        caminho.unlink()
+
+
+class Manifest:
+    def __init__(self, caminho: Path, dados: Optional[dict] = None):
+        self.caminho = caminho
+        self.dados = dados or {
+            "versao": VERSAO,
+            "parametros": {},
+            "zips": {},
+            "derivados": {},
+        }
+
+    @classmethod
+    def carregar(cls, caminho: Path) -> "Manifest":
+        if not caminho.exists():
+            return cls(caminho)
+        try:
+            dados = json.loads(caminho.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return cls(caminho)
+        if dados.get("versao") != VERSAO:
+            return cls(caminho)
+        return cls(caminho, dados)
+
+    def salvar(self) -> None:
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        temp = self.caminho.with_suffix(self.caminho.suffix + ".tmp")
+        temp.write_text(
+            json.dumps(self.dados, indent=2, ensure_ascii=False, sort_keys=True),
+            encoding="utf-8",
+        )
+        temp.replace(self.caminho)
+
+    @property
+    def zips(self) -> Dict[str, dict]:
+        return self.dados["zips"]
+
+    def validarParametros(self, parametros: Dict[str, str]) -> bool:
+        """
+        Parâmetros que mudam o conteúdo dos artefatos (formato, filtro...).
+        Se mudaram, tudo o que foi registrado deixa de valer.
+        """
+        if self.dados["parametros"] == parametros:
+            return True
+        self.dados["parametros"] = dict(parametros)
+        self.dados["zips"] = {}
+        self.dados["derivados"] = {}
+        return False
+
+    def hashZip(self, zipPath: Path) -> str:
+        # mesmo tamanho + mtime do registrado: reaproveita o hash sem reler o ZIP
+        st = zipPath.stat()
+        entrada = self.zips.get(zipPath.name) or {}
+        if (
+            entrada.get("sha256")
+            and entrada.get("tamanho") == st.st_size
+            and entrada.get("mtime_ns") == st.st_mtime_ns
+        ):
+            return entrada["sha256"]
+        sha256 = hashArquivo(zipPath)
+        if sha256 is None:  # sumiu entre o stat e a leitura
+            raise FileNotFoundError(zipPath)
+        return sha256
+
+    def registrarZip(self, zipPath: Path, sha256: str, **artefatos) -> dict:
+        st = zipPath.stat()
+        entrada = {
+            "sha256": sha256,
+            "tamanho": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            **artefatos,
+        }
+        self.zips[zipPath.name] = entrada
+        return entrada
+
+    def removerZip(self, nome: str) -> Optional[dict]:
+        return self.zips.pop(nome, None)
+
+    def isDerivadoAtualizado(
+        self, nome: str, caminho: Path, origens: Dict[str, Optional[str]]
+    ) -> bool:
+        entrada = self.dados["derivados"].get(nome)
+        if not entrada or entrada.get("origens") != origens:
+            return False
+        return entrada.get("sha256") == hashArquivo(caminho)
+
+    def registrarDerivado(
+        self,
+        nome: str,
+        caminho: Path,
+        origens: Dict[str, Optional[str]],
+        linhas: Optional[int] = None,
+    ) -> dict:
+        entrada = {
+            "arquivo": caminho.name,
+            "sha256": hashArquivo(caminho),
+            "origens": dict(origens),
+            "linhas": linhas,
+        }
+        self.dados["derivados"][nome] = entrada
+        return entrada
@@ -0,0 +1,298 @@
+"""
+Executor de etapas do pipeline (DAG pequeno) com instrumentação por etapa.
+
+Cada etapa declara dependências e, opcionalmente, os arquivos que lê e grava;
+o executor mede tempo de parede, linhas e bytes de entrada/saída (pelo
+tamanho/contagem dos arquivos declarados) e pico de RSS durante a etapa, e
+grava tudo num relatório JSON. Etapas sem dependência entre si rodam em
+paralelo (threads).
+
+Pico de RSS é amostrado do processo inteiro (inclui processos filhos do
+process pool da normalização): com etapas concorrentes, o valor é o pico do
+processo enquanto a etapa rodava, não só dela.
+"""
+
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence
+
+from app.core import columnar
+from app.core.paths import OUTPUT_DIR
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+INTERVALO_AMOSTRA_RSS = 0.05
+
+
+@dataclass
+class Etapa:
+    nome: str
+    executar: Callable[[], object]
+    dependencias: Sequence[str] = ()
+    entradas: Callable[[], Sequence[Path]] = lambda: ()
+    saidas: Callable[[], Sequence[Path]] = lambda: ()
+
+
+@dataclass
+class MetricasEtapa:
+    nome: str
+    status: str = "pendente"  # pendente | ok | erro | pulada
+    inicio: Optional[str] = None
+    duracao_s: Optional[float] = None
+    linhas_entrada: Optional[int] = None
+    linhas_saida: Optional[int] = None
+    bytes_lidos: Optional[int] = None
+    bytes_escritos: Optional[int] = None
+    pico_rss_mb: Optional[float] = None
+    erro: Optional[str] = None
+
+
+@dataclass
+class RelatorioExecucao:
+    inicio: str
+    duracao_s: float = 0.0
+    workers: int = 1
+    etapas: List[MetricasEtapa] = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return all(e.status == "ok" for e in self.etapas)
+
+    def salvar(self, caminho: Path) -> Path:
+        caminho.parent.mkdir(parents=True, exist_ok=True)
+        caminho.write_text(
+            json.dumps(asdict(self), indent=2, ensure_ascii=False), encoding="utf-8"
+        )
+        return caminho
+
+
+def getArquivoRelatorio(prefixo: str) -> Path:
+    carimbo = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return OUTPUT_DIR / "relatorios" / f"{prefixo}_{carimbo}.json"
+
+
+def tamanhoBytes(caminho: Path) -> int:
+    if caminho.is_dir():
+        return sum(p.stat().st_size for p in caminho.rglob("*") if p.is_file())
+    return caminho.stat().st_size if caminho.exists() else 0
+
+
+def contarLinhas(caminho: Path) -> Optional[int]:
+    # linhas de dados (sem header); None para formatos sem contagem barata (ZIP)
+    if not caminho.exists():
+        return None
+    if columnar.isCaminhoColunar(caminho):
+        if columnar.pq is None:
+            return None
+        return sum(
+            columnar.pq.ParquetFile(p).metadata.num_rows
+            for p in columnar.listarPartes(caminho)
+        )
+    if caminho.suffix.lower() != ".csv":
+        return None
+
+    linhas = 0
+    with open(caminho, "rb") as f:
+        while chunk := f.read(1024 * 1024):
+            linhas += chunk.count(b"\n")
+    return max(linhas - 1, 0)
+
+
+def somarMetrica(caminhos: Sequence[Path], medir) -> Optional[int]:
+    valores = [medir(c) for c in caminhos]
+    valores = [v for v in valores if v is not None]
+    return sum(valores) if valores else None
+
+
+def listarDescendentes(pid: int) -> List[int]:
+    # `children` de cada thread só lista os filhos criados por ela: o process pool
+    # nasce numa thread do ThreadPoolExecutor, então é preciso varrer todas as
+    # threads de cada processo (e descer nos netos)
+    descendentes: List[int] = []
+    pendentes = [pid]
+    vistos = {pid}
+    while pendentes:
+        atual = pendentes.pop()
+        for children in Path(f"/proc/{atual}/task").glob("*/children"):
+            try:
+                pids = children.read_text(encoding="ascii").split()
+            except OSError:
+                continue
+            for filho in map(int, pids):
+                if filho not in vistos:
+                    vistos.add(filho)
+                    descendentes.append(filho)
+                    pendentes.append(filho)
+    return descendentes
+
+
+def lerRssAtualMb() -> Optional[float]:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            paginas = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+
+    # descendentes vivos (process pool da normalização e seus filhos)
+    for pid in listarDescendentes(os.getpid()):
+        try:
+            with open(f"/proc/{pid}/statm", encoding="ascii") as f:
+                paginas += int(f.read().split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+    return paginas * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+
+
+def lerPicoRssProcessoMb() -> Optional[float]:
+    # fallback sem /proc: ru_maxrss (KB no Linux, bytes no macOS), pico da vida toda
+    if resource is None:
+        return None
+    pico = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+class AmostradorRss:
+    def __init__(self, intervalo: float = INTERVALO_AMOSTRA_RSS):
+        self.intervalo = intervalo
+        self.picoMb: Optional[float] = None
+        self._parar = threading.Event()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+
+    def _amostrar(self) -> None:
+        while True:
+            atual = lerRssAtualMb()
+            if atual is not None:
+                self.picoMb = max(self.picoMb or 0.0, atual)
+            if self._parar.wait(self.intervalo):
+                return
+
+    def __enter__(self) -> "AmostradorRss":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._parar.set()
+        self._thread.join()
+        if self.picoMb is None:
+            self.picoMb = lerPicoRssProcessoMb()
+
+
+def validarEtapas(etapas: Sequence[Etapa]) -> None:
+    nomes = [e.nome for e in etapas]
+    if len(set(nomes)) != len(nomes):
+        raise ValueError(f"Etapas com nome repetido: {nomes}")
+    for e in etapas:
+        faltando = [d for d in e.dependencias if d not in nomes]
+        if faltando:
+            raise ValueError(f"Etapa {e.nome}: dependências inexistentes {faltando}")
+
+    # Kahn: sobra etapa sem grau zero => ciclo
+    pendentes = {e.nome: set(e.dependencias) for e in etapas}
+    while pendentes:
+        livres = [n for n, deps in pendentes.items() if not deps]
+        if not livres:
+            raise ValueError(f"Ciclo entre etapas: {sorted(pendentes)}")
+        for n in livres:
+            del pendentes[n]
+        for deps in pendentes.values():
+            deps.difference_update(livres)
+
+
+def executarEtapa(etapa: Etapa, metricas: MetricasEtapa) -> None:
+    entradas = list(etapa.entradas())
+    metricas.linhas_entrada = somarMetrica(entradas, contarLinhas)
+    metricas.bytes_lidos = somarMetrica(entradas, tamanhoBytes)
+    metricas.inicio = datetime.now().isoformat(timespec="seconds")
+
+    # fora do try: se o __enter__ falhar (thread não sobe), o finally ainda
+    # enxerga o amostrador e o erro registrado é o verdadeiro
+    amostrador = AmostradorRss()
+    inicio = time.perf_counter()
+    try:
+        with amostrador:
+            etapa.executar()
+    except Exception as e:
+        metricas.status = "erro"
+        metricas.erro = f"{type(e).__name__}: {e}"
+        return
+    finally:
+        metricas.duracao_s = round(time.perf_counter() - inicio, 3)
+        if amostrador.picoMb is not None:
+            metricas.pico_rss_mb = round(amostrador.picoMb, 1)
+
+    saidas = list(etapa.saidas())
+    metricas.linhas_saida = somarMetrica(saidas, contarLinhas)
+    metricas.bytes_escritos = somarMetrica(saidas, tamanhoBytes)
+    metricas.status = "ok"
+
+
+def executarPipeline(
+    etapas: Sequence[Etapa],
+    workers: int = 1,
+    relatorioPath: Optional[Path] = None,
+) -> RelatorioExecucao:
+    """
+    Executa as etapas respeitando as dependências. Falha numa etapa marca as
+    dependentes como "pulada" e o restante segue; o relatório é gravado
+    (se pedido) antes de levantar o erro.
+    """
+    validarEtapas(etapas)
+    porNome: Dict[str, Etapa] = {e.nome: e for e in etapas}
+    metricas = {e.nome: MetricasEtapa(e.nome) for e in etapas}
+    relatorio = RelatorioExecucao(
+        inicio=datetime.now().isoformat(timespec="seconds"),
+        workers=workers,
+        etapas=[metricas[e.nome] for e in etapas],
+    )
+
+    inicio = time.perf_counter()
+    pendentes = [e.nome for e in etapas]
+    rodando = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while pendentes or rodando:
+            for nome in list(pendentes):
+                deps = [metricas[d].status for d in porNome[nome].dependencias]
+                if any(s in ("erro", "pulada") for s in deps):
+                    metricas[nome].status = "pulada"
+                    pendentes.remove(nome)
+                elif all(s == "ok" for s in deps) and len(rodando) < max(1, workers):
+                    print(f"=== Etapa: {nome} ===")
+                    futuro = pool.submit(executarEtapa, porNome[nome], metricas[nome])
+                    rodando[futuro] = nome
+                    pendentes.remove(nome)
+
+            if not rodando:
+                continue
+            concluidos, _ = wait(list(rodando), return_when=FIRST_COMPLETED)
+            for futuro in concluidos:
+                futuro.result()
+                m = metricas[rodando.pop(futuro)]
+                print(
+                    f"{m.nome} | {m.status} | {m.duracao_s}s | "
+                    f"linhas={m.linhas_entrada}->{m.linhas_saida} | "
+                    f"pico_rss={m.pico_rss_mb}MB"
+                )
+
+    relatorio.duracao_s = round(time.perf_counter() - inicio, 3)
+    if relatorioPath is not None:
+        relatorio.salvar(relatorioPath)
+
+    if not relatorio.ok:
+        erros = [f"{m.nome}: {m.erro}" for m in relatorio.etapas if m.erro]
+        raise RuntimeError(f"Pipeline falhou ({'; '.join(erros)})")
+
+    return relatorio
@@ -0,0 +1,308 @@
+"""
+Kernel único de parse de valores monetários (pt-BR / ponto) para inteiros.
+
+Converte o texto direto em (inteiro não escalado, casas decimais) — e daí em
+centavos — sem criar `Decimal`. Cobre números em ASCII no formato
+`[+-]?ddd[.ddd][e[+-]ddd]` depois de normalizar os separadores (o expoente
+aparece no texto que `str(Decimal)` gera para valores muito pequenos); o
+resto (vazio, NaN, infinito, lixo) é reportado com um motivo em vez de virar
+`Decimal(0)` em silêncio, e cada chamador decide o que fazer.
+
+Formatos (regras dos parsers que existiam em cada etapa):
+- ptbr: "." é milhar e "," é decimal (arquivos brutos da ANS);
+- auto: "," é decimal; "." só é milhar se houver "," (`parse_decimal`);
+- ponto: "." é decimal (staging e consolidados gerados pelo pipeline).
+"""
+
+from decimal import MAX_EMAX, MAX_PREC, MIN_EMIN, Context, Decimal, InvalidOperation
+from typing import TYPE_CHECKING, Any, Optional, Tuple
+
+if TYPE_CHECKING:
+    # em runtime os dois são opcionais (a API em lote checa antes de usar)
+    import numpy as np
+    import pyarrow as pa
+
+    pc: Any  # kernels do pyarrow.compute são gerados em runtime
+else:
+    try:
+        import numpy as np
+    except ImportError:  # dependência opcional (API em lote)
+        np = None
+
+    try:
+        import pyarrow as pa
+        import pyarrow.compute as pc
+    except ImportError:  # dependência opcional (API em lote)
+        pa = None
+        pc = None
+
+FORMATO_PTBR = "ptbr"
+FORMATO_AUTO = "auto"
+FORMATO_PONTO = "ponto"
+
+MOTIVO_VAZIO = "vazio"
+MOTIVO_INVALIDO = "invalido"
+MOTIVO_PRECISAO = "mais_de_2_casas"
+MOTIVO_EXPOENTE = "expoente_fora_da_faixa"
+
+# int64 comporta qualquer número de 18 dígitos
+MAX_DIGITOS_LOTE = 18
+
+# "1e999999999" viraria um inteiro gigante; valor monetário não chega perto
+MAX_EXPOENTE = 28
+
+# aritmética sem arredondar (o contexto padrão corta em 28 dígitos)
+CONTEXTO_EXATO = Context(prec=MAX_PREC, Emax=MAX_EMAX, Emin=MIN_EMIN)
+
+
+class ErroDecimal(ValueError):
+    def __init__(self, motivo: str, valor: str):
+        super().__init__(f"Valor decimal {motivo}: {valor!r}")
+        self.motivo = motivo
+        self.valor = valor
+
+
+def _normalizar(valor: str, formato: str) -> str:
+    v = (valor or "").strip()
+    if formato == FORMATO_PONTO:
+        return v
+    if formato == FORMATO_PTBR:
+        v = v.replace(".", "").replace(",", ".")
+    elif formato == FORMATO_AUTO:
+        v = v.replace(" ", "")
+        if "," in v:
+            if "." in v:
+                v = v.replace(".", "")
+            v = v.replace(",", ".")
+    else:
+        raise ValueError(f"Formato decimal inválido: {formato}")
+    # "7 ." -> "7 ": o Decimal também ignora o espaço que sobra
+    return v.strip()
+
+
+def decompor(valor: str, formato: str = FORMATO_AUTO) -> Tuple[int, int]:
+    """
+    (inteiro não escalado, casas decimais); "1.234,50" em ptbr -> (123450, 2).
+    Com expoente as casas podem ser negativas: "1E+3" -> (1, -3).
+    """
+    # caminho comum: o texto já vem em ponto fixo, sem sinal, milhar nem
+    # espaço ("124876.67"; "124876,67" em ptbr) e pula a normalização
+    if valor and valor.isascii():
+        if formato == FORMATO_PONTO or (formato == FORMATO_AUTO and "," not in valor):
+            inteiro, _, fracao = valor.partition(".")
+        elif formato == FORMATO_PTBR or formato == FORMATO_AUTO:
+            inteiro, _, fracao = valor.partition(",")
+        else:
+            inteiro = fracao = ""
+        digitos = inteiro + fracao
+        if digitos.isdigit():
+            return int(digitos), len(fracao)
+
+    v = _normalizar(valor, formato)
+    inteiro, _, fracao = v.partition(".")
+    digitos = inteiro + fracao
+    if digitos.isdigit() and digitos.isascii():
+        return int(digitos), len(fracao)
+    if not v:
+        raise ErroDecimal(MOTIVO_VAZIO, valor)
+
+    expoente = 0
+    if "e" in v or "E" in v:
+        v, _, texto = v.replace("E", "e").partition("e")
+        absoluto = texto[1:] if texto[:1] in ("+", "-") else texto
+        if not (absoluto.isascii() and absoluto.isdigit()):
+            raise ErroDecimal(MOTIVO_INVALIDO, valor)
+        expoente = int(texto)
+        if abs(expoente) > MAX_EXPOENTE:
+            raise ErroDecimal(MOTIVO_EXPOENTE, valor)
+
+    sinal = v[:1]
+    if sinal == "-" or sinal == "+":
+        v = v[1:]
+    inteiro, _, fracao = v.partition(".")
+    digitos = inteiro + fracao if fracao else inteiro
+    if not (digitos.isascii() and digitos.isdigit()):
+        raise ErroDecimal(MOTIVO_INVALIDO, valor)
+
+    n = int(digitos)
+    return (-n if sinal == "-" else n), len(fracao) - expoente
+
+
+def como_decimal(inteiro: int, casas: int) -> Decimal:
+    """`Decimal` exato (mesmo expoente) de um par devolvido por `decompor`."""
+    return Decimal(inteiro).scaleb(-casas, CONTEXTO_EXATO)
+
+
+def tentar_decimal(valor: str, formato: str = FORMATO_AUTO) -> Optional[Decimal]:
+    """`Decimal` exato de `decompor`, ou None no que o kernel recusa."""
+    # caminho comum ("124876.67"): o construtor em C valida e converte, e
+    # depois saem o que ele aceita e o kernel não (NaN/infinito, expoente,
+    # "_", dígitos fora do ASCII). Só normaliza se houver vírgula ou milhar.
+    # O "-0" fica como nos parsers antigos.
+    v = valor
+    if not v or "," in v or not (formato == FORMATO_AUTO or formato == FORMATO_PONTO):
+        v = _normalizar(valor, formato)
+        if not v:
+            return None
+    try:
+        d = Decimal(v)
+    except InvalidOperation:
+        pass
+    else:
+        if (
+            d.is_finite()
+            and v.isascii()
+            and "_" not in v
+            and "e" not in v
+            and "E" not in v
+        ):
+            return d
+    try:
+        return como_decimal(*decompor(valor, formato))
+    except ErroDecimal:
+        return None
+
+
+def para_decimal(valor: str, formato: str = FORMATO_AUTO) -> Decimal:
+    """Como `tentar_decimal`, mas levanta ErroDecimal com o motivo."""
+    d = tentar_decimal(valor, formato)
+    return d if d is not None else como_decimal(*decompor(valor, formato))
+
+
+def formatar(inteiro: int, casas: int) -> str:
+    """
+    Texto em ponto fixo de um par de `decompor`: o mesmo de `str(Decimal)`,
+    sem a notação científica que ele usa para valores muito pequenos.
+    """
+    if casas <= 0:
+        return str(inteiro * 10**-casas)
+    digitos = str(inteiro)
+    if inteiro >= 0 and len(digitos) > casas:
+        return digitos[:-casas] + "." + digitos[-casas:]
+    digitos = str(abs(inteiro)).rjust(casas + 1, "0")
+    sinal = "-" if inteiro < 0 else ""
+    return f"{sinal}{digitos[:-casas]}.{digitos[-casas:]}"
+
+
+def para_texto(valor: str, formato: str = FORMATO_AUTO) -> str:
+    """
+    `formatar(*decompor(valor, formato))`; no caminho comum só tira os zeros
+    à esquerda do texto normalizado ("1.234,50" em ptbr -> "1234.50").
+    """
+    if valor and formato == FORMATO_PTBR and valor.isascii():
+        # "124876,67" (sem milhar): basta trocar a vírgula
+        inteiro, virgula, fracao = valor.partition(",")
+        if fracao.isdigit() or not virgula:
+            if inteiro.isdigit():
+                if inteiro[0] == "0":
+                    inteiro = inteiro.lstrip("0") or "0"
+                return inteiro + "." + fracao if virgula else inteiro
+            if inteiro[:1] == "-" and inteiro[1:].isdigit():
+                inteiro = inteiro[1:].lstrip("0") or "0"
+                # "-0,00" -> "0.00", como `formatar` (o inteiro não guarda o sinal)
+                if inteiro != "0" or fracao.strip("0"):
+                    inteiro = "-" + inteiro
+                return inteiro + "." + fracao if virgula else inteiro
+    return formatar(*decompor(valor, formato))
+
+
+def para_centavos(valor: str, formato: str = FORMATO_AUTO) -> int:
+    n, casas = decompor(valor, formato)
+    if casas > 2:
+        raise ErroDecimal(MOTIVO_PRECISAO, valor)
+    return n * 10 ** (2 - casas)
+
+
+def tentar_centavos(
+    valor: str, formato: str = FORMATO_AUTO
+) -> Tuple[Optional[int], Optional[str]]:
+    """(centavos, None) ou (None, motivo) — sem exceção no caminho por linha."""
+    try:
+        return para_centavos(valor, formato), None
+    except ErroDecimal as e:
+        return None, e.motivo
+
+
+def decompor_lote(valores, formato: str = FORMATO_AUTO):
+    """
+    `decompor` para uma coluna inteira (lista ou array pyarrow de texto).
+
+    Retorna (inteiros int64, casas int64, validos bool) em NumPy. Só ponto
+    fixo: linhas fora da gramática, com expoente ou com mais de 18 dígitos
+    (não cabem em int64) saem com validos=False e (0, 0) — o escalar decide
+    cada uma (valor ou motivo). Sem pyarrow, faz o mesmo linha a linha.
+    """
+    if np is None:
+        raise RuntimeError("API em lote requer numpy. Instale com: pip install numpy")
+
+    if pa is None:
+        inteiros, casas, validos = [], [], []
+        for v in valores:
+            try:
+                n, c = decompor(v, formato)
+                ok = len(str(abs(n))) <= MAX_DIGITOS_LOTE
+                ok = ok and "e" not in (v or "").lower()
+            except ErroDecimal:
+                ok = False
+            inteiros.append(n if ok else 0)
+            casas.append(c if ok else 0)
+            validos.append(ok)
+        return (
+            np.array(inteiros, dtype=np.int64),
+            np.array(casas, dtype=np.int64),
+            np.array(validos, dtype=bool),
+        )
+
+    if not isinstance(valores, (pa.Array, pa.ChunkedArray)):
+        valores = pa.array(valores, type=pa.string())
+    texto = pc.utf8_trim_whitespace(pc.fill_null(valores, ""))
+
+    if formato == FORMATO_PTBR:
+        texto = pc.replace_substring(pc.replace_substring(texto, ".", ""), ",", ".")
+    elif formato == FORMATO_AUTO:
+        texto = pc.replace_substring(texto, " ", "")
+        comVirgula = pc.match_substring(texto, ",")
+        semMilhar = pc.if_else(
+            pc.match_substring(texto, "."), pc.replace_substring(texto, ".", ""), texto
+        )
+        texto = pc.if_else(comVirgula, pc.replace_substring(semMilhar, ",", "."), texto)
+    elif formato != FORMATO_PONTO:
+        raise ValueError(f"Formato decimal inválido: {formato}")
+    texto = pc.utf8_trim_whitespace(texto)
+
+    digitos = pc.replace_substring_regex(texto, r"[+.]", "")
+    validos = pc.and_(
+        pc.match_substring_regex(texto, r"^[+-]?[0-9]*(\.[0-9]*)?$"),
+        pc.match_substring_regex(texto, r"[0-9]"),
+    )
+    validos = pc.and_(
+        validos,
+        pc.less_equal(
+            pc.utf8_length(pc.replace_substring(digitos, "-", "")), MAX_DIGITOS_LOTE
+        ),
+    )
+    # ".5" / "-.5": sem dígito antes do ponto, o cast ainda recebe "5" / "-5"
+    inteiros = pc.cast(pc.if_else(validos, digitos, "0"), pa.int64())
+
+    ponto = pc.find_substring(texto, ".")
+    casas = pc.if_else(
+        pc.and_(validos, pc.greater_equal(ponto, 0)),
+        pc.subtract(pc.subtract(pc.utf8_length(texto), ponto), 1),
+        0,
+    )
+
+    return (
+        inteiros.to_numpy(zero_copy_only=False),
+        pc.cast(casas, pa.int64()).to_numpy(zero_copy_only=False),
+        validos.to_numpy(zero_copy_only=False),
+    )
+
+
+def centavos_lote(valores, formato: str = FORMATO_AUTO):
+    """(centavos int64, validos bool); mais de 2 casas também sai inválido."""
+    inteiros, casas, validos = decompor_lote(valores, formato)
+    validos = validos & (casas <= 2)
+    # 18 dígitos * 100 pode estourar int64: esses também voltam ao escalar
+    validos &= np.abs(inteiros) < 10**16
+    centavos = np.where(validos, inteiros * 10 ** np.clip(2 - casas, 0, 2), 0)
+    return centavos, validos
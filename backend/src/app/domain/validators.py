@@ -1,57 +1,101 @@
 import re
-from decimal import Decimal, InvalidOperation
-from typing import Optional
+from functools import lru_cache
+from typing import Optional, Sequence
+
+from app.domain import decimais
+
+try:
+    import numpy as np
+except ImportError:  # dependência opcional (validação em lote)
+    np = None
 
 
 def limpar_digitos(valor: str) -> str:
     return re.sub(r"\D+", "", valor or "")
 
 
-def parse_decimal(valor: str) -> Optional[Decimal]:
-    v = (valor or "").strip()
-    if not v:
-        return None
+# formatos pt-br e inteiros (FORMATO_AUTO); vazio, NaN e lixo -> None. Alias
+# e não wrapper: roda por linha na agregação e a chamada extra pesa
+parse_decimal = decimais.tentar_decimal
 
-    # lida com formatos pt-br e inteiros
-    v = v.replace(" ", "")
-    if "," in v and "." in v:
-        v = v.replace(".", "").replace(",", ".")
-    elif "," in v and "." not in v:
-        v = v.replace(",", ".")
 
-    try:
-        return Decimal(v)
-    except (InvalidOperation, ValueError):
-        return None
+ERRO_CNPJ_INVALIDO = "cnpj_invalido"
 
+# motivos detalhados (motivo_cnpj_invalido); a coluna `erros` do consolidado final
+# continua só com ERRO_CNPJ_INVALIDO
+MOTIVO_CNPJ_VAZIO = "cnpj_vazio"
+MOTIVO_CNPJ_TAMANHO = "cnpj_tamanho_invalido"
+MOTIVO_CNPJ_REPETIDO = "cnpj_digitos_repetidos"
+MOTIVO_CNPJ_DV = "cnpj_dv_invalido"
 
-def validar_cnpj(cnpj: str) -> bool:
-    cnpj = limpar_digitos(cnpj)
+PESOS_DV1 = (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+PESOS_DV2 = (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2)
+
+
+def _digitos_cnpj(cnpj: str) -> str:
+    # caminho rápido: já vem só com dígitos na maioria das linhas (CADOP limpo)
+    if len(cnpj) == 14 and cnpj.isascii() and cnpj.isdigit():
+        return cnpj
+    # só 0-9: dígitos Unicode (ex. "１" de largura total) não contam
+    return re.sub(r"[^0-9]+", "", cnpj)
 
+
+def _calc_dv(base: str, pesos: tuple) -> str:
+    resto = sum(int(d) * p for d, p in zip(base, pesos)) % 11
+    return "0" if resto < 2 else str(11 - resto)
+
+
+@lru_cache(maxsize=65_536)
+def motivo_cnpj_invalido(cnpj: str) -> Optional[str]:
+    """None se o CNPJ é válido; senão o motivo (MOTIVO_CNPJ_*)."""
+    cnpj = _digitos_cnpj(cnpj or "")
+
+    if not cnpj:
+        return MOTIVO_CNPJ_VAZIO
     if len(cnpj) != 14:
-        return False
+        return MOTIVO_CNPJ_TAMANHO
     if cnpj == cnpj[0] * 14:
-        return False
-
-    def calc_dv(base12: str) -> str:
-        pesos1 = [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-        pesos2 = [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]
-
-        soma = 0
-        for i, p in enumerate(pesos1):
-            soma += int(base12[i]) * p
-        resto = soma % 11
-        dv1 = "0" if resto < 2 else str(11 - resto)
-
-        base13 = base12 + dv1
-        soma = 0
-        for i, p in enumerate(pesos2):
-            soma += int(base13[i]) * p
-        resto = soma % 11
-        dv2 = "0" if resto < 2 else str(11 - resto)
-
-        return dv1 + dv2
-
-    base = cnpj[:12]
-    dv = cnpj[12:]
-    return calc_dv(base) == dv
+        return MOTIVO_CNPJ_REPETIDO
+
+    dv1 = _calc_dv(cnpj[:12], PESOS_DV1)
+    dv2 = _calc_dv(cnpj[:12] + dv1, PESOS_DV2)
+    if cnpj[12:] != dv1 + dv2:
+        return MOTIVO_CNPJ_DV
+    return None
+
+
+def validar_cnpj(cnpj: str) -> bool:
+    # poucos milhares de CNPJs distintos se repetem por trimestre: memoizado
+    return motivo_cnpj_invalido(cnpj) is None
+
+
+def validar_cnpjs(cnpjs: Sequence[str]):
+    """
+    Valida uma coluna inteira de uma vez: dígitos como matriz uint8 (n x 14)
+    e DVs por produto matricial com os pesos. Retorna um array bool do NumPy
+    (ou lista de bool, sem NumPy).
+    """
+    if np is None:
+        return [validar_cnpj(c) for c in cnpjs]
+
+    digitos = [_digitos_cnpj(c or "") for c in cnpjs]
+    tamanho14 = np.fromiter(
+        (len(d) == 14 for d in digitos), dtype=bool, count=len(digitos)
+    )
+    validos = np.zeros(len(digitos), dtype=bool)
+    if not tamanho14.any():
+        return validos
+
+    texto = "".join(d for d, ok in zip(digitos, tamanho14) if ok).encode("ascii")
+    m = (np.frombuffer(texto, dtype=np.uint8).reshape(-1, 14) - ord("0")).astype(
+        np.int64
+    )
+
+    resto1 = (m[:, :12] @ np.array(PESOS_DV1)) % 11
+    dv1 = np.where(resto1 < 2, 0, 11 - resto1)
+    resto2 = (m[:, :12] @ np.array(PESOS_DV2[:12]) + dv1 * PESOS_DV2[12]) % 11
+    dv2 = np.where(resto2 < 2, 0, 11 - resto2)
+
+    repetido = (m == m[:, :1]).all(axis=1)
+    validos[tamanho14] = (m[:, 12] == dv1) & (m[:, 13] == dv2) & ~repetido
+    return validos
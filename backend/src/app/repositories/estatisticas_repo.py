@@ -1,54 +1,150 @@
 from __future__ import annotations
 
 from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+# linha única refeita a cada carga (db/estatisticas_resumo.sql)
+SQL_RESUMO = text(
+    """
+    SELECT total_despesas, media_despesas, top5_operadoras, despesas_por_uf
+    FROM healthtech.estatisticas_resumo
+    WHERE id = 1
+    """
+)
+
+SQL_TOTAL_DESPESAS = text(
+    "SELECT COALESCE(SUM(valor_despesas), 0) FROM healthtech.despesa_trimestral"
+)
+
+SQL_MEDIA_DESPESAS = text(
+    "SELECT COALESCE(AVG(valor_despesas), 0) FROM healthtech.despesa_trimestral"
+)
+
+SQL_TOP5_OPERADORAS = text(
+    """
+    SELECT o.cnpj, o.razao_social, COALESCE(SUM(d.valor_despesas), 0) AS total
+    FROM healthtech.operadora o
+    JOIN healthtech.despesa_trimestral d
+      ON d.registro_ans = o.registro_ans
+    GROUP BY o.cnpj, o.razao_social
+    ORDER BY total DESC
+    LIMIT 5
+    """
+)
+
+SQL_DESPESAS_POR_UF = text(
+    """
+    SELECT o.uf, COALESCE(SUM(d.valor_despesas), 0) AS total
+    FROM healthtech.operadora o
+    JOIN healthtech.despesa_trimestral d
+      ON d.registro_ans = o.registro_ans
+    WHERE o.uf IS NOT NULL
+    GROUP BY o.uf
+    ORDER BY o.uf
+    """
+)
+
+# as quatro consultas acima num comando só: uma varredura do fato,
+# agregado por operadora e depois por GROUPING SETS; mesmo formato
+# de linha do resumo materializado
+SQL_CONSULTA_UNICA = text(
+    """
+    WITH por_operadora AS (
+      SELECT registro_ans, SUM(valor_despesas) AS total, COUNT(*) AS qtd
+      FROM healthtech.despesa_trimestral
+      GROUP BY registro_ans
+    ),
+    grupos AS (
+      -- nivel 1 = (cnpj, razao_social); 6 = (uf); 7 = geral
+      SELECT
+        GROUPING(o.cnpj, o.razao_social, o.uf) AS nivel,
+        o.cnpj, o.razao_social, o.uf,
+        SUM(p.total) AS total,
+        SUM(p.qtd) AS qtd
+      FROM por_operadora p
+      JOIN healthtech.operadora o ON o.registro_ans = p.registro_ans
+      GROUP BY GROUPING SETS ((o.cnpj, o.razao_social), (o.uf), ())
+    )
+    SELECT
+      COALESCE((SELECT total FROM grupos WHERE nivel = 7), 0) AS total_despesas,
+      COALESCE(
+        (SELECT total / NULLIF(qtd, 0) FROM grupos WHERE nivel = 7), 0
+      ) AS media_despesas,
+      (
+        SELECT COALESCE(
+          jsonb_agg(
+            jsonb_build_object(
+              'cnpj', cnpj, 'razao_social', razao_social, 'total_despesas', total
+            )
+            ORDER BY total DESC
+          ),
+          '[]'::jsonb
+        )
+        FROM (
+          SELECT cnpj, razao_social, total
+          FROM grupos
+          WHERE nivel = 1
+          ORDER BY total DESC
+          LIMIT 5
+        ) t
+      ) AS top5_operadoras,
+      (
+        SELECT COALESCE(jsonb_object_agg(uf, total), '{}'::jsonb)
+        FROM grupos
+        WHERE nivel = 6 AND uf IS NOT NULL
+      ) AS despesas_por_uf
+    """
+)
+
 
 class EstatisticasRepository:
+    def resumo(self, db: Session):
+        # None em banco sem o resumo: o serviço cai nas queries abaixo
+        try:
+            return db.execute(SQL_RESUMO).mappings().first()
+        except ProgrammingError:
+            db.rollback()
+            return None
+
     def total_despesas(self, db: Session):
-        return db.execute(
-            text(
-                "SELECT COALESCE(SUM(valor_despesas), 0) FROM healthtech.despesa_trimestral"
-            )
-        ).scalar_one()
+        return db.execute(SQL_TOTAL_DESPESAS).scalar_one()
 
     def media_despesas(self, db: Session):
-        return db.execute(
-            text(
-                "SELECT COALESCE(AVG(valor_despesas), 0) FROM healthtech.despesa_trimestral"
-            )
-        ).scalar_one()
+        return db.execute(SQL_MEDIA_DESPESAS).scalar_one()
 
     def top5_operadoras(self, db: Session):
-        return (
-            db.execute(
-                text(
-                    """
-                SELECT o.cnpj, o.razao_social, COALESCE(SUM(d.valor_despesas), 0) AS total
-                FROM healthtech.operadora o
-                JOIN healthtech.despesa_trimestral d
-                  ON d.registro_ans = o.registro_ans
-                GROUP BY o.cnpj, o.razao_social
-                ORDER BY total DESC
-                LIMIT 5
-                """
-                )
-            )
-            .mappings()
-            .all()
-        )
+        return db.execute(SQL_TOP5_OPERADORAS).mappings().all()
 
     def despesas_por_uf(self, db: Session):
-        return db.execute(
-            text(
-                """
-                SELECT o.uf, COALESCE(SUM(d.valor_despesas), 0) AS total
-                FROM healthtech.operadora o
-                JOIN healthtech.despesa_trimestral d
-                  ON d.registro_ans = o.registro_ans
-                WHERE o.uf IS NOT NULL
-                GROUP BY o.uf
-                ORDER BY o.uf
-                """
-            )
-        ).all()
+        return db.execute(SQL_DESPESAS_POR_UF).all()
+
+    def estatisticas_consulta_unica(self, db: Session):
+        return db.execute(SQL_CONSULTA_UNICA).mappings().one()
+
+
+class AsyncEstatisticasRepository:
+    """Mesmas consultas, com AsyncSession (API_DB_MODO=async)."""
+
+    async def resumo(self, db: AsyncSession):
+        try:
+            return (await db.execute(SQL_RESUMO)).mappings().first()
+        except ProgrammingError:
+            await db.rollback()
+            return None
+
+    async def total_despesas(self, db: AsyncSession):
+        return (await db.execute(SQL_TOTAL_DESPESAS)).scalar_one()
+
+    async def media_despesas(self, db: AsyncSession):
+        return (await db.execute(SQL_MEDIA_DESPESAS)).scalar_one()
+
+    async def top5_operadoras(self, db: AsyncSession):
+        return (await db.execute(SQL_TOP5_OPERADORAS)).mappings().all()
+
+    async def despesas_por_uf(self, db: AsyncSession):
+        return (await db.execute(SQL_DESPESAS_POR_UF)).all()
+
+    async def estatisticas_consulta_unica(self, db: AsyncSession):
+        return (await db.execute(SQL_CONSULTA_UNICA)).mappings().one()
@@ -1,84 +1,242 @@
 from __future__ import annotations
 
+import json
+import os
+import re
+
 from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+COLUNAS_OPERADORA = """
+              registro_ans, cnpj, razao_social, nome_fantasia, modalidade, uf,
+              cidade, logradouro, numero, complemento, bairro, cep, ddd, telefone, fax,
+              endereco_eletronico, representante, cargo_representante, regiao_comercializacao,
+              data_registro_ans
+"""
 
-class OperadoraRepository:
-    def count_operadoras(self, db: Session, q_text: str, q_digits: str) -> int:
-        sql = text(
-            """
-            SELECT COUNT(*)
-            FROM healthtech.operadora
-            WHERE (
+FILTRO_Q = """
+            (
               :q_text = ''
               OR razao_social ILIKE :q_like
               OR (:q_digits <> '' AND cnpj LIKE :cnpj_like)
             )
-            """
+"""
+
+BUSCA_ILIKE = "ilike"
+BUSCA_TRIGRAM = "trigram"
+
+# expressão do idx_operadora_busca_trgm (db/005_busca_operadora.sql), idêntica
+DOC_BUSCA = (
+    "healthtech.normalizar_busca("
+    "coalesce(razao_social, '') || ' ' || coalesce(nome_fantasia, ''))"
+)
+Q_BUSCA = "healthtech.normalizar_busca(:q_text)"
+
+# trecho sem acento/caixa (LIKE no GIN de trigramas), palavra parecida
+# (erros de digitação, operador <%) ou prefixo de CNPJ (btree)
+FILTRO_TRIGRAM = f"""
+            (
+              :q_text = ''
+              OR {DOC_BUSCA} LIKE '%' || {Q_BUSCA} || '%'
+              OR {Q_BUSCA} OPERATOR(public.<%) {DOC_BUSCA}
+              OR (:cnpj_prefixo <> '' AND cnpj LIKE :cnpj_prefixo)
+            )
+"""
+
+# CNPJ exato/prefixo > começo do nome > similaridade da palavra
+RANK_TRIGRAM = f"""
+              CASE WHEN :cnpj_prefixo <> '' AND cnpj LIKE :cnpj_prefixo THEN 2 ELSE 0 END
+              + CASE WHEN {DOC_BUSCA} LIKE {Q_BUSCA} || '%' THEN 1 ELSE 0 END
+              + public.word_similarity({Q_BUSCA}, {DOC_BUSCA})
+"""
+
+_CNPJ_DIGITADO = re.compile(r"[\d./\- ]+")
+
+
+def get_modo_busca(modo: str | None = None) -> str:
+    modo = (modo or os.getenv("OPERADORAS_BUSCA") or BUSCA_ILIKE).lower()
+    if modo not in (BUSCA_ILIKE, BUSCA_TRIGRAM):
+        raise ValueError(f"Modo de busca de operadoras inválido: {modo}")
+    return modo
+
+
+def _params_q(q_text: str, q_digits: str) -> dict:
+    return {
+        "q_text": q_text,  # sempre string
+        "q_like": f"%{q_text}%",  # "%%" quando vazio
+        "q_digits": q_digits,  # sempre string
+        "cnpj_like": f"%{q_digits}%",  # "%%" quando vazio
+        # trigram: prefixo só quando o q parece um CNPJ (dígitos e pontuação)
+        "cnpj_prefixo": (
+            f"{q_digits}%" if q_digits and _CNPJ_DIGITADO.fullmatch(q_text) else ""
+        ),
+    }
+
+
+def _linhas_plano(plano) -> int:
+    if isinstance(plano, str):
+        plano = json.loads(plano)
+    return int(plano[0]["Plan"]["Plan Rows"])
+
+
+class ConsultasOperadora:
+    """
+    Cada consulta é montada num `_sql_*` (texto + parâmetros) e executada
+    pelo OperadoraRepository com a Session síncrona ou pelo
+    AsyncOperadoraRepository com a AsyncSession: o SQL é um só nos dois
+    caminhos.
+    """
+
+    def __init__(self, busca: str | None = None):
+        self.busca = get_modo_busca(busca)
+        self.filtro = FILTRO_TRIGRAM if self.busca == BUSCA_TRIGRAM else FILTRO_Q
+
+    def _sql_count(self, q_text: str, q_digits: str):
+        sql = text(f"SELECT COUNT(*) FROM healthtech.operadora WHERE {self.filtro}")
+        return sql, _params_q(q_text, q_digits)
+
+    def _sql_estimate(self, q_text: str, q_digits: str):
+        # estimativa do planner (EXPLAIN sem executar): custo fixo, sem varrer
+        sql = text(
+            "EXPLAIN (FORMAT JSON) "
+            f"SELECT 1 FROM healthtech.operadora WHERE {self.filtro}"
         )
-        params = {
-            "q_text": q_text,  # sempre string
-            "q_like": f"%{q_text}%",  # "%%" quando vazio
-            "q_digits": q_digits,  # sempre string
-            "cnpj_like": f"%{q_digits}%",  # "%%" quando vazio
-        }
-        return int(db.execute(sql, params).scalar_one())
+        return sql, _params_q(q_text, q_digits)
 
-    def list_operadoras(
-        self, db: Session, page: int, limit: int, q_text: str, q_digits: str
-    ):
+    def _sql_list(self, page: int, limit: int, q_text: str, q_digits: str):
         offset = (page - 1) * limit
+        ordem = "razao_social NULLS LAST, registro_ans"
+        if self.busca == BUSCA_TRIGRAM and q_text:
+            # com busca, mais relevante primeiro; empate na ordem alfabética
+            ordem = f"({RANK_TRIGRAM}) DESC, {ordem}"
         sql = text(
-            """
-            SELECT
-              registro_ans, cnpj, razao_social, nome_fantasia, modalidade, uf,
-              cidade, logradouro, numero, complemento, bairro, cep, ddd, telefone, fax,
-              endereco_eletronico, representante, cargo_representante, regiao_comercializacao,
-              data_registro_ans
+            f"""
+            SELECT {COLUNAS_OPERADORA}
             FROM healthtech.operadora
-            WHERE (
-              :q_text = ''
-              OR razao_social ILIKE :q_like
-              OR (:q_digits <> '' AND cnpj LIKE :cnpj_like)
+            WHERE {self.filtro}
+            ORDER BY {ordem}
+            LIMIT :limit OFFSET :offset
+            """
+        )
+        params = {**_params_q(q_text, q_digits), "limit": limit, "offset": offset}
+        return sql, params
+
+    def _sql_keyset(
+        self,
+        limit: int,
+        q_text: str,
+        q_digits: str,
+        apos: tuple[str | None, int] | None,
+    ):
+        """
+        Mesma ordem do offset, a partir da chave (razao_social, registro_ans)
+        da última linha da página anterior. Anda no idx_operadora_razao_registro
+        e para no LIMIT, em qualquer profundidade. Razões NULL vêm por último:
+        ficam num ramo próprio do UNION ALL para a comparação de linha seguir
+        usando o índice. Com busca por trigramas a ordem continua a da chave
+        (o ranking de relevância é só do modo offset).
+        """
+        params = {**_params_q(q_text, q_digits), "limit": limit}
+        if apos is None:
+            sql = text(
+                f"""
+                SELECT {COLUNAS_OPERADORA}
+                FROM healthtech.operadora
+                WHERE {self.filtro}
+                ORDER BY razao_social NULLS LAST, registro_ans
+                LIMIT :limit
+                """
+            )
+        elif apos[0] is None:
+            sql = text(
+                f"""
+                SELECT {COLUNAS_OPERADORA}
+                FROM healthtech.operadora
+                WHERE {self.filtro}
+                  AND razao_social IS NULL
+                  AND registro_ans > :apos_registro
+                ORDER BY registro_ans
+                LIMIT :limit
+                """
+            )
+            params["apos_registro"] = apos[1]
+        else:
+            sql = text(
+                f"""
+                SELECT * FROM (
+                  (
+                    SELECT {COLUNAS_OPERADORA}
+                    FROM healthtech.operadora
+                    WHERE {self.filtro}
+                      AND (razao_social, registro_ans) > (:apos_razao, :apos_registro)
+                    ORDER BY razao_social, registro_ans
+                    LIMIT :limit
+                  )
+                  UNION ALL
+                  (
+                    SELECT {COLUNAS_OPERADORA}
+                    FROM healthtech.operadora
+                    WHERE {self.filtro}
+                      AND razao_social IS NULL
+                    ORDER BY registro_ans
+                    LIMIT :limit
+                  )
+                ) pagina
+                ORDER BY razao_social NULLS LAST, registro_ans
+                LIMIT :limit
+                """
             )
+            params["apos_razao"] = apos[0]
+            params["apos_registro"] = apos[1]
+        return sql, params
+
+    def _sql_todas(self):
+        # carga do índice em memória: a ordem é a da listagem, vinda do banco
+        sql = text(
+            f"""
+            SELECT {COLUNAS_OPERADORA}
+            FROM healthtech.operadora
             ORDER BY razao_social NULLS LAST, registro_ans
-            LIMIT :limit OFFSET :offset
             """
         )
-        params = {
-            "q_text": q_text,
-            "q_like": f"%{q_text}%",
-            "q_digits": q_digits,
-            "cnpj_like": f"%{q_digits}%",
-            "limit": limit,
-            "offset": offset,
-        }
-        return db.execute(sql, params).mappings().all()
+        return sql, {}
 
-    def get_operadora_by_cnpj(self, db: Session, cnpj: str):
+    def _sql_versao(self):
+        """
+        Versão dos dados gravada pela carga (usecases/db_import.py ou
+        db/002_import.sql) na mesma transação que altera a tabela: partição
+        carregada atualiza `carregado_em`, partição que sumiu sai do controle
+        (muda a contagem).
+        Transacional e igual nas réplicas, ao contrário dos contadores do pg_stat.
+        """
         sql = text(
             """
-            SELECT
-              registro_ans, cnpj, razao_social, nome_fantasia, modalidade, uf,
-              cidade, logradouro, numero, complemento, bairro, cep, ddd, telefone, fax,
-              endereco_eletronico, representante, cargo_representante, regiao_comercializacao,
-              data_registro_ans
+            SELECT max(carregado_em), count(*)
+            FROM healthtech.import_controle
+            """
+        )
+        return sql, {}
+
+    def _sql_by_cnpj(self, cnpj: str):
+        sql = text(
+            f"""
+            SELECT {COLUNAS_OPERADORA}
             FROM healthtech.operadora
             WHERE cnpj = :cnpj
             LIMIT 1
             """
         )
-        return db.execute(sql, {"cnpj": cnpj}).mappings().first()
+        return sql, {"cnpj": cnpj}
 
-    def get_registro_ans_by_cnpj(self, db: Session, cnpj: str) -> int | None:
+    def _sql_registro_by_cnpj(self, cnpj: str):
         sql = text(
             "SELECT registro_ans FROM healthtech.operadora WHERE cnpj = :cnpj LIMIT 1"
         )
-        v = db.execute(sql, {"cnpj": cnpj}).scalar()
-        return int(v) if v is not None else None
+        return sql, {"cnpj": cnpj}
 
-    def list_despesas_by_registro(self, db: Session, registro_ans: int):
+    def _sql_despesas(self, registro_ans: int):
         sql = text(
             """
             SELECT ano, trimestre, valor_despesas
@@ -87,4 +245,106 @@ class OperadoraRepository:
             ORDER BY ano ASC, trimestre ASC
             """
         )
-        return db.execute(sql, {"registro_ans": registro_ans}).all()
+        return sql, {"registro_ans": registro_ans}
+
+
+class OperadoraRepository(ConsultasOperadora):
+    def count_operadoras(self, db: Session, q_text: str, q_digits: str) -> int:
+        return int(db.execute(*self._sql_count(q_text, q_digits)).scalar_one())
+
+    def estimate_operadoras(self, db: Session, q_text: str, q_digits: str) -> int:
+        return _linhas_plano(
+            db.execute(*self._sql_estimate(q_text, q_digits)).scalar_one()
+        )
+
+    def list_operadoras(
+        self, db: Session, page: int, limit: int, q_text: str, q_digits: str
+    ):
+        sql, params = self._sql_list(page, limit, q_text, q_digits)
+        return db.execute(sql, params).mappings().all()
+
+    def list_operadoras_keyset(
+        self,
+        db: Session,
+        limit: int,
+        q_text: str,
+        q_digits: str,
+        apos: tuple[str | None, int] | None = None,
+    ):
+        sql, params = self._sql_keyset(limit, q_text, q_digits, apos)
+        return db.execute(sql, params).mappings().all()
+
+    def list_todas_operadoras(self, db: Session):
+        return db.execute(*self._sql_todas()).mappings().all()
+
+    def versao_operadoras(self, db: Session) -> tuple | None:
+        # None em banco sem import_controle (nenhuma carga desde o DDL)
+        try:
+            linha = db.execute(*self._sql_versao()).first()
+        except ProgrammingError:
+            db.rollback()
+            return None
+        return tuple(linha) if linha is not None else None
+
+    def get_operadora_by_cnpj(self, db: Session, cnpj: str):
+        return db.execute(*self._sql_by_cnpj(cnpj)).mappings().first()
+
+    def get_registro_ans_by_cnpj(self, db: Session, cnpj: str) -> int | None:
+        v = db.execute(*self._sql_registro_by_cnpj(cnpj)).scalar()
+        return int(v) if v is not None else None
+
+    def list_despesas_by_registro(self, db: Session, registro_ans: int):
+        return db.execute(*self._sql_despesas(registro_ans)).all()
+
+
+class AsyncOperadoraRepository(ConsultasOperadora):
+    """Mesmas consultas, com AsyncSession (API_DB_MODO=async)."""
+
+    async def count_operadoras(
+        self, db: AsyncSession, q_text: str, q_digits: str
+    ) -> int:
+        return int((await db.execute(*self._sql_count(q_text, q_digits))).scalar_one())
+
+    async def estimate_operadoras(
+        self, db: AsyncSession, q_text: str, q_digits: str
+    ) -> int:
+        resultado = await db.execute(*self._sql_estimate(q_text, q_digits))
+        return _linhas_plano(resultado.scalar_one())
+
+    async def list_operadoras(
+        self, db: AsyncSession, page: int, limit: int, q_text: str, q_digits: str
+    ):
+        sql, params = self._sql_list(page, limit, q_text, q_digits)
+        return (await db.execute(sql, params)).mappings().all()
+
+    async def list_operadoras_keyset(
+        self,
+        db: AsyncSession,
+        limit: int,
+        q_text: str,
+        q_digits: str,
+        apos: tuple[str | None, int] | None = None,
+    ):
+        sql, params = self._sql_keyset(limit, q_text, q_digits, apos)
+        return (await db.execute(sql, params)).mappings().all()
+
+    async def list_todas_operadoras(self, db: AsyncSession):
+        return (await db.execute(*self._sql_todas())).mappings().all()
+
+    async def versao_operadoras(self, db: AsyncSession) -> tuple | None:
+        try:
+            linha = (await db.execute(*self._sql_versao())).first()
+        except ProgrammingError:
+            await db.rollback()
+            return None
+        return tuple(linha) if linha is not None else None
+
+    async def get_operadora_by_cnpj(self, db: AsyncSession, cnpj: str):
+        return (await db.execute(*self._sql_by_cnpj(cnpj))).mappings().first()
+
+    async def get_registro_ans_by_cnpj(self, db: AsyncSession, cnpj: str) -> int | None:
+        v = (await db.execute(*self._sql_registro_by_cnpj(cnpj))).scalar()
+        return int(v) if v is not None else None
+
+    async def list_despesas_by_registro(self, db: AsyncSession, registro_ans: int):
+        return (await db.execute(*self._sql_despesas(registro_ans))).all()
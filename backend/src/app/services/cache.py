@@ -0,0 +1,228 @@
+"""
+Backends de cache da API, com trava por chave para recálculo único.
+
+- memoria: dict no processo (padrão; cada worker do uvicorn tem o seu);
+- sqlite: arquivo local compartilhado por todos os workers da máquina;
+- redis: compartilhado entre máquinas (dependência opcional).
+
+Todos guardam JSON com o instante da gravação em tempo de parede
+(`time.time()`), comparável entre processos. A política (TTL, stale,
+quem recalcula) fica no serviço; aqui só ler/gravar/invalidar e a trava.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.core.paths import DATA_DIR
+
+try:
+    import redis  # pyright: ignore[reportMissingImports]
+except ImportError:  # dependência opcional (STATS_CACHE=redis)
+    redis = None
+
+CACHE_MEMORIA = "memoria"
+CACHE_SQLITE = "sqlite"
+CACHE_REDIS = "redis"
+
+CHAVE_ESTATISTICAS = "estatisticas"
+
+ARQUIVO_SQLITE = DATA_DIR / "cache" / "api_cache.sqlite"
+
+# falha do backend (arquivo travado, redis fora do ar): o serviço trata como
+# cache vazio / trava não obtida em vez de derrubar o request
+ERROS_CACHE: tuple[type[Exception], ...] = (sqlite3.Error, OSError)
+if redis is not None:
+    ERROS_CACHE += (redis.RedisError,)
+
+
+@dataclass(frozen=True)
+class EntradaCache:
+    valor: dict
+    gravado_em: float
+
+
+class CacheMemoria:
+    # sem I/O: o serviço async chama direto, sem thread
+    bloqueante = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dados: dict[str, EntradaCache] = {}
+        self._travas: dict[str, tuple[str, float]] = {}
+
+    def get(self, chave: str) -> EntradaCache | None:
+        return self._dados.get(chave)
+
+    def set(self, chave: str, valor: dict) -> None:
+        self._dados[chave] = EntradaCache(valor, time.time())
+
+    def delete(self, chave: str) -> None:
+        self._dados.pop(chave, None)
+
+    def acquire(self, chave: str, ttl: float) -> str | None:
+        agora = time.time()
+        with self._lock:
+            atual = self._travas.get(chave)
+            if atual is not None and atual[1] > agora:
+                return None
+            token = uuid.uuid4().hex
+            self._travas[chave] = (token, agora + ttl)
+            return token
+
+    def release(self, chave: str, token: str) -> None:
+        with self._lock:
+            atual = self._travas.get(chave)
+            if atual is not None and atual[0] == token:
+                del self._travas[chave]
+
+
+DDL_SQLITE = """
+CREATE TABLE IF NOT EXISTS cache (
+  chave       TEXT PRIMARY KEY,
+  valor       TEXT NOT NULL,
+  gravado_em  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS travas (
+  chave     TEXT PRIMARY KEY,
+  token     TEXT NOT NULL,
+  expira_em REAL NOT NULL
+);
+"""
+
+
+class CacheSqlite:
+    bloqueante = True
+
+    def __init__(self, caminho: Path | str = ARQUIVO_SQLITE):
+        self.caminho = Path(caminho)
+        self.caminho.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._conectar()) as conn:
+            # WAL: leitores não bloqueiam quem grava
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(DDL_SQLITE)
+
+    def _conectar(self) -> sqlite3.Connection:
+        # conexão curta por operação: serve a qualquer thread/worker
+        return sqlite3.connect(self.caminho, timeout=5, isolation_level=None)
+
+    def get(self, chave: str) -> EntradaCache | None:
+        with closing(self._conectar()) as conn:
+            linha = conn.execute(
+                "SELECT valor, gravado_em FROM cache WHERE chave = ?", (chave,)
+            ).fetchone()
+        if linha is None:
+            return None
+        return EntradaCache(json.loads(linha[0]), linha[1])
+
+    def set(self, chave: str, valor: dict) -> None:
+        with closing(self._conectar()) as conn:
+            conn.execute(
+                "INSERT INTO cache (chave, valor, gravado_em) VALUES (?, ?, ?) "
+                "ON CONFLICT (chave) DO UPDATE SET "
+                "valor = excluded.valor, gravado_em = excluded.gravado_em",
+                (chave, json.dumps(valor), time.time()),
+            )
+
+    def delete(self, chave: str) -> None:
+        with closing(self._conectar()) as conn:
+            conn.execute("DELETE FROM cache WHERE chave = ?", (chave,))
+
+    def acquire(self, chave: str, ttl: float) -> str | None:
+        agora = time.time()
+        token = uuid.uuid4().hex
+        with closing(self._conectar()) as conn:
+            # IMMEDIATE: trava expirada (dono morreu) e a nova na mesma transação
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "DELETE FROM travas WHERE chave = ? AND expira_em <= ?", (chave, agora)
+            )
+            cur = conn.execute(
+                "INSERT OR IGNORE INTO travas (chave, token, expira_em) VALUES (?, ?, ?)",
+                (chave, token, agora + ttl),
+            )
+            conn.execute("COMMIT")
+        return token if cur.rowcount == 1 else None
+
+    def release(self, chave: str, token: str) -> None:
+        with closing(self._conectar()) as conn:
+            conn.execute(
+                "DELETE FROM travas WHERE chave = ? AND token = ?", (chave, token)
+            )
+
+
+# apaga a trava só se ainda for de quem a pegou
+LUA_RELEASE = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+  return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class CacheRedis:
+    bloqueante = True
+
+    def __init__(self, url: str):
+        if redis is None:
+            raise RuntimeError(
+                "STATS_CACHE=redis requer redis. Instale com: pip install redis"
+            )
+        self.cliente = redis.Redis.from_url(url)
+
+    def get(self, chave: str) -> EntradaCache | None:
+        bruto = self.cliente.get(chave)
+        if bruto is None:
+            return None
+        dados = json.loads(bruto)
+        return EntradaCache(dados["valor"], dados["gravado_em"])
+
+    def set(self, chave: str, valor: dict) -> None:
+        self.cliente.set(chave, json.dumps({"valor": valor, "gravado_em": time.time()}))
+
+    def delete(self, chave: str) -> None:
+        self.cliente.delete(chave)
+
+    def acquire(self, chave: str, ttl: float) -> str | None:
+        token = uuid.uuid4().hex
+        ok = self.cliente.set(f"{chave}:trava", token, nx=True, px=int(ttl * 1000))
+        return token if ok else None
+
+    def release(self, chave: str, token: str) -> None:
+        self.cliente.eval(LUA_RELEASE, 1, f"{chave}:trava", token)
+
+
+def get_tipo_cache(tipo: str | None = None) -> str:
+    tipo = (tipo or os.getenv("STATS_CACHE") or CACHE_MEMORIA).lower()
+    if tipo not in (CACHE_MEMORIA, CACHE_SQLITE, CACHE_REDIS):
+        raise ValueError(f"Backend de cache inválido: {tipo}")
+    return tipo
+
+
+def criar_cache(tipo: str | None = None):
+    tipo = get_tipo_cache(tipo)
+    if tipo == CACHE_SQLITE:
+        return CacheSqlite(os.getenv("STATS_CACHE_PATH") or ARQUIVO_SQLITE)
+    if tipo == CACHE_REDIS:
+        return CacheRedis(os.getenv("STATS_CACHE_URL") or "redis://localhost:6379/0")
+    return CacheMemoria()
+
+
+def invalidar_estatisticas() -> bool:
+    """
+    Chamado no fim de uma carga: a próxima leitura recalcula. Só alcança os
+    backends compartilhados; o de memória vive dentro dos workers da API e
+    expira pelo TTL.
+    """
+    if get_tipo_cache() == CACHE_MEMORIA:
+        return False
+    criar_cache().delete(CHAVE_ESTATISTICAS)
+    return True
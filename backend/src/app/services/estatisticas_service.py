@@ -1,41 +1,132 @@
 from __future__ import annotations
 
+import asyncio
+import logging
 import os
 import time
+from typing import Callable, TypeGuard, TypeVar
 
-from app.repositories.estatisticas_repo import EstatisticasRepository
+from app.repositories.estatisticas_repo import (
+    AsyncEstatisticasRepository,
+    EstatisticasRepository,
+)
+from app.services.cache import (
+    CHAVE_ESTATISTICAS,
+    ERROS_CACHE,
+    EntradaCache,
+    criar_cache,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+# sem resumo materializado: quatro consultas (padrão) ou um comando só
+CONSULTA_SEPARADAS = "separadas"
+CONSULTA_UNICA = "unica"
 
-class EstatisticasService:
-    def __init__(self, repo: EstatisticasRepository):
-        self.repo = repo
+T = TypeVar("T")
+
+logger = logging.getLogger("healthtech")
+
+
+def get_modo_consulta(modo: str | None = None) -> str:
+    modo = (modo or os.getenv("STATS_CONSULTA") or CONSULTA_SEPARADAS).lower()
+    if modo not in (CONSULTA_SEPARADAS, CONSULTA_UNICA):
+        raise ValueError(f"Modo de consulta de estatísticas inválido: {modo}")
+    return modo
+
+
+class PoliticaCacheEstatisticas:
+    """
+    Cache com recálculo único: quando o valor vence, só quem pega a trava
+    consulta o banco; os demais recebem o valor vencido (até `stale`
+    segundos depois do TTL) ou esperam o recálculo terminar. Com backend
+    compartilhado (STATS_CACHE=sqlite/redis) isso vale entre workers.
+    Backend fora do ar não derruba o request: leitura vira cache vazio,
+    trava vira "não obtida" e o valor é calculado direto no banco.
+
+    Regras e montagem do payload comuns ao EstatisticasService e ao
+    AsyncEstatisticasService; cada um percorre o fluxo com o seu repositório.
+    """
+
+    def __init__(self, consulta: str | None = None, cache=None):
+        self.consulta = get_modo_consulta(consulta)
+        self.cache = cache if cache is not None else criar_cache()
         self.ttl = int(os.getenv("STATS_CACHE_TTL", "300"))
-        self._cache_value: dict | None = None
-        self._cache_ts: float = 0.0
+        self.stale = int(os.getenv("STATS_CACHE_STALE", "300"))
+        # tempo máximo de um recálculo: trava vence e quem espera desiste
+        self.trava_ttl = int(os.getenv("STATS_CACHE_LOCK_TTL", "30"))
+        self.espera_intervalo = 0.05
 
-    def _cache_get(self) -> dict | None:
-        if self._cache_value is None:
-            return None
-        if (time.monotonic() - self._cache_ts) > self.ttl:
+    def invalidar(self) -> None:
+        self.cache.delete(CHAVE_ESTATISTICAS)
+
+    def _idade(self, entrada: EntradaCache) -> float:
+        return time.time() - entrada.gravado_em
+
+    def _fresca(self, entrada: EntradaCache | None) -> TypeGuard[EntradaCache]:
+        return entrada is not None and self._idade(entrada) <= self.ttl
+
+    def _servivel(self, entrada: EntradaCache | None) -> TypeGuard[EntradaCache]:
+        # vencida, mas ainda dentro do stale enquanto outro recalcula
+        return entrada is not None and self._idade(entrada) <= self.ttl + self.stale
+
+    def _recalculada(
+        self, entrada: EntradaCache | None, anterior: EntradaCache | None
+    ) -> TypeGuard[EntradaCache]:
+        return entrada is not None and (
+            anterior is None or entrada.gravado_em > anterior.gravado_em
+        )
+
+    # operações de cache que não levantam erro do backend
+
+    def _ler(self) -> tuple[EntradaCache | None, bool]:
+        """(entrada, backend respondeu)."""
+        try:
+            return self.cache.get(CHAVE_ESTATISTICAS), True
+        except ERROS_CACHE as e:
+            logger.warning("Cache de estatísticas indisponível: %s", e)
+            return None, False
+
+    def _travar(self) -> str | None:
+        try:
+            return self.cache.acquire(CHAVE_ESTATISTICAS, self.trava_ttl)
+        except ERROS_CACHE as e:
+            logger.warning("Trava do cache de estatísticas indisponível: %s", e)
             return None
-        return self._cache_value
 
-    def _cache_set(self, value: dict) -> None:
-        self._cache_value = value
-        self._cache_ts = time.monotonic()
+    def _gravar(self, payload: dict) -> None:
+        try:
+            self.cache.set(CHAVE_ESTATISTICAS, payload)
+        except ERROS_CACHE as e:
+            logger.warning("Cache de estatísticas não gravado: %s", e)
 
-    def get(self, db: Session) -> dict:
-        cached = self._cache_get()
-        if cached is not None:
-            return cached
+    def _soltar(self, token: str) -> None:
+        # se falhar, a trava vence sozinha em trava_ttl
+        try:
+            self.cache.release(CHAVE_ESTATISTICAS, token)
+        except ERROS_CACHE as e:
+            logger.warning("Trava do cache de estatísticas não liberada: %s", e)
 
-        total = self.repo.total_despesas(db)
-        media = self.repo.media_despesas(db)
-        top_rows = self.repo.top5_operadoras(db)
-        uf_rows = self.repo.despesas_por_uf(db)
+    def _payload_resumo(self, resumo) -> dict:
+        # JSONB já vem no formato da resposta (mesmas chaves)
+        return {
+            "total_despesas": float(resumo["total_despesas"] or 0),
+            "media_despesas": float(resumo["media_despesas"] or 0),
+            "top5_operadoras": [
+                {
+                    "cnpj": r.get("cnpj"),
+                    "razao_social": r.get("razao_social"),
+                    "total_despesas": float(r.get("total_despesas") or 0),
+                }
+                for r in resumo["top5_operadoras"]
+            ],
+            "despesas_por_uf": {
+                str(uf): float(v) for uf, v in sorted(resumo["despesas_por_uf"].items())
+            },
+        }
 
-        payload = {
+    def _montar_payload(self, total, media, top_rows, uf_rows) -> dict:
+        return {
             "total_despesas": float(total or 0),
             "media_despesas": float(media or 0),
             "top5_operadoras": [
@@ -51,5 +142,134 @@ class EstatisticasService:
             },
         }
 
-        self._cache_set(payload)
-        return payload
+
+class EstatisticasService(PoliticaCacheEstatisticas):
+    def __init__(
+        self,
+        repo: EstatisticasRepository,
+        consulta: str | None = None,
+        cache=None,
+    ):
+        super().__init__(consulta, cache)
+        self.repo = repo
+
+    def get(self, db: Session) -> dict:
+        entrada, _ = self._ler()
+        if self._fresca(entrada):
+            return entrada.valor
+
+        token = self._travar()
+        if token is not None:
+            try:
+                # outro worker pode ter gravado entre a leitura e a trava
+                atual, _ = self._ler()
+                if self._fresca(atual):
+                    return atual.valor
+                payload = self._calcular(db)
+                self._gravar(payload)
+                return payload
+            finally:
+                self._soltar(token)
+
+        # outro request/worker está recalculando (ou o backend falhou)
+        if self._servivel(entrada):
+            return entrada.valor
+        return self._esperar_recalculo(db, entrada)
+
+    def _esperar_recalculo(self, db: Session, anterior: EntradaCache | None) -> dict:
+        limite = time.monotonic() + self.trava_ttl
+        while time.monotonic() < limite:
+            time.sleep(self.espera_intervalo)
+            entrada, ok = self._ler()
+            if not ok:
+                break  # backend fora do ar: ninguém vai gravar
+            if self._recalculada(entrada, anterior):
+                return entrada.valor
+        # quem recalculava não terminou no prazo: calcula sem cache
+        return self._calcular(db)
+
+    def _calcular(self, db: Session) -> dict:
+        resumo = self.repo.resumo(db)
+        if resumo is not None:
+            return self._payload_resumo(resumo)
+        if self.consulta == CONSULTA_UNICA:
+            # mesmo formato de linha do resumo
+            return self._payload_resumo(self.repo.estatisticas_consulta_unica(db))
+        return self._montar_payload(
+            self.repo.total_despesas(db),
+            self.repo.media_despesas(db),
+            self.repo.top5_operadoras(db),
+            self.repo.despesas_por_uf(db),
+        )
+
+
+class AsyncEstatisticasService(PoliticaCacheEstatisticas):
+    """
+    Mesma política sobre o AsyncEstatisticasRepository (API_DB_MODO=async).
+    sqlite e redis fazem I/O bloqueante (o `BEGIN IMMEDIATE` do sqlite
+    espera até 5 s): essas operações vão para uma thread com
+    `asyncio.to_thread`; o cache em memória é chamado direto.
+    """
+
+    def __init__(
+        self,
+        repo: AsyncEstatisticasRepository,
+        consulta: str | None = None,
+        cache=None,
+    ):
+        super().__init__(consulta, cache)
+        self.repo = repo
+
+    async def _em_thread(self, fn: Callable[..., T], *args) -> T:
+        if not getattr(self.cache, "bloqueante", True):
+            return fn(*args)
+        return await asyncio.to_thread(fn, *args)
+
+    async def get(self, db: AsyncSession) -> dict:
+        entrada, _ = await self._em_thread(self._ler)
+        if self._fresca(entrada):
+            return entrada.valor
+
+        token = await self._em_thread(self._travar)
+        if token is not None:
+            try:
+                atual, _ = await self._em_thread(self._ler)
+                if self._fresca(atual):
+                    return atual.valor
+                payload = await self._calcular(db)
+                await self._em_thread(self._gravar, payload)
+                return payload
+            finally:
+                await self._em_thread(self._soltar, token)
+
+        if self._servivel(entrada):
+            return entrada.valor
+        return await self._esperar_recalculo(db, entrada)
+
+    async def _esperar_recalculo(
+        self, db: AsyncSession, anterior: EntradaCache | None
+    ) -> dict:
+        limite = time.monotonic() + self.trava_ttl
+        while time.monotonic() < limite:
+            # espera sem prender o event loop
+            await asyncio.sleep(self.espera_intervalo)
+            entrada, ok = await self._em_thread(self._ler)
+            if not ok:
+                break
+            if self._recalculada(entrada, anterior):
+                return entrada.valor
+        return await self._calcular(db)
+
+    async def _calcular(self, db: AsyncSession) -> dict:
+        resumo = await self.repo.resumo(db)
+        if resumo is not None:
+            return self._payload_resumo(resumo)
+        if self.consulta == CONSULTA_UNICA:
+            return self._payload_resumo(await self.repo.estatisticas_consulta_unica(db))
+        # mesma sessão: as consultas vão em sequência na conexão
+        return self._montar_payload(
+            await self.repo.total_despesas(db),
+            await self.repo.media_despesas(db),
+            await self.repo.top5_operadoras(db),
+            await self.repo.despesas_por_uf(db),
+        )
@@ -0,0 +1,144 @@
+"""
+Índice em memória da dimensão operadora (poucos milhares de linhas).
+
+Responde o filtro `q` do modo ILIKE (padrão) com o mesmo resultado do SQL:
+- `razao_social ILIKE '%q%'` (com `%`/`_` do próprio q como curingas);
+- `q_digits <> '' AND cnpj LIKE '%dígitos%'`.
+
+A ordem das linhas vem do próprio banco (`ORDER BY razao_social NULLS
+LAST, registro_ans` na carga): a posição no array é a chave de ordenação,
+sem depender de reproduzir a collation do PostgreSQL em Python.
+
+Estruturas:
+- trigramas sem acento/caixa -> posições (candidatos; o ILIKE confirma);
+- sufixos dos CNPJs ordenados (trie de dígitos compacta): `LIKE '%123%'`
+  vira busca binária pelo prefixo "123" entre os sufixos.
+"""
+
+from __future__ import annotations
+
+import re
+import unicodedata
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Mapping, Sequence
+
+
+def dobrar(valor: str) -> str:
+    # minúsculas sem acento; preserva "a está contido em b"
+    decomposto = unicodedata.normalize("NFKD", valor.lower())
+    return "".join(c for c in decomposto if not unicodedata.combining(c))
+
+
+def trigramas(valor: str) -> set[str]:
+    return {valor[i : i + 3] for i in range(len(valor) - 2)}
+
+
+def regex_like(padrao: str) -> re.Pattern | None:
+    """
+    `ILIKE '%padrao%'` como regex (sobre texto já em minúsculas): `%` e `_`
+    são curingas e `\\` escapa, como no PostgreSQL. None se o padrão termina
+    em escape (o banco rejeita; quem chama volta ao SQL).
+    """
+    partes = []
+    i = 0
+    while i < len(padrao):
+        c = padrao[i]
+        if c == "\\":
+            if i + 1 == len(padrao):
+                return None
+            partes.append(re.escape(padrao[i + 1]))
+            i += 2
+            continue
+        if c == "%":
+            partes.append(".*")
+        elif c == "_":
+            partes.append(".")
+        else:
+            partes.append(re.escape(c))
+        i += 1
+    return re.compile("".join(partes), re.DOTALL)
+
+
+class IndiceOperadoras:
+    def __init__(self, linhas: Sequence[Mapping]):
+        # linhas já na ordem da listagem SQL
+        self.linhas = [dict(r) for r in linhas]
+        self.posicao = {r["registro_ans"]: i for i, r in enumerate(self.linhas)}
+
+        # razão NULL não casa com ILIKE (só com o CNPJ): fica de fora
+        self._razoes: dict[int, str] = {
+            i: r["razao_social"].lower()
+            for i, r in enumerate(self.linhas)
+            if r["razao_social"] is not None
+        }
+
+        self._trigramas: dict[str, list[int]] = {}
+        for i, razao in self._razoes.items():
+            for t in trigramas(dobrar(razao)):
+                self._trigramas.setdefault(t, []).append(i)
+
+        sufixos = sorted(
+            (r["cnpj"][k:], i)
+            for i, r in enumerate(self.linhas)
+            if r["cnpj"]
+            for k in range(len(r["cnpj"]))
+        )
+        self._sufixos = [s for s, _ in sufixos]
+        self._sufixo_pos = [i for _, i in sufixos]
+
+        # a paginação repete o mesmo q a cada página
+        self.buscar = lru_cache(maxsize=256)(self._buscar)
+
+    def __len__(self) -> int:
+        return len(self.linhas)
+
+    def _por_razao(self, q_text: str) -> set[int] | None:
+        ql = q_text.lower()
+        if any(c in ql for c in "%_\\"):
+            regex = regex_like(ql)
+            if regex is None:
+                return None
+            return {i for i, razao in self._razoes.items() if regex.search(razao)}
+
+        grams = trigramas(dobrar(ql))
+        if grams:
+            listas = sorted((self._trigramas.get(t, []) for t in grams), key=len)
+            candidatos = set(listas[0])
+            for lista in listas[1:]:
+                if not candidatos:
+                    break
+                candidatos.intersection_update(lista)
+        else:
+            candidatos = self._razoes
+        return {i for i in candidatos if ql in self._razoes[i]}
+
+    def _por_cnpj(self, q_digits: str) -> set[int]:
+        inicio = bisect_left(self._sufixos, q_digits)
+        # ":" vem logo depois de "9": fecha o intervalo dos sufixos com o prefixo
+        fim = bisect_left(self._sufixos, q_digits + ":", lo=inicio)
+        return set(self._sufixo_pos[inicio:fim])
+
+    def _buscar(self, q_text: str, q_digits: str) -> tuple[int, ...] | None:
+        """Posições que casam com o filtro, na ordem SQL; None = use o SQL."""
+        if q_text == "":
+            return tuple(range(len(self.linhas)))
+        achados = self._por_razao(q_text)
+        if achados is None:
+            return None
+        if q_digits:
+            achados |= self._por_cnpj(q_digits)
+        return tuple(sorted(achados))
+
+    def pagina(self, posicoes: tuple[int, ...], offset: int, limit: int) -> list[dict]:
+        return [self.linhas[i] for i in posicoes[offset : offset + limit]]
+
+    def pagina_apos(
+        self, posicoes: tuple[int, ...], apos: tuple[str | None, int], limit: int
+    ) -> list[dict] | None:
+        """Keyset: linhas depois da chave do cursor; None se a linha sumiu."""
+        i = self.posicao.get(apos[1])
+        if i is None or self.linhas[i]["razao_social"] != apos[0]:
+            return None
+        inicio = bisect_right(posicoes, i)
+        return [self.linhas[j] for j in posicoes[inicio : inicio + limit]]
@@ -1,14 +1,93 @@
 from __future__ import annotations
 
+import asyncio
+import base64
+import binascii
+import json
+import os
+import threading
+import time
+from typing import Mapping, Sequence
+
 from app.api.utils import only_digits
-from app.repositories.operadora_repo import OperadoraRepository
+from app.repositories.operadora_repo import (
+    BUSCA_ILIKE,
+    AsyncOperadoraRepository,
+    OperadoraRepository,
+)
+from app.services.operadora_indice import IndiceOperadoras
 from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+CONTAGEM_EXATA = "exata"
+CONTAGEM_ESTIMADA = "estimada"
+CONTAGEM_NENHUMA = "nenhuma"
 
-class OperadoraService:
-    def __init__(self, repo: OperadoraRepository):
-        self.repo = repo
+
+def encode_cursor(razao_social: str | None, registro_ans: int) -> str:
+    # opaco para o cliente: chave da última linha em base64url
+    bruto = json.dumps([razao_social, registro_ans], separators=(",", ":"))
+    return base64.urlsafe_b64encode(bruto.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[str | None, int]:
+    try:
+        bruto = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        razao_social, registro_ans = json.loads(bruto)
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+        raise HTTPException(status_code=422, detail="Cursor inválido")
+    if not (razao_social is None or isinstance(razao_social, str)) or not (
+        isinstance(registro_ans, int) and not isinstance(registro_ans, bool)
+    ):
+        raise HTTPException(status_code=422, detail="Cursor inválido")
+    return razao_social, registro_ans
+
+
+def get_indice_ativo(ativo: bool | None = None) -> bool:
+    if ativo is not None:
+        return ativo
+    return os.getenv("OPERADORAS_INDICE", "0") == "1"
+
+
+class PaginacaoOperadoras:
+    """
+    Com OPERADORAS_INDICE=1 (e busca ILIKE), a listagem sai de um índice
+    em memória (services/operadora_indice.py), carregado no startup e
+    recarregado quando a versão dos dados muda; conferida no máximo a cada
+    OPERADORAS_INDICE_INTERVALO segundos. Filtro que o índice não cobre,
+    ou cursor de linha que sumiu, vai ao SQL.
+
+    Regras comuns ao OperadoraService e ao AsyncOperadoraService (índice,
+    cursor, total, validação); cada um consulta o seu repositório.
+    """
+
+    def __init__(self, busca: str, indice: bool | None = None):
+        # a busca por trigramas ordena por relevância no banco: fica no SQL
+        self.usar_indice = get_indice_ativo(indice) and busca == BUSCA_ILIKE
+        self.intervalo_versao = float(os.getenv("OPERADORAS_INDICE_INTERVALO", "10"))
+        self.indice: IndiceOperadoras | None = None
+        self._versao: tuple | None = None
+        self._verificado_em: float | None = None
+
+    def _precisa_recarregar(self, versao: tuple | None) -> bool:
+        return self.indice is None or versao != self._versao
+
+    def _desligar_indice(self) -> None:
+        # sem versão (banco sem import_controle) não há como ver a tabela mudar:
+        # nada de índice velho, a listagem vai ao SQL até a versão aparecer
+        self.indice = None
+        self._versao = None
+
+    def _trocar_indice(self, versao: tuple | None, linhas: Sequence[Mapping]) -> None:
+        self.indice = IndiceOperadoras(linhas)
+        self._versao = versao
+
+    def _indice_em_dia(self) -> bool:
+        return (
+            self._verificado_em is not None
+            and time.monotonic() - self._verificado_em < self.intervalo_versao
+        )
 
     def _normalize_q(self, q: str | None) -> tuple[str, str]:
         if not q:
@@ -25,11 +104,127 @@ class OperadoraService:
             raise HTTPException(status_code=422, detail="CNPJ deve conter 14 dígitos")
         return cnpj
 
-    def listar(self, db: Session, page: int, limit: int, q: str | None):
+    def _total_indice(
+        self, posicoes: tuple[int, ...], contagem: str
+    ) -> tuple[int | None, bool]:
+        # com o índice a contagem exata sai de graça, inclusive no lugar da estimada
+        if contagem == CONTAGEM_NENHUMA:
+            return None, False
+        return len(posicoes), False
+
+    def _cursor_indice(
+        self,
+        indice: IndiceOperadoras,
+        posicoes: tuple[int, ...],
+        limit: int,
+        apos: tuple[str | None, int] | None,
+    ) -> list[dict] | None:
+        if apos is None:
+            return indice.pagina(posicoes, 0, limit + 1)
+        return indice.pagina_apos(posicoes, apos, limit + 1)
+
+    def _fechar_pagina_cursor(self, rows, limit: int):
+        # a linha a mais só diz se existe próxima página
+        proximo = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            ultima = rows[-1]
+            proximo = encode_cursor(ultima["razao_social"], ultima["registro_ans"])
+        return rows, proximo
+
+
+class OperadoraService(PaginacaoOperadoras):
+    def __init__(self, repo: OperadoraRepository, indice: bool | None = None):
+        super().__init__(repo.busca, indice)
+        self.repo = repo
+        self._lock = threading.Lock()
+
+    def carregar_indice(self, db: Session) -> bool:
+        """Lê a versão e recarrega se mudou. True se o índice foi (re)montado."""
+        # versão antes das linhas: mudança no meio faz a próxima conferência recarregar
+        versao = self.repo.versao_operadoras(db)
+        if versao is None:
+            self._desligar_indice()
+            recarregou = False
+        else:
+            recarregou = self._precisa_recarregar(versao)
+        if recarregou:
+            self._trocar_indice(versao, self.repo.list_todas_operadoras(db))
+        self._verificado_em = time.monotonic()
+        return recarregou
+
+    def _indice(self, db: Session) -> IndiceOperadoras | None:
+        if not self.usar_indice:
+            return None
+        if self._indice_em_dia():
+            return self.indice
+        # um request confere a versão; os outros seguem com o índice atual
+        if not self._lock.acquire(blocking=self.indice is None):
+            return self.indice
+        try:
+            if not self._indice_em_dia():
+                self.carregar_indice(db)
+        finally:
+            self._lock.release()
+        return self.indice
+
+    def _total(
+        self, db: Session, q_text: str, q_digits: str, contagem: str
+    ) -> tuple[int | None, bool]:
+        """(total ou None, se o total é estimado)."""
+        if contagem == CONTAGEM_EXATA:
+            return self.repo.count_operadoras(db, q_text, q_digits), False
+        if contagem == CONTAGEM_ESTIMADA:
+            return self.repo.estimate_operadoras(db, q_text, q_digits), True
+        return None, False
+
+    def listar(
+        self,
+        db: Session,
+        page: int,
+        limit: int,
+        q: str | None,
+        contagem: str = CONTAGEM_EXATA,
+    ):
+        """(total ou None, se o total é estimado, linhas)."""
         q_text, q_digits = self._normalize_q(q)
-        total = self.repo.count_operadoras(db, q_text, q_digits)
+        indice = self._indice(db)
+        posicoes = indice.buscar(q_text, q_digits) if indice is not None else None
+        if indice is not None and posicoes is not None:
+            total, estimado = self._total_indice(posicoes, contagem)
+            return total, estimado, indice.pagina(posicoes, (page - 1) * limit, limit)
+
+        total, estimado = self._total(db, q_text, q_digits, contagem)
         rows = self.repo.list_operadoras(db, page, limit, q_text, q_digits)
-        return total, rows
+        return total, estimado, rows
+
+    def listar_cursor(
+        self,
+        db: Session,
+        limit: int,
+        q: str | None,
+        cursor: str | None,
+        contagem: str = CONTAGEM_NENHUMA,
+    ):
+        """(total ou None, se é estimado, linhas, próximo cursor ou None no fim)."""
+        q_text, q_digits = self._normalize_q(q)
+        apos = decode_cursor(cursor) if cursor else None
+        indice = self._indice(db)
+        posicoes = indice.buscar(q_text, q_digits) if indice is not None else None
+        rows = None
+        if indice is not None and posicoes is not None:
+            rows = self._cursor_indice(indice, posicoes, limit, apos)
+        if rows is None:
+            # uma linha a mais diz se existe próxima página, sem COUNT
+            rows = self.repo.list_operadoras_keyset(
+                db, limit + 1, q_text, q_digits, apos
+            )
+        rows, proximo = self._fechar_pagina_cursor(rows, limit)
+        if posicoes is not None:
+            total, estimado = self._total_indice(posicoes, contagem)
+        else:
+            total, estimado = self._total(db, q_text, q_digits, contagem)
+        return total, estimado, rows, proximo
 
     def detalhe(self, db: Session, cnpj: str):
         cnpj_norm = self._normalize_cnpj(cnpj)
@@ -45,3 +240,106 @@ class OperadoraService:
             raise HTTPException(status_code=404, detail="Operadora não encontrada")
         rows = self.repo.list_despesas_by_registro(db, reg)
         return cnpj_norm, rows
+
+
+class AsyncOperadoraService(PaginacaoOperadoras):
+    """Mesmas regras sobre o AsyncOperadoraRepository (API_DB_MODO=async)."""
+
+    def __init__(self, repo: AsyncOperadoraRepository, indice: bool | None = None):
+        super().__init__(repo.busca, indice)
+        self.repo = repo
+        self._recarga = asyncio.Lock()
+
+    async def carregar_indice(self, db: AsyncSession) -> bool:
+        versao = await self.repo.versao_operadoras(db)
+        if versao is None:
+            self._desligar_indice()
+            recarregou = False
+        else:
+            recarregou = self._precisa_recarregar(versao)
+        if recarregou:
+            self._trocar_indice(versao, await self.repo.list_todas_operadoras(db))
+        self._verificado_em = time.monotonic()
+        return recarregou
+
+    async def _indice(self, db: AsyncSession) -> IndiceOperadoras | None:
+        if not self.usar_indice:
+            return None
+        if self._indice_em_dia():
+            return self.indice
+        # um request confere a versão; os outros seguem (sem índice ainda: SQL)
+        if self._recarga.locked():
+            return self.indice
+        async with self._recarga:
+            if not self._indice_em_dia():
+                await self.carregar_indice(db)
+        return self.indice
+
+    async def _total(
+        self, db: AsyncSession, q_text: str, q_digits: str, contagem: str
+    ) -> tuple[int | None, bool]:
+        if contagem == CONTAGEM_EXATA:
+            return await self.repo.count_operadoras(db, q_text, q_digits), False
+        if contagem == CONTAGEM_ESTIMADA:
+            return await self.repo.estimate_operadoras(db, q_text, q_digits), True
+        return None, False
+
+    async def listar(
+        self,
+        db: AsyncSession,
+        page: int,
+        limit: int,
+        q: str | None,
+        contagem: str = CONTAGEM_EXATA,
+    ):
+        q_text, q_digits = self._normalize_q(q)
+        indice = await self._indice(db)
+        posicoes = indice.buscar(q_text, q_digits) if indice is not None else None
+        if indice is not None and posicoes is not None:
+            total, estimado = self._total_indice(posicoes, contagem)
+            return total, estimado, indice.pagina(posicoes, (page - 1) * limit, limit)
+
+        total, estimado = await self._total(db, q_text, q_digits, contagem)
+        rows = await self.repo.list_operadoras(db, page, limit, q_text, q_digits)
+        return total, estimado, rows
+
+    async def listar_cursor(
+        self,
+        db: AsyncSession,
+        limit: int,
+        q: str | None,
+        cursor: str | None,
+        contagem: str = CONTAGEM_NENHUMA,
+    ):
+        q_text, q_digits = self._normalize_q(q)
+        apos = decode_cursor(cursor) if cursor else None
+        indice = await self._indice(db)
+        posicoes = indice.buscar(q_text, q_digits) if indice is not None else None
+        rows = None
+        if indice is not None and posicoes is not None:
+            rows = self._cursor_indice(indice, posicoes, limit, apos)
+        if rows is None:
+            rows = await self.repo.list_operadoras_keyset(
+                db, limit + 1, q_text, q_digits, apos
+            )
+        rows, proximo = self._fechar_pagina_cursor(rows, limit)
+        if posicoes is not None:
+            total, estimado = self._total_indice(posicoes, contagem)
+        else:
+            total, estimado = await self._total(db, q_text, q_digits, contagem)
+        return total, estimado, rows, proximo
+
+    async def detalhe(self, db: AsyncSession, cnpj: str):
+        cnpj_norm = self._normalize_cnpj(cnpj)
+        row = await self.repo.get_operadora_by_cnpj(db, cnpj_norm)
+        if not row:
+            raise HTTPException(status_code=404, detail="Operadora não encontrada")
+        return row
+
+    async def despesas(self, db: AsyncSession, cnpj: str):
+        cnpj_norm = self._normalize_cnpj(cnpj)
+        reg = await self.repo.get_registro_ans_by_cnpj(db, cnpj_norm)
+        if reg is None:
+            raise HTTPException(status_code=404, detail="Operadora não encontrada")
+        rows = await self.repo.list_despesas_by_registro(db, reg)
+        return cnpj_norm, rows
@@ -5,24 +5,37 @@ import zipfile
 from dataclasses import dataclass
 from decimal import Decimal
 from pathlib import Path
-from typing import Dict, Optional, Tuple
+from typing import Dict, Iterable, Iterator, Optional, Tuple
 
+from app.core import columnar, manifest
+from app.core.deteccao import detectarDelimiter, detectarEncoding
 from app.core.paths import OUTPUT_TESTE2_DIR
 from app.domain.validators import parse_decimal
 
 DEFAULT_ZIP_NOME = "Agregacao_Gabriel_Martins"
 INPUT_FILENAME = "consolidado_despesas_final.csv"
+INPUT_COLUNAR_FILENAME = "consolidado_despesas_final.parquet"
 OUTPUT_FILENAME = "despesas_agregadas.csv"
 
+CENTAVO = Decimal("0.01")
+
 
 def getArquivoInput() -> Path:
     return OUTPUT_TESTE2_DIR / INPUT_FILENAME
 
 
+def getArquivoInputColunar() -> Path:
+    return OUTPUT_TESTE2_DIR / INPUT_COLUNAR_FILENAME
+
+
 def getArquivoCsvAgregado() -> Path:
     return OUTPUT_TESTE2_DIR / OUTPUT_FILENAME
 
 
+def getArquivoManifest() -> Path:
+    return OUTPUT_TESTE2_DIR / manifest.ARQUIVO_MANIFESTO
+
+
 def getArquivoZipFinal(nome: Optional[str] = None) -> Path:
     # ZIP do usecase fica no output do teste2 (runner copia pra delivery)
     nome = (nome or os.getenv("TESTE_ZIP_NOME") or DEFAULT_ZIP_NOME).strip()
@@ -30,22 +43,6 @@ def getArquivoZipFinal(nome: Optional[str] = None) -> Path:
     return OUTPUT_TESTE2_DIR / f"Teste_{nome}.zip"
 
 
-def detectarEncoding(caminho: Path) -> str:
-    amostra = caminho.read_bytes()[:200_000]
-    for enc in ("utf-8-sig", "utf-8", "latin-1"):
-        try:
-            amostra.decode(enc)
-            return enc
-        except UnicodeDecodeError:
-            continue
-    return "latin-1"
-
-
-def detectarDelimiter(caminho: Path, encoding: str) -> str:
-    amostra = caminho.read_text(encoding=encoding, errors="ignore")[:50_000]
-    return ";" if amostra.count(";") >= amostra.count(",") else ","
-
-
 @dataclass
 class WelfordAgg:
     """
@@ -59,12 +56,15 @@ class WelfordAgg:
     total: Decimal = Decimal("0")
 
     def add(self, x: Decimal) -> None:
+        # mesmas operações Decimal de sempre, só em locais: roda por linha
+        n = self.n + 1
+        self.n = n
         self.total += x
-        self.n += 1
-        delta = x - self.mean
-        self.mean += delta / Decimal(self.n)
-        delta2 = x - self.mean
-        self.m2 += delta * delta2
+        media = self.mean
+        delta = x - media
+        media += delta / n
+        self.mean = media
+        self.m2 += delta * (x - media)
 
     def variance_pop(self) -> Decimal:
         if self.n == 0:
@@ -75,6 +75,13 @@ class WelfordAgg:
         v = self.variance_pop()
         return v.sqrt() if v > 0 else Decimal("0")
 
+    def resultado(self) -> Tuple[Decimal, Decimal, Decimal]:
+        return (
+            self.total.quantize(CENTAVO),
+            self.mean.quantize(CENTAVO),
+            self.std_pop().quantize(CENTAVO),
+        )
+
 
 def _linha_valida(row: dict) -> bool:
     if (row.get("valor_positivo") or "") != "1":
@@ -86,57 +93,97 @@ def _linha_valida(row: dict) -> bool:
     return True
 
 
-def executarAgregacaoAns(nome_zip: Optional[str] = None) -> Tuple[Path, Path]:
-    inp = getArquivoInput()
-    if not inp.exists():
-        raise RuntimeError(
-            f"Arquivo de entrada não encontrado: {inp}. Rode o Teste 2.2/2.1 antes."
-        )
+def extrairValido(row: dict) -> Optional[Tuple[str, str, Decimal]]:
+    # (razão, UF, valor) de uma linha do consolidado final, ou None se não entra na agregação
+    if not _linha_valida(row):
+        return None
 
-    OUTPUT_TESTE2_DIR.mkdir(parents=True, exist_ok=True)
+    valor = parse_decimal(row.get("ValorDespesas") or "")
+    if valor is None:
+        return None
 
-    out_csv = getArquivoCsvAgregado()
-    out_zip = getArquivoZipFinal(nome_zip)
+    return (row.get("RazaoSocial") or "").strip(), (row.get("UF") or "").strip(), valor
 
-    enc = detectarEncoding(inp)
-    delim = detectarDelimiter(inp, enc)
 
-    grupos: Dict[tuple[str, str], WelfordAgg] = {}
+def lerValidosCsv(inp: Path) -> Iterator[Tuple[str, str, Decimal]]:
+    enc = detectarEncoding(inp)
+    delim = detectarDelimiter(inp)
 
     with open(inp, newline="", encoding=enc) as f:
         reader = csv.DictReader(f, delimiter=delim)
         for row in reader:
-            if not _linha_valida(row):
+            valido = extrairValido(row)
+            if valido is not None:
+                yield valido
+
+
+def lerValidosColunar(inp: Path) -> Iterator[Tuple[str, str, Decimal]]:
+    colunas = [
+        "RazaoSocial",
+        "UF",
+        "ValorDespesas",
+        "ValorDespesas" + columnar.SUFIXO_EXPOENTE,
+        "valor_positivo",
+        "razao_social_nao_vazia",
+    ]
+    for batch in columnar.lerLotesArrow(inp, colunas):
+        for razao, uf, inteiro, expoente, positivo, razaoOk in zip(
+            *(batch.column(c).to_pylist() for c in colunas)
+        ):
+            if not positivo or not razaoOk:
                 continue
 
-            razao = (row.get("RazaoSocial") or "").strip()
-            uf = (row.get("UF") or "").strip()
-
-            valor = parse_decimal(row.get("ValorDespesas") or "")
-            if valor is None:
+            uf = str(uf or "").strip()
+            if not uf or inteiro is None or expoente is None:
                 continue
 
-            key = (razao, uf)
-            agg = grupos.get(key)
-            if agg is None:
-                agg = WelfordAgg()
-                grupos[key] = agg
-            agg.add(valor)
+            yield str(razao or "").strip(), uf, Decimal(inteiro).scaleb(expoente)
+
+
+def lerValidos(inp: Path, colunar: bool) -> Iterator[Tuple[str, str, Decimal]]:
+    if colunar:
+        return lerValidosColunar(inp)
+    return lerValidosCsv(inp)
 
-    registros = []
-    for (razao, uf), agg in grupos.items():
-        registros.append(
-            {
-                "RazaoSocial": razao,
-                "UF": uf,
-                "total_despesas": str(agg.total.quantize(Decimal("0.01"))),
-                "media_trimestral": str(agg.mean.quantize(Decimal("0.01"))),
-                "desvio_padrao": str(agg.std_pop().quantize(Decimal("0.01"))),
-                "qtd_registros": str(agg.n),
-            }
-        )
 
-    registros.sort(key=lambda r: Decimal(r["total_despesas"]), reverse=True)
+def agruparLinhas(
+    linhas: Iterable[Tuple[str, str, Decimal]],
+) -> Dict[tuple[str, str], WelfordAgg]:
+    grupos: Dict[tuple[str, str], WelfordAgg] = {}
+    for razao, uf, valor in linhas:
+        key = (razao, uf)
+        agg = grupos.get(key)
+        if agg is None:
+            agg = WelfordAgg()
+            grupos[key] = agg
+        agg.add(valor)
+    return grupos
+
+
+def escreverAgregado(
+    grupos: Dict[tuple[str, str], WelfordAgg],
+    out_csv: Path,
+    out_zip: Path,
+) -> int:
+    resultados = []
+    for (razao, uf), agg in grupos.items():
+        total, media, desvio = agg.resultado()
+        resultados.append((total, razao, uf, media, desvio, agg.n))
+
+    # ordena pelo Decimal já calculado (sem re-parse da string)
+    resultados.sort(key=lambda r: r[0], reverse=True)
+
+    registros = [
+        {
+            "RazaoSocial": razao,
+            "UF": uf,
+            "total_despesas": str(total),
+            "media_trimestral": str(media),
+            "desvio_padrao": str(desvio),
+            "qtd_registros": str(n),
+        }
+        for total, razao, uf, media, desvio, n in resultados
+    ]
 
     with open(out_csv, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(
@@ -157,6 +204,48 @@ def executarAgregacaoAns(nome_zip: Optional[str] = None) -> Tuple[Path, Path]:
     with zipfile.ZipFile(out_zip, "w", compression=zipfile.ZIP_DEFLATED) as z:
         z.write(out_csv, arcname=out_csv.name)
 
+    return len(registros)
+
+
+def executarAgregacaoAns(
+    nome_zip: Optional[str] = None,
+    formato: Optional[str] = None,
+    incremental: Optional[bool] = None,
+) -> Tuple[Path, Path]:
+    formato = columnar.getFormatoIntermediario(formato)
+    colunar = formato == columnar.FORMATO_PARQUET
+    if incremental is None:
+        incremental = manifest.isModoIncremental()
+    inp = getArquivoInputColunar() if colunar else getArquivoInput()
+    if not inp.exists():
+        raise RuntimeError(
+            f"Arquivo de entrada não encontrado: {inp}. Rode o Teste 2.2/2.1 antes."
+        )
+
+    OUTPUT_TESTE2_DIR.mkdir(parents=True, exist_ok=True)
+
+    out_csv = getArquivoCsvAgregado()
+    out_zip = getArquivoZipFinal(nome_zip)
+
+    if incremental:
+        # estatísticas dependem de todos os trimestres: refaz tudo ou nada
+        registro = manifest.Manifest.carregar(getArquivoManifest())
+        registro.validarParametros({"formato": formato})
+        origens = {"consolidado_final": manifest.hashArquivo(inp)}
+        if (
+            registro.isDerivadoAtualizado(out_csv.name, out_csv, origens)
+            and out_zip.exists()
+        ):
+            print(f"{out_csv.name} | inalterado (manifesto)")
+            return out_csv, out_zip
+
+    grupos = agruparLinhas(lerValidos(inp, colunar))
+    total = escreverAgregado(grupos, out_csv, out_zip)
+
+    if incremental:
+        registro.registrarDerivado(out_csv.name, out_csv, origens, linhas=total)
+        registro.salvar()
+
     return out_csv, out_zip
 
 
@@ -1,13 +1,29 @@
 import csv
+import os
 import zipfile
-from collections import defaultdict
-from decimal import Decimal, InvalidOperation
-from typing import Dict, Tuple
+from collections import Counter, defaultdict
+from decimal import Decimal, localcontext
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
 
+from app.core import columnar, manifest
 from app.core.paths import OUTPUT_TESTE1_DIR, STAGING_DIR
+from app.domain import decimais
 
+MOTOR_DECIMAL = "decimal"
+MOTOR_VETORIZADO = "vetorizado"
 
-def getArquivoStaging():
+# Parquet: vazio e inválido já viraram nulo na escrita do staging
+MOTIVO_NULO = "nulo"
+
+# valor recusado entra como 0 (regra original): a chave aparece na primeira
+# ocorrência mesmo sem nenhum valor válido
+ZERO = Decimal(0)
+
+
+def getArquivoStaging(formato: str = columnar.FORMATO_CSV):
+    if formato == columnar.FORMATO_PARQUET:
+        return STAGING_DIR / "eventos_sinistros_staging.parquet"
     return STAGING_DIR / "eventos_sinistros_staging.csv"
 
 
@@ -19,46 +35,361 @@ def getArquivoZipFinal():
     return OUTPUT_TESTE1_DIR / "consolidado_despesas.zip"
 
 
-def parseDecimal(valor: str) -> Decimal:
-    v = (valor or "").strip()
-    if not v:
-        return Decimal(0)
-    try:
-        return Decimal(v)
-    except (InvalidOperation, ValueError):
-        return Decimal(0)
+def getArquivoColunarFinal():
+    return OUTPUT_TESTE1_DIR / "consolidado_despesas.parquet"
 
 
-def consolidarDespesas():
-    stagingPath = getArquivoStaging()
-    if not stagingPath.exists():
-        raise RuntimeError("Staging não encontrado. Execute a normalização antes.")
+def getArquivoManifest():
+    return STAGING_DIR / manifest.ARQUIVO_MANIFESTO
 
-    OUTPUT_TESTE1_DIR.mkdir(parents=True, exist_ok=True)
 
-    csvFinal = getArquivoCsvFinal()
-    zipFinal = getArquivoZipFinal()
+def getDiretorioStagingZips():
+    return STAGING_DIR / "zips"
 
-    acumulado: Dict[Tuple[str, str, str], Decimal] = defaultdict(Decimal)
 
+def getDiretorioConsolidadoZips():
+    return STAGING_DIR / "consolidado_zips"
+
+
+def lerStagingCsv(
+    stagingPath: Path, erros: Counter
+) -> Iterator[Tuple[str, str, str, Decimal]]:
+    # valor recusado pelo kernel vale ZERO e é contado em `erros` pelo motivo
     with open(stagingPath, encoding="utf-8", newline="") as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        header = next(reader, None)
+        if header is None:
+            return
+
+        # por posição, sem um dict por linha; coluna ausente ou linha curta
+        # leem vazio, como no DictReader
+        iReg, iAno, iTrimestre, iValor = (
+            header.index(c) if c in header else len(header)
+            for c in ("reg_ans", "ano", "trimestre", "vl_saldo_final")
+        )
+        largura = max(iReg, iAno, iTrimestre, iValor) + 1
 
         for row in reader:
-            registroAns = (row.get("reg_ans") or "").strip()
-            ano = (row.get("ano") or "").strip()
-            trimestre = (row.get("trimestre") or "").strip()
+            if len(row) < largura:
+                row += [""] * (largura - len(row))
+            texto = row[iValor]
+            valor = decimais.tentar_decimal(texto, decimais.FORMATO_PONTO)
+            if valor is None:
+                try:
+                    decimais.decompor(texto, decimais.FORMATO_PONTO)
+                except decimais.ErroDecimal as e:
+                    erros[e.motivo] += 1
+                valor = ZERO
+            yield (row[iReg].strip(), row[iAno].strip(), row[iTrimestre].strip(), valor)
+
+
+def lerStagingColunar(
+    stagingPath: Path, erros: Counter
+) -> Iterator[Tuple[str, str, str, Decimal]]:
+    colunas = ["reg_ans", "ano", "trimestre", "vl_saldo_final"]
+    colunas.append("vl_saldo_final" + columnar.SUFIXO_EXPOENTE)
+    for batch in columnar.lerLotesArrow(stagingPath, colunas):
+        for registroAns, ano, trimestre, inteiro, expoente in zip(
+            *(batch.column(c).to_pylist() for c in colunas)
+        ):
+            if inteiro is None or expoente is None:
+                erros[MOTIVO_NULO] += 1
+                valor = ZERO
+            else:
+                valor = decimais.como_decimal(inteiro, -expoente)
+            yield (
+                str(registroAns or "").strip(),
+                "" if ano is None else str(ano),
+                "" if trimestre is None else str(trimestre),
+                valor,
+            )
+
+
+def reportarRecusados(stagingPath: Path, erros: Counter) -> None:
+    if erros:
+        print(f"{stagingPath.name} | valores recusados (somados como 0): {dict(erros)}")
+
+
+def getMotorConsolidacao(motor: Optional[str] = None) -> str:
+    motor = (motor or os.getenv("ANS_CONSOLIDACAO_MOTOR") or MOTOR_DECIMAL).lower()
+    if motor not in (MOTOR_DECIMAL, MOTOR_VETORIZADO):
+        raise ValueError(f"Motor de consolidação inválido: {motor}")
+    return motor
 
+
+def acumularDecimal(
+    stagingPath: Path, formato: str
+) -> Dict[Tuple[str, str, str], Decimal]:
+    """
+    Motor linha a linha: cada valor passa pelo kernel de `domain.decimais`
+    e é somado como `Decimal` partindo de `Decimal(0)`, sem arredondar (o
+    contexto padrão cortaria em 28 dígitos e divergiria do vetorizado).
+    """
+    erros: Counter = Counter()
+    acumulado: Dict[Tuple[str, str, str], Decimal] = defaultdict(Decimal)
+
+    linhas = (
+        lerStagingColunar(stagingPath, erros)
+        if formato == columnar.FORMATO_PARQUET
+        else lerStagingCsv(stagingPath, erros)
+    )
+
+    with localcontext(decimais.CONTEXTO_EXATO):
+        for registroAns, ano, trimestre, valor in linhas:
             if not registroAns or not ano or not trimestre:
                 continue
 
-            valor = parseDecimal(row.get("vl_saldo_final") or "0")
             if valor < 0:
                 continue
 
-            chave = (registroAns, ano, trimestre)
-            acumulado[chave] += valor
+            acumulado[(registroAns, ano, trimestre)] += valor
+
+    reportarRecusados(stagingPath, erros)
+    return acumulado
+
+
+def lerLotesStaging(stagingPath: Path, formato: str, erros: Counter):
+    """
+    (reg_ans, ano, trimestre) como texto + valor como inteiro não
+    escalado/expoente; os recusados viram 0 (expoente 0) e são contados em
+    `erros` pelo motivo, como em `lerStagingCsv`.
+    """
+    if formato == columnar.FORMATO_PARQUET:
+        colunas = ["reg_ans", "ano", "trimestre", "vl_saldo_final"]
+        colunas.append("vl_saldo_final" + columnar.SUFIXO_EXPOENTE)
+        for batch in columnar.lerLotesArrow(stagingPath, colunas):
+            inteiros = batch.column(colunas[3])
+            expoentes = batch.column(colunas[4])
+            aceitos = inteiros.is_valid().to_numpy(
+                zero_copy_only=False
+            ) & expoentes.is_valid().to_numpy(zero_copy_only=False)
+            recusados = len(aceitos) - int(aceitos.sum())
+            if recusados:
+                erros[MOTIVO_NULO] += recusados
+            # nulo -> (0, 0): mesma parcela do ZERO no motor Decimal
+            yield (
+                batch.column("reg_ans"),
+                columnar.pc.cast(batch.column("ano"), columnar.pa.string()),
+                columnar.pc.cast(batch.column("trimestre"), columnar.pa.string()),
+                columnar.pc.fill_null(inteiros, 0).to_numpy(),
+                columnar.pc.fill_null(expoentes, 0).to_numpy().astype("int64"),
+            )
+        return
+
+    if stagingPath.stat().st_size == 0:
+        return
+    colunas = ["reg_ans", "ano", "trimestre", "vl_saldo_final"]
+    for batch in columnar.lerLotesCsvArrow(stagingPath, colunas):
+        # recusados já voltam como (0, 0)
+        inteiros, expoentes, motivos = columnar.textoParaInteiros(
+            batch.column("vl_saldo_final")
+        )
+        erros.update(motivos.values())
+        yield (
+            batch.column("reg_ans"),
+            batch.column("ano"),
+            batch.column("trimestre"),
+            inteiros,
+            expoentes,
+        )
+
+
+def acumularVetorizado(
+    stagingPath: Path, formato: str
+) -> Dict[Tuple[str, str, str], Decimal]:
+    """
+    Mesmo resultado de `acumularDecimal`, em lotes NumPy:
+    - chaves dicionarizadas por lote e combinadas num int64;
+    - valores alinhados ao menor expoente do lote (centavos, no caso comum)
+      e somados como inteiros com `np.add.reduceat`;
+    - parciais dos lotes somados em `int` Python (sem overflow).
+    O expoente do resultado replica a soma de `Decimal` partindo de
+    `Decimal(0)`: min(0, menor expoente somado) — "0" continua "0".
+    """
+    columnar.exigirNumpy()
+    np = columnar.np
+    pc = columnar.pc
+
+    erros: Counter = Counter()
+    dicionarios: List[Dict[str, int]] = [{}, {}, {}]
+    # codigoChave -> [primeiraOcorrencia, soma, expoenteSoma, menorExpoente]
+    grupos: Dict[int, list] = {}
+    deslocamento = 0
+
+    for colunasChave, inteiros, expoentes in (
+        (lote[:3], lote[3], lote[4])
+        for lote in lerLotesStaging(stagingPath, formato, erros)
+    ):
+        codigos = []
+        validos = inteiros >= 0
+        for k, coluna in enumerate(colunasChave):
+            coluna = pc.call_function(
+                "utf8_trim_whitespace", [pc.fill_null(coluna, "")]
+            )
+            preenchida = pc.call_function("not_equal", [coluna, ""])
+            validos &= preenchida.to_numpy(zero_copy_only=False)
+            codificada = coluna.dictionary_encode()
+            mapa = np.array(
+                [
+                    dicionarios[k].setdefault(v, len(dicionarios[k]))
+                    for v in codificada.dictionary.to_pylist()
+                ],
+                dtype=np.int64,
+            )
+            codigos.append(mapa[codificada.indices.to_numpy(zero_copy_only=False)])
 
+        if not validos.any():
+            deslocamento += len(validos)
+            continue
+
+        chaves = (codigos[0] << 32 | codigos[1] << 16 | codigos[2])[validos]
+        inteiros = inteiros[validos]
+        expoentes = expoentes[validos]
+
+        base = int(expoentes.min())
+        amplitude = int(expoentes.max()) - base
+        limite = int(np.abs(inteiros).max()) * 10**amplitude * len(inteiros)
+        if amplitude > 18:
+            # 10 ** amplitude já estoura int64: fatores em int Python
+            fatores = 10 ** (expoentes - base).astype(object)
+        else:
+            fatores = 10 ** (expoentes - base)
+        if limite >= 2**63:
+            # soma do lote não cabe em int64: usa int Python (object)
+            inteiros = inteiros.astype(object)
+            fatores = fatores.astype(object)
+        alinhados = inteiros * fatores
+
+        unicas, primeiros, inversos = np.unique(
+            chaves, return_index=True, return_inverse=True
+        )
+        ordem = np.argsort(inversos, kind="stable")
+        inicios = np.searchsorted(inversos[ordem], np.arange(len(unicas)))
+        somas = np.add.reduceat(alinhados[ordem], inicios)
+        menores = np.minimum.reduceat(expoentes[ordem], inicios)
+
+        for chave, primeiro, soma, menor in zip(
+            unicas.tolist(), primeiros.tolist(), somas.tolist(), menores.tolist()
+        ):
+            atual = grupos.get(chave)
+            if atual is None:
+                grupos[chave] = [deslocamento + primeiro, soma, base, menor]
+                continue
+            expoente = min(atual[2], base)
+            atual[1] = atual[1] * 10 ** (atual[2] - expoente) + soma * 10 ** (
+                base - expoente
+            )
+            atual[2] = expoente
+            atual[3] = min(atual[3], menor)
+
+        deslocamento += int(validos.sum())
+
+    reportarRecusados(stagingPath, erros)
+    nomes = [list(d) for d in dicionarios]
+    acumulado: Dict[Tuple[str, str, str], Decimal] = {}
+    for chave, (_, soma, expoenteSoma, menor) in sorted(
+        grupos.items(), key=lambda item: item[1][0]
+    ):
+        expoente = min(0, menor)
+        if expoenteSoma < expoente:
+            soma //= 10 ** (expoente - expoenteSoma)
+        else:
+            soma *= 10 ** (expoenteSoma - expoente)
+        acumulado[
+            (
+                nomes[0][chave >> 32],
+                nomes[1][(chave >> 16) & 0xFFFF],
+                nomes[2][chave & 0xFFFF],
+            )
+        ] = Decimal(soma).scaleb(expoente)
+
+    return acumulado
+
+
+def acumular(
+    stagingPath: Path, formato: str, motor: str
+) -> Dict[Tuple[str, str, str], Decimal]:
+    if motor == MOTOR_VETORIZADO:
+        return acumularVetorizado(stagingPath, formato)
+    return acumularDecimal(stagingPath, formato)
+
+
+def escreverConsolidadoParcial(
+    acumulado: Dict[Tuple[str, str, str], Decimal], caminho: Path
+) -> None:
+    caminho.parent.mkdir(parents=True, exist_ok=True)
+    with open(caminho, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f, delimiter=";")
+        writer.writerow(["RegistroANS", "Ano", "Trimestre", "ValorDespesas"])
+        for (registroAns, ano, trimestre), valor in acumulado.items():
+            writer.writerow([registroAns, ano, trimestre, str(valor)])
+
+
+def lerConsolidadoParcial(caminho: Path) -> Dict[Tuple[str, str, str], Decimal]:
+    # str(Decimal) -> Decimal preserva o expoente (soma continua idêntica)
+    with open(caminho, encoding="utf-8", newline="") as f:
+        reader = csv.reader(f, delimiter=";")
+        next(reader, None)
+        return {(r[0], r[1], r[2]): Decimal(r[3]) for r in reader}
+
+
+def acumularIncremental(
+    formato: str, motor: str
+) -> Dict[Tuple[str, str, str], Decimal]:
+    """
+    Um consolidado parcial por ZIP, refeito só quando o staging parcial do
+    ZIP mudou (hash no manifesto). Os parciais são somados na ordem dos ZIPs,
+    a mesma do staging unificado: chaves na ordem de primeira ocorrência e
+    mesma soma/expoente do modo completo.
+    """
+    registro = manifest.Manifest.carregar(getArquivoManifest())
+    if not registro.zips:
+        raise RuntimeError("Manifesto vazio. Execute a normalização incremental antes.")
+
+    acumulado: Dict[Tuple[str, str, str], Decimal] = {}
+    arquivosAtuais = set()
+
+    for nome in sorted(registro.zips):
+        entrada = registro.zips[nome]
+        staging = entrada.get("staging") or {}
+        if not staging.get("sha256"):
+            continue
+
+        parcial = getDiretorioConsolidadoZips() / f"{Path(nome).stem}.csv"
+        arquivosAtuais.add(parcial.name)
+        consolidado = entrada.get("consolidado") or {}
+
+        if consolidado.get("origem") == staging["sha256"] and consolidado.get(
+            "sha256"
+        ) == manifest.hashArquivo(parcial):
+            parcialAcumulado = lerConsolidadoParcial(parcial)
+        else:
+            stagingParcial = getDiretorioStagingZips() / staging["arquivo"]
+            parcialAcumulado = acumular(stagingParcial, formato, motor)
+            escreverConsolidadoParcial(parcialAcumulado, parcial)
+            entrada["consolidado"] = {
+                "arquivo": parcial.name,
+                "origem": staging["sha256"],
+                "sha256": manifest.hashArquivo(parcial),
+                "linhas": len(parcialAcumulado),
+            }
+            print(f"{nome} | consolidado parcial={len(parcialAcumulado)}")
+
+        for chave, valor in parcialAcumulado.items():
+            acumulado[chave] = acumulado.get(chave, Decimal(0)) + valor
+
+    if getDiretorioConsolidadoZips().exists():
+        for sobra in getDiretorioConsolidadoZips().iterdir():
+            if sobra.name not in arquivosAtuais:
+                sobra.unlink()
+
+    registro.salvar()
+    return acumulado
+
+
+def escreverConsolidado(
+    acumulado: Dict[Tuple[str, str, str], Decimal], csvFinal: Path
+) -> None:
     with open(csvFinal, "w", encoding="utf-8", newline="") as f:
         writer = csv.writer(f, delimiter=";")
         writer.writerow(
@@ -68,6 +399,41 @@ def consolidarDespesas():
         for (registroAns, ano, trimestre), valor in acumulado.items():
             writer.writerow([registroAns, "NÃO INFORMADA", trimestre, ano, str(valor)])
 
+
+def consolidarDespesas(
+    formato: Optional[str] = None,
+    motor: Optional[str] = None,
+    incremental: Optional[bool] = None,
+):
+    formato = columnar.getFormatoIntermediario(formato)
+    motor = getMotorConsolidacao(motor)
+    if incremental is None:
+        incremental = manifest.isModoIncremental()
+    stagingPath = getArquivoStaging(formato)
+    if not incremental and not stagingPath.exists():
+        raise RuntimeError("Staging não encontrado. Execute a normalização antes.")
+
+    OUTPUT_TESTE1_DIR.mkdir(parents=True, exist_ok=True)
+
+    csvFinal = getArquivoCsvFinal()
+    zipFinal = getArquivoZipFinal()
+
+    if incremental:
+        acumulado = acumularIncremental(formato, motor)
+    else:
+        acumulado = acumular(stagingPath, formato, motor)
+
+    escreverConsolidado(acumulado, csvFinal)
+
+    if formato == columnar.FORMATO_PARQUET:
+        with columnar.EscritorColunar(
+            getArquivoColunarFinal(), columnar.CONSOLIDADO_LAYOUT
+        ) as escritor:
+            for (registroAns, ano, trimestre), valor in acumulado.items():
+                escritor.writerow(
+                    [registroAns, "NÃO INFORMADA", trimestre, ano, str(valor)]
+                )
+
     with zipfile.ZipFile(zipFinal, "w", zipfile.ZIP_DEFLATED) as z:
         z.write(csvFinal, arcname=csvFinal.name)
 
@@ -1,5 +1,9 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass
-from typing import Dict, List
+from pathlib import Path
+from typing import Dict, List, Optional
 from urllib.parse import urljoin
 
 import requests
@@ -9,6 +13,9 @@ from app.core.types import Trimestre
 baseUrl = "https://dadosabertos.ans.gov.br/FTP/PDA/demonstracoes_contabeis/"
 userAgent = "v01dslick"
 
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_WORKERS = 4
+
 
 @dataclass
 class Arquivo:
@@ -96,20 +103,138 @@ def listarArquivosAno(
     return arquivos
 
 
-def baixarArquivo(sessao: requests.Session, arquivo: Arquivo, destino):
-    destinoTemp = destino.with_suffix(destino.suffix + ".part")
+@dataclass(frozen=True)
+class MetadadosRemotos:
+    tamanho: Optional[int]
+    etag: Optional[str]
 
-    with sessao.get(arquivo.url, stream=True, timeout=60) as resp:
-        resp.raise_for_status()
-        with open(destinoTemp, "wb") as f:
-            for chunk in resp.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
 
-    destinoTemp.replace(destino)
+@dataclass(frozen=True)
+class ResultadoDownload:
+    arquivo: Arquivo
+    destino: Path
+    status: str  # "baixado" | "retomado" | "ignorado"
+    bytes: int
+
+
+def getArquivoEtag(destino: Path) -> Path:
+    return destino.with_name(destino.name + ".etag")
+
+
+def obterMetadadosRemotos(sessao: requests.Session, url: str) -> MetadadosRemotos:
+    resp = sessao.head(url, allow_redirects=True, timeout=30)
+    if resp.status_code >= 400:
+        return MetadadosRemotos(tamanho=None, etag=None)
+
+    tamanho = resp.headers.get("Content-Length")
+    return MetadadosRemotos(
+        tamanho=int(tamanho) if tamanho and tamanho.isdigit() else None,
+        etag=resp.headers.get("ETag"),
+    )
+
 
+def isArquivoAtualizado(destino: Path, remoto: MetadadosRemotos) -> bool:
+    if not destino.exists():
+        return False
+    if remoto.tamanho is None and remoto.etag is None:
+        return False
+    if remoto.tamanho is not None and destino.stat().st_size != remoto.tamanho:
+        return False
+    if remoto.etag is not None:
+        etagPath = getArquivoEtag(destino)
+        if etagPath.exists():
+            return etagPath.read_text(encoding="utf-8").strip() == remoto.etag
+        # sem etag salvo: tamanho igual é suficiente
+        return remoto.tamanho is not None
+    return True
 
-def executarDownloadAns() -> None:
+
+def baixarArquivo(
+    sessao: requests.Session, arquivo: Arquivo, destino: Path
+) -> ResultadoDownload:
+    remoto = obterMetadadosRemotos(sessao, arquivo.url)
+    if isArquivoAtualizado(destino, remoto):
+        return ResultadoDownload(arquivo, destino, "ignorado", 0)
+
+    destinoTemp = destino.with_suffix(destino.suffix + ".part")
+    etagTemp = getArquivoEtag(destinoTemp)
+
+    # .part só é retomado se pertence à mesma versão do arquivo remoto
+    offset = destinoTemp.stat().st_size if destinoTemp.exists() else 0
+    if offset and remoto.etag is not None:
+        etagParcial = (
+            etagTemp.read_text(encoding="utf-8").strip() if etagTemp.exists() else None
+        )
+        if etagParcial != remoto.etag:
+            offset = 0
+    if remoto.tamanho is not None and offset > remoto.tamanho:
+        offset = 0
+
+    headers = {}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+        if remoto.etag is not None:
+            headers["If-Range"] = remoto.etag
+
+    escritos = 0
+    with sessao.get(arquivo.url, stream=True, timeout=60, headers=headers) as resp:
+        if resp.status_code == 416:
+            # .part já completo
+            resp.close()
+            retomado = True
+        else:
+            resp.raise_for_status()
+            retomado = offset > 0 and resp.status_code == 206
+            etag = resp.headers.get("ETag") or remoto.etag
+            if etag:
+                etagTemp.write_text(etag, encoding="utf-8")
+
+            with open(destinoTemp, "ab" if retomado else "wb") as f:
+                for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                    if chunk:
+                        f.write(chunk)
+                        escritos += len(chunk)
+
+    destinoTemp.replace(destino)
+    if etagTemp.exists():
+        etagTemp.replace(getArquivoEtag(destino))
+
+    return ResultadoDownload(
+        arquivo, destino, "retomado" if retomado else "baixado", escritos
+    )
+
+
+def baixarArquivos(
+    arquivos: List[Arquivo],
+    destinoDir: Path,
+    maxWorkers: Optional[int] = None,
+) -> List[ResultadoDownload]:
+    """
+    Baixa os arquivos em paralelo (pool limitado de threads).
+    Cada thread mantém sua própria Session (requests.Session não é thread-safe).
+    """
+    destinoDir.mkdir(parents=True, exist_ok=True)
+    workers = maxWorkers or int(os.getenv("ANS_DOWNLOAD_WORKERS", DEFAULT_WORKERS))
+    local = threading.local()
+
+    def tarefa(arquivo: Arquivo) -> ResultadoDownload:
+        sessao = getattr(local, "sessao", None)
+        if sessao is None:
+            sessao = criarSessao()
+            local.sessao = sessao
+        return baixarArquivo(sessao, arquivo, destinoDir / arquivo.nome)
+
+    resultados: List[ResultadoDownload] = []
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futuros = [pool.submit(tarefa, a) for a in arquivos]
+        for futuro in as_completed(futuros):
+            resultados.append(futuro.result())
+
+    resultados.sort(key=lambda r: r.arquivo.nome)
+    return resultados
+
+
+def executarDownloadAns(maxWorkers: Optional[int] = None) -> None:
     sessao = criarSessao()
     RAW_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -132,11 +257,12 @@ def executarDownloadAns() -> None:
     trimestresOrdenados = sorted(arquivosPorTrimestre.keys(), reverse=True)
     trimestresSelecionados = trimestresOrdenados[:3]
 
-    for trimestre in trimestresSelecionados:
-        for arquivo in arquivosPorTrimestre[trimestre]:
-            destino = RAW_DIR / arquivo.nome
-            baixarArquivo(sessao, arquivo, destino)
-            print(f"Baixado: {arquivo.nome}")
+    selecionados = [
+        arquivo for t in trimestresSelecionados for arquivo in arquivosPorTrimestre[t]
+    ]
+
+    for r in baixarArquivos(selecionados, RAW_DIR, maxWorkers):
+        print(f"{r.status.capitalize()}: {r.arquivo.nome}")
 
 
 if __name__ == "__main__":
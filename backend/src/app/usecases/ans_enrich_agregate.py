@@ -0,0 +1,104 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from pathlib import Path
+from typing import Iterator, Optional, Tuple
+
+from app.core import columnar, manifest
+from app.usecases import ans_agregate, ans_enrich_validate
+
+
+def isModoFundido() -> bool:
+    return os.getenv("ANS_TESTE2_FUNDIDO", "0") == "1"
+
+
+def executarEnriquecimentoEAgregacao(
+    nome_zip: Optional[str] = None,
+    formato: Optional[str] = None,
+    incremental: Optional[bool] = None,
+) -> Tuple[Path, Path, Path]:
+    """
+    2.2 + 2.1 + 2.3 numa passagem: cada linha do consolidado é enriquecida,
+    validada, gravada no CSV final e já alimenta a agregação. O CSV final não
+    é relido nem re-parseado; os arquivos gerados são os mesmos das etapas
+    separadas.
+    """
+    formato = columnar.getFormatoIntermediario(formato)
+    colunar = formato == columnar.FORMATO_PARQUET
+    if incremental is None:
+        incremental = manifest.isModoIncremental()
+
+    consolidadoPath = ans_enrich_validate.getArquivoConsolidadoEntrada(colunar)
+    cadopPath = ans_enrich_validate.baixarCadopSeNecessario()
+    finalPath = ans_enrich_validate.getArquivoFinalTeste2()
+    out_csv = ans_agregate.getArquivoCsvAgregado()
+    out_zip = ans_agregate.getArquivoZipFinal(nome_zip)
+
+    def getEntradaAgregacao() -> Path:
+        if colunar:
+            return ans_agregate.getArquivoInputColunar()
+        return ans_agregate.getArquivoInput()
+
+    if incremental:
+        # mesmo manifesto (e mesmas chaves) das etapas separadas
+        registro = manifest.Manifest.carregar(ans_enrich_validate.getArquivoManifest())
+        registro.validarParametros({"formato": formato})
+        origensFinal = ans_enrich_validate.getOrigensEnriquecimento(
+            consolidadoPath, cadopPath
+        )
+        if (
+            registro.isDerivadoAtualizado(finalPath.name, finalPath, origensFinal)
+            and (not colunar or getEntradaAgregacao().exists())
+            and registro.isDerivadoAtualizado(
+                out_csv.name,
+                out_csv,
+                {"consolidado_final": manifest.hashArquivo(getEntradaAgregacao())},
+            )
+            and out_zip.exists()
+        ):
+            print(f"{finalPath.name} + {out_csv.name} | inalterados (manifesto)")
+            return finalPath, out_csv, out_zip
+
+    totalFinal = 0
+
+    with (
+        ans_enrich_validate.carregarIndiceCadop(cadopPath) as cadop,
+        ans_enrich_validate.abrirSaidaFinal(finalPath, colunar) as escrever,
+    ):
+        motivosCnpj = ans_enrich_validate.validarCnpjsCadop(cadop)
+
+        def enriquecerEFiltrar() -> Iterator[Tuple[str, str, Decimal]]:
+            nonlocal totalFinal
+            linhas = ans_enrich_validate.lerConsolidado(consolidadoPath, colunar)
+            for linha in linhas:
+                saida = ans_enrich_validate.enriquecerLinha(*linha, cadop, motivosCnpj)
+                escrever(saida)
+                totalFinal += 1
+
+                valido = ans_agregate.extrairValido(saida)
+                if valido is not None:
+                    yield valido
+
+        grupos = ans_agregate.agruparLinhas(enriquecerEFiltrar())
+
+    # só o ZIP do final (zlib libera o GIL) corre em paralelo com a escrita do
+    # agregado; o CSV final já foi gravado em série na passagem acima (csv.writer
+    # segura o GIL: thread escritora com fila não ganhou nada)
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        zipFinal = pool.submit(ans_enrich_validate.ziparFinal, finalPath)
+        totalAgregado = ans_agregate.escreverAgregado(grupos, out_csv, out_zip)
+        zipFinal.result()
+
+    if incremental:
+        registro.registrarDerivado(
+            finalPath.name, finalPath, origensFinal, linhas=totalFinal
+        )
+        registro.registrarDerivado(
+            out_csv.name,
+            out_csv,
+            {"consolidado_final": manifest.hashArquivo(getEntradaAgregacao())},
+            linhas=totalAgregado,
+        )
+        registro.salvar()
+
+    return finalPath, out_csv, out_zip
@@ -1,13 +1,22 @@
 import csv
 import re
 import zipfile
+from contextlib import contextmanager, nullcontext
 from pathlib import Path
-from typing import Dict
+from typing import Callable, Dict, Iterable, Iterator, Optional, Tuple
 
 import requests
+from app.core import cadop_index, columnar, manifest
+from app.core.deteccao import detectarDelimiter, detectarEncoding
 from app.core.paths import OUTPUT_TESTE1_DIR, OUTPUT_TESTE2_DIR, RAW_DIR
+from app.domain import decimais
 from app.domain.models import CadopRegistro
-from app.domain.validators import limpar_digitos, parse_decimal, validar_cnpj
+from app.domain.validators import (
+    ERRO_CNPJ_INVALIDO,
+    limpar_digitos,
+    motivo_cnpj_invalido,
+    validar_cnpjs,
+)
 
 userAgent = "v01dslick"
 cadopBaseUrl = (
@@ -28,6 +37,18 @@ def getArquivoFinalTeste2() -> Path:
     return OUTPUT_TESTE2_DIR / "consolidado_despesas_final.csv"
 
 
+def getArquivoConsolidadoColunar() -> Path:
+    return OUTPUT_TESTE1_DIR / "consolidado_despesas.parquet"
+
+
+def getArquivoFinalColunarTeste2() -> Path:
+    return OUTPUT_TESTE2_DIR / "consolidado_despesas_final.parquet"
+
+
+def getArquivoManifest() -> Path:
+    return OUTPUT_TESTE2_DIR / manifest.ARQUIVO_MANIFESTO
+
+
 def criarSessao() -> requests.Session:
     sessao = requests.Session()
     sessao.headers.update({"User-Agent": userAgent})
@@ -56,24 +77,6 @@ def baixarCadopSeNecessario() -> Path:
     return destino
 
 
-def detectarEncoding(caminho: Path) -> str:
-    amostra = caminho.read_bytes()[:200_000]
-    for enc in ("utf-8-sig", "utf-8", "latin-1"):
-        try:
-            amostra.decode(enc)
-            return enc
-        except UnicodeDecodeError:
-            continue
-    return "latin-1"
-
-
-def detectarDelimiter(caminho: Path) -> str:
-    amostra = caminho.read_text(encoding=detectarEncoding(caminho), errors="ignore")[
-        :50_000
-    ]
-    return ";" if amostra.count(";") > amostra.count(",") else ","
-
-
 def normalizarHeader(nome: str) -> str:
     nome = (nome or "").strip().lower()
     nome = re.sub(r"\s+", " ", nome)
@@ -148,98 +151,227 @@ def carregarCadopPorRegistroAns(cadopPath: Path) -> Dict[str, CadopRegistro]:
         return out
 
 
-def executarEnriquecimentoEValidacao() -> Path:
-    consolidadoPath = getArquivoConsolidado()
+def carregarIndiceCadop(cadopPath: Path) -> cadop_index.IndiceCadop:
+    # índice compilado ao lado do CSV; só recompila quando o CADOP muda
+    indice = cadop_index.abrirIndiceAtualizado(cadopPath)
+    if indice is not None:
+        return indice
+
+    indicePath = cadop_index.getArquivoIndice(cadopPath)
+    cadop_index.compilarIndice(
+        carregarCadopPorRegistroAns(cadopPath), cadopPath, indicePath
+    )
+    return cadop_index.IndiceCadop(indicePath)
+
+
+FINAL_FIELDNAMES = [
+    "RegistroANS",
+    "CNPJ",
+    "RazaoSocial",
+    "Modalidade",
+    "UF",
+    "Trimestre",
+    "Ano",
+    "ValorDespesas",
+    "cnpj_valido",
+    "valor_positivo",
+    "razao_social_nao_vazia",
+    "erros",
+]
+
+
+def lerConsolidadoCsv(consolidadoPath: Path) -> Iterator[Tuple[str, str, str, str]]:
+    enc = detectarEncoding(consolidadoPath)
+    # empate vai para "," aqui (regra original do enriquecimento)
+    delim = detectarDelimiter(consolidadoPath, empate=",")
+
+    with open(consolidadoPath, encoding=enc, newline="") as fIn:
+        reader = csv.DictReader(fIn, delimiter=delim)
+        for row in reader:
+            yield (
+                limpar_digitos(row.get("RegistroANS") or row.get("reg_ans") or ""),
+                (row.get("Trimestre") or row.get("trimestre") or "").strip(),
+                (row.get("Ano") or row.get("ano") or "").strip(),
+                (
+                    row.get("ValorDespesas")
+                    or row.get("valorDespesas")
+                    or row.get("valor_despesas")
+                    or ""
+                ).strip(),
+            )
+
+
+def lerConsolidadoColunar(
+    consolidadoPath: Path,
+) -> Iterator[Tuple[str, str, str, str]]:
+    for row in columnar.lerLinhas(consolidadoPath, columnar.CONSOLIDADO_LAYOUT):
+        valor = row["ValorDespesas"]
+        yield (
+            limpar_digitos(str(row["RegistroANS"] or "")),
+            "" if row["Trimestre"] is None else str(row["Trimestre"]),
+            "" if row["Ano"] is None else str(row["Ano"]),
+            "" if valor is None else str(valor),
+        )
+
+
+def validarCnpjsCadop(cadop: Iterable[CadopRegistro]) -> Dict[str, Optional[str]]:
+    """Motivo (MOTIVO_CNPJ_*) ou None de cada CNPJ do CADOP, validados em lote."""
+    cnpjs = list({cad.cnpj for cad in cadop})
+    return {
+        cnpj: None if ok else motivo_cnpj_invalido(cnpj)
+        for cnpj, ok in zip(cnpjs, validar_cnpjs(cnpjs))
+    }
+
+
+def enriquecerLinha(
+    registroAns: str,
+    trimestre: str,
+    ano: str,
+    valorStr: str,
+    cadop,
+    motivosCnpj: Optional[Dict[str, Optional[str]]] = None,
+) -> Dict[str, str]:
+    cad = cadop.get(registroAns)
+    cnpj = cad.cnpj if cad else ""
+    razaoSocial = cad.razaoSocial if cad else ""
+    modalidade = cad.modalidade if cad else ""
+    uf = cad.uf if cad else ""
+
+    erros = []
+
+    # CNPJs do CADOP já vêm validados (validarCnpjsCadop); o resto, um a um
+    if motivosCnpj is not None and cnpj in motivosCnpj:
+        motivoCnpj = motivosCnpj[cnpj]
+    else:
+        motivoCnpj = motivo_cnpj_invalido(cnpj)
+    cnpjOk = motivoCnpj is None
+    if not cnpjOk:
+        erros.append(ERRO_CNPJ_INVALIDO)
+
+    # o sinal do inteiro não escalado é o sinal do valor (qualquer nº de casas)
+    try:
+        valorOk = decimais.decompor(valorStr)[0] > 0
+    except decimais.ErroDecimal:
+        valorOk = False
+    if not valorOk:
+        erros.append("valor_nao_positivo")
+
+    razaoOk = bool((razaoSocial or "").strip())
+    if not razaoOk:
+        erros.append("razao_social_vazia")
+
+    return {
+        "RegistroANS": registroAns,
+        "CNPJ": cnpj,
+        "RazaoSocial": razaoSocial,
+        "Modalidade": modalidade,
+        "UF": uf,
+        "Trimestre": trimestre,
+        "Ano": ano,
+        "ValorDespesas": valorStr,
+        "cnpj_valido": "1" if cnpjOk else "0",
+        "valor_positivo": "1" if valorOk else "0",
+        "razao_social_nao_vazia": "1" if razaoOk else "0",
+        "erros": ",".join(erros),
+    }
+
+
+def getArquivoConsolidadoEntrada(colunar: bool) -> Path:
+    consolidadoPath = (
+        getArquivoConsolidadoColunar() if colunar else getArquivoConsolidado()
+    )
     if not consolidadoPath.exists():
         raise RuntimeError(
-            "consolidado_despesas.csv não encontrado em data/output/teste1. Rode o Teste 1 primeiro."
+            f"{consolidadoPath.name} não encontrado em data/output/teste1. Rode o Teste 1 primeiro."
         )
+    return consolidadoPath
 
-    cadopPath = baixarCadopSeNecessario()
-    cadop = carregarCadopPorRegistroAns(cadopPath)
 
-    outPath = getArquivoFinalTeste2()
-    outPath.parent.mkdir(parents=True, exist_ok=True)
+def lerConsolidado(
+    consolidadoPath: Path, colunar: bool
+) -> Iterator[Tuple[str, str, str, str]]:
+    if colunar:
+        return lerConsolidadoColunar(consolidadoPath)
+    return lerConsolidadoCsv(consolidadoPath)
 
-    enc = detectarEncoding(consolidadoPath)
-    delim = detectarDelimiter(consolidadoPath)
 
+@contextmanager
+def abrirSaidaFinal(outPath: Path, colunar: bool) -> Iterator[Callable[[dict], None]]:
+    """CSV final (+ Parquet no modo colunar); devolve a função que grava uma linha."""
+    outPath.parent.mkdir(parents=True, exist_ok=True)
     with (
-        open(consolidadoPath, encoding=enc, newline="") as fIn,
         open(outPath, "w", encoding="utf-8", newline="") as fOut,
+        (
+            columnar.EscritorColunar(
+                getArquivoFinalColunarTeste2(), columnar.CONSOLIDADO_FINAL_LAYOUT
+            )
+            if colunar
+            else nullcontext()
+        ) as escritorColunar,
     ):
-        reader = csv.DictReader(fIn, delimiter=delim)
-        fieldnames = [
-            "RegistroANS",
-            "CNPJ",
-            "RazaoSocial",
-            "Modalidade",
-            "UF",
-            "Trimestre",
-            "Ano",
-            "ValorDespesas",
-            "cnpj_valido",
-            "valor_positivo",
-            "razao_social_nao_vazia",
-            "erros",
-        ]
-        writer = csv.DictWriter(fOut, fieldnames=fieldnames, delimiter=";")
+        writer = csv.DictWriter(fOut, fieldnames=FINAL_FIELDNAMES, delimiter=";")
         writer.writeheader()
 
-        for row in reader:
-            registroAns = limpar_digitos(
-                row.get("RegistroANS") or row.get("reg_ans") or ""
-            )
-            trimestre = (row.get("Trimestre") or row.get("trimestre") or "").strip()
-            ano = (row.get("Ano") or row.get("ano") or "").strip()
-            valorStr = (
-                row.get("ValorDespesas")
-                or row.get("valorDespesas")
-                or row.get("valor_despesas")
-                or ""
-            ).strip()
-
-            cad = cadop.get(registroAns)
-            cnpj = cad.cnpj if cad else ""
-            razaoSocial = cad.razaoSocial if cad else ""
-            modalidade = cad.modalidade if cad else ""
-            uf = cad.uf if cad else ""
-
-            erros = []
-
-            cnpjOk = validar_cnpj(cnpj) if cnpj else False
-            if not cnpjOk:
-                erros.append("cnpj_invalido")
-
-            valor = parse_decimal(valorStr)
-            valorOk = bool(valor is not None and valor > 0)
-            if not valorOk:
-                erros.append("valor_nao_positivo")
-
-            razaoOk = bool((razaoSocial or "").strip())
-            if not razaoOk:
-                erros.append("razao_social_vazia")
-
-            writer.writerow(
-                {
-                    "RegistroANS": registroAns,
-                    "CNPJ": cnpj,
-                    "RazaoSocial": razaoSocial,
-                    "Modalidade": modalidade,
-                    "UF": uf,
-                    "Trimestre": trimestre,
-                    "Ano": ano,
-                    "ValorDespesas": valorStr,
-                    "cnpj_valido": "1" if cnpjOk else "0",
-                    "valor_positivo": "1" if valorOk else "0",
-                    "razao_social_nao_vazia": "1" if razaoOk else "0",
-                    "erros": ",".join(erros),
-                }
-            )
+        def escrever(saida: dict) -> None:
+            writer.writerow(saida)
+            if escritorColunar is not None:
+                escritorColunar.writerow([saida[k] for k in FINAL_FIELDNAMES])
+
+        yield escrever
+
 
+def ziparFinal(outPath: Path) -> Path:
     zipPath = outPath.with_suffix(".zip")
     with zipfile.ZipFile(zipPath, "w", compression=zipfile.ZIP_DEFLATED) as z:
         z.write(outPath, arcname=outPath.name)
+    return zipPath
+
+
+def getOrigensEnriquecimento(consolidadoPath: Path, cadopPath: Path) -> dict:
+    return {
+        "consolidado": manifest.hashArquivo(consolidadoPath),
+        "cadop": manifest.hashArquivo(cadopPath),
+    }
+
+
+def executarEnriquecimentoEValidacao(
+    formato: Optional[str] = None, incremental: Optional[bool] = None
+) -> Path:
+    formato = columnar.getFormatoIntermediario(formato)
+    colunar = formato == columnar.FORMATO_PARQUET
+    if incremental is None:
+        incremental = manifest.isModoIncremental()
+
+    consolidadoPath = getArquivoConsolidadoEntrada(colunar)
+    cadopPath = baixarCadopSeNecessario()
+    outPath = getArquivoFinalTeste2()
+
+    if incremental:
+        # refaz só se o consolidado ou o CADOP mudaram desde a última execução
+        registro = manifest.Manifest.carregar(getArquivoManifest())
+        registro.validarParametros({"formato": formato})
+        origens = getOrigensEnriquecimento(consolidadoPath, cadopPath)
+        if registro.isDerivadoAtualizado(outPath.name, outPath, origens) and (
+            not colunar or getArquivoFinalColunarTeste2().exists()
+        ):
+            print(f"{outPath.name} | inalterado (manifesto)")
+            return outPath
+
+    total = 0
+    with (
+        carregarIndiceCadop(cadopPath) as cadop,
+        abrirSaidaFinal(outPath, colunar) as escrever,
+    ):
+        motivosCnpj = validarCnpjsCadop(cadop)
+        for linha in lerConsolidado(consolidadoPath, colunar):
+            escrever(enriquecerLinha(*linha, cadop, motivosCnpj))
+            total += 1
+
+    ziparFinal(outPath)
+
+    if incremental:
+        registro.registrarDerivado(outPath.name, outPath, origens, linhas=total)
+        registro.salvar()
 
     return outPath
 
@@ -1,15 +1,27 @@
 import csv
+import io
+import os
 import re
+import shutil
 import unicodedata
 import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime
-from decimal import Decimal, InvalidOperation
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional
-
+from typing import Iterator, List, Optional, TextIO, Tuple
+
+from app.core import columnar, manifest
+from app.core.deteccao import (
+    AMOSTRA_ENCODING,
+    detectarEncoding,
+    detectarEncodingAmostra,
+)
 from app.core.paths import EXTRACTED_DIR, RAW_DIR, STAGING_DIR
 from app.core.types import Trimestre
+from app.domain import decimais
 from app.usecases.ans_download import executarDownloadAns
 
 
@@ -19,22 +31,50 @@ class ZipJob:
     trimestre: Optional[Trimestre]
 
 
+@dataclass(frozen=True)
+class ShardJob:
+    indice: int
+    zipPath: Path
+    membro: str
+    trimestre: Optional[Trimestre]
+
+
 def stripAccents(valor: str) -> str:
     nfkd = unicodedata.normalize("NFKD", valor)
     return "".join(c for c in nfkd if not unicodedata.combining(c))
 
 
+_espacos = re.compile(r"\s+")
+
+
 def normalizarTexto(valor: str) -> str:
     valor = stripAccents(valor)
-    valor = re.sub(r"\s+", " ", valor)
+    valor = _espacos.sub(" ", valor)
     return valor.lower().strip()
 
 
+# poucas centenas de descrições distintas se repetem milhões de vezes:
+# a normalização unicode/regex roda uma vez por descrição, não por linha
+@lru_cache(maxsize=8192)
 def isDespesasEventosSinistros(descricao: str) -> bool:
     texto = normalizarTexto(descricao)
     return "desp" in texto and ("evento" in texto or "sinistro" in texto)
 
 
+def getPrefixosContaFiltro() -> Optional[Tuple[str, ...]]:
+    """
+    Filtro opcional por plano de contas (ex.: ANS_FILTRO_PREFIXOS_CONTA="41"),
+    substituindo o filtro por DESCRICAO.
+    """
+    valor = os.getenv("ANS_FILTRO_PREFIXOS_CONTA", "")
+    prefixos = tuple(p.strip() for p in valor.split(",") if p.strip())
+    return prefixos or None
+
+
+def isContaEventosSinistros(conta: str, prefixos: Tuple[str, ...]) -> bool:
+    return conta.strip().startswith(prefixos)
+
+
 def parseData(valor: str) -> str:
     valor = valor.strip()
     if not valor:
@@ -48,25 +88,12 @@ def parseData(valor: str) -> str:
 
 
 def parseDecimalStr(valor: str) -> str:
-    valor = valor.strip()
-    if not valor:
-        return ""
-    valor = valor.replace(".", "").replace(",", ".")
+    # "1.234,50" -> "1234.50"; o que o kernel recusa segue como veio e a
+    # consolidação reporta
     try:
-        return str(Decimal(valor))
-    except (InvalidOperation, ValueError):
-        return valor
-
-
-def detectarEncoding(caminho: Path) -> str:
-    amostra = caminho.read_bytes()[:200_000]
-    for enc in ("utf-8-sig", "utf-8", "latin-1"):
-        try:
-            amostra.decode(enc)
-            return enc
-        except UnicodeDecodeError:
-            continue
-    return "latin-1"
+        return decimais.para_texto(valor, decimais.FORMATO_PTBR)
+    except decimais.ErroDecimal:
+        return valor.strip()
 
 
 def inferirTrimestreDoZip(nome: str) -> Optional[Trimestre]:
@@ -124,24 +151,55 @@ CANON_HEADER = [
 ]
 
 
-def processarCsvParaStaging(
-    caminhoCsv: Path,
+def getArquivoStaging(formato: str = columnar.FORMATO_CSV) -> Path:
+    nome = "eventos_sinistros_staging"
+    if formato == columnar.FORMATO_PARQUET:
+        return STAGING_DIR / f"{nome}.parquet"
+    return STAGING_DIR / f"{nome}.csv"
+
+
+def getDiretorioStagingZips() -> Path:
+    return STAGING_DIR / "zips"
+
+
+def getArquivoStagingZip(zipPath: Path, stagingPath: Path) -> Path:
+    # staging parcial de um ZIP, no mesmo formato do staging unificado
+    return getDiretorioStagingZips() / f"{zipPath.stem}{stagingPath.suffix}"
+
+
+def getArquivoManifest() -> Path:
+    return STAGING_DIR / manifest.ARQUIVO_MANIFESTO
+
+
+@contextmanager
+def abrirSaidaStaging(caminhoStaging: Path) -> Iterator[tuple]:
+    # staging .parquet é um dataset: cada chamada grava uma nova parte (append)
+    if columnar.isCaminhoColunar(caminhoStaging):
+        with columnar.EscritorColunar(
+            columnar.proximaParte(caminhoStaging), columnar.STAGING_LAYOUT
+        ) as escritor:
+            yield escritor, True
+        return
+
+    caminhoStaging.parent.mkdir(parents=True, exist_ok=True)
+    existe = caminhoStaging.exists()
+    with open(caminhoStaging, "a", encoding="utf-8", newline="") as saida:
+        yield csv.writer(saida), existe
+
+
+def escreverStaging(
+    entrada: TextIO,
+    fonteArquivo: str,
     caminhoStaging: Path,
     trimestre: Optional[Trimestre],
 ) -> dict:
-    encoding = detectarEncoding(caminhoCsv)
-    caminhoStaging.parent.mkdir(parents=True, exist_ok=True)
-    existe = caminhoStaging.exists()
+    prefixosConta = getPrefixosContaFiltro()
 
     total = 0
     match = 0
 
-    with (
-        open(caminhoCsv, encoding=encoding, newline="") as entrada,
-        open(caminhoStaging, "a", encoding="utf-8", newline="") as saida,
-    ):
+    with abrirSaidaStaging(caminhoStaging) as (writer, existe):
         reader = csv.reader(entrada, delimiter=";", quotechar='"')
-        writer = csv.writer(saida)
 
         try:
             header = next(reader)
@@ -162,7 +220,14 @@ def processarCsvParaStaging(
         for row in reader:
             total += 1
             descricao = get(row, "DESCRICAO")
-            if not descricao or not isDespesasEventosSinistros(descricao):
+            if not descricao:
+                continue
+            if prefixosConta is not None:
+                if not isContaEventosSinistros(
+                    get(row, "CD_CONTA_CONTABIL"), prefixosConta
+                ):
+                    continue
+            elif not isDespesasEventosSinistros(descricao):
                 continue
 
             match += 1
@@ -173,19 +238,107 @@ def processarCsvParaStaging(
                     get(row, "REG_ANS").strip(),
                     get(row, "CD_CONTA_CONTABIL").strip(),
                     descricao.strip(),
-                    parseDecimalStr(get(row, "VL_SALDO_INICIAL"))
-                    if "VL_SALDO_INICIAL" in colunas
-                    else "",
+                    (
+                        parseDecimalStr(get(row, "VL_SALDO_INICIAL"))
+                        if "VL_SALDO_INICIAL" in colunas
+                        else ""
+                    ),
                     parseDecimalStr(get(row, "VL_SALDO_FINAL")),
                     str(trimestre.ano) if trimestre else "",
                     str(trimestre.numero) if trimestre else "",
-                    caminhoCsv.name,
+                    fonteArquivo,
                 ]
             )
 
     return {"total": total, "match": match}
 
 
+def processarCsvParaStaging(
+    caminhoCsv: Path,
+    caminhoStaging: Path,
+    trimestre: Optional[Trimestre],
+) -> dict:
+    encoding = detectarEncoding(caminhoCsv)
+    with open(caminhoCsv, encoding=encoding, newline="") as entrada:
+        return escreverStaging(entrada, caminhoCsv.name, caminhoStaging, trimestre)
+
+
+def processarMembroZipParaStaging(
+    z: zipfile.ZipFile,
+    info: zipfile.ZipInfo,
+    caminhoStaging: Path,
+    trimestre: Optional[Trimestre],
+) -> dict:
+    """
+    Decodifica o CSV direto do stream do ZIP (sem extrair para disco).
+    Memória limitada ao buffer do TextIOWrapper, não ao tamanho do membro.
+    """
+    with z.open(info) as origem:
+        encoding = detectarEncodingAmostra(origem.read(AMOSTRA_ENCODING))
+
+    with (
+        z.open(info) as origem,
+        io.TextIOWrapper(origem, encoding=encoding, newline="") as entrada,
+    ):
+        return escreverStaging(
+            entrada, Path(info.filename).name, caminhoStaging, trimestre
+        )
+
+
+def isModoStreaming() -> bool:
+    return os.getenv("ANS_NORMALIZACAO_STREAMING", "0") == "1"
+
+
+def processarZipParaStaging(
+    job: ZipJob, caminhoStaging: Path, streaming: bool = False
+) -> List[tuple[str, dict]]:
+    trimestre = job.trimestre or inferirTrimestreDoZip(job.zipPath.name)
+    resultados: List[tuple[str, dict]] = []
+
+    if streaming:
+        with zipfile.ZipFile(job.zipPath, "r") as z:
+            membros = [i for i in z.infolist() if not i.filename.endswith("/")]
+            csvs = [i for i in membros if i.filename.lower().endswith(".csv")]
+            naoCsv = [Path(i.filename) for i in membros if i not in csvs]
+
+            if naoCsv:
+                exts = sorted({p.suffix.lower() or "<sem_ext>" for p in naoCsv})
+                print(f"{job.zipPath.name} | arquivos não-CSV detectados: {exts}")
+
+            if not csvs:
+                print(f"{job.zipPath.name} | nenhum CSV encontrado (ignorando)")
+
+            for info in csvs:
+                stats = processarMembroZipParaStaging(
+                    z, info, caminhoStaging, trimestre
+                )
+                resultados.append((Path(info.filename).name, stats))
+
+        return resultados
+
+    destino = EXTRACTED_DIR / (
+        f"{trimestre.numero}T{trimestre.ano}" if trimestre else job.zipPath.stem
+    )
+
+    arquivos = extrairZip(job.zipPath, destino)
+
+    csvs = [a for a in arquivos if a.suffix.lower() == ".csv"]
+    naoCsv = [a for a in arquivos if a.suffix.lower() != ".csv"]
+
+    if naoCsv:
+        exts = sorted({p.suffix.lower() or "<sem_ext>" for p in naoCsv})
+        print(f"{job.zipPath.name} | arquivos não-CSV detectados: {exts}")
+
+    if not csvs:
+        print(f"{job.zipPath.name} | nenhum CSV encontrado (ignorando)")
+
+    for csvPath in csvs:
+        stats = processarCsvParaStaging(csvPath, caminhoStaging, trimestre)
+        resultados.append((csvPath.name, stats))
+
+    return resultados
+
+
 def listarZipsRaw() -> List[ZipJob]:
     RAW_DIR.mkdir(parents=True, exist_ok=True)
     jobs: List[ZipJob] = []
@@ -201,28 +354,17 @@ def listarZipsRaw() -> List[ZipJob]:
     return jobs
 
 
-def executarProcessamentoAns() -> Path:
-    RAW_DIR.mkdir(parents=True, exist_ok=True)
-
-    if not any(RAW_DIR.glob("*.zip")):
-        executarDownloadAns()
-
-    stagingPath = STAGING_DIR / "eventos_sinistros_staging.csv"
-
-    jobs = listarZipsRaw()
-    if not jobs:
-        raise RuntimeError("Nenhum ZIP encontrado em data/raw")
+def listarShards(jobs: List[ZipJob]) -> List[ShardJob]:
+    # ordem dos shards = ordem do processamento serial (zips ordenados, membros do infolist)
+    shards: List[ShardJob] = []
 
     for job in jobs:
         trimestre = job.trimestre or inferirTrimestreDoZip(job.zipPath.name)
-        destino = EXTRACTED_DIR / (
-            f"{trimestre.numero}T{trimestre.ano}" if trimestre else job.zipPath.stem
-        )
-
-        arquivos = extrairZip(job.zipPath, destino)
+        with zipfile.ZipFile(job.zipPath, "r") as z:
+            membros = [i for i in z.infolist() if not i.filename.endswith("/")]
 
-        csvs = [a for a in arquivos if a.suffix.lower() == ".csv"]
-        naoCsv = [a for a in arquivos if a.suffix.lower() != ".csv"]
+        csvs = [i for i in membros if i.filename.lower().endswith(".csv")]
+        naoCsv = [Path(i.filename) for i in membros if i not in csvs]
 
         if naoCsv:
             exts = sorted({p.suffix.lower() or "<sem_ext>" for p in naoCsv})
@@ -230,11 +372,212 @@ def executarProcessamentoAns() -> Path:
 
         if not csvs:
             print(f"{job.zipPath.name} | nenhum CSV encontrado (ignorando)")
+
+        for info in csvs:
+            shards.append(
+                ShardJob(
+                    indice=len(shards),
+                    zipPath=job.zipPath,
+                    membro=info.filename,
+                    trimestre=trimestre,
+                )
+            )
+
+    return shards
+
+
+def processarShard(
+    shard: ShardJob, shardsDir: Path, caminhoStaging: Path
+) -> tuple[str, dict, Path]:
+    # roda em processo worker: precisa ser função top-level (picklable)
+    shardPath = shardsDir / f"{shard.indice:05d}{caminhoStaging.suffix}"
+    with zipfile.ZipFile(shard.zipPath, "r") as z:
+        stats = processarMembroZipParaStaging(
+            z, z.getinfo(shard.membro), shardPath, shard.trimestre
+        )
+    return Path(shard.membro).name, stats, shardPath
+
+
+def mesclarShards(
+    shardPaths: List[Path], caminhoStaging: Path, copiar: bool = False
+) -> None:
+    if columnar.isCaminhoColunar(caminhoStaging):
+        for shardPath in shardPaths:
+            columnar.anexarPartes(shardPath, caminhoStaging, copiar)
+        return
+
+    caminhoStaging.parent.mkdir(parents=True, exist_ok=True)
+    existe = caminhoStaging.exists()
+
+    with open(caminhoStaging, "ab") as saida:
+        for shardPath in shardPaths:
+            if not shardPath.exists():
+                continue
+            with open(shardPath, "rb") as entrada:
+                header = entrada.readline()
+                if not existe:
+                    saida.write(header)
+                    existe = True
+                shutil.copyfileobj(entrada, saida, 1024 * 1024)
+
+
+def processarZipsEmParalelo(
+    jobs: List[ZipJob], caminhoStaging: Path, workers: int
+) -> List[tuple[str, dict]]:
+    """
+    Um shard por (ZIP, membro CSV), normalizado em processo separado para um
+    staging próprio; o merge segue a ordem serial, então o resultado final é
+    idêntico ao do processamento sequencial.
+    """
+    shards = listarShards(jobs)
+    shardsDir = caminhoStaging.parent / f"{caminhoStaging.stem}_shards"
+    if shardsDir.exists():
+        shutil.rmtree(shardsDir)
+    shardsDir.mkdir(parents=True)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            resultados = list(
+                pool.map(
+                    processarShard,
+                    shards,
+                    [shardsDir] * len(shards),
+                    [caminhoStaging] * len(shards),
+                )
+            )
+
+        mesclarShards([shardPath for _, _, shardPath in resultados], caminhoStaging)
+    finally:
+        shutil.rmtree(shardsDir, ignore_errors=True)
+
+    return [(nome, stats) for nome, stats, _ in resultados]
+
+
+def processarZipsIncremental(
+    jobs: List[ZipJob], caminhoStaging: Path, streaming: bool, workers: int
+) -> List[tuple[str, dict]]:
+    """
+    Normaliza só os ZIPs novos/alterados (hash no manifesto) para um staging
+    parcial por ZIP; o staging unificado é remontado a partir dos parciais,
+    na ordem dos ZIPs, então não duplica linhas entre execuções.
+    """
+    registro = manifest.Manifest.carregar(getArquivoManifest())
+    registro.validarParametros(
+        {
+            "formato": caminhoStaging.suffix.lstrip("."),
+            "filtroPrefixosConta": ",".join(getPrefixosContaFiltro() or ()),
+        }
+    )
+
+    resultados: List[tuple[str, dict]] = []
+    parciais: List[Path] = []
+
+    for job in jobs:
+        nome = job.zipPath.name
+        parcial = getArquivoStagingZip(job.zipPath, caminhoStaging)
+        parciais.append(parcial)
+
+        sha = registro.hashZip(job.zipPath)
+        entrada = registro.zips.get(nome) or {}
+        staging = entrada.get("staging") or {}
+        if entrada.get("sha256") == sha and staging.get(
+            "sha256"
+        ) == manifest.hashArquivo(parcial):
+            print(f"{nome} | inalterado (manifesto)")
             continue
 
-        for csvPath in csvs:
-            stats = processarCsvParaStaging(csvPath, stagingPath, trimestre)
-            print(f"{csvPath.name} | lidas={stats['total']} | match={stats['match']}")
+        manifest.removerArtefato(parcial)
+        if workers > 1:
+            stats = processarZipsEmParalelo([job], parcial, workers)
+        else:
+            stats = processarZipParaStaging(job, parcial, streaming)
+        resultados.extend(stats)
+
+        trimestre = job.trimestre or inferirTrimestreDoZip(nome)
+        registro.registrarZip(
+            job.zipPath,
+            sha,
+            trimestre=f"{trimestre.numero}T{trimestre.ano}" if trimestre else None,
+            staging={
+                "arquivo": parcial.name,
+                "sha256": manifest.hashArquivo(parcial),
+                "lidas": sum(s["total"] for _, s in stats),
+                "linhas": sum(s["match"] for _, s in stats),
+            },
+        )
+
+    atuais = {job.zipPath.name for job in jobs}
+    for nome in [n for n in registro.zips if n not in atuais]:
+        entrada = registro.removerZip(nome) or {}
+        arquivo = (entrada.get("staging") or {}).get("arquivo")
+        if arquivo:
+            manifest.removerArtefato(getDiretorioStagingZips() / arquivo)
+        print(f"{nome} | removido de data/raw (descartado do staging)")
+
+    origens = {
+        nome: (entrada.get("staging") or {}).get("sha256")
+        for nome, entrada in registro.zips.items()
+    }
+    if not registro.isDerivadoAtualizado("staging", caminhoStaging, origens):
+        manifest.removerArtefato(caminhoStaging)
+        mesclarShards(parciais, caminhoStaging, copiar=True)
+        registro.registrarDerivado(
+            "staging",
+            caminhoStaging,
+            origens,
+            linhas=sum(
+                (e.get("staging") or {}).get("linhas", 0)
+                for e in registro.zips.values()
+            ),
+        )
+
+    registro.salvar()
+    return resultados
+
+
+def getWorkersNormalizacao() -> int:
+    return int(os.getenv("ANS_NORMALIZACAO_WORKERS", "1"))
+
+
+def executarProcessamentoAns(
+    streaming: Optional[bool] = None,
+    workers: Optional[int] = None,
+    formato: Optional[str] = None,
+    incremental: Optional[bool] = None,
+) -> Path:
+    RAW_DIR.mkdir(parents=True, exist_ok=True)
+
+    if not any(RAW_DIR.glob("*.zip")):
+        executarDownloadAns()
+
+    stagingPath = getArquivoStaging(columnar.getFormatoIntermediario(formato))
+    if streaming is None:
+        streaming = isModoStreaming()
+    if workers is None:
+        workers = getWorkersNormalizacao()
+    if incremental is None:
+        incremental = manifest.isModoIncremental()
+
+    jobs = listarZipsRaw()
+    if not jobs:
+        raise RuntimeError("Nenhum ZIP encontrado em data/raw")
+
+    if incremental:
+        for nome, stats in processarZipsIncremental(
+            jobs, stagingPath, streaming, workers
+        ):
+            print(f"{nome} | lidas={stats['total']} | match={stats['match']}")
+        return stagingPath
+
+    if workers > 1:
+        # modo paralelo sempre lê direto do ZIP (streaming)
+        for nome, stats in processarZipsEmParalelo(jobs, stagingPath, workers):
+            print(f"{nome} | lidas={stats['total']} | match={stats['match']}")
+        return stagingPath
+
+    for job in jobs:
+        for nome, stats in processarZipParaStaging(job, stagingPath, streaming):
+            print(f"{nome} | lidas={stats['total']} | match={stats['match']}")
 
     return stagingPath
 
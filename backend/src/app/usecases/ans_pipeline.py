@@ -0,0 +1,175 @@
+import shutil
+from dataclasses import replace
+from pathlib import Path
+from typing import List, Optional
+
+from app.core import columnar
+from app.core.paths import DELIVERY_DIR, RAW_DIR
+from app.core.pipeline import Etapa
+from app.usecases import (
+    ans_agregate,
+    ans_consolidate,
+    ans_download,
+    ans_enrich_agregate,
+    ans_enrich_validate,
+    ans_normalization,
+    db_import,
+)
+
+
+def listarZipsRaw() -> List[Path]:
+    return sorted(RAW_DIR.glob("*.zip"))
+
+
+def montarEtapasTeste1(
+    formato: Optional[str] = None,
+    streaming: Optional[bool] = None,
+    workers: Optional[int] = None,
+    incremental: Optional[bool] = None,
+) -> List[Etapa]:
+    formato = columnar.getFormatoIntermediario(formato)
+
+    return [
+        Etapa(
+            nome="download",
+            executar=ans_download.executarDownloadAns,
+            saidas=listarZipsRaw,
+        ),
+        Etapa(
+            nome="normalizacao",
+            executar=lambda: ans_normalization.executarProcessamentoAns(
+                streaming=streaming,
+                workers=workers,
+                formato=formato,
+                incremental=incremental,
+            ),
+            dependencias=("download",),
+            entradas=listarZipsRaw,
+            saidas=lambda: [ans_normalization.getArquivoStaging(formato)],
+        ),
+        Etapa(
+            nome="consolidacao",
+            executar=lambda: ans_consolidate.consolidarDespesas(
+                formato=formato, incremental=incremental
+            ),
+            dependencias=("normalizacao",),
+            entradas=lambda: [ans_consolidate.getArquivoStaging(formato)],
+            saidas=lambda: [
+                ans_consolidate.getArquivoCsvFinal(),
+                ans_consolidate.getArquivoZipFinal(),
+            ],
+        ),
+    ]
+
+
+def entregarAgregado(nome: str) -> Path:
+    # entrega: runner é o único responsável por delivery/
+    DELIVERY_DIR.mkdir(parents=True, exist_ok=True)
+    zipEntrega = DELIVERY_DIR / f"Teste_Agregacao_{nome}.zip"
+    shutil.copyfile(ans_agregate.getArquivoZipFinal(nome), zipEntrega)
+    return zipEntrega
+
+
+def montarEtapasTeste2(
+    nome: str,
+    formato: Optional[str] = None,
+    incremental: Optional[bool] = None,
+    dependenciasConsolidado: tuple = (),
+    fundido: Optional[bool] = None,
+) -> List[Etapa]:
+    """
+    `dependenciasConsolidado`: etapas que produzem o consolidado do Teste 1
+    (vazio quando o Teste 2 roda sozinho). O CADOP não depende delas e roda
+    em paralelo com o Teste 1.
+    `fundido`: enriquecimento + agregação numa etapa só (uma passagem).
+    """
+    formato = columnar.getFormatoIntermediario(formato)
+    colunar = formato == columnar.FORMATO_PARQUET
+    if fundido is None:
+        fundido = ans_enrich_agregate.isModoFundido()
+
+    def consolidado() -> List[Path]:
+        if colunar:
+            return [ans_enrich_validate.getArquivoConsolidadoColunar()]
+        return [ans_enrich_validate.getArquivoConsolidado()]
+
+    cadop = Etapa(
+        nome="cadop",
+        executar=ans_enrich_validate.baixarCadopSeNecessario,
+        saidas=lambda: [ans_enrich_validate.getArquivoCadopLocal()],
+    )
+    entrega = Etapa(
+        nome="entrega",
+        executar=lambda: entregarAgregado(nome),
+        dependencias=("agregacao",),
+        saidas=lambda: [DELIVERY_DIR / f"Teste_Agregacao_{nome}.zip"],
+    )
+
+    if fundido:
+        return [
+            cadop,
+            Etapa(
+                nome="enriquecimento_agregacao",
+                executar=lambda: ans_enrich_agregate.executarEnriquecimentoEAgregacao(
+                    nome_zip=nome, formato=formato, incremental=incremental
+                ),
+                dependencias=("cadop", *dependenciasConsolidado),
+                entradas=lambda: consolidado()
+                + [ans_enrich_validate.getArquivoCadopLocal()],
+                saidas=lambda: [
+                    ans_enrich_validate.getArquivoFinalTeste2(),
+                    ans_agregate.getArquivoCsvAgregado(),
+                    ans_agregate.getArquivoZipFinal(nome),
+                ],
+            ),
+            replace(entrega, dependencias=("enriquecimento_agregacao",)),
+        ]
+
+    return [
+        cadop,
+        Etapa(
+            nome="enriquecimento",
+            executar=lambda: ans_enrich_validate.executarEnriquecimentoEValidacao(
+                formato=formato, incremental=incremental
+            ),
+            dependencias=("cadop", *dependenciasConsolidado),
+            entradas=lambda: consolidado()
+            + [ans_enrich_validate.getArquivoCadopLocal()],
+            saidas=lambda: [ans_enrich_validate.getArquivoFinalTeste2()],
+        ),
+        Etapa(
+            nome="agregacao",
+            executar=lambda: ans_agregate.executarAgregacaoAns(
+                nome_zip=nome, formato=formato, incremental=incremental
+            ),
+            dependencias=("enriquecimento",),
+            entradas=lambda: [
+                (
+                    ans_agregate.getArquivoInputColunar()
+                    if colunar
+                    else ans_agregate.getArquivoInput()
+                )
+            ],
+            saidas=lambda: [
+                ans_agregate.getArquivoCsvAgregado(),
+                ans_agregate.getArquivoZipFinal(nome),
+            ],
+        ),
+        entrega,
+    ]
+
+
+def montarEtapaImportacaoDb(
+    dependencias: tuple = ("entrega",),
+    tamanhoLote: Optional[int] = None,
+    incremental: Optional[bool] = None,
+) -> Etapa:
+    # última etapa: carga no PostgreSQL via COPY (substitui o psql + 002_import.sql)
+    return Etapa(
+        nome="importacao_db",
+        executar=lambda: db_import.executarImportacaoDb(
+            tamanhoLote=tamanhoLote, incremental=incremental
+        ),
+        dependencias=dependencias,
+        entradas=lambda: [caminho for _, caminho in db_import.getAlvosPadrao()],
+    )
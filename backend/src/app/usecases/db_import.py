@@ -0,0 +1,804 @@
+"""
+Carga dos artefatos do pipeline no PostgreSQL (Teste 3) sem psql.
+
+Mesmas regras de saneamento e rejeição de `db/002_import.sql`, aplicadas em
+Python durante a leitura do CSV: linhas válidas já tipadas vão por COPY
+binário para uma tabela temporária e entram no destino com um único
+INSERT ... ON CONFLICT por lote; rejeitadas vão por COPY direto para
+`import_rejeitados` (mesma origem/motivo/payload do script SQL).
+
+Modo incremental: cada alvo é dividido em partições (CADOP inteiro; fato
+por (ano, trimestre); agregada por (razao_social, uf)) com hash do conteúdo
+em `import_controle`. Só as partições cujo hash mudou desde a última carga
+passam pelo COPY; o upsert ainda ignora linhas idênticas às do banco. Na
+carga completa os hashes saem da mesma leitura do COPY; na incremental uma
+leitura só de hash decide as partições antes do COPY. Partição que sumiu do
+arquivo sai do controle e, na agregada (recalculada inteira), do destino.
+
+Diferenças em relação ao script:
+- valor que não converte para numeric(18,2) (ou inteiro fora do tipo)
+  rejeita a linha em vez de abortar a importação inteira;
+- chave repetida no mesmo lote: vale a última ocorrência (no SQL o
+  ON CONFLICT falha ao atualizar a mesma linha duas vezes);
+- vazio no CSV vira NULL no payload (o csv do Python não distingue `;;`
+  de `;"";`).
+"""
+
+import csv
+import hashlib
+import os
+import re
+import time
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import ROUND_HALF_UP, Decimal, InvalidOperation
+from pathlib import Path
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    # em runtime é opcional: quem usa chama exigirPsycopg() antes
+    import psycopg
+    from psycopg.types.json import Jsonb
+else:
+    try:
+        import psycopg
+        from psycopg.types.json import Jsonb
+    except ImportError:  # dependência opcional (carga no banco)
+        psycopg = None
+        Jsonb = None
+
+from app.core import manifest
+from app.core.deteccao import detectarFormato
+from app.services import cache
+from app.usecases import ans_agregate, ans_enrich_validate
+
+TAMANHO_LOTE = 50_000
+SCHEMA = "healthtech"
+
+MAX_INT4 = 2**31 - 1
+MAX_INT2 = 2**15 - 1
+# numeric(18,2): 16 dígitos antes da vírgula
+LIMITE_NUMERIC_18_2 = Decimal(10) ** 16
+CENTAVO = Decimal("0.01")
+
+VERDADEIROS = ("1", "true", "t", "yes", "y")
+FALSOS = ("0", "false", "f", "no", "n")
+
+DDL_REJEITADOS = """
+CREATE TABLE IF NOT EXISTS import_rejeitados (
+  origem     TEXT NOT NULL,
+  motivo     TEXT NOT NULL,
+  payload    JSONB NOT NULL,
+  criado_em  TIMESTAMPTZ NOT NULL DEFAULT now()
+)
+"""
+
+DDL_CONTROLE = """
+CREATE TABLE IF NOT EXISTS import_controle (
+  origem        TEXT NOT NULL,
+  particao      TEXT NOT NULL,
+  sha256        TEXT NOT NULL,
+  carregado_em  TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (origem, particao)
+)
+"""
+
+
+def exigirPsycopg():
+    if psycopg is None:
+        raise RuntimeError(
+            "Carga no banco requer psycopg. Instale com: pip install psycopg"
+        )
+
+
+def getTamanhoLote(tamanhoLote: Optional[int] = None) -> int:
+    return int(tamanhoLote or os.getenv("ANS_DB_LOTE") or TAMANHO_LOTE)
+
+
+def getDatabaseUrl(databaseUrl: Optional[str] = None) -> str:
+    if not databaseUrl:
+        try:
+            from dotenv import load_dotenv
+
+            load_dotenv(override=False)
+        except ImportError:
+            pass
+        databaseUrl = os.getenv("DATABASE_URL")
+    if not databaseUrl:
+        raise RuntimeError(
+            "DATABASE_URL não configurada. Defina no terminal ou no arquivo .env na raiz do projeto."
+        )
+    # mesma URL da API (SQLAlchemy): psycopg quer o DSN libpq puro
+    return databaseUrl.replace("postgresql+psycopg://", "postgresql://", 1)
+
+
+# =========================================================
+# Saneamento (mesmas regras do 002_import.sql)
+# =========================================================
+
+
+def limpar(valor: Optional[str]) -> Optional[str]:
+    # NULLIF(trim(x), '') — trim do Postgres só remove espaços
+    v = (valor or "").strip(" ")
+    return v or None
+
+
+def inteiro(valor: Optional[str], maximo: int) -> Optional[int]:
+    if valor is None or not (valor.isascii() and valor.isdigit()):
+        return None
+    n = int(valor)
+    return n if n <= maximo else None
+
+
+def booleano(valor: Optional[str]) -> Optional[bool]:
+    v = (valor or "").lower()
+    if v in VERDADEIROS:
+        return True
+    if v in FALSOS:
+        return False
+    return None
+
+
+def uf(valor: Optional[str]) -> Optional[str]:
+    v = (valor or "").upper()
+    return v if re.fullmatch(r"[A-Z]{2}", v) else None
+
+
+def cnpj(valor: Optional[str]) -> Optional[str]:
+    digitos = re.sub(r"[^0-9]", "", valor or "")
+    return digitos if len(digitos) == 14 else None
+
+
+def dataRegistro(valor: Optional[str]) -> Optional[date]:
+    if valor is None:
+        return None
+    for regex, formato in (
+        (r"\d{4}-\d{2}-\d{2}", "%Y-%m-%d"),
+        (r"\d{2}/\d{2}/\d{4}", "%d/%m/%Y"),
+    ):
+        if re.fullmatch(regex, valor):
+            try:
+                return datetime.strptime(valor, formato).date()
+            except ValueError:
+                return None
+    return None
+
+
+def monetario(valor: Optional[str]) -> Optional[Decimal]:
+    # replace(',', '.') + regexp_replace('[^0-9\.-]', '') + ::numeric(18,2)
+    if valor is None:
+        return None
+    v = re.sub(r"[^0-9.\-]", "", valor.replace(",", "."))
+    try:
+        d = Decimal(v).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+    except (InvalidOperation, ValueError):
+        return None
+    return d if abs(d) < LIMITE_NUMERIC_18_2 else None
+
+
+# =========================================================
+# Alvos
+# =========================================================
+
+COLUNAS_STG_CADOP = [
+    "registro_operadora",
+    "cnpj",
+    "razao_social",
+    "nome_fantasia",
+    "modalidade",
+    "logradouro",
+    "numero",
+    "complemento",
+    "bairro",
+    "cidade",
+    "uf",
+    "cep",
+    "ddd",
+    "telefone",
+    "fax",
+    "endereco_eletronico",
+    "representante",
+    "cargo_representante",
+    "regiao_de_comercializacao",
+    "data_registro_ans",
+]
+
+COLUNAS_STG_DESPESA = [
+    "registro_ans",
+    "cnpj",
+    "razao_social",
+    "modalidade",
+    "uf",
+    "trimestre",
+    "ano",
+    "valor_despesas",
+    "cnpj_valido",
+    "valor_positivo",
+    "razao_social_nao_vazia",
+    "erros",
+]
+
+COLUNAS_STG_AGREGADA = [
+    "razao_social",
+    "uf",
+    "total_despesas",
+    "media_trimestral",
+    "desvio_padrao",
+    "qtd_registros",
+]
+
+
+def tiparCadop(stg: Dict[str, Optional[str]]) -> Optional[tuple]:
+    registro = inteiro(limpar(stg["registro_operadora"]), MAX_INT4)
+    if registro is None:
+        return None
+    texto = {k: limpar(stg[k]) for k in COLUNAS_STG_CADOP}
+    return (
+        registro,
+        cnpj(stg["cnpj"]),
+        texto["razao_social"],
+        texto["nome_fantasia"],
+        texto["modalidade"],
+        uf(texto["uf"]),
+        texto["cidade"],
+        texto["logradouro"],
+        texto["numero"],
+        texto["complemento"],
+        texto["bairro"],
+        texto["cep"],
+        texto["ddd"],
+        texto["telefone"],
+        texto["fax"],
+        texto["endereco_eletronico"],
+        texto["representante"],
+        texto["cargo_representante"],
+        texto["regiao_de_comercializacao"],
+        dataRegistro(texto["data_registro_ans"]),
+    )
+
+
+def tiparDespesa(stg: Dict[str, Optional[str]]) -> Optional[tuple]:
+    registro = inteiro(limpar(stg["registro_ans"]), MAX_INT4)
+    ano = inteiro(limpar(stg["ano"]), MAX_INT2)
+    trimestre = inteiro(limpar(stg["trimestre"]), MAX_INT2)
+    valor = monetario(limpar(stg["valor_despesas"]))
+    if registro is None or ano is None or valor is None:
+        return None
+    # CHECK (trimestre BETWEEN 1 AND 4) abortaria a carga: rejeita a linha
+    if trimestre is None or not 1 <= trimestre <= 4:
+        return None
+    return (
+        registro,
+        ano,
+        trimestre,
+        valor,
+        booleano(limpar(stg["cnpj_valido"])),
+        booleano(limpar(stg["valor_positivo"])),
+        booleano(limpar(stg["razao_social_nao_vazia"])),
+        stg["erros"],
+    )
+
+
+def tiparAgregada(stg: Dict[str, Optional[str]]) -> Optional[tuple]:
+    razaoSocial = limpar(stg["razao_social"])
+    ufValida = uf(limpar(stg["uf"]))
+    total = monetario(limpar(stg["total_despesas"]))
+    if razaoSocial is None or ufValida is None or total is None:
+        return None
+    return (
+        razaoSocial,
+        ufValida,
+        total,
+        monetario(limpar(stg["media_trimestral"])),
+        monetario(limpar(stg["desvio_padrao"])),
+        inteiro(limpar(stg["qtd_registros"]), MAX_INT4),
+    )
+
+
+def particaoUnica(stg: Dict[str, Optional[str]]) -> str:
+    return "*"
+
+
+def particaoTrimestre(stg: Dict[str, Optional[str]]) -> str:
+    return f"{limpar(stg['ano']) or ''}T{limpar(stg['trimestre']) or ''}"
+
+
+def particaoRazaoUf(stg: Dict[str, Optional[str]]) -> str:
+    return f"{limpar(stg['razao_social']) or ''}|{(limpar(stg['uf']) or '').upper()}"
+
+
+@dataclass(frozen=True)
+class Alvo:
+    origem: str
+    motivo: str
+    tabela: str
+    colunas: Sequence[str]
+    tipos: Sequence[str]
+    chave: Sequence[str]
+    colunasStg: Sequence[str]
+    tipar: Callable[[Dict[str, Optional[str]]], Optional[tuple]]
+    # colunas sobrescritas no conflito; as demais usam COALESCE com o atual
+    sobrescrever: Sequence[str] = ()
+    # 3.2.1: cria operadora mínima para registro_ans fora do CADOP
+    garantirOperadora: bool = False
+    # unidade de carga incremental
+    particao: Callable[[Dict[str, Optional[str]]], str] = particaoUnica
+    # tabela particionada por (ano, trimestre): cria as partições do lote antes do upsert
+    particionadaPorTrimestre: bool = False
+    # expressão SQL que refaz `particao` numa linha do destino: partição que
+    # some do arquivo sai do destino (None = destino guarda o histórico)
+    sqlParticao: Optional[str] = None
+
+
+ALVO_CADOP = Alvo(
+    origem="cadop",
+    motivo="registro_operadora ausente/invalido",
+    tabela="operadora",
+    colunas=(
+        "registro_ans",
+        "cnpj",
+        "razao_social",
+        "nome_fantasia",
+        "modalidade",
+        "uf",
+        "cidade",
+        "logradouro",
+        "numero",
+        "complemento",
+        "bairro",
+        "cep",
+        "ddd",
+        "telefone",
+        "fax",
+        "endereco_eletronico",
+        "representante",
+        "cargo_representante",
+        "regiao_comercializacao",
+        "data_registro_ans",
+    ),
+    # CHAR(n) vai como text: o psycopg não tem dumper binário de bpchar e o
+    # formato binário dos dois é o mesmo (o servidor aplica o tamanho)
+    tipos=("int4", *["text"] * 18, "date"),
+    chave=("registro_ans",),
+    colunasStg=COLUNAS_STG_CADOP,
+    tipar=tiparCadop,
+)
+
+ALVO_DESPESA = Alvo(
+    origem="despesa_trimestral",
+    motivo="campo obrigatorio ausente/invalido",
+    tabela="despesa_trimestral",
+    colunas=(
+        "registro_ans",
+        "ano",
+        "trimestre",
+        "valor_despesas",
+        "cnpj_valido",
+        "valor_positivo",
+        "razao_social_nao_vazia",
+        "erros",
+    ),
+    tipos=("int4", "int2", "int2", "numeric", "bool", "bool", "bool", "text"),
+    chave=("registro_ans", "ano", "trimestre"),
+    colunasStg=COLUNAS_STG_DESPESA,
+    tipar=tiparDespesa,
+    sobrescrever=("valor_despesas",),
+    garantirOperadora=True,
+    particao=particaoTrimestre,
+    particionadaPorTrimestre=True,
+)
+
+ALVO_AGREGADA = Alvo(
+    origem="despesa_agregada",
+    motivo="razao_social/uf/total invalidos",
+    tabela="despesa_agregada_operadora_uf",
+    colunas=(
+        "razao_social",
+        "uf",
+        "total_despesas",
+        "media_trimestral",
+        "desvio_padrao",
+        "qtd_registros",
+    ),
+    tipos=("text", "text", "numeric", "numeric", "numeric", "int4"),
+    chave=("razao_social", "uf"),
+    colunasStg=COLUNAS_STG_AGREGADA,
+    tipar=tiparAgregada,
+    sobrescrever=("total_despesas",),
+    particao=particaoRazaoUf,
+    # recalculada inteira a cada agregação: grupo que sumiu ficou obsoleto
+    sqlParticao="razao_social || '|' || uf",
+)
+
+
+def sqlUpsert(alvo: Alvo, temporaria: str) -> str:
+    colunas = ", ".join(alvo.colunas)
+    chave = ", ".join(alvo.chave)
+    novos = {
+        c: (
+            f"EXCLUDED.{c}"
+            if c in alvo.sobrescrever
+            else f"COALESCE(EXCLUDED.{c}, {alvo.tabela}.{c})"
+        )
+        for c in alvo.colunas
+        if c not in alvo.chave
+    }
+    atualizacoes = ",\n  ".join(f"{c} = {v}" for c, v in novos.items())
+    atuais = ", ".join(f"{alvo.tabela}.{c}" for c in novos)
+    # DISTINCT ON: a última ocorrência da chave no lote vence;
+    # WHERE: linha idêntica à do banco não é reescrita
+    return (
+        f"INSERT INTO {alvo.tabela} ({colunas})\n"
+        f"SELECT DISTINCT ON ({chave}) {colunas} FROM {temporaria}\n"
+        f"ORDER BY {chave}, ordem DESC\n"
+        f"ON CONFLICT ({chave}) DO UPDATE SET\n  {atualizacoes}\n"
+        f"WHERE ({atuais}) IS DISTINCT FROM ({', '.join(novos.values())})"
+    )
+
+
+SQL_PLACEHOLDERS = """
+INSERT INTO operadora (registro_ans, uf)
+SELECT DISTINCT ON (registro_ans) registro_ans, uf
+FROM tmp_operadora_faltante
+ORDER BY registro_ans, (uf IS NULL)
+ON CONFLICT (registro_ans) DO NOTHING
+"""
+
+# criar_particao_despesa (db/funcoes_particao.sql) é idempotente; bancos ainda
+# sem o 004_migracao_particionamento.sql não têm a função e seguem sem ela
+SQL_TEM_PARTICOES = "SELECT to_regproc('criar_particao_despesa') IS NOT NULL"
+
+
+def sqlParticoes(temporaria: str) -> str:
+    return (
+        "SELECT criar_particao_despesa(ano, trimestre) "
+        f"FROM (SELECT DISTINCT ano, trimestre FROM {temporaria}) p "
+        "ORDER BY ano, trimestre"
+    )
+
+
+# resumo de /api/estatisticas (db/estatisticas_resumo.sql); mesma regra da função acima
+SQL_TEM_RESUMO = "SELECT to_regproc('atualizar_estatisticas_resumo') IS NOT NULL"
+
+
+def atualizarResumo(
+    conn, resultados: List["ResultadoCarga"], incremental: bool
+) -> bool:
+    """Recalcula o resumo na transação da carga; incremental sem mudança não precisa."""
+    if incremental and not any(r.gravadas or r.removidas for r in resultados):
+        return False
+    if not conn.execute(SQL_TEM_RESUMO).fetchone()[0]:
+        return False
+    conn.execute("SELECT atualizar_estatisticas_resumo()")
+    return True
+
+
+# =========================================================
+# Carga
+# =========================================================
+
+
+@dataclass
+class ResultadoCarga:
+    origem: str
+    arquivo: str
+    linhas: int = 0
+    gravadas: int = 0
+    rejeitadas: int = 0
+    # incremental: linhas de partições inalteradas (sem COPY)
+    ignoradas: int = 0
+    # linhas do destino em partições que sumiram do arquivo
+    removidas: int = 0
+    duracao_s: float = 0.0
+
+    @property
+    def linhasPorSegundo(self) -> float:
+        return self.linhas / self.duracao_s if self.duracao_s > 0 else 0.0
+
+    def resumo(self) -> str:
+        return (
+            f"{self.origem} | linhas={self.linhas} gravadas={self.gravadas} "
+            f"rejeitadas={self.rejeitadas} ignoradas={self.ignoradas} "
+            f"removidas={self.removidas} | "
+            f"{self.duracao_s:.2f}s "
+            f"({self.linhasPorSegundo:,.0f} linhas/s)"
+        )
+
+
+def lerStg(
+    caminho: Path, colunasStg: Sequence[str]
+) -> Iterator[Dict[str, Optional[str]]]:
+    # como o \copy: cabeçalho ignorado, colunas por posição
+    formato = detectarFormato(caminho)
+    with open(caminho, encoding=formato.encoding, newline="") as f:
+        reader = csv.reader(f, delimiter=formato.delimiter)
+        next(reader, None)
+        n = len(colunasStg)
+        for row in reader:
+            if not row:
+                continue
+            row = (row + [""] * n)[:n]
+            yield {k: (v if v != "" else None) for k, v in zip(colunasStg, row)}
+
+
+def lotes(linhas: Iterator, tamanho: int) -> Iterator[List]:
+    lote = []
+    for linha in linhas:
+        lote.append(linha)
+        if len(lote) >= tamanho:
+            yield lote
+            lote = []
+    if lote:
+        yield lote
+
+
+def copiar(
+    cur, tabela: str, colunas: Sequence[str], tipos: Sequence[str], linhas
+) -> None:
+    with cur.copy(
+        f"COPY {tabela} ({', '.join(colunas)}) FROM STDIN (FORMAT BINARY)"
+    ) as copy:
+        copy.set_types(list(tipos))
+        for linha in linhas:
+            copy.write_row(linha)
+
+
+class HashParticoes:
+    """sha256 do conteúdo bruto de cada partição, linha a linha."""
+
+    def __init__(self, alvo: Alvo):
+        self.alvo = alvo
+        self.total = 0
+        self._hashes: Dict[str, Any] = {}
+
+    def acompanhar(
+        self, linhas: Iterable[Dict[str, Optional[str]]]
+    ) -> Iterator[Dict[str, Optional[str]]]:
+        # hash na mesma passada de quem consome as linhas
+        for stg in linhas:
+            chave = self.alvo.particao(stg)
+            h = self._hashes.get(chave)
+            if h is None:
+                h = self._hashes[chave] = hashlib.sha256()
+            h.update("\x1f".join(v or "" for v in stg.values()).encode("utf-8") + b"\n")
+            self.total += 1
+            yield stg
+
+    def hexdigests(self) -> Dict[str, str]:
+        return {k: h.hexdigest() for k, h in self._hashes.items()}
+
+
+def hashParticoes(alvo: Alvo, caminho: Path) -> Tuple[Dict[str, str], int]:
+    """sha256 de cada partição + total de linhas, numa leitura só de hash."""
+    hashes = HashParticoes(alvo)
+    for _ in hashes.acompanhar(lerStg(caminho, alvo.colunasStg)):
+        pass
+    return hashes.hexdigests(), hashes.total
+
+
+def compararParticoes(hashes: Dict[str, str], anteriores: Dict[str, str]) -> Set[str]:
+    return {p for p, h in hashes.items() if anteriores.get(p) != h}
+
+
+def particoesRemovidas(hashes: Dict[str, str], anteriores: Dict[str, str]) -> Set[str]:
+    return set(anteriores) - set(hashes)
+
+
+def lerControle(conn, alvo: Alvo) -> Dict[str, str]:
+    cur = conn.execute(
+        "SELECT particao, sha256 FROM import_controle WHERE origem = %s",
+        (alvo.origem,),
+    )
+    return dict(cur.fetchall())
+
+
+def registrarControle(
+    conn, alvo: Alvo, hashes: Dict[str, str], particoes: Iterable[str]
+) -> None:
+    with conn.cursor() as cur:
+        cur.executemany(
+            "INSERT INTO import_controle (origem, particao, sha256) "
+            "VALUES (%s, %s, %s) "
+            "ON CONFLICT (origem, particao) DO UPDATE SET "
+            "sha256 = EXCLUDED.sha256, carregado_em = now()",
+            [(alvo.origem, p, hashes[p]) for p in sorted(particoes)],
+        )
+
+
+def removerParticoes(conn, alvo: Alvo, removidas: Set[str]) -> int:
+    """Tira do controle (e do destino, se `sqlParticao`) as partições que sumiram."""
+    if not removidas:
+        return 0
+    particoes = sorted(removidas)
+    linhas = 0
+    with conn.cursor() as cur:
+        if alvo.sqlParticao is not None:
+            cur.execute(
+                f"DELETE FROM {alvo.tabela} WHERE {alvo.sqlParticao} = ANY(%s)",
+                (particoes,),
+            )
+            linhas = max(cur.rowcount, 0)
+        cur.execute(
+            "DELETE FROM import_controle WHERE origem = %s AND particao = ANY(%s)",
+            (alvo.origem, particoes),
+        )
+    return linhas
+
+
+def carregarAlvo(
+    conn,
+    alvo: Alvo,
+    caminho: Path,
+    tamanhoLote: int,
+    particoes: Optional[Set[str]] = None,
+    hashes: Optional[HashParticoes] = None,
+) -> ResultadoCarga:
+    """
+    `particoes`: só as linhas dessas partições (None = arquivo inteiro).
+    `hashes`: recebe o hash de todas as linhas lidas, na mesma passada.
+    """
+    resultado = ResultadoCarga(origem=alvo.origem, arquivo=caminho.name)
+    if particoes is not None and not particoes:
+        return resultado
+    inicio = time.perf_counter()
+    temporaria = f"tmp_{alvo.tabela}"
+    upsert = sqlUpsert(alvo, temporaria)
+
+    with conn.cursor() as cur:
+        cur.execute(
+            f"CREATE TEMP TABLE {temporaria} "
+            f"(LIKE {alvo.tabela} INCLUDING DEFAULTS, ordem BIGINT) ON COMMIT DROP"
+        )
+        criarParticoes = False
+        if alvo.particionadaPorTrimestre:
+            criarParticoes = cur.execute(SQL_TEM_PARTICOES).fetchone()[0]
+        if alvo.garantirOperadora:
+            cur.execute(
+                "CREATE TEMP TABLE tmp_operadora_faltante "
+                "(registro_ans INTEGER, uf CHAR(2)) ON COMMIT DROP"
+            )
+
+        linhas = lerStg(caminho, alvo.colunasStg)
+        if hashes is not None:
+            linhas = hashes.acompanhar(linhas)
+        if particoes is not None:
+            linhas = (stg for stg in linhas if alvo.particao(stg) in particoes)
+
+        for lote in lotes(linhas, tamanhoLote):
+            validas = []
+            rejeitadas = []
+            faltantes = []
+            for stg in lote:
+                tipada = alvo.tipar(stg)
+                if tipada is None:
+                    rejeitadas.append((alvo.origem, alvo.motivo, Jsonb(stg)))
+                else:
+                    validas.append((*tipada, resultado.linhas + len(validas)))
+
+                if alvo.garantirOperadora:
+                    # 3.2.1: dimensão garantida para todo registro_ans válido do fato
+                    registro = inteiro(limpar(stg["registro_ans"]), MAX_INT4)
+                    if registro is not None:
+                        faltantes.append((registro, uf(limpar(stg["uf"]))))
+
+            if rejeitadas:
+                copiar(
+                    cur,
+                    "import_rejeitados",
+                    ("origem", "motivo", "payload"),
+                    ("text", "text", "jsonb"),
+                    rejeitadas,
+                )
+            if faltantes:
+                copiar(
+                    cur,
+                    "tmp_operadora_faltante",
+                    ("registro_ans", "uf"),
+                    ("int4", "text"),
+                    faltantes,
+                )
+                cur.execute(SQL_PLACEHOLDERS)
+                cur.execute("TRUNCATE tmp_operadora_faltante")
+            if validas:
+                copiar(
+                    cur,
+                    temporaria,
+                    (*alvo.colunas, "ordem"),
+                    (*alvo.tipos, "int8"),
+                    validas,
+                )
+                if criarParticoes:
+                    cur.execute(sqlParticoes(temporaria))
+                cur.execute(upsert)
+                resultado.gravadas += max(cur.rowcount, 0)
+                cur.execute(f"TRUNCATE {temporaria}")
+
+            resultado.linhas += len(lote)
+            resultado.rejeitadas += len(rejeitadas)
+
+    resultado.duracao_s = round(time.perf_counter() - inicio, 3)
+    return resultado
+
+
+def getAlvosPadrao() -> List[Tuple[Alvo, Path]]:
+    # mesma ordem do 002_import.sql: dimensão antes do fato
+    return [
+        (ALVO_CADOP, ans_enrich_validate.getArquivoCadopLocal()),
+        (ALVO_DESPESA, ans_enrich_validate.getArquivoFinalTeste2()),
+        (ALVO_AGREGADA, ans_agregate.getArquivoCsvAgregado()),
+    ]
+
+
+def executarImportacaoDb(
+    databaseUrl: Optional[str] = None,
+    tamanhoLote: Optional[int] = None,
+    alvos: Optional[List[Tuple[Alvo, Path]]] = None,
+    incremental: Optional[bool] = None,
+) -> List[ResultadoCarga]:
+    """
+    Carrega CADOP, consolidado final e agregadas numa transação só (como o
+    BEGIN/COMMIT do script). Requer o DDL (`db/001_ddl.sql`) já aplicado.
+    `incremental`: só as partições alteradas desde a última carga.
+    """
+    exigirPsycopg()
+    tamanhoLote = getTamanhoLote(tamanhoLote)
+    if incremental is None:
+        incremental = manifest.isModoIncremental()
+    alvos = alvos or getAlvosPadrao()
+
+    for _, caminho in alvos:
+        if not caminho.exists():
+            raise RuntimeError(f"{caminho.name} não encontrado. Rode o pipeline antes.")
+
+    resultados = []
+    with psycopg.connect(
+        getDatabaseUrl(databaseUrl), options=f"-csearch_path={SCHEMA}"
+    ) as conn:
+        with conn.transaction():
+            conn.execute(DDL_REJEITADOS)
+            conn.execute(DDL_CONTROLE)
+            for alvo, caminho in alvos:
+                anteriores = lerControle(conn, alvo)
+                if incremental:
+                    hashes, total = hashParticoes(alvo, caminho)
+                    particoes = compararParticoes(hashes, anteriores)
+                    resultado = carregarAlvo(
+                        conn, alvo, caminho, tamanhoLote, particoes
+                    )
+                    resultado.ignoradas = total - resultado.linhas
+                else:
+                    # carga completa também registra (a próxima pode ser
+                    # incremental), com o hash tirado da leitura do COPY
+                    lidas = HashParticoes(alvo)
+                    resultado = carregarAlvo(
+                        conn, alvo, caminho, tamanhoLote, hashes=lidas
+                    )
+                    hashes = lidas.hexdigests()
+                    particoes = set(hashes)
+                registrarControle(conn, alvo, hashes, particoes)
+                resultado.removidas = removerParticoes(
+                    conn, alvo, particoesRemovidas(hashes, anteriores)
+                )
+                print(resultado.resumo())
+                resultados.append(resultado)
+
+            if atualizarResumo(conn, resultados, incremental):
+                print("Resumo de estatísticas atualizado")
+
+    # depois do COMMIT: cache compartilhado da API (STATS_CACHE=sqlite/redis)
+    if cache.invalidar_estatisticas():
+        print("Cache de estatísticas da API invalidado")
+
+    return resultados
@@ -6,3 +6,121 @@ root = Path(__file__).resolve().parents[1]
 srcPath = root / "src"
 
 sys.path.insert(0, str(srcPath))
+
+import random
+import zipfile
+from dataclasses import dataclass
+
+import pytest
+
+HEADER_ANS = (
+    "DATA;REG_ANS;CD_CONTA_CONTABIL;DESCRICAO;VL_SALDO_INICIAL;VL_SALDO_FINAL\n"
+)
+
+CONTAS_ANS = [
+    ("411", "EVENTOS/ SINISTROS CONHECIDOS OU AVISADOS DE ASSISTÊNCIA A SAÚDE"),
+    ("41", "Despesas com Eventos / Sinistros"),
+    ("4111", "DESPESAS COM SINISTROS - JUDICIAL"),
+    ("311", "Contraprestações Efetivas de Operações de Planos"),
+    ("46", "Despesas Administrativas"),
+]
+
+HEADER_CADOP = (
+    "REGISTRO_OPERADORA;CNPJ;Razao_Social;Nome_Fantasia;Modalidade;Logradouro;"
+    "Numero;Complemento;Bairro;Cidade;UF;CEP;DDD;Telefone;Fax;Endereco_eletronico;"
+    "Representante;Cargo_Representante;Regiao_de_Comercializacao;Data_Registro_ANS\n"
+)
+
+
+@dataclass
+class PipelineDirs:
+    raw: Path
+    extracted: Path
+    staging: Path
+    teste1: Path
+    teste2: Path
+
+
+def gerarCnpj(rnd: random.Random) -> str:
+    base = [rnd.randint(0, 9) for _ in range(12)]
+    for pesos in (
+        [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2],
+        [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2],
+    ):
+        resto = sum(d * p for d, p in zip(base, pesos)) % 11
+        base.append(0 if resto < 2 else 11 - resto)
+    return "".join(map(str, base))
+
+
+def gerarValor(rnd: random.Random) -> str:
+    escolha = rnd.random()
+    if escolha < 0.05:
+        return "0"
+    if escolha < 0.1:
+        return f"-{rnd.randint(1, 9999)},{rnd.randint(0, 99):02d}"
+    inteiro = f"{rnd.randint(0, 50_000_000):,}".replace(",", ".")
+    return f"{inteiro},{rnd.randint(0, 99):02d}"
+
+
+def gerarDadosAns(
+    raw: Path, trimestres=((2025, 1), (2025, 2), (2025, 3)), operadoras=40, seed=7
+) -> None:
+    """ZIPs sintéticos no layout da ANS + Relatorio_cadop.csv em `raw`."""
+    rnd = random.Random(seed)
+    raw.mkdir(parents=True, exist_ok=True)
+    registros = [f"{rnd.randint(300, 420_000):06d}" for _ in range(operadoras)]
+
+    for ano, t in trimestres:
+        linhas = [HEADER_ANS]
+        for reg in registros:
+            for conta, descricao in CONTAS_ANS:
+                for _ in range(rnd.randint(1, 3)):
+                    linhas.append(
+                        f'01/{t * 3:02d}/{ano};"{reg}";"{conta}";"{descricao}";'
+                        f'"{gerarValor(rnd)}";"{gerarValor(rnd)}"\n'
+                    )
+        with zipfile.ZipFile(raw / f"{t}T{ano}.zip", "w", zipfile.ZIP_DEFLATED) as z:
+            z.writestr(f"{t}T{ano}.csv", "".join(linhas).encode("latin-1"))
+
+    ufs = ["SP", "RJ", "MG", "RS", ""]
+    cadop = [HEADER_CADOP]
+    for i, reg in enumerate(registros[:-3]):  # algumas operadoras sem cadastro
+        cnpj = gerarCnpj(rnd) if i % 9 else "11111111111111"
+        razao = f"OPERADORA {i % 25} SAÚDE LTDA" if i % 11 else ""
+        cadop.append(
+            f'"{reg}";"{cnpj}";"{razao}";;"Medicina de Grupo";;;;;;'
+            f'"{ufs[i % len(ufs)]}";;;;;;;;;"2015-05-19"\n'
+        )
+    (raw / "Relatorio_cadop.csv").write_text("".join(cadop), encoding="utf-8")
+
+
+@pytest.fixture
+def pipelineDirs(tmp_path: Path, monkeypatch) -> PipelineDirs:
+    """Redireciona os diretórios de dados de todos os usecases para tmp_path."""
+    from app.usecases import (
+        ans_agregate,
+        ans_consolidate,
+        ans_enrich_validate,
+        ans_normalization,
+    )
+
+    dirs = PipelineDirs(
+        raw=tmp_path / "raw",
+        extracted=tmp_path / "extracted",
+        staging=tmp_path / "staging",
+        teste1=tmp_path / "output" / "teste1",
+        teste2=tmp_path / "output" / "teste2",
+    )
+
+    monkeypatch.setattr(ans_normalization, "RAW_DIR", dirs.raw)
+    monkeypatch.setattr(ans_normalization, "EXTRACTED_DIR", dirs.extracted)
+    monkeypatch.setattr(ans_normalization, "STAGING_DIR", dirs.staging)
+    monkeypatch.setattr(ans_consolidate, "STAGING_DIR", dirs.staging)
+    monkeypatch.setattr(ans_consolidate, "OUTPUT_TESTE1_DIR", dirs.teste1)
+    monkeypatch.setattr(ans_enrich_validate, "RAW_DIR", dirs.raw)
+    monkeypatch.setattr(ans_enrich_validate, "OUTPUT_TESTE1_DIR", dirs.teste1)
+    monkeypatch.setattr(ans_enrich_validate, "OUTPUT_TESTE2_DIR", dirs.teste2)
+    monkeypatch.setattr(ans_agregate, "OUTPUT_TESTE2_DIR", dirs.teste2)
+
+    gerarDadosAns(dirs.raw)
+    return dirs
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import csv
+from decimal import Decimal
+from pathlib import Path
+
+from app.usecases.ans_agregate import WelfordAgg, agruparLinhas, escreverAgregado
+
+
+def test_welford_total_media_e_desvio():
+    agg = WelfordAgg()
+    for v in ("10", "20.5", "30.25"):
+        agg.add(Decimal(v))
+    assert agg.n == 3
+    assert agg.resultado() == (Decimal("60.75"), Decimal("20.25"), Decimal("8.27"))
+
+
+def test_ordena_pelo_total_numerico(tmp_path: Path):
+    # como texto "9.00" > "10.00"; a ordem tem que ser a do valor
+    linhas = [
+        ("A", "SP", Decimal("9")),
+        ("B", "RJ", Decimal("10")),
+        ("C", "MG", Decimal("100.5")),
+        ("C", "MG", Decimal("-1")),
+    ]
+    out_csv = tmp_path / "agregadas.csv"
+    assert escreverAgregado(agruparLinhas(linhas), out_csv, tmp_path / "a.zip") == 3
+
+    with open(out_csv, newline="", encoding="utf-8") as f:
+        registros = list(csv.DictReader(f, delimiter=";"))
+    assert [(r["RazaoSocial"], r["total_despesas"]) for r in registros] == [
+        ("C", "99.50"),
+        ("B", "10.00"),
+        ("A", "9.00"),
+    ]
@@ -0,0 +1,139 @@
+from __future__ import annotations
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+from app.core.types import Trimestre
+from app.usecases.ans_download import Arquivo, baixarArquivos, getArquivoEtag
+
+ARQUIVOS = {
+    "1T2025.zip": bytes(range(256)) * 4096,
+    "2T2025.zip": b"conteudo-2t" * 50_000,
+    "3T2025.zip": b"conteudo-3t" * 70_000,
+}
+
+
+class ServidorAns(BaseHTTPRequestHandler):
+    """Stand-in do FTP da ANS: HEAD, ETag e Range (206) como um servidor real."""
+
+    gets: list[tuple[str, str | None]] = []
+
+    def log_message(self, format, *args):
+        pass
+
+    def _corpo(self) -> bytes | None:
+        return ARQUIVOS.get(self.path.lstrip("/"))
+
+    def _etag(self) -> str:
+        return f'"{self.path.lstrip("/")}-v1"'
+
+    def do_HEAD(self):
+        corpo = self._corpo()
+        if corpo is None:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(corpo)))
+        self.send_header("ETag", self._etag())
+        self.end_headers()
+
+    def do_GET(self):
+        corpo = self._corpo()
+        faixa = self.headers.get("Range")
+        ServidorAns.gets.append((self.path, faixa))
+        if corpo is None:
+            self.send_error(404)
+            return
+
+        if faixa and self.headers.get("If-Range", self._etag()) == self._etag():
+            inicio = int(faixa.removeprefix("bytes=").split("-")[0])
+            if inicio >= len(corpo):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(corpo)}")
+                self.end_headers()
+                return
+            parte = corpo[inicio:]
+            self.send_response(206)
+            self.send_header(
+                "Content-Range", f"bytes {inicio}-{len(corpo) - 1}/{len(corpo)}"
+            )
+        else:
+            parte = corpo
+            self.send_response(200)
+
+        self.send_header("Content-Length", str(len(parte)))
+        self.send_header("ETag", self._etag())
+        self.end_headers()
+        self.wfile.write(parte)
+
+
+@pytest.fixture
+def servidor():
+    ServidorAns.gets = []
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), ServidorAns)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{httpd.server_address[1]}/"
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def criarArquivos(baseUrl: str) -> list[Arquivo]:
+    return [
+        Arquivo(url=baseUrl + nome, nome=nome, trimestre=Trimestre(2025, i + 1))
+        for i, nome in enumerate(sorted(ARQUIVOS))
+    ]
+
+
+def test_baixa_todos_em_paralelo(servidor: str, tmp_path: Path):
+    resultados = baixarArquivos(criarArquivos(servidor), tmp_path, maxWorkers=3)
+
+    assert [r.status for r in resultados] == ["baixado"] * 3
+    for nome, corpo in ARQUIVOS.items():
+        assert (tmp_path / nome).read_bytes() == corpo
+        assert not (tmp_path / f"{nome}.part").exists()
+        assert getArquivoEtag(tmp_path / nome).exists()
+
+
+def test_retoma_part_existente_com_range(servidor: str, tmp_path: Path):
+    nome = "1T2025.zip"
+    corpo = ARQUIVOS[nome]
+    parcial = tmp_path / f"{nome}.part"
+    parcial.write_bytes(corpo[:100_000])
+    getArquivoEtag(parcial).write_text(f'"{nome}-v1"', encoding="utf-8")
+
+    arquivo = [a for a in criarArquivos(servidor) if a.nome == nome]
+    (resultado,) = baixarArquivos(arquivo, tmp_path, maxWorkers=1)
+
+    assert resultado.status == "retomado"
+    assert resultado.bytes == len(corpo) - 100_000
+    assert (tmp_path / nome).read_bytes() == corpo
+    assert ServidorAns.gets == [(f"/{nome}", "bytes=100000-")]
+
+
+def test_part_de_outra_versao_baixa_do_zero(servidor: str, tmp_path: Path):
+    nome = "2T2025.zip"
+    parcial = tmp_path / f"{nome}.part"
+    parcial.write_bytes(b"lixo-de-versao-antiga")
+    getArquivoEtag(parcial).write_text('"outra-versao"', encoding="utf-8")
+
+    arquivo = [a for a in criarArquivos(servidor) if a.nome == nome]
+    (resultado,) = baixarArquivos(arquivo, tmp_path, maxWorkers=1)
+
+    assert resultado.status == "baixado"
+    assert (tmp_path / nome).read_bytes() == ARQUIVOS[nome]
+
+
+def test_ignora_arquivos_ja_atualizados(servidor: str, tmp_path: Path):
+    arquivos = criarArquivos(servidor)
+    baixarArquivos(arquivos, tmp_path, maxWorkers=2)
+    ServidorAns.gets = []
+
+    resultados = baixarArquivos(arquivos, tmp_path, maxWorkers=2)
+
+    assert [r.status for r in resultados] == ["ignorado"] * 3
+    assert ServidorAns.gets == []
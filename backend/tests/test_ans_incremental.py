@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import json
+import shutil
+
+import pytest
+from app.usecases.ans_agregate import executarAgregacaoAns
+from app.usecases.ans_consolidate import consolidarDespesas
+from app.usecases.ans_enrich_validate import executarEnriquecimentoEValidacao
+from app.usecases.ans_normalization import executarProcessamentoAns
+from conftest import PipelineDirs, gerarDadosAns
+
+
+def executarTeste1(formato: str, incremental: bool) -> bytes:
+    executarProcessamentoAns(
+        streaming=True, workers=1, formato=formato, incremental=incremental
+    )
+    zipFinal = consolidarDespesas(formato=formato, incremental=incremental)
+    return zipFinal.with_suffix(".csv").read_bytes()
+
+
+def executarCompleto(dirs: PipelineDirs, formato: str) -> bytes:
+    # rebuild do zero, sem manifesto, para comparação
+    shutil.rmtree(dirs.staging, ignore_errors=True)
+    return executarTeste1(formato, incremental=False)
+
+
+def lerManifesto(dirs: PipelineDirs) -> dict:
+    return json.loads((dirs.staging / "manifest.json").read_text(encoding="utf-8"))
+
+
+@pytest.mark.parametrize("formato", ["csv", "parquet"])
+def test_trimestre_novo_processa_so_o_zip_novo(
+    pipelineDirs: PipelineDirs, formato: str, capsys
+):
+    if formato == "parquet":
+        pytest.importorskip("pyarrow")
+
+    novo = pipelineDirs.raw / "3T2025.zip"
+    guardado = novo.rename(pipelineDirs.raw.parent / novo.name)
+    executarTeste1(formato, incremental=True)
+    guardado.rename(novo)
+    capsys.readouterr()
+
+    incremental = executarTeste1(formato, incremental=True)
+    saida = capsys.readouterr().out
+
+    assert "1T2025.zip | inalterado (manifesto)" in saida
+    assert "2T2025.zip | inalterado (manifesto)" in saida
+    assert "3T2025.csv | lidas=" in saida
+    assert "1T2025.zip | consolidado parcial" not in saida
+    assert sorted(lerManifesto(pipelineDirs)["zips"]) == [
+        "1T2025.zip",
+        "2T2025.zip",
+        "3T2025.zip",
+    ]
+
+    staging = pipelineDirs.staging / f"eventos_sinistros_staging.{formato}"
+    stagingIncremental = sorted(staging.iterdir()) if staging.is_dir() else None
+    csvIncremental = staging.read_bytes() if staging.is_file() else None
+
+    assert executarCompleto(pipelineDirs, formato) == incremental
+    if csvIncremental is not None:
+        assert staging.read_bytes() == csvIncremental
+    else:
+        assert stagingIncremental is not None
+        assert len(list(staging.iterdir())) == len(stagingIncremental)
+
+
+def test_reexecucao_nao_duplica_staging(pipelineDirs: PipelineDirs, capsys):
+    primeira = executarTeste1("csv", incremental=True)
+    staging = (pipelineDirs.staging / "eventos_sinistros_staging.csv").read_bytes()
+    capsys.readouterr()
+
+    segunda = executarTeste1("csv", incremental=True)
+
+    assert capsys.readouterr().out.count("inalterado (manifesto)") == 3
+    assert segunda == primeira
+    assert (
+        pipelineDirs.staging / "eventos_sinistros_staging.csv"
+    ).read_bytes() == staging
+
+
+def test_zip_alterado_e_removido(pipelineDirs: PipelineDirs, capsys):
+    executarTeste1("csv", incremental=True)
+
+    # 2T2025 republicado com outro conteúdo; 1T2025 retirado do raw
+    outro = pipelineDirs.raw.parent / "outro"
+    gerarDadosAns(outro, trimestres=((2025, 2),), seed=99)
+    shutil.copyfile(outro / "2T2025.zip", pipelineDirs.raw / "2T2025.zip")
+    (pipelineDirs.raw / "1T2025.zip").unlink()
+    capsys.readouterr()
+
+    incremental = executarTeste1("csv", incremental=True)
+    saida = capsys.readouterr().out
+
+    assert "3T2025.zip | inalterado (manifesto)" in saida
+    assert "2T2025.csv | lidas=" in saida
+    assert "1T2025.zip | removido" in saida
+    assert sorted(lerManifesto(pipelineDirs)["zips"]) == ["2T2025.zip", "3T2025.zip"]
+    assert not (pipelineDirs.staging / "consolidado_zips" / "1T2025.csv").exists()
+    assert executarCompleto(pipelineDirs, "csv") == incremental
+
+
+def test_teste2_pula_etapas_com_entradas_inalteradas(
+    pipelineDirs: PipelineDirs, capsys
+):
+    executarTeste1("csv", incremental=True)
+    final = executarEnriquecimentoEValidacao(formato="csv", incremental=True)
+    agregado, _ = executarAgregacaoAns(
+        nome_zip="teste", formato="csv", incremental=True
+    )
+    esperado = agregado.read_bytes()
+    capsys.readouterr()
+
+    executarTeste1("csv", incremental=True)
+    executarEnriquecimentoEValidacao(formato="csv", incremental=True)
+    executarAgregacaoAns(nome_zip="teste", formato="csv", incremental=True)
+    saida = capsys.readouterr().out
+
+    assert f"{final.name} | inalterado (manifesto)" in saida
+    assert f"{agregado.name} | inalterado (manifesto)" in saida
+    assert agregado.read_bytes() == esperado
+
+    # CADOP mudou: enriquecimento e agregação são refeitos
+    cadop = pipelineDirs.raw / "Relatorio_cadop.csv"
+    cadop.write_text(cadop.read_text(encoding="utf-8") + "\n", encoding="utf-8")
+    executarEnriquecimentoEValidacao(formato="csv", incremental=True)
+    saida = capsys.readouterr().out
+
+    assert "inalterado" not in saida
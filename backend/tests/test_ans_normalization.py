@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import zipfile
+from pathlib import Path
+
+import pytest
+from app.core.types import Trimestre
+from app.usecases import ans_normalization
+from app.usecases.ans_normalization import ZipJob, processarZipParaStaging
+
+HEADER = "DATA;REG_ANS;CD_CONTA_CONTABIL;DESCRICAO;VL_SALDO_INICIAL;VL_SALDO_FINAL\n"
+
+LINHAS = [
+    '01/01/2025;"123456";"411";"Despesas com Eventos / Sinistros";"1.000,50";"2.345,67"\n',
+    '01/01/2025;"123456";"311";"Contraprestações Efetivas";"10,00";"20,00"\n',
+    '2025-01-01;"654321";"4111";"DESPESAS  COM SINISTROS   Conhecidos";"0";"99,9"\n',
+    '01/01/2025;"777777";"41";"Despesas de Comercialização";"1,00";"2,00"\n',
+]
+
+
+def criarZip(destino: Path, membros: dict[str, bytes]) -> Path:
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as z:
+        for nome, conteudo in membros.items():
+            z.writestr(nome, conteudo)
+    return destino
+
+
+@pytest.fixture
+def zipAns(tmp_path: Path) -> Path:
+    corpo = HEADER + "".join(LINHAS * 500)
+    return criarZip(
+        tmp_path / "1T2025.zip",
+        {
+            "1T2025.csv": corpo.encode("latin-1"),
+            "pasta/1T2025_ajuste.csv": corpo.encode("utf-8-sig"),
+            "leiame.txt": b"ignorar",
+        },
+    )
+
+
+def test_streaming_gera_staging_identico_a_extracao(
+    zipAns: Path, tmp_path: Path, monkeypatch
+):
+    monkeypatch.setattr(ans_normalization, "EXTRACTED_DIR", tmp_path / "extracted")
+    job = ZipJob(zipPath=zipAns, trimestre=Trimestre(2025, 1))
+
+    stagingExtracao = tmp_path / "extracao.csv"
+    stagingStreaming = tmp_path / "streaming.csv"
+
+    statsExtracao = processarZipParaStaging(job, stagingExtracao, streaming=False)
+    statsStreaming = processarZipParaStaging(job, stagingStreaming, streaming=True)
+
+    assert statsStreaming == statsExtracao
+    assert statsStreaming == [
+        ("1T2025.csv", {"total": 2000, "match": 1000}),
+        ("1T2025_ajuste.csv", {"total": 2000, "match": 1000}),
+    ]
+    assert stagingStreaming.read_bytes() == stagingExtracao.read_bytes()
+
+
+def test_streaming_nao_extrai_para_disco(zipAns: Path, tmp_path: Path, monkeypatch):
+    extracted = tmp_path / "extracted"
+    monkeypatch.setattr(ans_normalization, "EXTRACTED_DIR", extracted)
+    job = ZipJob(zipPath=zipAns, trimestre=Trimestre(2025, 1))
+
+    processarZipParaStaging(job, tmp_path / "staging.csv", streaming=True)
+
+    assert not extracted.exists()
+
+
+def test_encoding_de_amostra_truncada_no_meio_de_caractere():
+    amostra = "DESCRIÇÃO".encode("utf-8")[:-1]
+    assert ans_normalization.detectarEncodingAmostra(amostra) != "latin-1"
+
+
+def test_paralelo_gera_staging_identico_ao_serial(tmp_path: Path):
+    corpo = HEADER + "".join(LINHAS * 300)
+    jobs = []
+    for t in (1, 2, 3):
+        zipPath = criarZip(
+            tmp_path / f"{t}T2025.zip",
+            {
+                f"{t}T2025.csv": corpo.encode("latin-1"),
+                f"{t}T2025_b.csv": (HEADER + LINHAS[0] * t).encode("utf-8"),
+            },
+        )
+        jobs.append(ZipJob(zipPath=zipPath, trimestre=Trimestre(2025, t)))
+
+    stagingSerial = tmp_path / "serial" / "staging.csv"
+    stagingParalelo = tmp_path / "paralelo" / "staging.csv"
+
+    statsSerial = [
+        item
+        for job in jobs
+        for item in processarZipParaStaging(job, stagingSerial, streaming=True)
+    ]
+    statsParalelo = ans_normalization.processarZipsEmParalelo(
+        jobs, stagingParalelo, workers=3
+    )
+
+    assert statsParalelo == statsSerial
+    assert stagingParalelo.read_bytes() == stagingSerial.read_bytes()
+    assert not (stagingParalelo.parent / "staging_shards").exists()
+
+
+def test_filtro_memoizado_equivale_ao_original():
+    semCache = ans_normalization.isDespesasEventosSinistros.__wrapped__
+    for linha in LINHAS:
+        descricao = linha.split(";")[3].strip('"')
+        assert ans_normalization.isDespesasEventosSinistros(descricao) == semCache(
+            descricao
+        )
+
+
+def test_filtro_por_prefixo_de_conta(zipAns: Path, tmp_path: Path, monkeypatch):
+    monkeypatch.setenv("ANS_FILTRO_PREFIXOS_CONTA", "41")
+    job = ZipJob(zipPath=zipAns, trimestre=Trimestre(2025, 1))
+    staging = tmp_path / "staging.csv"
+
+    stats = processarZipParaStaging(job, staging, streaming=True)
+
+    # contas 411, 4111 e 41 casam; 311 não
+    assert stats[0] == ("1T2025.csv", {"total": 2000, "match": 1500})
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from decimal import Decimal
+
+import pytest
+from app.usecases.ans_agregate import executarAgregacaoAns
+from app.usecases.ans_consolidate import consolidarDespesas
+from app.usecases.ans_enrich_validate import executarEnriquecimentoEValidacao
+from app.usecases.ans_normalization import executarProcessamentoAns
+from conftest import PipelineDirs
+
+
+def executarPipeline(formato: str) -> dict[str, bytes]:
+    executarProcessamentoAns(streaming=True, workers=1, formato=formato)
+    consolidarDespesas(formato=formato)
+    final = executarEnriquecimentoEValidacao(formato=formato)
+    agregado, _ = executarAgregacaoAns(nome_zip="teste", formato=formato)
+
+    consolidado = final.parents[1] / "teste1" / "consolidado_despesas.csv"
+    return {
+        "consolidado": consolidado.read_bytes(),
+        "final": final.read_bytes(),
+        "agregado": agregado.read_bytes(),
+    }
+
+
+def test_parquet_mantem_entregaveis_identicos(pipelineDirs: PipelineDirs):
+    pytest.importorskip("pyarrow")
+
+    csv = executarPipeline("csv")
+    parquet = executarPipeline("parquet")
+
+    assert (pipelineDirs.staging / "eventos_sinistros_staging.parquet").is_dir()
+    assert (pipelineDirs.teste1 / "consolidado_despesas.parquet").exists()
+    assert (pipelineDirs.teste2 / "consolidado_despesas_final.parquet").exists()
+    assert parquet == csv
+    # zeros à esquerda do RegistroANS preservados
+    assert any(l.startswith(b"0") for l in csv["consolidado"].splitlines()[1:])
+
+
+def test_parquet_paralelo_mantem_staging_colunar(pipelineDirs: PipelineDirs):
+    pytest.importorskip("pyarrow")
+
+    executarProcessamentoAns(streaming=True, workers=1, formato="parquet")
+    serial = consolidarDespesas(formato="parquet").with_suffix(".csv").read_bytes()
+
+    staging = pipelineDirs.staging / "eventos_sinistros_staging.parquet"
+    for parte in staging.iterdir():
+        parte.unlink()
+    executarProcessamentoAns(workers=2, formato="parquet")
+    paralelo = consolidarDespesas(formato="parquet").with_suffix(".csv").read_bytes()
+
+    assert paralelo == serial
+
+
+@pytest.mark.parametrize("formato", ["csv", "parquet"])
+def test_motor_vetorizado_gera_consolidado_identico(
+    pipelineDirs: PipelineDirs, formato: str
+):
+    pytest.importorskip("pyarrow")
+    pytest.importorskip("numpy")
+
+    executarProcessamentoAns(streaming=True, workers=1, formato=formato)
+    consolidado = pipelineDirs.teste1 / "consolidado_despesas.csv"
+
+    consolidarDespesas(formato=formato, motor="decimal")
+    esperado = consolidado.read_bytes()
+    consolidarDespesas(formato=formato, motor="vetorizado")
+
+    assert consolidado.read_bytes() == esperado
+
+
+def test_motor_vetorizado_replica_expoente_do_decimal(tmp_path, capsys):
+    pytest.importorskip("pyarrow")
+    pytest.importorskip("numpy")
+    from app.usecases.ans_consolidate import acumularDecimal, acumularVetorizado
+
+    staging = tmp_path / "staging.csv"
+    staging.write_text(
+        "data,reg_ans,cd_conta_contabil,descricao,vl_saldo_inicial,vl_saldo_final,"
+        "ano,trimestre,fonte_arquivo\n"
+        ",8,,,,,2025,1,a\n"
+        ",1,,,,0,2025,1,a\n"
+        ",2,,,,99.9,2025,1,a\n"
+        ",2,,,,0.05,2025,1,a\n"
+        ",3,,,,1E+3,2025,1,a\n"
+        ",3,,,,-5.00,2025,1,a\n"
+        ",4,,,,lixo,2025,1,a\n"
+        ",4,,,,,2025,1,a\n"
+        ",,,,,10.00,2025,1,a\n"
+        ",5,,,,123456789012345678.12,2025,2,a\n"
+        ",5,,,,123456789012345678.12,2025,2,a\n"
+        # expoentes a mais de 18 casas um do outro: 10 ** amplitude não cabe
+        # em int64 e precisa ir para int Python antes da soma
+        ",6,,,,1000,2025,3,a\n"
+        ",6,,,,0.0000000000000000001,2025,3,a\n"
+        ",7,,,,5E+25,2025,3,a\n"
+        ",7,,,,0.01,2025,3,a\n"
+        ",1,,,,-0.00,2025,1,a\n"
+        ",8,,,,7.5,2025,1,a\n",
+        encoding="utf-8",
+    )
+
+    esperado = acumularDecimal(staging, "csv")
+    obtido = acumularVetorizado(staging, "csv")
+
+    assert list(obtido.items()) == list(esperado.items())
+    assert [str(v) for v in obtido.values()] == [str(v) for v in esperado.values()]
+    # inválido/vazio soma 0 (chave na 1ª ocorrência) e os dois motores reportam
+    assert [k[0] for k in obtido] == ["8", "1", "2", "3", "4", "5", "6", "7"]
+    assert str(obtido[("4", "2025", "1")]) == "0"
+    assert str(obtido[("8", "2025", "1")]) == "7.5"
+    assert obtido[("6", "2025", "3")] == Decimal("1000.0000000000000000001")
+    assert obtido[("7", "2025", "3")] == Decimal("50000000000000000000000000.01")
+    recusados = "valores recusados (somados como 0): {'vazio': 2, 'invalido': 1}"
+    assert capsys.readouterr().out.count(recusados) == 2
+
+
+@pytest.mark.parametrize("formato", ["csv", "parquet"])
+def test_modo_fundido_gera_arquivos_identicos(pipelineDirs: PipelineDirs, formato: str):
+    if formato == "parquet":
+        pytest.importorskip("pyarrow")
+    from app.usecases.ans_enrich_agregate import executarEnriquecimentoEAgregacao
+
+    executarProcessamentoAns(streaming=True, workers=1, formato=formato)
+    consolidarDespesas(formato=formato)
+    final = executarEnriquecimentoEValidacao(formato=formato)
+    agregado, _ = executarAgregacaoAns(nome_zip="teste", formato=formato)
+    esperado = (final.read_bytes(), agregado.read_bytes())
+
+    final.unlink()
+    agregado.unlink()
+    fundidoFinal, fundidoAgregado, fundidoZip = executarEnriquecimentoEAgregacao(
+        nome_zip="teste", formato=formato
+    )
+
+    assert (fundidoFinal.read_bytes(), fundidoAgregado.read_bytes()) == esperado
+    assert fundidoZip.exists() and final.with_suffix(".zip").exists()
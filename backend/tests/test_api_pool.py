@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import asyncio
+import importlib
+from typing import cast
+
+import pytest
+from app.api import pool
+from app.api.pool import MetricasPool, config_pool, get_prepare_threshold
+from app.api.utils import executar
+from sqlalchemy.engine.interfaces import DBAPIConnection
+from sqlalchemy.exc import OperationalError, TimeoutError
+
+
+def test_config_pool_pelo_ambiente(monkeypatch):
+    for var in ("API_DB_POOL_SIZE", "API_DB_MAX_OVERFLOW", "API_DB_PRE_PING"):
+        monkeypatch.delenv(var, raising=False)
+    padrao = config_pool()
+    assert (padrao["pool_size"], padrao["max_overflow"]) == (5, 10)
+    assert padrao["pool_pre_ping"] is False
+
+    monkeypatch.setenv("API_DB_POOL_SIZE", "20")
+    monkeypatch.setenv("API_DB_PRE_PING", "1")
+    assert config_pool()["pool_size"] == 20
+    assert config_pool()["pool_pre_ping"] is True
+
+
+@pytest.mark.parametrize("valor, esperado", [(None, 5), ("0", 0), ("none", None)])
+def test_prepare_threshold(monkeypatch, valor, esperado):
+    if valor is None:
+        monkeypatch.delenv("API_DB_PREPARE_THRESHOLD", raising=False)
+    else:
+        monkeypatch.setenv("API_DB_PREPARE_THRESHOLD", valor)
+    assert get_prepare_threshold() == esperado
+
+
+def test_metricas_de_checkout_e_timeout():
+    conexoes = []
+
+    def abrir():
+        conexoes.append(object())
+        return cast(DBAPIConnection, _ConexaoFake())
+
+    metricas = MetricasPool()
+    p = pool.PoolMedido(abrir, pool_size=1, max_overflow=0, timeout=0.05)
+    p.metricas = metricas
+
+    primeira = p.connect()
+    with pytest.raises(TimeoutError):
+        p.connect()  # pool de 1, já em uso: espera o timeout
+    primeira.close()
+    p.connect().close()
+
+    dados = metricas.como_dict(p)
+    assert dados["checkouts"] == 2 and dados["timeouts"] == 1
+    assert dados["espera_max_ms"] >= 50
+    assert dados["tamanho"] == 1 and dados["em_uso"] == 0
+    assert dados["max_overflow"] == pool.get_max_overflow()
+    assert len(conexoes) == 1
+
+    # dispose()/recreate() mantém as métricas
+    novo = p.recreate()
+    assert isinstance(novo, pool.PoolMedido) and novo.metricas is metricas
+
+
+class _ConexaoFake:
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class DbFake:
+    def __init__(self):
+        self.rollbacks = 0
+
+    def rollback(self):
+        self.rollbacks += 1
+
+
+def erroConexao(invalidada: bool) -> OperationalError:
+    erro = OperationalError("SELECT 1", {}, Exception("server closed the connection"))
+    erro.connection_invalidated = invalidada
+    return erro
+
+
+def test_executar_repete_uma_vez_conexao_invalidada():
+    db = DbFake()
+    chamadas = []
+
+    def servico(db, x):
+        chamadas.append(x)
+        if len(chamadas) == 1:
+            raise erroConexao(invalidada=True)
+        return x * 2
+
+    antes = pool.METRICAS_SYNC.repeticoes
+    assert asyncio.run(executar(servico, db, 21)) == 42
+    assert chamadas == [21, 21] and db.rollbacks == 1
+    assert pool.METRICAS_SYNC.repeticoes == antes + 1
+
+
+def test_executar_nao_repete_outros_erros():
+    def servico(db):
+        raise erroConexao(invalidada=False)
+
+    with pytest.raises(OperationalError):
+        asyncio.run(executar(servico, DbFake()))
+
+
+def test_engine_async_so_no_primeiro_uso(monkeypatch):
+    pytest.importorskip("psycopg")
+    monkeypatch.setenv("DATABASE_URL", "postgresql+psycopg://u:s@localhost:5432/db")
+    db = importlib.import_module("app.api.db")
+    # modo sync (padrão): o import não cria pool async nem métricas dele
+    assert db._async_engine is None
+    monkeypatch.setattr(db, "_async_engine", None)
+    monkeypatch.setattr(db, "_async_sessionmaker", None)
+
+    engine = db.get_async_engine()
+    assert db.get_async_engine() is engine
+    assert db.get_async_sessionmaker().kw["bind"] is engine
+    asyncio.run(db.dispose_async_engine())
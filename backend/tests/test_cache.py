@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import time
+
+import pytest
+from app.services import cache
+from app.services.cache import CacheMemoria, CacheSqlite
+
+
+@pytest.fixture(params=["memoria", "sqlite"])
+def backend(request, tmp_path):
+    if request.param == "sqlite":
+        return CacheSqlite(tmp_path / "cache.sqlite")
+    return CacheMemoria()
+
+
+def test_get_set_delete(backend):
+    assert backend.get("k") is None
+    backend.set("k", {"a": 1.5, "b": ["x"]})
+    entrada = backend.get("k")
+    assert entrada is not None
+    assert entrada.valor == {"a": 1.5, "b": ["x"]}
+    assert entrada.gravado_em <= time.time()
+    backend.delete("k")
+    assert backend.get("k") is None
+
+
+def test_trava_exclusiva_e_expira(backend):
+    token = backend.acquire("k", ttl=60)
+    assert token is not None
+    assert backend.acquire("k", ttl=60) is None
+
+    backend.release("k", "token-de-outro")
+    assert backend.acquire("k", ttl=60) is None
+    backend.release("k", token)
+    assert backend.acquire("k", ttl=60) is not None
+
+    # dono que morreu segurando a trava não bloqueia para sempre
+    assert backend.acquire("outra", ttl=0.01) is not None
+    time.sleep(0.02)
+    assert backend.acquire("outra", ttl=60) is not None
+
+
+def test_sqlite_compartilhado_entre_instancias(tmp_path):
+    a = CacheSqlite(tmp_path / "cache.sqlite")
+    b = CacheSqlite(tmp_path / "cache.sqlite")
+    a.set("k", {"v": 1})
+    entrada = b.get("k")
+    assert entrada is not None and entrada.valor == {"v": 1}
+    assert a.acquire("k", ttl=60) is not None
+    assert b.acquire("k", ttl=60) is None
+
+
+def test_invalidacao_so_em_backend_compartilhado(monkeypatch, tmp_path):
+    monkeypatch.delenv("STATS_CACHE", raising=False)
+    assert not cache.invalidar_estatisticas()
+
+    monkeypatch.setenv("STATS_CACHE", "sqlite")
+    monkeypatch.setenv("STATS_CACHE_PATH", str(tmp_path / "cache.sqlite"))
+    compartilhado = cache.criar_cache()
+    compartilhado.set(cache.CHAVE_ESTATISTICAS, {"v": 1})
+    assert cache.invalidar_estatisticas()
+    assert compartilhado.get(cache.CHAVE_ESTATISTICAS) is None
+
+    with pytest.raises(ValueError):
+        cache.get_tipo_cache("memcached")
@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+from app.core.cadop_index import IndiceCadop, compilarIndice, getArquivoIndice
+from app.usecases import ans_enrich_validate
+from app.usecases.ans_enrich_validate import (
+    carregarCadopPorRegistroAns,
+    carregarIndiceCadop,
+)
+from conftest import PipelineDirs
+
+
+def test_indice_equivale_ao_dict(pipelineDirs: PipelineDirs):
+    cadopPath = pipelineDirs.raw / "Relatorio_cadop.csv"
+    esperado = carregarCadopPorRegistroAns(cadopPath)
+
+    with carregarIndiceCadop(cadopPath) as indice:
+        assert len(indice) == len(esperado)
+        assert {r.registroAns: r for r in indice} == esperado
+        for registroAns, registro in esperado.items():
+            assert indice.get(registroAns) == registro
+            assert registroAns in indice
+
+        assert indice.get("999999999") is None
+        assert indice.get("") is None
+        assert "0" + next(iter(esperado)) not in indice
+
+
+def test_indice_reaproveitado_ate_o_cadop_mudar(
+    pipelineDirs: PipelineDirs, monkeypatch
+):
+    cadopPath = pipelineDirs.raw / "Relatorio_cadop.csv"
+    carregarIndiceCadop(cadopPath).close()
+
+    def naoRecompilar(_):
+        raise AssertionError("índice recompilado sem mudança no CADOP")
+
+    monkeypatch.setattr(
+        ans_enrich_validate, "carregarCadopPorRegistroAns", naoRecompilar
+    )
+    with carregarIndiceCadop(cadopPath) as indice:
+        total = len(indice)
+
+    # touch sem mudar conteúdo: confere pelo hash e continua válido
+    st = cadopPath.stat()
+    os.utime(cadopPath, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    carregarIndiceCadop(cadopPath).close()
+
+    monkeypatch.undo()
+    with open(cadopPath, "a", encoding="utf-8") as f:
+        f.write('"123";"11222333000181";"NOVA OPERADORA";;"Cooperativa";;;;;;"PR"\n')
+
+    with carregarIndiceCadop(cadopPath) as indice:
+        assert len(indice) == total + 1
+        registro = indice.get("123")
+        assert registro is not None and registro.razaoSocial == "NOVA OPERADORA"
+
+
+def test_indice_corrompido_e_recompilado(pipelineDirs: PipelineDirs):
+    cadopPath = pipelineDirs.raw / "Relatorio_cadop.csv"
+    getArquivoIndice(cadopPath).write_bytes(b"lixo")
+
+    with carregarIndiceCadop(cadopPath) as indice:
+        assert len(indice) == len(carregarCadopPorRegistroAns(cadopPath))
+
+
+def test_indice_vazio(tmp_path):
+    origem = tmp_path / "cadop.csv"
+    origem.write_text("", encoding="utf-8")
+    destino = compilarIndice({}, origem, tmp_path / "cadop.idx")
+
+    with IndiceCadop(destino) as indice:
+        assert len(indice) == 0
+        assert indice.get("123") is None
+
+
+def test_cabecalho_invalido(tmp_path):
+    destino = tmp_path / "cadop.idx"
+    destino.write_bytes(b"x" * 100)
+    with pytest.raises(ValueError):
+        IndiceCadop(destino)
@@ -0,0 +1,479 @@
+from __future__ import annotations
+
+import os
+import shutil
+import subprocess
+from dataclasses import replace
+from datetime import date
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+from app.usecases import db_import
+from app.usecases.db_import import (
+    ALVO_AGREGADA,
+    ALVO_CADOP,
+    ALVO_DESPESA,
+    COLUNAS_STG_AGREGADA,
+    COLUNAS_STG_CADOP,
+    COLUNAS_STG_DESPESA,
+    lerStg,
+    monetario,
+    tiparAgregada,
+    tiparCadop,
+    tiparDespesa,
+)
+
+
+def stgDespesa(**valores):
+    stg = dict.fromkeys(COLUNAS_STG_DESPESA)
+    stg.update(registro_ans="123456", ano="2025", trimestre="3", valor_despesas="10.50")
+    stg.update(valores)
+    return stg
+
+
+def test_cadop_regras_do_script():
+    stg = dict.fromkeys(COLUNAS_STG_CADOP)
+    stg.update(
+        registro_operadora=" 419761 ",
+        cnpj="19.541.931/0001-25",
+        razao_social="  OPERADORA X ",
+        uf="mg",
+        data_registro_ans="19/05/2015",
+    )
+    tipada = tiparCadop(stg)
+    assert tipada is not None
+    assert tipada[:3] == (419761, "19541931000125", "OPERADORA X")
+    assert tipada[5] == "MG"
+    assert tipada[-1] == date(2015, 5, 19)
+
+    # cnpj/uf/data inválidos viram NULL; registro inválido rejeita
+    stg.update(cnpj="123", uf="M1", data_registro_ans="2015-02-30")
+    tipada = tiparCadop(stg)
+    assert tipada is not None
+    assert (tipada[1], tipada[5], tipada[-1]) == (None, None, None)
+    assert tiparCadop({**stg, "registro_operadora": "ABC"}) is None
+
+
+@pytest.mark.parametrize(
+    "valores, rejeita",
+    [
+        ({}, False),
+        ({"registro_ans": ""}, True),
+        ({"ano": "20x5"}, True),
+        ({"trimestre": "5"}, True),
+        ({"valor_despesas": None}, True),
+        ({"valor_despesas": "R$"}, True),
+        ({"valor_despesas": "1" * 17}, True),  # não cabe em numeric(18,2)
+    ],
+)
+def test_despesa_rejeicoes(valores, rejeita):
+    assert (tiparDespesa(stgDespesa(**valores)) is None) is rejeita
+
+
+def test_despesa_flags_e_valor():
+    tipada = tiparDespesa(
+        stgDespesa(valor_despesas="R$ 1234,565", cnpj_valido="T", valor_positivo="no")
+    )
+    assert tipada is not None
+    assert tipada[3] == Decimal("1234.57")
+    assert tipada[4:7] == (True, False, None)
+
+
+def test_monetario_arredonda_como_numeric():
+    assert monetario("-0.005") == Decimal("-0.01")
+    assert monetario("2.345") == Decimal("2.35")
+    assert monetario("1.234.56") is None
+
+
+def test_agregada_opcionais_viram_null():
+    stg = {
+        "razao_social": "X",
+        "uf": "sp",
+        "total_despesas": "10",
+        "media_trimestral": "abc",
+        "desvio_padrao": None,
+        "qtd_registros": "2.0",
+    }
+    assert tiparAgregada(stg) == ("X", "SP", Decimal("10.00"), None, None, None)
+    assert tiparAgregada({**stg, "uf": None}) is None
+
+
+def test_le_csv_por_posicao(tmp_path: Path):
+    arquivo = tmp_path / "agregadas.csv"
+    arquivo.write_text(
+        "RazaoSocial;UF;total_despesas;media_trimestral;desvio_padrao;qtd_registros\n"
+        'X;SP;10;5;"";2\n'
+        "Y;RJ\n",
+        encoding="utf-8",
+    )
+    linhas = list(lerStg(arquivo, ALVO_AGREGADA.colunasStg))
+    assert linhas[0]["desvio_padrao"] is None
+    assert linhas[1] == dict(
+        razao_social="Y",
+        uf="RJ",
+        total_despesas=None,
+        media_trimestral=None,
+        desvio_padrao=None,
+        qtd_registros=None,
+    )
+
+
+def test_database_url_da_api(monkeypatch):
+    monkeypatch.setenv("DATABASE_URL", "postgresql+psycopg://u:s@localhost:5432/db")
+    assert db_import.getDatabaseUrl() == "postgresql://u:s@localhost:5432/db"
+
+
+def test_particoes_incrementais(tmp_path: Path):
+    arquivo = tmp_path / "final.csv"
+    cabecalho = ";".join(COLUNAS_STG_DESPESA) + "\n"
+    linhas = [
+        "1;;X;;SP;1;2025;10;1;1;1;\n",
+        "2;;Y;;RJ;1;2025;20;1;1;1;\n",
+        "1;;X;;SP;2;2025;30;1;1;1;\n",
+    ]
+    arquivo.write_text(cabecalho + "".join(linhas), encoding="utf-8")
+    anteriores, total = db_import.hashParticoes(ALVO_DESPESA, arquivo)
+    assert set(anteriores) == {"2025T1", "2025T2"}
+    assert total == 3
+
+    # trimestre novo + revisão do 2T: o 1T fica de fora do COPY
+    linhas[2] = "1;;X;;SP;2;2025;31;1;1;1;\n"
+    linhas.append("1;;X;;SP;3;2025;40;1;1;1;\n")
+    arquivo.write_text(cabecalho + "".join(linhas), encoding="utf-8")
+    hashes, _ = db_import.hashParticoes(ALVO_DESPESA, arquivo)
+    assert db_import.compararParticoes(hashes, anteriores) == {"2025T2", "2025T3"}
+    assert db_import.compararParticoes(hashes, hashes) == set()
+
+    # carga completa: o hash sai da mesma leitura que alimenta o COPY
+    lidas = db_import.HashParticoes(ALVO_DESPESA)
+    copiadas = list(lidas.acompanhar(lerStg(arquivo, COLUNAS_STG_DESPESA)))
+    assert len(copiadas) == lidas.total == 4
+    assert lidas.hexdigests() == hashes
+
+
+def test_resumo_so_recalcula_quando_ha_mudanca():
+    class ConnFake:
+        def __init__(self):
+            self.comandos = []
+
+        def execute(self, sql):
+            self.comandos.append(sql)
+            return self
+
+        def fetchone(self):
+            return (True,)
+
+    semMudanca = [db_import.ResultadoCarga(origem="cadop", arquivo="x.csv")]
+    conn = ConnFake()
+    assert not db_import.atualizarResumo(conn, semMudanca, incremental=True)
+    assert conn.comandos == []
+
+    assert db_import.atualizarResumo(conn, semMudanca, incremental=False)
+    assert conn.comandos[-1] == "SELECT atualizar_estatisticas_resumo()"
+
+
+def test_particao_que_sumiu_sai_do_controle_e_da_agregada():
+    class ConnFake:
+        def __init__(self):
+            self.comandos = []
+            self.rowcount = 2
+
+        def cursor(self):
+            return self
+
+        def __enter__(self):
+            return self
+
+        def __exit__(self, *exc):
+            return False
+
+        def execute(self, sql, params=None):
+            self.comandos.append((sql, params))
+
+    anteriores = {"A|SP": "h1", "B|RJ": "h2"}
+    removidas = db_import.particoesRemovidas({"A|SP": "h3"}, anteriores)
+    assert removidas == {"B|RJ"}
+
+    conn = ConnFake()
+    assert db_import.removerParticoes(conn, ALVO_AGREGADA, removidas) == 2
+    destino, controle = conn.comandos
+    assert destino == (
+        "DELETE FROM despesa_agregada_operadora_uf "
+        "WHERE razao_social || '|' || uf = ANY(%s)",
+        (["B|RJ"],),
+    )
+    assert controle[1] == ("despesa_agregada", ["B|RJ"])
+
+    # o fato guarda o histórico: só o controle esquece o trimestre
+    conn = ConnFake()
+    assert db_import.removerParticoes(conn, ALVO_DESPESA, {"2024T1"}) == 0
+    assert [sql.split()[2] for sql, _ in conn.comandos] == ["import_controle"]
+    assert db_import.removerParticoes(ConnFake(), ALVO_DESPESA, set()) == 0
+
+
+# =========================================================
+# Integração: banco real em DATABASE_URL (pula sem ele)
+# =========================================================
+#
+# A carga grava de verdade (COMMIT). Para não encostar nos dados de quem
+# roda, os alvos usam `origem` própria (controle e rejeitadas separados),
+# registro_ans numa faixa reservada, ano 1901 e razão social marcada.
+
+DB_DIR = Path(__file__).resolve().parents[2] / "db"
+PREFIXO_ORIGEM = "teste_integracao_"
+REGISTRO_TESTE = 99_999_001
+ANO_TESTE = 1901
+RAZAO_TESTE = "TESTE INTEGRACAO"
+
+
+def limparBanco(conn) -> None:
+    faixa = (REGISTRO_TESTE, REGISTRO_TESTE + 99)
+    conn.execute(
+        "DELETE FROM despesa_trimestral WHERE registro_ans BETWEEN %s AND %s", faixa
+    )
+    if conn.execute(db_import.SQL_TEM_PARTICOES).fetchone()[0]:
+        for trimestre in range(1, 5):
+            conn.execute(
+                "SELECT remover_particao_despesa(%s, %s)", (ANO_TESTE, trimestre)
+            )
+    conn.execute("DELETE FROM operadora WHERE registro_ans BETWEEN %s AND %s", faixa)
+    conn.execute(
+        "DELETE FROM despesa_agregada_operadora_uf WHERE razao_social LIKE %s",
+        (f"{RAZAO_TESTE}%",),
+    )
+    for tabela in ("import_rejeitados", "import_controle"):
+        conn.execute(
+            f"DELETE FROM {tabela} WHERE origem LIKE %s", (f"{PREFIXO_ORIGEM}%",)
+        )
+    # o resumo foi refeito com as linhas do teste dentro
+    if conn.execute(db_import.SQL_TEM_RESUMO).fetchone()[0]:
+        conn.execute("SELECT atualizar_estatisticas_resumo()")
+
+
+@pytest.fixture
+def banco():
+    """Conexão no banco de teste (DDL aplicado se faltar); limpa antes e depois."""
+    if not os.getenv("DATABASE_URL"):
+        pytest.skip("integração com PostgreSQL: defina DATABASE_URL")
+    psycopg = pytest.importorskip("psycopg")
+    url = db_import.getDatabaseUrl()
+    with psycopg.connect(
+        url, autocommit=True, options=f"-csearch_path={db_import.SCHEMA}"
+    ) as conn:
+        if (
+            conn.execute("SELECT to_regclass('despesa_trimestral')").fetchone()[0]
+            is None
+        ):
+            if shutil.which("psql") is None:
+                pytest.skip("banco sem db/001_ddl.sql e sem psql para aplicar")
+            subprocess.run(
+                [
+                    "psql",
+                    url,
+                    "-q",
+                    "-v",
+                    "ON_ERROR_STOP=1",
+                    "-f",
+                    str(DB_DIR / "001_ddl.sql"),
+                ],
+                check=True,
+            )
+        conn.execute(db_import.DDL_REJEITADOS)
+        conn.execute(db_import.DDL_CONTROLE)
+        limparBanco(conn)
+        try:
+            yield conn
+        finally:
+            limparBanco(conn)
+
+
+def escreverCsv(caminho: Path, colunas, linhas) -> Path:
+    texto = [";".join(colunas)] + [";".join(map(str, linha)) for linha in linhas]
+    caminho.write_text("\n".join(texto) + "\n", encoding="utf-8")
+    return caminho
+
+
+def linhaCadop(registro, razao: str, ufOperadora: str) -> list:
+    linha = [""] * len(COLUNAS_STG_CADOP)
+    linha[0:3] = [registro, "19541931000125", razao]
+    linha[COLUNAS_STG_CADOP.index("uf")] = ufOperadora
+    return linha
+
+
+def linhaDespesa(registro, trimestre: int, valor: str, flag: str = "T") -> list:
+    # registro_ans;cnpj;razao_social;modalidade;uf;trimestre;ano;valor;flags x3;erros
+    return [
+        registro,
+        "",
+        RAZAO_TESTE,
+        "",
+        "SP",
+        trimestre,
+        ANO_TESTE,
+        valor,
+        flag,
+        flag,
+        flag,
+        "",
+    ]
+
+
+def alvosTeste(tmp_path: Path, cadop, despesas, agregadas) -> list:
+    return [
+        (
+            replace(alvo, origem=PREFIXO_ORIGEM + alvo.origem),
+            escreverCsv(tmp_path / f"{alvo.origem}.csv", alvo.colunasStg, linhas),
+        )
+        for alvo, linhas in (
+            (ALVO_CADOP, cadop),
+            (ALVO_DESPESA, despesas),
+            (ALVO_AGREGADA, agregadas),
+        )
+    ]
+
+
+def resumoCarga(resultados) -> list:
+    return [(r.linhas, r.gravadas, r.rejeitadas) for r in resultados]
+
+
+def contarLinhas(conn) -> dict:
+    faixa = (REGISTRO_TESTE, REGISTRO_TESTE + 99)
+    return {
+        "operadora": conn.execute(
+            "SELECT count(*) FROM operadora WHERE registro_ans BETWEEN %s AND %s", faixa
+        ).fetchone()[0],
+        "despesa": conn.execute(
+            "SELECT count(*) FROM despesa_trimestral WHERE registro_ans BETWEEN %s AND %s",
+            faixa,
+        ).fetchone()[0],
+        "agregada": conn.execute(
+            "SELECT count(*) FROM despesa_agregada_operadora_uf WHERE razao_social LIKE %s",
+            (f"{RAZAO_TESTE}%",),
+        ).fetchone()[0],
+    }
+
+
+def contarRejeitadas(conn) -> dict:
+    linhas = conn.execute(
+        "SELECT origem, count(*) FROM import_rejeitados "
+        "WHERE origem LIKE %s GROUP BY origem",
+        (f"{PREFIXO_ORIGEM}%",),
+    ).fetchall()
+    return {origem[len(PREFIXO_ORIGEM) :]: n for origem, n in linhas}
+
+
+def test_integracao_carga_upsert_e_rejeitadas(banco, tmp_path: Path):
+    cadop = [
+        linhaCadop(REGISTRO_TESTE, f"{RAZAO_TESTE} A", "SP"),
+        linhaCadop("ABC", f"{RAZAO_TESTE} SEM REGISTRO", "RJ"),
+    ]
+    despesas = [
+        linhaDespesa(REGISTRO_TESTE, 1, "100,00"),
+        linhaDespesa(REGISTRO_TESTE, 2, "200.00"),
+        linhaDespesa(REGISTRO_TESTE + 1, 1, "50"),  # fora do CADOP: operadora mínima
+        linhaDespesa(REGISTRO_TESTE, 3, "R$"),
+    ]
+    agregadas = [
+        [f"{RAZAO_TESTE} A", "SP", "300", "150", "50", "2"],
+        [f"{RAZAO_TESTE} B", "S1", "50", "", "", "1"],
+    ]
+    alvos = alvosTeste(tmp_path, cadop, despesas, agregadas)
+
+    primeira = db_import.executarImportacaoDb(alvos=alvos, incremental=False)
+    assert resumoCarga(primeira) == [(2, 1, 1), (4, 3, 1), (2, 1, 1)]
+    assert contarLinhas(banco) == {"operadora": 2, "despesa": 3, "agregada": 1}
+    assert contarRejeitadas(banco) == {
+        "cadop": 1,
+        "despesa_trimestral": 1,
+        "despesa_agregada": 1,
+    }
+    motivo, payload = banco.execute(
+        "SELECT motivo, payload FROM import_rejeitados WHERE origem = %s",
+        (PREFIXO_ORIGEM + "despesa_trimestral",),
+    ).fetchone()
+    assert motivo == ALVO_DESPESA.motivo
+    assert payload["valor_despesas"] == "R$" and payload["erros"] is None
+    assert banco.execute(
+        "SELECT uf, razao_social FROM operadora WHERE registro_ans = %s",
+        (REGISTRO_TESTE + 1,),
+    ).fetchone() == ("SP", None)
+
+    # mesmo arquivo de novo: upsert não reescreve linha idêntica; as
+    # rejeitadas são registradas por carga (como no 002_import.sql)
+    segunda = db_import.executarImportacaoDb(alvos=alvos, incremental=False)
+    assert resumoCarga(segunda) == [(2, 0, 1), (4, 0, 1), (2, 0, 1)]
+    assert contarLinhas(banco) == {"operadora": 2, "despesa": 3, "agregada": 1}
+    assert set(contarRejeitadas(banco).values()) == {2}
+
+    # revisão: valor sobrescrito; flags/opcionais vazios mantêm o que havia
+    despesas[0] = linhaDespesa(REGISTRO_TESTE, 1, "120,50", flag="")
+    agregadas[0] = [f"{RAZAO_TESTE} A", "SP", "320", "", "", "2"]
+    alvos = alvosTeste(tmp_path, cadop, despesas, agregadas)
+    terceira = db_import.executarImportacaoDb(alvos=alvos, incremental=False)
+    assert [r.gravadas for r in terceira] == [0, 1, 1]
+    assert banco.execute(
+        "SELECT valor_despesas, cnpj_valido, valor_positivo FROM despesa_trimestral "
+        "WHERE registro_ans = %s AND ano = %s AND trimestre = 1",
+        (REGISTRO_TESTE, ANO_TESTE),
+    ).fetchone() == (Decimal("120.50"), True, True)
+    assert banco.execute(
+        "SELECT total_despesas, media_trimestral, desvio_padrao "
+        "FROM despesa_agregada_operadora_uf WHERE razao_social = %s",
+        (f"{RAZAO_TESTE} A",),
+    ).fetchone() == (Decimal("320.00"), Decimal("150.00"), Decimal("50.00"))
+    assert contarLinhas(banco) == {"operadora": 2, "despesa": 3, "agregada": 1}
+
+
+def test_integracao_incremental_por_particao(banco, tmp_path: Path):
+    cadop = [linhaCadop(REGISTRO_TESTE, f"{RAZAO_TESTE} A", "SP")]
+    despesas = [
+        linhaDespesa(REGISTRO_TESTE, 1, "100,00"),
+        linhaDespesa(REGISTRO_TESTE + 1, 1, "50"),
+        linhaDespesa("", 1, "10"),  # rejeitada, na partição do 1T
+        linhaDespesa(REGISTRO_TESTE, 2, "200,00"),
+    ]
+    agregadas = [
+        [f"{RAZAO_TESTE} A", "SP", "300", "150", "50", "2"],
+        [f"{RAZAO_TESTE} B", "RJ", "50", "50", "0", "1"],
+    ]
+    alvos = alvosTeste(tmp_path, cadop, despesas, agregadas)
+    db_import.executarImportacaoDb(alvos=alvos, incremental=False)
+    alvoDespesa, alvoAgregada = alvos[1][0], alvos[2][0]
+    antes = db_import.lerControle(banco, alvoDespesa)
+    assert set(antes) == {f"{ANO_TESTE}T1", f"{ANO_TESTE}T2"}
+    assert set(db_import.lerControle(banco, alvoAgregada)) == {
+        f"{RAZAO_TESTE} A|SP",
+        f"{RAZAO_TESTE} B|RJ",
+    }
+
+    # 2T revisado, 1T intacto, grupo B some da agregada
+    despesas[3] = linhaDespesa(REGISTRO_TESTE, 2, "210,00")
+    del agregadas[1]
+    alvos = alvosTeste(tmp_path, cadop, despesas, agregadas)
+    cadopR, despesaR, agregadaR = db_import.executarImportacaoDb(
+        alvos=alvos, incremental=True
+    )
+    assert (cadopR.linhas, cadopR.ignoradas) == (0, 1)
+    # só o 2T passou pelo COPY: a rejeitada do 1T não é lida de novo
+    assert (despesaR.linhas, despesaR.gravadas, despesaR.rejeitadas) == (1, 1, 0)
+    assert despesaR.ignoradas == 3
+    assert (agregadaR.linhas, agregadaR.removidas) == (0, 1)
+
+    depois = db_import.lerControle(banco, alvoDespesa)
+    assert depois[f"{ANO_TESTE}T1"] == antes[f"{ANO_TESTE}T1"]
+    assert depois[f"{ANO_TESTE}T2"] != antes[f"{ANO_TESTE}T2"]
+    assert banco.execute(
+        "SELECT trimestre, valor_despesas FROM despesa_trimestral "
+        "WHERE registro_ans = %s ORDER BY trimestre",
+        (REGISTRO_TESTE,),
+    ).fetchall() == [(1, Decimal("100.00")), (2, Decimal("210.00"))]
+    assert set(db_import.lerControle(banco, alvoAgregada)) == {f"{RAZAO_TESTE} A|SP"}
+    assert contarLinhas(banco) == {"operadora": 2, "despesa": 3, "agregada": 1}
+    assert contarRejeitadas(banco) == {"despesa_trimestral": 1}
+
+    # nada mudou desde a última carga: nenhuma partição é copiada
+    repetida = db_import.executarImportacaoDb(alvos=alvos, incremental=True)
+    assert [(r.linhas, r.gravadas, r.removidas) for r in repetida] == [(0, 0, 0)] * 3
+    assert [r.ignoradas for r in repetida] == [1, 4, 1]
+    assert db_import.lerControle(banco, alvoDespesa) == depois
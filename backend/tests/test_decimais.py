@@ -0,0 +1,216 @@
+from __future__ import annotations
+
+import random
+from decimal import Decimal, InvalidOperation
+
+import pytest
+from app.domain import decimais, validators
+from app.domain.decimais import (
+    FORMATO_AUTO,
+    FORMATO_PONTO,
+    FORMATO_PTBR,
+    MOTIVO_PRECISAO,
+    MOTIVO_VAZIO,
+    ErroDecimal,
+    centavos_lote,
+    como_decimal,
+    decompor,
+    decompor_lote,
+    formatar,
+    para_centavos,
+    tentar_centavos,
+)
+
+# regras dos parsers que o kernel substitui, copiadas como referência
+
+
+def referenciaPtbr(valor: str):
+    # ans_normalization.parseDecimalStr
+    v = valor.strip().replace(".", "").replace(",", ".")
+    try:
+        return Decimal(v)
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def referenciaAuto(valor: str):
+    # domain.validators.parse_decimal
+    v = (valor or "").strip()
+    if not v:
+        return None
+    v = v.replace(" ", "")
+    if "," in v and "." in v:
+        v = v.replace(".", "").replace(",", ".")
+    elif "," in v and "." not in v:
+        v = v.replace(",", ".")
+    try:
+        return Decimal(v)
+    except (InvalidOperation, ValueError):
+        return None
+
+
+def referenciaPonto(valor: str):
+    # ans_consolidate.parseDecimal, sem o fallback para 0 (que sumia com
+    # o valor inválido em vez de reportá-lo)
+    try:
+        return Decimal((valor or "").strip())
+    except (InvalidOperation, ValueError):
+        return None
+
+
+REFERENCIAS = {
+    FORMATO_PTBR: referenciaPtbr,
+    FORMATO_AUTO: referenciaAuto,
+    FORMATO_PONTO: referenciaPonto,
+}
+
+
+def gerarTexto(rnd: random.Random) -> str:
+    if rnd.random() < 0.5:
+        # número bem formado em algum dos formatos
+        inteiro = rnd.randint(0, 10 ** rnd.randint(0, 16))
+        casas = rnd.choice([0, 0, 1, 2, 2, 3, 6])
+        fracao = "".join(rnd.choice("0123456789") for _ in range(casas))
+        milhar = rnd.choice(["", "."]) if rnd.random() < 0.3 else ""
+        texto = f"{inteiro:,}".replace(",", milhar)
+        if casas:
+            texto += rnd.choice([",", "."]) + fracao
+        sinal = rnd.choice(["", "", "-", "+"])
+        espaco = rnd.choice(["", " ", "\t"])
+        return espaco + sinal + texto + espaco
+    alfabeto = "0123456789.,-+ eE_"
+    return "".join(rnd.choice(alfabeto) for _ in range(rnd.randint(0, 8)))
+
+
+@pytest.mark.parametrize("formato", [FORMATO_PTBR, FORMATO_AUTO, FORMATO_PONTO])
+def test_kernel_concorda_com_parsers_atuais(formato):
+    rnd = random.Random(2024)
+    referencia = REFERENCIAS[formato]
+
+    for _ in range(20_000):
+        texto = gerarTexto(rnd)
+        esperado = referencia(texto)
+        try:
+            inteiro, casas = decompor(texto, formato)
+        except ErroDecimal as e:
+            # só recusa vazio, lixo, NaN/infinito, o "_" que o Decimal aceita
+            # e expoente fora da faixa
+            assert (
+                esperado is None
+                or not esperado.is_finite()
+                or "_" in texto
+                or e.motivo == decimais.MOTIVO_EXPOENTE
+            ), texto
+            continue
+
+        assert esperado is not None, texto
+        d = como_decimal(inteiro, casas)
+        assert d == esperado, texto
+        # mesmo expoente: o texto gerado a partir daqui não muda
+        assert d.as_tuple().exponent == esperado.as_tuple().exponent, texto
+        assert Decimal(formatar(inteiro, casas)) == esperado, texto
+        assert decimais.para_texto(texto, formato) == formatar(inteiro, casas)
+
+        centavos, motivo = tentar_centavos(texto, formato)
+        if casas <= 2:
+            assert motivo is None and centavos == esperado * 100
+        else:
+            assert centavos is None and motivo == MOTIVO_PRECISAO
+
+
+@pytest.mark.parametrize("formato", [FORMATO_PTBR, FORMATO_AUTO, FORMATO_PONTO])
+def test_lote_igual_ao_escalar(formato):
+    pytest.importorskip("numpy")
+    rnd = random.Random(7)
+    textos = [gerarTexto(rnd) for _ in range(5_000)] + [None, "", "-", "."]
+
+    inteiros, casas, validos = decompor_lote(textos, formato)
+    centavos, centavosValidos = centavos_lote(textos, formato)
+
+    for i, valor in enumerate(textos):
+        texto = valor or ""  # None no lote é vazio, como no escalar
+        try:
+            esperado = decompor(texto, formato)
+        except ErroDecimal:
+            assert not validos[i], texto
+            assert not centavosValidos[i], texto
+            continue
+        # o lote só cobre ponto fixo em int64; o resto volta ao escalar
+        if "e" in texto.lower() or (
+            len(str(abs(esperado[0]))) > decimais.MAX_DIGITOS_LOTE
+        ):
+            assert not validos[i], texto
+            continue
+        assert validos[i], texto
+        assert (int(inteiros[i]), int(casas[i])) == esperado, texto
+        if centavosValidos[i]:
+            assert int(centavos[i]) == para_centavos(texto, formato), texto
+
+
+def test_lote_sem_pyarrow(monkeypatch):
+    pytest.importorskip("numpy")
+    textos = ["1.234,56", "abc", "", "99"]
+    esperado = decompor_lote(textos, FORMATO_PTBR)
+    monkeypatch.setattr(decimais, "pa", None)
+    obtido = decompor_lote(textos, FORMATO_PTBR)
+    for a, b in zip(esperado, obtido):
+        assert a.tolist() == b.tolist()
+
+
+@pytest.mark.parametrize(
+    "texto, formato, esperado",
+    [
+        ("1.234,56", FORMATO_PTBR, 123456),
+        ("1.234,56", FORMATO_AUTO, 123456),
+        ("1234.5", FORMATO_AUTO, 123450),
+        ("99.9", FORMATO_PTBR, 99900),
+        ("-0,5", FORMATO_AUTO, -50),
+        (" 15 ", FORMATO_PONTO, 1500),
+    ],
+)
+def test_para_centavos(texto, formato, esperado):
+    assert para_centavos(texto, formato) == esperado
+
+
+def test_erros_explicitos():
+    with pytest.raises(ErroDecimal) as e:
+        para_centavos("   ")
+    assert e.value.motivo == MOTIVO_VAZIO
+    assert tentar_centavos("1,005") == (None, MOTIVO_PRECISAO)
+    assert tentar_centavos("1e-3") == (None, MOTIVO_PRECISAO)
+    assert tentar_centavos("1e") == (None, decimais.MOTIVO_INVALIDO)
+    assert tentar_centavos("NaN") == (None, decimais.MOTIVO_INVALIDO)
+    assert tentar_centavos("1e99999") == (None, decimais.MOTIVO_EXPOENTE)
+
+
+@pytest.mark.parametrize(
+    "texto, inteiro, casas, fixo",
+    [
+        ("1E+3", 1, -3, "1000"),
+        ("1.5e-7", 15, 8, "0.00000015"),
+        ("-2.50E1", -250, 1, "-25.0"),
+        ("0.00", 0, 2, "0.00"),
+    ],
+)
+def test_expoente(texto, inteiro, casas, fixo):
+    assert decompor(texto, FORMATO_PONTO) == (inteiro, casas)
+    assert formatar(inteiro, casas) == fixo
+    assert str(como_decimal(inteiro, casas)) == str(Decimal(texto))
+
+
+def test_parse_decimal_usa_o_kernel():
+    rnd = random.Random(11)
+    for _ in range(5_000):
+        texto = gerarTexto(rnd)
+        esperado = referenciaAuto(texto)
+        try:
+            decompor(texto, FORMATO_AUTO)
+        except ErroDecimal:
+            # recusas já cobertas em test_kernel_concorda_com_parsers_atuais
+            esperado = None
+        obtido = validators.parse_decimal(texto)
+        assert obtido == esperado, texto
+        if esperado is not None:
+            assert obtido is not None
+            # mesmos dígitos e expoente; só o sinal do zero ("-0") se perde
+            assert obtido.as_tuple()[1:] == esperado.as_tuple()[1:], texto
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+from app.core import deteccao
+from app.core.deteccao import FormatoCsv, detectarFormato
+
+
+@pytest.fixture(autouse=True)
+def cacheLimpo():
+    deteccao.limparCache()
+    yield
+    deteccao.limparCache()
+
+
+@pytest.mark.parametrize(
+    "conteudo, esperado",
+    [
+        ("A;B\nSÃO PAULO;1,5\n".encode("utf-8-sig"), FormatoCsv("utf-8-sig", ";")),
+        ("A;B\nSÃO PAULO;1,5\n".encode("latin-1"), FormatoCsv("latin-1", ";")),
+        (b"a,b,c\n1,2,3\n", FormatoCsv("utf-8-sig", ",")),
+        (b"", FormatoCsv("utf-8-sig", ";")),
+    ],
+)
+def test_detecta_encoding_e_delimitador(tmp_path: Path, conteudo, esperado):
+    arquivo = tmp_path / "dados.csv"
+    arquivo.write_bytes(conteudo)
+    assert detectarFormato(arquivo) == esperado
+
+
+def test_le_so_a_amostra(tmp_path: Path, monkeypatch):
+    # utf-8 cortado no meio de um caractere na fronteira da amostra
+    arquivo = tmp_path / "grande.csv"
+    corpo = ("x" * (deteccao.AMOSTRA_ENCODING - 1) + "ç;" * 10).encode("utf-8")
+    arquivo.write_bytes(corpo + b"\xff" * 1000)  # lixo latin-1 depois da amostra
+
+    lidos: list[int] = []
+    original = deteccao.lerAmostra
+
+    def espiar(caminho, limite=deteccao.AMOSTRA_ENCODING):
+        lidos.append(limite)
+        return original(caminho, limite)
+
+    monkeypatch.setattr(deteccao, "lerAmostra", espiar)
+
+    assert detectarFormato(arquivo).encoding == "utf-8-sig"
+    assert lidos == [deteccao.AMOSTRA_ENCODING]
+
+
+def test_cache_por_caminho_mtime_e_tamanho(tmp_path: Path, monkeypatch):
+    arquivo = tmp_path / "dados.csv"
+    arquivo.write_bytes(b"a;b\n1;2\n")
+
+    chamadas: list[Path] = []
+    original = deteccao.lerAmostra
+    monkeypatch.setattr(
+        deteccao,
+        "lerAmostra",
+        lambda caminho, *a: chamadas.append(caminho) or original(caminho, *a),
+    )
+
+    assert deteccao.detectarEncoding(arquivo) == "utf-8-sig"
+    assert deteccao.detectarDelimiter(arquivo) == ";"
+    assert len(chamadas) == 1
+
+    # reescrito com outro conteúdo: nova amostragem
+    arquivo.write_bytes("a,b\nç,2,3\n".encode("latin-1"))
+    st = arquivo.stat()
+    os.utime(arquivo, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    assert detectarFormato(arquivo) == FormatoCsv("latin-1", ",")
+    assert len(chamadas) == 2
+
+
+def test_empate_segue_a_regra_de_cada_etapa(tmp_path: Path):
+    # mesmo número de ";" e ",": agregação/carga ficam com ";", enriquecimento com ","
+    arquivo = tmp_path / "empate.csv"
+    arquivo.write_bytes(b"a;b,c\n1;2,3\n")
+
+    assert deteccao.detectarDelimiter(arquivo) == ";"
+    assert deteccao.detectarDelimiter(arquivo, empate=",") == ","
+    assert detectarFormato(arquivo).delimiter == ";"
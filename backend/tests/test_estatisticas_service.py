@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import cast
+
+import pytest
+from app.repositories.estatisticas_repo import (
+    AsyncEstatisticasRepository,
+    EstatisticasRepository,
+)
+from app.services.cache import CHAVE_ESTATISTICAS, CacheMemoria, CacheSqlite
+from app.services.estatisticas_service import (
+    AsyncEstatisticasService,
+    EstatisticasService,
+    get_modo_consulta,
+)
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+class RepoFake:
+    def __init__(self, resumo=None):
+        self._resumo = resumo
+        self.consultas = 0
+
+    def resumo(self, db):
+        return self._resumo
+
+    def total_despesas(self, db):
+        self.consultas += 1
+        return Decimal("300.00")
+
+    def media_despesas(self, db):
+        self.consultas += 1
+        return Decimal("100.00")
+
+    def top5_operadoras(self, db):
+        self.consultas += 1
+        return [{"cnpj": "1", "razao_social": "A", "total": Decimal("300.00")}]
+
+    def despesas_por_uf(self, db):
+        self.consultas += 1
+        return [("RJ", Decimal("100.00")), ("SP", Decimal("200.00"))]
+
+
+# os fakes fazem o papel do repositório; a sessão nunca é usada
+SEM_DB = cast(Session, None)
+SEM_DB_ASYNC = cast(AsyncSession, None)
+
+
+def servico(repo: RepoFake, **kwargs) -> EstatisticasService:
+    return EstatisticasService(cast(EstatisticasRepository, repo), **kwargs)
+
+
+ESPERADO = {
+    "total_despesas": 300.0,
+    "media_despesas": 100.0,
+    "top5_operadoras": [{"cnpj": "1", "razao_social": "A", "total_despesas": 300.0}],
+    "despesas_por_uf": {"RJ": 100.0, "SP": 200.0},
+}
+
+
+def test_resumo_materializado_dispensa_consultas():
+    repo = RepoFake(
+        resumo={
+            "total_despesas": Decimal("300.00"),
+            "media_despesas": Decimal("100.00"),
+            "top5_operadoras": [
+                {"cnpj": "1", "razao_social": "A", "total_despesas": 300.0}
+            ],
+            "despesas_por_uf": {"SP": 200.0, "RJ": 100.0},
+        }
+    )
+    payload = servico(repo).get(db=SEM_DB)
+    assert payload == ESPERADO
+    assert list(payload["despesas_por_uf"]) == ["RJ", "SP"]
+    assert repo.consultas == 0
+
+
+def test_sem_resumo_usa_consultas():
+    repo = RepoFake()
+    assert servico(repo).get(db=SEM_DB) == ESPERADO
+    assert repo.consultas == 4
+
+
+def test_consulta_unica_usa_um_comando():
+    class RepoUnica(RepoFake):
+        def estatisticas_consulta_unica(self, db):
+            self.consultas += 1
+            return {
+                "total_despesas": Decimal("300.00"),
+                "media_despesas": Decimal("100.00"),
+                "top5_operadoras": [
+                    {"cnpj": "1", "razao_social": "A", "total_despesas": 300.0}
+                ],
+                "despesas_por_uf": {"SP": 200.0, "RJ": 100.0},
+            }
+
+    repo = RepoUnica()
+    assert servico(repo, consulta="unica").get(db=SEM_DB) == ESPERADO
+    assert repo.consultas == 1
+
+
+def test_modo_consulta_pelo_ambiente(monkeypatch):
+    monkeypatch.setenv("STATS_CONSULTA", "UNICA")
+    assert get_modo_consulta() == "unica"
+    monkeypatch.delenv("STATS_CONSULTA")
+    assert get_modo_consulta() == "separadas"
+    with pytest.raises(ValueError):
+        get_modo_consulta("cinco")
+
+
+class RepoLento(RepoFake):
+    def total_despesas(self, db):
+        time.sleep(0.2)
+        return super().total_despesas(db)
+
+
+def test_recalculo_unico_entre_workers(tmp_path):
+    # um serviço por "worker", todos no mesmo arquivo de cache
+    repo = RepoLento()
+    servicos = [
+        servico(repo, cache=CacheSqlite(tmp_path / "c.sqlite")) for _ in range(8)
+    ]
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        payloads = list(pool.map(lambda i: servicos[i % 8].get(db=SEM_DB), range(16)))
+
+    assert all(p == ESPERADO for p in payloads)
+    assert repo.consultas == 4  # uma rodada das quatro consultas
+
+
+def test_vencido_servido_enquanto_outro_recalcula():
+    cache = CacheMemoria()
+    repo = RepoFake()
+    svc = servico(repo, cache=cache)
+    cache.set(CHAVE_ESTATISTICAS, {"antigo": True})
+    svc.ttl = 0
+    time.sleep(0.01)
+
+    token = cache.acquire(CHAVE_ESTATISTICAS, ttl=60)  # outro worker recalculando
+    assert token is not None
+    assert svc.get(db=SEM_DB) == {"antigo": True}
+    assert repo.consultas == 0
+
+    cache.release(CHAVE_ESTATISTICAS, token)
+    assert svc.get(db=SEM_DB) == ESPERADO
+    assert repo.consultas == 4
+
+
+def test_invalidar_forca_recalculo():
+    repo = RepoFake()
+    svc = servico(repo, cache=CacheMemoria())
+    svc.get(db=SEM_DB)
+    svc.get(db=SEM_DB)
+    assert repo.consultas == 4
+    svc.invalidar()
+    svc.get(db=SEM_DB)
+    assert repo.consultas == 8
+
+
+class RepoAsyncFake(RepoFake):
+    """RepoFake com as assinaturas do AsyncEstatisticasRepository."""
+
+    async def resumo(self, db):
+        return super().resumo(db)
+
+    async def total_despesas(self, db):
+        await asyncio.sleep(0.05)
+        return super().total_despesas(db)
+
+    async def media_despesas(self, db):
+        return super().media_despesas(db)
+
+    async def top5_operadoras(self, db):
+        return super().top5_operadoras(db)
+
+    async def despesas_por_uf(self, db):
+        return super().despesas_por_uf(db)
+
+
+def servico_async(repo: RepoAsyncFake, **kwargs) -> AsyncEstatisticasService:
+    return AsyncEstatisticasService(cast(AsyncEstatisticasRepository, repo), **kwargs)
+
+
+def test_async_recalculo_unico_no_event_loop():
+    repo = RepoAsyncFake()
+    svc = servico_async(repo, cache=CacheMemoria())
+
+    async def rodar():
+        # 20 requests concorrentes no mesmo loop: um calcula, os outros esperam
+        return await asyncio.gather(*(svc.get(db=SEM_DB_ASYNC) for _ in range(20)))
+
+    payloads = asyncio.run(rodar())
+    assert all(p == ESPERADO for p in payloads)
+    assert repo.consultas == 4
+
+
+class CacheFora:
+    """Backend compartilhado fora do ar (arquivo travado, redis caído)."""
+
+    bloqueante = True
+
+    def __init__(self):
+        self.threads: set[int] = set()
+
+    def _falhar(self):
+        self.threads.add(threading.get_ident())
+        raise sqlite3.OperationalError("database is locked")
+
+    def get(self, chave):
+        self._falhar()
+
+    def set(self, chave, valor):
+        self._falhar()
+
+    def acquire(self, chave, ttl):
+        self._falhar()
+
+    def release(self, chave, token):
+        self._falhar()
+
+
+def test_backend_fora_do_ar_calcula_direto():
+    repo = RepoFake()
+    svc = servico(repo, cache=CacheFora())
+    inicio = time.monotonic()
+    assert svc.get(db=SEM_DB) == ESPERADO
+    # trava não obtida não vira espera até trava_ttl
+    assert time.monotonic() - inicio < 1
+    assert repo.consultas == 4
+
+
+def test_async_cache_bloqueante_fora_do_event_loop():
+    repo = RepoAsyncFake()
+    cache = CacheFora()
+    svc = servico_async(repo, cache=cache)
+
+    async def rodar():
+        return await svc.get(db=SEM_DB_ASYNC), threading.get_ident()
+
+    payload, loop = asyncio.run(rodar())
+    assert payload == ESPERADO
+    assert cache.threads and loop not in cache.threads
@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import random
+from typing import cast
+
+import pytest
+from app.api.utils import only_digits
+from app.repositories.operadora_repo import BUSCA_TRIGRAM, OperadoraRepository
+from app.services.operadora_indice import IndiceOperadoras, regex_like
+from app.services.operadora_service import OperadoraService, encode_cursor
+from sqlalchemy.orm import Session
+
+PALAVRAS = ["UNIMED", "SAÚDE", "São", "médica", "ODONTO", "Ação", "PLANO", "ﬁel"]
+
+
+def chaveOrdem(r):
+    # razao_social NULLS LAST, registro_ans
+    return (r["razao_social"] is None, r["razao_social"] or "", r["registro_ans"])
+
+
+def likeReferencia(texto: str, padrao: str) -> bool:
+    """LIKE '%padrao%' caractere a caractere, como o PostgreSQL avalia."""
+    tokens, i = [], 0
+    while i < len(padrao):
+        if padrao[i] == "\\":
+            tokens.append(("lit", padrao[i + 1]))
+            i += 2
+            continue
+        tokens.append(
+            {"%": ("any", None), "_": ("one", None)}.get(padrao[i], ("lit", padrao[i]))
+        )
+        i += 1
+    tokens = [("any", None)] + tokens + [("any", None)]
+
+    def casa(t, k):
+        if k == len(tokens):
+            return t == len(texto)
+        tipo, c = tokens[k]
+        if tipo == "any":
+            return any(casa(u, k + 1) for u in range(t, len(texto) + 1))
+        if t == len(texto):
+            return False
+        return (tipo == "one" or texto[t] == c) and casa(t + 1, k + 1)
+
+    return casa(0, 0)
+
+
+def filtroSql(linhas, q_text, q_digits):
+    """FILTRO_Q do operadora_repo, linha a linha, na ordem do ORDER BY."""
+    return [
+        r
+        for r in linhas
+        if q_text == ""
+        or (
+            r["razao_social"] is not None
+            and likeReferencia(r["razao_social"].lower(), q_text.lower())
+        )
+        or (q_digits != "" and r["cnpj"] is not None and q_digits in r["cnpj"])
+    ]
+
+
+def gerarLinhas(n: int, seed: int):
+    rnd = random.Random(seed)
+    linhas = []
+    for i in range(1, n + 1):
+        razao = " ".join(rnd.choice(PALAVRAS) for _ in range(rnd.randint(1, 3)))
+        linhas.append(
+            {
+                "registro_ans": i,
+                "razao_social": None if rnd.random() < 0.1 else f"{razao} {i}%_",
+                "cnpj": (
+                    None
+                    if rnd.random() < 0.1
+                    else "".join(rnd.choice("0123456789") for _ in range(14))
+                ),
+            }
+        )
+    return sorted(linhas, key=chaveOrdem)
+
+
+LINHAS = gerarLinhas(400, 23)
+
+TERMOS = [
+    "",
+    "unimed",
+    "saude",  # sem acento não casa com SAÚDE no ILIKE
+    "SAÚDE",
+    "são",
+    "fi",
+    "ﬁel",
+    "a",
+    "12",
+    "med 1",
+    "1%",
+    "u_i",
+    "5\\%",
+    "\\_",
+    "zzz",
+    "007",
+    "plano 3",
+]
+
+
+@pytest.mark.parametrize("q", TERMOS)
+def test_indice_igual_ao_filtro_sql(q):
+    indice = IndiceOperadoras(LINHAS)
+    q_digits = only_digits(q)
+    posicoes = indice.buscar(q, q_digits)
+    assert posicoes is not None
+    esperado = filtroSql(LINHAS, q, q_digits)
+    assert [indice.linhas[i] for i in posicoes] == esperado
+
+
+def test_prefixo_cnpj_em_qualquer_posicao():
+    indice = IndiceOperadoras(LINHAS)
+    cnpj = next(r["cnpj"] for r in LINHAS if r["cnpj"])
+    for trecho in (cnpj, cnpj[:5], cnpj[4:9], cnpj[-3:]):
+        achadas = [indice.linhas[i]["cnpj"] for i in indice._por_cnpj(trecho)]
+        assert cnpj in achadas and all(trecho in c for c in achadas)
+
+
+def test_escape_no_fim_volta_ao_sql():
+    assert regex_like("abc\\") is None
+    assert IndiceOperadoras(LINHAS).buscar("abc\\", "") is None
+
+
+class RepoFake:
+    busca = "ilike"
+
+    def __init__(self, linhas):
+        self.linhas = linhas
+        # (max(carregado_em), count(*)) do import_controle
+        self.versao: tuple | None = ("2025-01-01", 3)
+        self.cargas = 0
+        self.consultas = 0
+
+    def versao_operadoras(self, db):
+        return self.versao
+
+    def list_todas_operadoras(self, db):
+        self.cargas += 1
+        return self.linhas
+
+    def count_operadoras(self, db, q_text, q_digits):
+        self.consultas += 1
+        return len(filtroSql(self.linhas, q_text, q_digits))
+
+    def estimate_operadoras(self, db, q_text, q_digits):
+        self.consultas += 1
+        return len(self.linhas)
+
+    def list_operadoras(self, db, page, limit, q_text, q_digits):
+        self.consultas += 1
+        offset = (page - 1) * limit
+        return filtroSql(self.linhas, q_text, q_digits)[offset : offset + limit]
+
+    def list_operadoras_keyset(self, db, limit, q_text, q_digits, apos=None):
+        self.consultas += 1
+        linhas = filtroSql(self.linhas, q_text, q_digits)
+        if apos is not None:
+            ref = {"razao_social": apos[0], "registro_ans": apos[1]}
+            linhas = [r for r in linhas if chaveOrdem(r) > chaveOrdem(ref)]
+        return linhas[:limit]
+
+
+# o fake faz o papel do repositório; a sessão nunca é usada
+SEM_DB = cast(Session, None)
+
+
+def servico(repo: RepoFake, indice: bool | None = None) -> OperadoraService:
+    return OperadoraService(cast(OperadoraRepository, repo), indice=indice)
+
+
+def test_servico_com_indice_responde_igual_e_sem_banco():
+    com = RepoFake(LINHAS)
+    sem = RepoFake(LINHAS)
+    svc = servico(com, indice=True)
+    ref = servico(sem, indice=False)
+
+    for q in ("unimed", "12", "", "são"):
+        for page in (1, 2, 7):
+            assert svc.listar(SEM_DB, page, 10, q) == ref.listar(SEM_DB, page, 10, q)
+
+        cursor = None
+        while True:
+            obtido = svc.listar_cursor(SEM_DB, 25, q, cursor, contagem="exata")
+            assert obtido == ref.listar_cursor(SEM_DB, 25, q, cursor, contagem="exata")
+            cursor = obtido[3]
+            if cursor is None:
+                break
+
+    assert com.cargas == 1 and com.consultas == 0
+
+
+def test_cursor_de_linha_removida_vai_ao_sql():
+    repo = RepoFake(LINHAS)
+    svc = servico(repo, indice=True)
+    cursor = encode_cursor("NÃO EXISTE", 99999)
+    svc.listar_cursor(SEM_DB, 10, None, cursor)
+    assert repo.consultas == 1
+
+
+def test_recarrega_quando_a_versao_muda():
+    repo = RepoFake(LINHAS)
+    svc = servico(repo, indice=True)
+    svc.intervalo_versao = 0
+    svc.listar(SEM_DB, 1, 10, None)
+    svc.listar(SEM_DB, 1, 10, None)
+    assert repo.cargas == 1
+
+    repo.linhas = LINHAS[:5]
+    repo.versao = ("2025-04-01", 3)
+    total, _, _ = svc.listar(SEM_DB, 1, 10, None)
+    assert repo.cargas == 2 and total == 5
+
+
+def test_sem_versao_nao_usa_indice_velho():
+    # banco sem import_controle: não dá para ver a carga nova, então SQL
+    repo = RepoFake(LINHAS)
+    svc = servico(repo, indice=True)
+    svc.intervalo_versao = 0
+    svc.listar(SEM_DB, 1, 10, None)
+    assert repo.cargas == 1 and repo.consultas == 0
+
+    repo.versao = None
+    repo.linhas = LINHAS[:5]
+    total, _, _ = svc.listar(SEM_DB, 1, 10, None)
+    assert svc.indice is None and total == 5 and repo.consultas > 0
+
+    # a versão voltou (carga que grava import_controle): índice de novo
+    repo.versao = ("2025-04-01", 1)
+    consultas = repo.consultas
+    assert svc.listar(SEM_DB, 1, 10, None)[0] == 5
+    assert repo.cargas == 2 and repo.consultas == consultas
+
+
+def test_estimada_pelo_indice_sai_exata():
+    svc = servico(RepoFake(LINHAS), indice=True)
+    ref = servico(RepoFake(LINHAS), indice=False)
+    total, estimado, _ = svc.listar(SEM_DB, 1, 10, "unimed", contagem="estimada")
+    assert estimado is False
+    assert total == ref.listar(SEM_DB, 1, 10, "unimed")[0]
+    # sem o índice a estimativa é do planner
+    assert ref.listar(SEM_DB, 1, 10, "unimed", contagem="estimada")[1] is True
+    _, estimado, _, _ = ref.listar_cursor(SEM_DB, 10, "unimed", None, "estimada")
+    assert estimado is True
+
+
+def test_busca_trigram_fica_no_sql(monkeypatch):
+    repo = RepoFake(LINHAS)
+    repo.busca = BUSCA_TRIGRAM
+    assert servico(repo, indice=True).usar_indice is False
+    monkeypatch.setenv("OPERADORAS_INDICE", "1")
+    assert servico(RepoFake(LINHAS)).usar_indice is True
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import re
+from pathlib import Path
+
+import pytest
+from app.repositories import operadora_repo
+from app.repositories.operadora_repo import OperadoraRepository, _params_q
+
+DB_DIR = Path(__file__).resolve().parents[2] / "db"
+
+
+def test_modo_busca(monkeypatch):
+    monkeypatch.delenv("OPERADORAS_BUSCA", raising=False)
+    assert OperadoraRepository().filtro is operadora_repo.FILTRO_Q
+    monkeypatch.setenv("OPERADORAS_BUSCA", "trigram")
+    assert OperadoraRepository().filtro is operadora_repo.FILTRO_TRIGRAM
+    with pytest.raises(ValueError):
+        OperadoraRepository(busca="elastic")
+
+
+@pytest.mark.parametrize(
+    "q, prefixo",
+    [
+        ("12.345.678/0001", "123456780001%"),
+        ("12345", "12345%"),
+        ("unimed 2", ""),
+        ("saúde", ""),
+    ],
+)
+def test_prefixo_cnpj_so_para_q_numerico(q, prefixo):
+    digitos = re.sub(r"\D+", "", q)
+    assert _params_q(q, digitos)["cnpj_prefixo"] == prefixo
+
+
+def test_expressao_igual_a_do_indice():
+    # o planner só usa o GIN se a expressão da query for a do índice
+    ddl = (DB_DIR / "005_busca_operadora.sql").read_text(encoding="utf-8")
+    indice = ddl[ddl.index("USING gin (") + len("USING gin (") :]
+    indice = indice[: indice.index(" public.gin_trgm_ops")]
+    assert re.sub(r"\s+", "", indice) == re.sub(r"\s+", "", operadora_repo.DOC_BUSCA)
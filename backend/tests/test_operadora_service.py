@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from typing import cast
+
+import pytest
+from app.api.utils import executar
+from app.repositories.operadora_repo import (
+    AsyncOperadoraRepository,
+    OperadoraRepository,
+)
+from app.services.operadora_service import (
+    AsyncOperadoraService,
+    OperadoraService,
+    decode_cursor,
+    encode_cursor,
+)
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+
+def chaveOrdem(r):
+    # razao_social NULLS LAST, registro_ans
+    return (r["razao_social"] is None, r["razao_social"] or "", r["registro_ans"])
+
+
+class RepoFake:
+    busca = "ilike"
+
+    def __init__(self, linhas):
+        self.linhas = sorted(linhas, key=chaveOrdem)
+        self.contagens = 0
+
+    def count_operadoras(self, db, q_text, q_digits):
+        self.contagens += 1
+        return len(self.linhas)
+
+    def list_operadoras_keyset(self, db, limit, q_text, q_digits, apos=None):
+        linhas = self.linhas
+        if apos is not None:
+            ref = {"razao_social": apos[0], "registro_ans": apos[1]}
+            linhas = [r for r in linhas if chaveOrdem(r) > chaveOrdem(ref)]
+        return linhas[:limit]
+
+
+# os fakes fazem o papel do repositório; a sessão nunca é usada
+SEM_DB = cast(Session, None)
+SEM_DB_ASYNC = cast(AsyncSession, None)
+
+
+def servico(repo: RepoFake, indice: bool | None = None) -> OperadoraService:
+    return OperadoraService(cast(OperadoraRepository, repo), indice=indice)
+
+
+def test_cursor_ida_e_volta():
+    for chave in [("UNIMED SÃO PAULO", 123456), (None, 7), ("", 1)]:
+        assert decode_cursor(encode_cursor(*chave)) == chave
+
+
+@pytest.mark.parametrize("cursor", ["lixo!", encode_cursor("x", 1)[:-3], "WzFd"])
+def test_cursor_invalido_422(cursor):
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor(cursor)
+    assert exc.value.status_code == 422
+
+
+def test_paginas_cobrem_tudo_na_ordem_do_offset():
+    rnd = random.Random(21)
+    linhas = [
+        {
+            "registro_ans": i,
+            "razao_social": (
+                None if rnd.random() < 0.2 else rnd.choice(["A", "B", "C", "D"])
+            ),
+        }
+        for i in range(1, 58)
+    ]
+    repo = RepoFake(linhas)
+    svc = servico(repo)
+
+    vistas, cursor, paginas = [], None, 0
+    while True:
+        total, _, rows, cursor = svc.listar_cursor(SEM_DB, 10, None, cursor)
+        vistas.extend(rows)
+        paginas += 1
+        if cursor is None:
+            break
+
+    assert total is None and repo.contagens == 0
+    assert paginas == 6
+    assert vistas == repo.linhas
+
+
+def test_contagem_exata_opcional_no_cursor():
+    repo = RepoFake([{"registro_ans": 1, "razao_social": "A"}])
+    total, _, rows, cursor = servico(repo).listar_cursor(
+        SEM_DB, 10, None, None, contagem="exata"
+    )
+    assert (total, len(rows), cursor) == (1, 1, None)
+
+
+class RepoAsyncFake(RepoFake):
+    async def count_operadoras(self, db, q_text, q_digits):
+        return super().count_operadoras(db, q_text, q_digits)
+
+    async def list_operadoras_keyset(self, db, limit, q_text, q_digits, apos=None):
+        return super().list_operadoras_keyset(db, limit, q_text, q_digits, apos)
+
+    async def get_registro_ans_by_cnpj(self, db, cnpj):
+        return None
+
+
+def servico_async(repo: RepoAsyncFake) -> AsyncOperadoraService:
+    return AsyncOperadoraService(cast(AsyncOperadoraRepository, repo), indice=False)
+
+
+def test_async_mesmas_paginas_que_o_sync():
+    linhas = [{"registro_ans": i, "razao_social": f"OP {i % 7}"} for i in range(1, 30)]
+    sync = servico(RepoFake(linhas), indice=False)
+    assincrono = servico_async(RepoAsyncFake(linhas))
+
+    async def paginas(svc):
+        vistas, cursor = [], None
+        while True:
+            # executar(): corrotina no loop, função síncrona no threadpool
+            total, estimado, rows, cursor = await executar(
+                svc.listar_cursor, None, 8, None, cursor, "exata"
+            )
+            vistas.append((total, estimado, rows, cursor))
+            if cursor is None:
+                return vistas
+
+    assert asyncio.run(paginas(assincrono)) == asyncio.run(paginas(sync))
+
+
+def test_async_cnpj_inexistente_404():
+    svc = servico_async(RepoAsyncFake([]))
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(svc.despesas(SEM_DB_ASYNC, "12.345.678/0001-90"))
+    assert exc.value.status_code == 404
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import json
+import os
+import queue
+import signal
+import subprocess
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from pathlib import Path
+
+import pytest
+from app.core import pipeline
+from app.core.pipeline import Etapa, executarPipeline
+from app.usecases import ans_pipeline
+from conftest import PipelineDirs
+
+
+def test_etapas_independentes_rodam_em_paralelo(tmp_path):
+    # só passa se "a" e "b" estiverem rodando ao mesmo tempo
+    barreira = threading.Barrier(2, timeout=5)
+    ordem: list[str] = []
+
+    etapas = [
+        Etapa("a", lambda: (barreira.wait(), ordem.append("a"))),
+        Etapa("b", lambda: (barreira.wait(), ordem.append("b"))),
+        Etapa("c", lambda: ordem.append("c"), dependencias=("a", "b")),
+    ]
+    relatorio = executarPipeline(etapas, workers=2)
+
+    assert ordem[-1] == "c"
+    assert [e.status for e in relatorio.etapas] == ["ok"] * 3
+
+
+def test_falha_pula_dependentes_e_grava_relatorio(tmp_path):
+    def falhar():
+        raise ValueError("sem dados")
+
+    executadas: list[str] = []
+    etapas = [
+        Etapa("ok", lambda: executadas.append("ok")),
+        Etapa("falha", falhar),
+        Etapa("depois", lambda: executadas.append("depois"), dependencias=("falha",)),
+    ]
+    relatorioPath = tmp_path / "relatorio.json"
+
+    with pytest.raises(RuntimeError, match="falha: ValueError: sem dados"):
+        executarPipeline(etapas, relatorioPath=relatorioPath)
+
+    dados = json.loads(relatorioPath.read_text(encoding="utf-8"))
+    assert [(e["nome"], e["status"]) for e in dados["etapas"]] == [
+        ("ok", "ok"),
+        ("falha", "erro"),
+        ("depois", "pulada"),
+    ]
+    assert executadas == ["ok"]
+
+
+def test_falha_do_amostrador_nao_esconde_o_erro(monkeypatch):
+    def semThread(self):
+        raise RuntimeError("can't start new thread")
+
+    monkeypatch.setattr(pipeline.AmostradorRss, "__enter__", semThread)
+    metricas = pipeline.MetricasEtapa("a")
+    pipeline.executarEtapa(Etapa("a", print), metricas)
+
+    assert metricas.status == "erro"
+    assert metricas.erro == "RuntimeError: can't start new thread"
+    assert metricas.pico_rss_mb is None
+
+
+NETO = "import sys, time; x = b'x' * (64 << 20); print('pronto', flush=True); time.sleep(30)"
+FILHO = f"import subprocess, sys; subprocess.run([sys.executable, '-c', {NETO!r}])"
+
+
+@pytest.mark.skipif(not Path("/proc/self/task").is_dir(), reason="sem /proc")
+def test_rss_soma_filhos_de_outras_threads_e_netos():
+    # o process pool nasce numa thread do executor, que segue viva durante a etapa
+    antes = pipeline.lerRssAtualMb()
+    criado: queue.Queue[subprocess.Popen] = queue.Queue()
+    liberar = threading.Event()
+
+    def criarFilho():
+        criado.put(
+            subprocess.Popen(
+                [sys.executable, "-c", FILHO], stdout=subprocess.PIPE, text=True
+            )
+        )
+        liberar.wait(30)
+
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        pool.submit(criarFilho)
+        filho = criado.get(timeout=10)
+        try:
+            assert filho.stdout.readline().strip() == "pronto"
+            descendentes = pipeline.listarDescendentes(os.getpid())
+            assert filho.pid in descendentes
+            assert len(descendentes) >= 2  # filho + neto
+            assert pipeline.lerRssAtualMb() - antes >= 64
+        finally:
+            for pid in pipeline.listarDescendentes(filho.pid):
+                os.kill(pid, signal.SIGKILL)
+            filho.kill()
+            filho.wait()
+            liberar.set()
+
+
+@pytest.mark.parametrize(
+    "etapas",
+    [
+        [Etapa("a", print, dependencias=("b",)), Etapa("b", print, ("a",))],
+        [Etapa("a", print, dependencias=("x",))],
+        [Etapa("a", print), Etapa("a", print)],
+    ],
+)
+def test_grafo_invalido(etapas):
+    with pytest.raises(ValueError):
+        executarPipeline(etapas)
+
+
+def test_pipeline_completo_gera_relatorio(
+    pipelineDirs: PipelineDirs, tmp_path, monkeypatch
+):
+    monkeypatch.setattr(ans_pipeline, "RAW_DIR", pipelineDirs.raw)
+    monkeypatch.setattr(ans_pipeline, "DELIVERY_DIR", tmp_path / "delivery")
+
+    etapas = ans_pipeline.montarEtapasTeste1(
+        formato="csv", streaming=True, workers=1
+    ) + ans_pipeline.montarEtapasTeste2(
+        "teste", formato="csv", dependenciasConsolidado=("consolidacao",)
+    )
+    # ZIPs sintéticos já estão no raw: sem download real
+    etapas[0] = replace(etapas[0], executar=lambda: None)
+
+    relatorioPath = tmp_path / "relatorio.json"
+    executarPipeline(etapas, workers=2, relatorioPath=relatorioPath)
+
+    dados = json.loads(relatorioPath.read_text(encoding="utf-8"))
+    metricas = {e["nome"]: e for e in dados["etapas"]}
+
+    assert list(metricas) == [
+        "download",
+        "normalizacao",
+        "consolidacao",
+        "cadop",
+        "enriquecimento",
+        "agregacao",
+        "entrega",
+    ]
+    assert all(m["status"] == "ok" for m in metricas.values())
+    assert all(m["duracao_s"] is not None for m in metricas.values())
+    assert metricas["normalizacao"]["bytes_lidos"] > 0
+    assert metricas["normalizacao"]["linhas_saida"] > 0
+    assert (
+        metricas["consolidacao"]["linhas_entrada"]
+        == metricas["normalizacao"]["linhas_saida"]
+    )
+    assert (
+        metricas["enriquecimento"]["linhas_saida"]
+        == metricas["consolidacao"]["linhas_saida"]
+    )
+    assert metricas["agregacao"]["linhas_saida"] > 0
+    assert metricas["normalizacao"]["pico_rss_mb"] > 0
+    assert (tmp_path / "delivery" / "Teste_Agregacao_teste.zip").exists()
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+from app.domain import validators
+from app.domain.models import CadopRegistro
+from app.domain.validators import (
+    MOTIVO_CNPJ_DV,
+    MOTIVO_CNPJ_REPETIDO,
+    MOTIVO_CNPJ_TAMANHO,
+    MOTIVO_CNPJ_VAZIO,
+    motivo_cnpj_invalido,
+    validar_cnpj,
+    validar_cnpjs,
+)
+from app.usecases.ans_enrich_validate import enriquecerLinha, validarCnpjsCadop
+
+CNPJS = [
+    ("11.222.333/0001-81", None),
+    ("11222333000181", None),
+    ("  11222333000181 ", None),
+    ("11222333000182", MOTIVO_CNPJ_DV),
+    ("11222333000191", MOTIVO_CNPJ_DV),
+    ("1122233300018", MOTIVO_CNPJ_TAMANHO),
+    ("112223330001810", MOTIVO_CNPJ_TAMANHO),
+    ("00000000000000", MOTIVO_CNPJ_REPETIDO),
+    ("", MOTIVO_CNPJ_VAZIO),
+    ("abc", MOTIVO_CNPJ_VAZIO),
+    ("１１２２２３３３０００１８１", MOTIVO_CNPJ_VAZIO),  # largura total
+    ("1122233300018١", MOTIVO_CNPJ_TAMANHO),  # dígito arábico-índico
+]
+
+
+def gerarCnpj(rnd: random.Random) -> str:
+    base = "".join(rnd.choice("0123456789") for _ in range(12))
+    dv1 = validators._calc_dv(base, validators.PESOS_DV1)
+    return base + dv1 + validators._calc_dv(base + dv1, validators.PESOS_DV2)
+
+
+@pytest.mark.parametrize("cnpj, motivo", CNPJS)
+def test_motivo_cnpj_invalido(cnpj, motivo):
+    assert motivo_cnpj_invalido(cnpj) == motivo
+    assert validar_cnpj(cnpj) is (motivo is None)
+
+
+def test_lote_igual_ao_escalar():
+    rnd = random.Random(7)
+    cnpjs = [c for c, _ in CNPJS] + [gerarCnpj(rnd) for _ in range(500)]
+    # metade com um dígito trocado
+    cnpjs += [c[:13] + str((int(c[13]) + 1) % 10) for c in cnpjs[-250:]]
+
+    assert list(validar_cnpjs(cnpjs)) == [validar_cnpj(c) for c in cnpjs]
+
+
+def test_lote_sem_numpy(monkeypatch):
+    monkeypatch.setattr(validators, "np", None)
+    cnpjs = [c for c, _ in CNPJS]
+    assert validar_cnpjs(cnpjs) == [m is None for _, m in CNPJS]
+
+
+def test_enriquecimento_em_lote_igual_ao_escalar():
+    cadop = {
+        reg: CadopRegistro(reg, cnpj, razao, "Medicina de Grupo", "SP")
+        for reg, cnpj, razao in (
+            ("1", "11222333000181", "A"),
+            ("2", "11222333000182", "B"),
+            ("3", "", "C"),
+        )
+    }
+    motivos = validarCnpjsCadop(cadop.values())
+    assert motivos == {
+        "11222333000181": None,
+        "11222333000182": MOTIVO_CNPJ_DV,
+        "": MOTIVO_CNPJ_VAZIO,
+    }
+
+    # lote (pipeline) e escalar (sem o dict) dão o mesmo `erros`, sem o motivo
+    for motivosCnpj in (motivos, None):
+        erros = [
+            enriquecerLinha(reg, "1", "2025", "10", cadop, motivosCnpj)["erros"]
+            for reg in ("1", "2", "3", "9")
+        ]
+        assert erros == [
+            "",
+            "cnpj_invalido",
+            "cnpj_invalido",
+            "cnpj_invalido,razao_social_vazia",
+        ]
@@ -36,6 +36,14 @@ CREATE TABLE IF NOT EXISTS operadora (
 
 CREATE INDEX IF NOT EXISTS idx_operadora_uf ON operadora (uf);
 
+-- ordem da listagem (razao_social NULLS LAST, registro_ans): a paginação por
+-- cursor anda neste índice e para no LIMIT, em qualquer página
+CREATE INDEX IF NOT EXISTS idx_operadora_razao_registro
+  ON operadora (razao_social, registro_ans);
+
+-- busca por trigramas (OPERADORAS_BUSCA=trigram): opcional, em
+-- 005_busca_operadora.sql, porque exige as extensões pg_trgm e unaccent
+
 -- =========================================================
 -- FATO: despesas por operadora e trimestre
 -- =========================================================
@@ -52,13 +60,32 @@ CREATE TABLE IF NOT EXISTS despesa_trimestral (
   erros                   TEXT,
 
   PRIMARY KEY (registro_ans, ano, trimestre)
-);
+) PARTITION BY RANGE (ano, trimestre);
+
+-- Uma partição por trimestre (criar_particao_despesa); a default só recebe
+-- períodos ainda sem partição. Sem índice em (ano, trimestre): o pruning
+-- de partição já resolve o filtro por período, e (registro_ans, ano,
+-- trimestre) é a própria PK.
+--
+-- Em banco criado com o DDL antigo o CREATE acima é pulado e o fato segue
+-- heap: nada de default nem funções (a carga checa to_regproc e segue sem
+-- partições) até rodar o 004. O \if é do psql porque \ir não roda em DO.
+SELECT relkind = 'p' AS fato_particionado
+FROM pg_class
+WHERE oid = 'despesa_trimestral'::regclass \gset
 
-CREATE INDEX IF NOT EXISTS idx_despesa_periodo
-  ON despesa_trimestral (ano, trimestre);
+\if :fato_particionado
+CREATE TABLE IF NOT EXISTS despesa_trimestral_default
+  PARTITION OF despesa_trimestral DEFAULT;
 
-CREATE INDEX IF NOT EXISTS idx_despesa_registro_periodo
-  ON despesa_trimestral (registro_ans, ano, trimestre);
+\ir funcoes_particao.sql
+\else
+DO $$
+BEGIN
+  RAISE NOTICE 'despesa_trimestral ainda é tabela comum (DDL antigo); migre com db/004_migracao_particionamento.sql';
+END
+$$;
+\endif
 
 -- =========================================================
 -- MATERIALIZADO: agregação do teste 2.3 (razao_social + uf)
@@ -77,4 +104,9 @@ CREATE TABLE IF NOT EXISTS despesa_agregada_operadora_uf (
 CREATE INDEX IF NOT EXISTS idx_agregada_uf
   ON despesa_agregada_operadora_uf (uf);
 
+-- =========================================================
+-- MATERIALIZADO: resumo de /api/estatisticas (refeito a cada carga)
+-- =========================================================
+\ir estatisticas_resumo.sql
+
 COMMIT;
@@ -24,6 +24,16 @@ CREATE TABLE IF NOT EXISTS import_rejeitados (
   criado_em  TIMESTAMPTZ NOT NULL DEFAULT now()
 );
 
+-- Controle de carga: mesma tabela do db_import (DDL_CONTROLE). A API usa
+-- (max(carregado_em), count(*)) como versão da operadora (índice em memória).
+CREATE TABLE IF NOT EXISTS import_controle (
+  origem        TEXT NOT NULL,
+  particao      TEXT NOT NULL,
+  sha256        TEXT NOT NULL,
+  carregado_em  TIMESTAMPTZ NOT NULL DEFAULT now(),
+  PRIMARY KEY (origem, particao)
+);
+
 -- =========================================================
 -- 1) STAGING TABLES
 -- =========================================================
@@ -217,7 +227,25 @@ SELECT
 FROM faltantes
 ON CONFLICT (registro_ans) DO NOTHING;
 
--- 3.2.2) converter / rejeitar / upsert no fato
+-- 3.2.2) uma partição por trimestre presente no fato (criar_particao_despesa,
+-- funcoes_particao.sql); períodos sem partição cairiam na default. Bancos
+-- ainda sem o 004_migracao_particionamento.sql não têm a função e seguem
+-- sem ela (mesma regra da carga Python, db_import.SQL_TEM_PARTICOES).
+DO $$
+BEGIN
+  IF to_regproc('criar_particao_despesa') IS NOT NULL THEN
+    PERFORM criar_particao_despesa(ano, trimestre)
+    FROM (
+      SELECT DISTINCT trim(ano)::int AS ano, trim(trimestre)::int AS trimestre
+      FROM stg_despesa_trimestral
+      WHERE trim(ano) ~ '^[0-9]+$' AND trim(trimestre) ~ '^[1-4]$'
+    ) p
+    ORDER BY ano, trimestre;
+  END IF;
+END
+$$;
+
+-- 3.2.3) converter / rejeitar / upsert no fato
 WITH cleaned AS (
   SELECT
     NULLIF(trim(registro_ans), '') AS registro_raw,
@@ -345,6 +373,33 @@ ON CONFLICT (razao_social, uf) DO UPDATE SET
   desvio_padrao = COALESCE(EXCLUDED.desvio_padrao, despesa_agregada_operadora_uf.desvio_padrao),
   qtd_registros = COALESCE(EXCLUDED.qtd_registros, despesa_agregada_operadora_uf.qtd_registros);
 
+-- =========================================================
+-- 4) Resumo de /api/estatisticas (estatisticas_resumo.sql)
+-- Na mesma transação: a API só vê o resumo novo junto com os dados novos.
+-- Banco sem o estatisticas_resumo.sql segue sem resumo (a API cai nas
+-- queries sobre o fato), como na carga Python (db_import.SQL_TEM_RESUMO).
+-- =========================================================
+DO $$
+BEGIN
+  IF to_regproc('atualizar_estatisticas_resumo') IS NOT NULL THEN
+    PERFORM atualizar_estatisticas_resumo();
+  END IF;
+END
+$$;
+
+-- =========================================================
+-- 5) Versão da carga (import_controle)
+-- Na mesma transação dos dados: a versão muda e o índice de operadoras da
+-- API recarrega. Os hashes por partição do db_import deixam de descrever o
+-- banco: saem, e a próxima carga incremental recarrega tudo (sha256 '' não
+-- bate com nenhum hash; a partição 'psql' sai como partição que sumiu).
+-- =========================================================
+DELETE FROM import_controle
+WHERE origem IN ('cadop', 'despesa_trimestral', 'despesa_agregada');
+
+INSERT INTO import_controle (origem, particao, sha256)
+VALUES ('cadop', 'psql', ''), ('despesa_trimestral', 'psql', ''), ('despesa_agregada', 'psql', '');
+
 COMMIT;
 
 -- =========================================================
@@ -2,6 +2,12 @@
 
 SET search_path TO healthtech;
 
+-- despesa_trimestral é particionada por (ano, trimestre): agregações que
+-- agrupam pela chave de partição (ou que admitem agregação parcial) rodam
+-- partição a partição. Ambos vêm desligados por padrão no PostgreSQL.
+SET enable_partitionwise_aggregate = on;
+SET enable_partitionwise_join = on;
+
 -- =========================================================
 -- Query 1
 -- Quais as 5 operadoras com maior crescimento percentual de despesas
@@ -11,24 +17,33 @@ SET search_path TO healthtech;
 -- - Para cada operadora, usamos o primeiro e o último trimestre DISPONÍVEL no dataset carregado,
 --   ao invés de exigir presença nos mesmos 2 trimestres globais.
 -- - Se valor inicial <= 0, crescimento percentual fica indefinido; esses casos são excluídos.
+--
+-- Primeiro/último período por MIN/MAX (agregação parcial por partição) e
+-- depois busca pontual pela PK, em vez de duas ordenações da tabela
+-- inteira por janela. (ano, trimestre) é único por operadora (PK).
 -- =========================================================
-WITH ranked AS (
+WITH limites AS (
   SELECT
-    d.registro_ans,
-    d.ano,
-    d.trimestre,
-    d.valor_despesas,
-    row_number() OVER (PARTITION BY d.registro_ans ORDER BY d.ano, d.trimestre) AS rn_first,
-    row_number() OVER (PARTITION BY d.registro_ans ORDER BY d.ano DESC, d.trimestre DESC) AS rn_last
-  FROM despesa_trimestral d
+    registro_ans,
+    MIN(ano * 10 + trimestre) AS periodo_inicial,
+    MAX(ano * 10 + trimestre) AS periodo_final
+  FROM despesa_trimestral
+  GROUP BY registro_ans
 ),
 first_last AS (
   SELECT
-    registro_ans,
-    MAX(CASE WHEN rn_first = 1 THEN valor_despesas END) AS valor_inicial,
-    MAX(CASE WHEN rn_last  = 1 THEN valor_despesas END) AS valor_final
-  FROM ranked
-  GROUP BY registro_ans
+    l.registro_ans,
+    i.valor_despesas AS valor_inicial,
+    f.valor_despesas AS valor_final
+  FROM limites l
+  JOIN despesa_trimestral i
+    ON i.registro_ans = l.registro_ans
+   AND i.ano = l.periodo_inicial / 10
+   AND i.trimestre = l.periodo_inicial % 10
+  JOIN despesa_trimestral f
+    ON f.registro_ans = l.registro_ans
+   AND f.ano = l.periodo_final / 10
+   AND f.trimestre = l.periodo_final % 10
 ),
 calc AS (
   SELECT
@@ -61,18 +76,23 @@ LIMIT 5;
 -- despesas totais e calcule também a média de despesas por operadora em cada UF.
 --
 -- Estratégia:
--- 1) Total por (UF, operadora)
+-- 1) Total por operadora (sem UF: agrega partição a partição) e depois a UF
 -- 2) Agrega por UF: total + média por operadora + contagem de operadoras
 -- =========================================================
-WITH por_operadora_uf AS (
+WITH por_operadora AS (
+  -- soma antes do join: agregação parcial por partição; cada operadora tem uma UF só
+  SELECT registro_ans, SUM(valor_despesas) AS total_operadora
+  FROM despesa_trimestral
+  GROUP BY registro_ans
+),
+por_operadora_uf AS (
   SELECT
     o.uf,
-    d.registro_ans,
-    SUM(d.valor_despesas) AS total_operadora_uf
-  FROM despesa_trimestral d
-  JOIN operadora o ON o.registro_ans = d.registro_ans
+    p.registro_ans,
+    p.total_operadora AS total_operadora_uf
+  FROM por_operadora p
+  JOIN operadora o ON o.registro_ans = p.registro_ans
   WHERE o.uf IS NOT NULL
-  GROUP BY o.uf, d.registro_ans
 ),
 por_uf AS (
   SELECT
@@ -101,6 +121,8 @@ LIMIT 5;
 -- - Usamos os 3 primeiros períodos (ano,trimestre) disponíveis ordenados.
 -- - Calculamos a média global por período.
 -- - Contamos, por operadora, em quantos períodos ela ficou acima da média.
+-- - A média por período agrupa pela chave de partição: uma agregação
+--   completa por partição, sem juntar as partições antes.
 -- =========================================================
 WITH periodos AS (
   SELECT ano, trimestre
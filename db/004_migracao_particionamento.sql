@@ -0,0 +1,53 @@
+-- Teste 3 — Migração: despesa_trimestral (heap) -> particionada por trimestre
+--
+-- Só para bancos criados com a versão anterior do 001_ddl.sql (tabela
+-- comum). Bancos novos já nascem particionados.
+-- Rode com: psql -d <seu_banco> -v ON_ERROR_STOP=1 -f db/004_migracao_particionamento.sql
+
+BEGIN;
+
+SET search_path TO healthtech;
+
+-- 1) tabela antiga sai do caminho (o nome da PK também: índices são por schema)
+ALTER TABLE despesa_trimestral RENAME TO despesa_trimestral_heap;
+ALTER INDEX despesa_trimestral_pkey RENAME TO despesa_trimestral_heap_pkey;
+DROP INDEX IF EXISTS idx_despesa_periodo;
+DROP INDEX IF EXISTS idx_despesa_registro_periodo;
+
+-- 2) layout novo (mesmo DDL do 001_ddl.sql)
+CREATE TABLE despesa_trimestral (
+  registro_ans        INTEGER NOT NULL REFERENCES operadora(registro_ans),
+  ano                 SMALLINT NOT NULL,
+  trimestre           SMALLINT NOT NULL CHECK (trimestre BETWEEN 1 AND 4),
+  valor_despesas      NUMERIC(18,2) NOT NULL,
+
+  -- flags do pipeline (mantidas para auditoria/qualidade)
+  cnpj_valido             BOOLEAN,
+  valor_positivo          BOOLEAN,
+  razao_social_nao_vazia  BOOLEAN,
+  erros                   TEXT,
+
+  PRIMARY KEY (registro_ans, ano, trimestre)
+) PARTITION BY RANGE (ano, trimestre);
+
+CREATE TABLE despesa_trimestral_default
+  PARTITION OF despesa_trimestral DEFAULT;
+
+\ir funcoes_particao.sql
+
+-- 3) uma partição por trimestre existente, depois os dados
+SELECT criar_particao_despesa(ano, trimestre)
+FROM (SELECT DISTINCT ano, trimestre FROM despesa_trimestral_heap) p
+ORDER BY ano, trimestre;
+
+INSERT INTO despesa_trimestral
+SELECT * FROM despesa_trimestral_heap;
+
+DROP TABLE despesa_trimestral_heap;
+
+ANALYZE despesa_trimestral;
+
+COMMIT;
+
+-- Conferência:
+-- SELECT tableoid::regclass AS particao, COUNT(*) FROM despesa_trimestral GROUP BY 1 ORDER BY 1;
@@ -0,0 +1,42 @@
+-- Teste 4 — Busca de operadoras (filtro `q` da API)
+--
+-- Trigramas sem acento/caixa sobre razão social + nome fantasia (GIN) e
+-- prefixo de CNPJ (btree). Usado quando a API roda com
+-- OPERADORAS_BUSCA=trigram; o modo padrão (ILIKE) não depende disto.
+--
+-- Opcional, fora do 001_ddl.sql: cria extensões (pg_trgm, unaccent), o que
+-- exige privilégio no banco. Sem ele a API em modo trigram falha na query.
+-- Idempotente; rode depois do 001:
+--   psql -d <seu_banco> -v ON_ERROR_STOP=1 -f db/005_busca_operadora.sql
+--
+-- Extensões no schema public (lugar padrão). Se já existirem em outro
+-- schema, ajuste os nomes qualificados abaixo e no operadora_repo.py.
+
+BEGIN;
+
+CREATE EXTENSION IF NOT EXISTS pg_trgm WITH SCHEMA public;
+CREATE EXTENSION IF NOT EXISTS unaccent WITH SCHEMA public;
+
+-- unaccent() é STABLE (o dicionário pode mudar); índice exige IMMUTABLE.
+-- Dicionário e schema fixos: o resultado não depende do search_path.
+CREATE OR REPLACE FUNCTION healthtech.normalizar_busca(valor TEXT)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT AS $$
+  SELECT lower(public.unaccent('public.unaccent'::regdictionary, valor))
+$$;
+
+-- Mesma expressão usada em FILTRO_TRIGRAM (operadora_repo.py): o planner
+-- só usa o índice se a expressão da query for idêntica
+CREATE INDEX IF NOT EXISTS idx_operadora_busca_trgm
+  ON healthtech.operadora
+  USING gin (
+    healthtech.normalizar_busca(
+      coalesce(razao_social, '') || ' ' || coalesce(nome_fantasia, '')
+    ) public.gin_trgm_ops
+  );
+
+-- CNPJ por prefixo (LIKE '123%') sem depender da collation
+CREATE INDEX IF NOT EXISTS idx_operadora_cnpj_prefixo
+  ON healthtech.operadora (cnpj bpchar_pattern_ops);
+
+COMMIT;
@@ -0,0 +1,91 @@
+-- Teste 3/4 — Resumo materializado de /api/estatisticas
+--
+-- Uma linha (id = 1) com o payload pronto: a API lê por PK, sem varrer o
+-- fato. Recalculado no fim de cada carga (002_import.sql e carga Python),
+-- na mesma transação — leitores veem o resumo anterior até o COMMIT.
+--
+-- Incluído por 001_ddl.sql (\ir). Idempotente: em bancos já criados rode
+--   psql -d <seu_banco> -f db/estatisticas_resumo.sql
+-- e depois SELECT healthtech.atualizar_estatisticas_resumo();
+
+SET search_path TO healthtech;
+
+CREATE TABLE IF NOT EXISTS estatisticas_resumo (
+  id                SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+  total_despesas    NUMERIC(20,2) NOT NULL,
+  -- sem escala fixa: mesmo AVG() das queries sobre o fato, sem arredondar
+  media_despesas    NUMERIC NOT NULL,
+  qtd_despesas      BIGINT NOT NULL,
+  -- [{"cnpj", "razao_social", "total_despesas"}], maior total primeiro
+  top5_operadoras   JSONB NOT NULL,
+  -- {"SP": total, ...}
+  despesas_por_uf   JSONB NOT NULL,
+  atualizado_em     TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+-- bancos criados com a média em NUMERIC(20,2); no-op se já for NUMERIC
+ALTER TABLE estatisticas_resumo ALTER COLUMN media_despesas TYPE NUMERIC;
+
+-- Mesmas regras das quatro queries do EstatisticasRepository
+CREATE OR REPLACE FUNCTION atualizar_estatisticas_resumo()
+RETURNS VOID
+LANGUAGE sql AS $$
+  WITH geral AS (
+    SELECT
+      COALESCE(SUM(valor_despesas), 0) AS total,
+      COALESCE(AVG(valor_despesas), 0) AS media,
+      COUNT(*) AS qtd
+    FROM healthtech.despesa_trimestral
+  ),
+  por_operadora AS (
+    SELECT registro_ans, SUM(valor_despesas) AS total
+    FROM healthtech.despesa_trimestral
+    GROUP BY registro_ans
+  ),
+  top5 AS (
+    SELECT o.cnpj, o.razao_social, SUM(p.total) AS total
+    FROM por_operadora p
+    JOIN healthtech.operadora o ON o.registro_ans = p.registro_ans
+    GROUP BY o.cnpj, o.razao_social
+    ORDER BY total DESC
+    LIMIT 5
+  ),
+  por_uf AS (
+    SELECT o.uf, SUM(p.total) AS total
+    FROM por_operadora p
+    JOIN healthtech.operadora o ON o.registro_ans = p.registro_ans
+    WHERE o.uf IS NOT NULL
+    GROUP BY o.uf
+  )
+  INSERT INTO healthtech.estatisticas_resumo AS r (
+    id, total_despesas, media_despesas, qtd_despesas,
+    top5_operadoras, despesas_por_uf, atualizado_em
+  )
+  SELECT
+    1,
+    g.total,
+    g.media,
+    g.qtd,
+    (
+      SELECT COALESCE(
+        jsonb_agg(
+          jsonb_build_object(
+            'cnpj', cnpj, 'razao_social', razao_social, 'total_despesas', total
+          )
+          ORDER BY total DESC
+        ),
+        '[]'::jsonb
+      )
+      FROM top5
+    ),
+    (SELECT COALESCE(jsonb_object_agg(uf, total), '{}'::jsonb) FROM por_uf),
+    now()
+  FROM geral g
+  ON CONFLICT (id) DO UPDATE SET
+    total_despesas = EXCLUDED.total_despesas,
+    media_despesas = EXCLUDED.media_despesas,
+    qtd_despesas = EXCLUDED.qtd_despesas,
+    top5_operadoras = EXCLUDED.top5_operadoras,
+    despesas_por_uf = EXCLUDED.despesas_por_uf,
+    atualizado_em = EXCLUDED.atualizado_em;
+$$;
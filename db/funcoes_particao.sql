@@ -0,0 +1,80 @@
+-- Teste 3 — Partições trimestrais de despesa_trimestral
+--
+-- Incluído por 001_ddl.sql e 004_migracao_particionamento.sql (\ir).
+-- Nomes sem schema: as funções usam o search_path de quem chama.
+--
+-- Uso:
+--   SELECT criar_particao_despesa(2025, 3);   -- cria (idempotente)
+--   SELECT remover_particao_despesa(2023, 1); -- DETACH + DROP
+--   -- carga de um trimestre fora da tabela e ATTACH no fim:
+--   CREATE TABLE carga_2025t4 (LIKE despesa_trimestral INCLUDING DEFAULTS INCLUDING CONSTRAINTS);
+--   \copy carga_2025t4 FROM ...
+--   SELECT anexar_particao_despesa('carga_2025t4', 2025, 4);
+
+CREATE OR REPLACE FUNCTION nome_particao_despesa(p_ano INTEGER, p_trimestre INTEGER)
+RETURNS TEXT
+LANGUAGE sql IMMUTABLE AS $$
+  SELECT format('despesa_trimestral_%st%s', p_ano, p_trimestre)
+$$;
+
+CREATE OR REPLACE FUNCTION anexar_particao_despesa(p_tabela TEXT, p_ano INTEGER, p_trimestre INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql AS $$
+DECLARE
+  ate_ano INTEGER := CASE WHEN p_trimestre = 4 THEN p_ano + 1 ELSE p_ano END;
+  ate_trimestre INTEGER := CASE WHEN p_trimestre = 4 THEN 1 ELSE p_trimestre + 1 END;
+BEGIN
+  -- CHECK igual ao limite da partição: o ATTACH não precisa varrer a tabela
+  EXECUTE format(
+    'ALTER TABLE %I ADD CONSTRAINT %I CHECK (ano = %s AND trimestre = %s)',
+    p_tabela, p_tabela || '_periodo', p_ano, p_trimestre
+  );
+  EXECUTE format(
+    'ALTER TABLE despesa_trimestral ATTACH PARTITION %I FOR VALUES FROM (%s, %s) TO (%s, %s)',
+    p_tabela, p_ano, p_trimestre, ate_ano, ate_trimestre
+  );
+END
+$$;
+
+CREATE OR REPLACE FUNCTION criar_particao_despesa(p_ano INTEGER, p_trimestre INTEGER)
+RETURNS TEXT
+LANGUAGE plpgsql AS $$
+DECLARE
+  nome TEXT := nome_particao_despesa(p_ano, p_trimestre);
+BEGIN
+  IF to_regclass(nome) IS NOT NULL THEN
+    RETURN nome;
+  END IF;
+
+  EXECUTE format(
+    'CREATE TABLE %I (LIKE despesa_trimestral INCLUDING DEFAULTS INCLUDING CONSTRAINTS)',
+    nome
+  );
+  -- linhas do período que já tinham caído na default vão para a partição nova
+  EXECUTE format(
+    'WITH movidas AS (
+       DELETE FROM despesa_trimestral_default
+       WHERE ano = %s AND trimestre = %s
+       RETURNING *
+     )
+     INSERT INTO %I SELECT * FROM movidas',
+    p_ano, p_trimestre, nome
+  );
+  PERFORM anexar_particao_despesa(nome, p_ano, p_trimestre);
+  RETURN nome;
+END
+$$;
+
+CREATE OR REPLACE FUNCTION remover_particao_despesa(p_ano INTEGER, p_trimestre INTEGER)
+RETURNS VOID
+LANGUAGE plpgsql AS $$
+DECLARE
+  nome TEXT := nome_particao_despesa(p_ano, p_trimestre);
+BEGIN
+  IF to_regclass(nome) IS NULL THEN
+    RETURN;
+  END IF;
+  EXECUTE format('ALTER TABLE despesa_trimestral DETACH PARTITION %I', nome);
+  EXECUTE format('DROP TABLE %I', nome);
+END
+$$;